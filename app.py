@@ -1,15 +1,80 @@
-from flask import Flask, request, jsonify
+import io
+import os
+import threading
+from itertools import chain
+
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from services.mediciones_service import (
     registrar_medicion_desde_api,
+    encolar_medicion_desde_api,
+    estado_medicion_pendiente,
+    ColaCerrada,
+    ColaLlena,
+    registrar_mediciones_lote_desde_api,
+    LOTE_MAXIMO_CIUDADES,
     listar_mediciones,
+    listar_mediciones_paginadas_http,
+    estadisticas_respuestas,
+    CursorInvalido,
+    LIMITE_POR_DEFECTO,
+    exportar_mediciones,
+    FormatoNoSoportado,
     CiudadNoEncontrada,
     ErrorAPIClima,
 )
+from database.almacenamiento import obtener_almacenamiento
+from database.connection import get_pool_stats
+from instrumentacion.latencias import iniciar_pedido, terminar_pedido
+from services.geocoding_service import estadisticas_geocoding
+from services.clima_service import estadisticas_clima
+from services.open_meteo_client import cliente as cliente_open_meteo
+from services.scheduler import iniciar_planificador, estadisticas_planificador
+from services.retencion_service import estadisticas_mantenimiento, iniciar_mantenimiento
+from services.escritura_diferida import escritura_diferida_habilitada, estadisticas_escritura
+from services.ultimas_mediciones import (
+    ULTIMAS_POR_CIUDAD,
+    estadisticas_ultimas,
+    mediciones_recientes,
+    obtener_ultimas,
+    ultima_medicion,
+)
+from services.estadisticas_service import obtener_estadisticas
+from services.analitica_service import analitica_mediciones
+from services.version_datos import estadisticas_version
+from services.sugerencias_service import (
+    SUGERENCIAS_POR_DEFECTO,
+    estadisticas_sugerencias,
+    obtener_indice,
+    sugerir_ciudades,
+)
+from services.filtros import (
+    FiltroInvalido,
+    parsear_decimal,
+    parsear_entero,
+    parsear_fecha,
+    parsear_lista_enteros,
+)
+from services.carga_masiva_service import ErrorImportacion, importar_csv_con_avance
+from services.historico_service import cargar_historico_con_avance
+from services.metricas import estadisticas_metricas, texto_prometheus
 
 app = Flask(__name__)
 CORS(app)
 
+
+@app.before_request
+def _iniciar_metricas():
+    iniciar_pedido()
+
+
+@app.after_request
+def _registrar_metricas(respuesta):
+    # Por la regla de la ruta ("/api/ciudades/<id>"), no por la URL: acota las series
+    ruta = request.url_rule.rule if request.url_rule is not None else "(sin ruta)"
+    terminar_pedido(request.method, ruta, respuesta.status_code)
+    return respuesta
+
 @app.route("/api/mediciones", methods=["POST"])
 def crear_medicion():
     """
@@ -19,7 +84,12 @@ def crear_medicion():
     }
 
     Usa la API de Open-Meteo para obtener clima actual y registrar
-    la medición en la base de datos.
+    la medición en la base de datos (201).
+
+    Con ESCRITURA_DIFERIDA=1 responde 202 apenas tiene el clima y el rango,
+    con un `id_provisional` en vez de `id_medicion`: la medición se escribe
+    después, en grupo con otras. Su estado se consulta en la URL del header
+    Location. Si la cola de escritura está llena responde 503.
     """
 
     data = request.get_json(silent=True) or {}
@@ -31,8 +101,13 @@ def crear_medicion():
             "detalle": "Se requiere el campo 'ciudad'."
         }), 400
 
+    diferida = escritura_diferida_habilitada()
+
     try:
-        resultado = registrar_medicion_desde_api(ciudad)
+        if diferida:
+            resultado = encolar_medicion_desde_api(ciudad)
+        else:
+            resultado = registrar_medicion_desde_api(ciudad)
 
     except CiudadNoEncontrada as e:
         # La API de geocoding no encontró esa ciudad
@@ -48,6 +123,15 @@ def crear_medicion():
             "detalle": str(e),
         }), 502
 
+    except (ColaLlena, ColaCerrada) as e:
+        # Contrapresión: la escritura diferida no da abasto (o se está cerrando)
+        respuesta = jsonify({
+            "error": "Servicio saturado",
+            "detalle": str(e),
+        })
+        respuesta.headers["Retry-After"] = "1"
+        return respuesta, 503
+
     except Exception as e:
         # Cualquier otro problema interno (BD, lógica, etc.)
         return jsonify({
@@ -55,25 +139,506 @@ def crear_medicion():
             "detalle": str(e),
         }), 500
 
+    if diferida:
+        # Aceptada: queda en la cola de escritura
+        respuesta = jsonify(resultado)
+        respuesta.headers["Location"] = f"/api/mediciones/pendientes/{resultado['id_provisional']}"
+        return respuesta, 202
+
     # Todo OK
     return jsonify(resultado), 201
 
 
+@app.route("/api/mediciones/pendientes/<id_provisional>", methods=["GET"])
+def medicion_pendiente(id_provisional):
+    """
+    Estado de una medición aceptada con 202 (escritura diferida):
+    "pendiente" mientras está en la cola, "escrita" (con id_medicion y
+    fecha) o "perdida" si no se pudo escribir. 404 si el id no se conoce:
+    es de otro proceso o ya se olvidó (se recuerdan
+    ESCRITURA_SEGUIMIENTO_TAMANIO ids).
+    """
+    estado = estado_medicion_pendiente(id_provisional)
+    if estado is None:
+        return jsonify({
+            "error": "Medición pendiente no encontrada",
+            "detalle": f"No hay una medición encolada con id '{id_provisional}'.",
+        }), 404
+    return jsonify(estado), 200
+
+
+@app.route("/api/mediciones/lote", methods=["POST"])
+def crear_mediciones_lote():
+    """
+    Registra mediciones para varias ciudades a la vez:
+    {
+        "ciudades": ["Buenos Aires", "Córdoba", "Rosario"]
+    }
+
+    El clima de todas se pide en una sola llamada a Open-Meteo y las
+    mediciones se insertan en una sola transacción. Devuelve resultados
+    y errores por ciudad; una ciudad desconocida no hace fallar al resto.
+    """
+    data = request.get_json(silent=True) or {}
+    ciudades = data.get("ciudades")
+
+    if (
+        not isinstance(ciudades, list)
+        or not ciudades
+        or not all(isinstance(c, str) and c.strip() for c in ciudades)
+    ):
+        return jsonify({
+            "error": "Faltan datos obligatorios",
+            "detalle": "Se requiere 'ciudades': una lista de nombres no vacíos.",
+        }), 400
+
+    if len(ciudades) > LOTE_MAXIMO_CIUDADES:
+        return jsonify({
+            "error": "Demasiadas ciudades",
+            "detalle": f"Como máximo {LOTE_MAXIMO_CIUDADES} ciudades por pedido.",
+        }), 400
+
+    try:
+        resultado = registrar_mediciones_lote_desde_api([c.strip() for c in ciudades])
+
+    except Exception as e:
+        return jsonify({
+            "error": "No se pudieron registrar las mediciones",
+            "detalle": str(e),
+        }), 500
+
+    return jsonify(resultado), 200
+
+
 @app.route("/api/mediciones", methods=["GET"])
 def obtener_mediciones():
     """
-    Devuelve la lista de todas las mediciones registradas.
+    Devuelve las mediciones registradas, de la más reciente a la más antigua,
+    paginadas por cursor:
+
+        GET /api/mediciones?limit=50
+        GET /api/mediciones?limit=50&cursor=<next_cursor de la página anterior>
+
+    Respuesta: {"mediciones": [...], "next_cursor": "..." | null}
+
+    Filtros opcionales (se combinan entre sí y con la paginación; hay que
+    repetirlos al pedir la página siguiente):
+        id_ciudad, ciudad (nombre, sin importar tildes ni mayúsculas),
+        id_rango, rango (nombre_rango), desde / hasta (YYYY-MM-DD, inclusive),
+        temp_min / temp_max (°C, inclusive)
+
+    Cada respuesta lleva un ETag (versión de los datos + parámetros): con
+    If-None-Match y sin cambios desde entonces se responde 304 sin consultar
+    la base de datos.
+
+    Con ?todas=true devuelve la lista completa sin paginar (formato anterior).
     """
+    args = request.args
+    todas = args.get("todas", "").lower() in ("1", "true", "si", "sí")
+
     try:
-        mediciones = listar_mediciones()
+        if todas:
+            return jsonify(listar_mediciones()), 200
+
+        limite = args.get("limit", LIMITE_POR_DEFECTO, type=int)
+        cursor = args.get("cursor") or None
+        pagina = listar_mediciones_paginadas_http(
+            limite,
+            cursor,
+            if_none_match=request.headers.get("If-None-Match"),
+            id_ciudad=parsear_entero(args.get("id_ciudad"), "id_ciudad"),
+            ciudad=args.get("ciudad") or None,
+            id_rango=parsear_entero(args.get("id_rango"), "id_rango"),
+            rango=args.get("rango") or None,
+            desde=parsear_fecha(args.get("desde"), "desde"),
+            hasta=parsear_fecha(args.get("hasta"), "hasta"),
+            temp_min=parsear_decimal(args.get("temp_min"), "temp_min"),
+            temp_max=parsear_decimal(args.get("temp_max"), "temp_max"),
+        )
+
+    except (CursorInvalido, FiltroInvalido) as e:
+        return jsonify({
+            "error": "Parámetros inválidos",
+            "detalle": str(e),
+        }), 400
+
     except Exception as e:
         return jsonify({
             "error": "No se pudieron obtener las mediciones",
             "detalle": str(e),
         }), 500
 
-    return jsonify(mediciones), 200
+    if pagina["cuerpo"] is None:
+        respuesta = Response(status=304)
+    else:
+        respuesta = Response(pagina["cuerpo"], status=200, mimetype="application/json")
+    # no-cache: el navegador guarda la respuesta pero revalida siempre con el ETag
+    respuesta.headers["ETag"] = pagina["etag"]
+    respuesta.headers["Cache-Control"] = "no-cache"
+    return respuesta
+
+
+@app.route("/api/mediciones/export", methods=["GET"])
+def exportar():
+    """
+    Exporta TODAS las mediciones en streaming, sin cargarlas en memoria:
+
+        GET /api/mediciones/export?format=ndjson   (por defecto)
+        GET /api/mediciones/export?format=csv
+    """
+    formato = request.args.get("format", "ndjson").lower()
+
+    try:
+        bloques = exportar_mediciones(formato)
+        # Pedimos el primer bloque acá para que un error de BD
+        # se convierta en un 500 y no en una respuesta cortada
+        primero = next(bloques, "")
+
+    except FormatoNoSoportado as e:
+        return jsonify({
+            "error": "Parámetros inválidos",
+            "detalle": str(e),
+        }), 400
+
+    except Exception as e:
+        return jsonify({
+            "error": "No se pudieron exportar las mediciones",
+            "detalle": str(e),
+        }), 500
+
+    if formato == "csv":
+        mimetype = "text/csv"
+        headers = {"Content-Disposition": "attachment; filename=mediciones.csv"}
+    else:
+        mimetype = "application/x-ndjson"
+        headers = {}
+
+    return Response(
+        stream_with_context(chain([primero], bloques)),
+        mimetype=mimetype,
+        headers=headers,
+    )
+
+
+@app.route("/api/mediciones/import", methods=["POST"])
+def importar():
+    """
+    Importa mediciones desde un CSV enviado como cuerpo del pedido
+    (Content-Type: text/csv), con las columnas de la exportación:
+
+        curl -X POST --data-binary @historico.csv -H "Content-Type: text/csv" \
+             http://localhost:5001/api/mediciones/import
+
+    El archivo se procesa en streaming (COPY en PostgreSQL). La respuesta es
+    NDJSON: eventos {"estado": "importando", "filas", ...} mientras avanza y
+    al final {"estado": "terminado", "insertadas", "duplicadas", ...} o
+    {"estado": "error", ...}; ante un error no se importa ninguna fila.
+    """
+    archivo = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+
+    try:
+        eventos = importar_csv_con_avance(archivo)
+
+    except ErrorImportacion as e:
+        return jsonify({
+            "error": "CSV inválido",
+            "detalle": str(e),
+        }), 400
+
+    except Exception as e:
+        return jsonify({
+            "error": "No se pudo importar el CSV",
+            "detalle": str(e),
+        }), 500
+
+    return Response(stream_with_context(eventos), mimetype="application/x-ndjson")
+
+
+@app.route("/api/mediciones/historico", methods=["POST"])
+def cargar_historico():
+    """
+    Carga el historial horario de una ciudad desde la API de archivo de
+    Open-Meteo:
+
+        {"ciudad": "Córdoba", "desde": "2024-01-01", "hasta": "2024-12-31"}
+
+    Se pide de a tramos de HISTORICO_DIAS_POR_PEDIDO días y cada tramo entra
+    por la importación masiva (COPY en PostgreSQL), sin duplicar las
+    mediciones que ya estaban (misma ciudad y fecha). La respuesta es NDJSON:
+    {"estado": "cargando", "tramo", "tramos", "completado_hasta", ...} por
+    tramo y al final {"estado": "terminado", ...} o {"estado": "error", ...}.
+    Ante un error los tramos anteriores quedan cargados: se retoma con
+    "desde" = el día siguiente a "completado_hasta".
+    """
+    data = request.get_json(silent=True) or {}
+    ciudad = data.get("ciudad")
+
+    if not ciudad:
+        return jsonify({
+            "error": "Faltan datos obligatorios",
+            "detalle": "Se requiere el campo 'ciudad'.",
+        }), 400
+
+    try:
+        eventos = cargar_historico_con_avance(
+            ciudad,
+            parsear_fecha(data.get("desde"), "desde"),
+            parsear_fecha(data.get("hasta"), "hasta"),
+        )
+
+    except FiltroInvalido as e:
+        return jsonify({
+            "error": "Parámetros inválidos",
+            "detalle": str(e),
+        }), 400
+
+    except CiudadNoEncontrada as e:
+        return jsonify({
+            "error": "Ciudad no encontrada",
+            "detalle": str(e),
+        }), 404
+
+    except ErrorAPIClima as e:
+        return jsonify({
+            "error": "Error al consultar la API de clima",
+            "detalle": str(e),
+        }), 502
+
+    except Exception as e:
+        return jsonify({
+            "error": "No se pudo cargar el historial",
+            "detalle": str(e),
+        }), 500
+
+    return Response(stream_with_context(eventos), mimetype="application/x-ndjson")
+
+
+@app.route("/api/estadisticas", methods=["GET"])
+def estadisticas():
+    """
+    Estadísticas diarias desde el resumen precalculado (mediciones_diarias):
+
+        GET /api/estadisticas?ciudad=Córdoba&desde=2025-01-01&hasta=2025-01-31
+        GET /api/estadisticas?id_ciudad=3
+
+    Sin fechas devuelve los últimos 30 días (máximo 366 por pedido).
+    Respuesta: {"desde", "hasta", "dias": [...], "rangos": [...]}
+    """
+    try:
+        resultado = obtener_estadisticas(
+            id_ciudad=parsear_entero(request.args.get("id_ciudad"), "id_ciudad"),
+            ciudad=request.args.get("ciudad") or None,
+            desde=parsear_fecha(request.args.get("desde"), "desde"),
+            hasta=parsear_fecha(request.args.get("hasta"), "hasta"),
+        )
+
+    except FiltroInvalido as e:
+        return jsonify({
+            "error": "Parámetros inválidos",
+            "detalle": str(e),
+        }), 400
+
+    except Exception as e:
+        return jsonify({
+            "error": "No se pudieron obtener las estadísticas",
+            "detalle": str(e),
+        }), 500
+
+    return jsonify(resultado), 200
+
+
+@app.route("/api/analitica", methods=["GET"])
+def analitica():
+    """
+    Analítica de una métrica sobre el historial de mediciones, por ciudad:
+
+        GET /api/analitica?ciudades=1,2&desde=2025-01-01&hasta=2025-01-31
+        GET /api/analitica?metrica=presion&ventana=48&k=2.5&serie=1
+
+    Media móvil de las últimas `ventana` mediciones (24 por defecto),
+    anomalías a más de `k` desvíos (3 por defecto) de las anteriores,
+    mínimo / máximo / promedio por día y tendencia (unidades por día).
+    Sin `ciudades` analiza todas; sin fechas, los últimos 30 días
+    (máximo ANALITICA_DIAS_MAXIMO). Con serie=1 agrega cada medición.
+    Respuesta: {"desde", "hasta", "metrica", "ventana", "k", "mediciones",
+    "ciudades": [{"id_ciudad", "resumen", "tendencia_por_dia", "anomalias", "dias"}, ...]}
+    """
+    args = request.args
+    try:
+        resultado = analitica_mediciones(
+            ids_ciudad=parsear_lista_enteros(args.get("ciudades"), "ciudades"),
+            desde=parsear_fecha(args.get("desde"), "desde"),
+            hasta=parsear_fecha(args.get("hasta"), "hasta"),
+            metrica=args.get("metrica") or "temperatura",
+            ventana=parsear_entero(args.get("ventana"), "ventana"),
+            k=parsear_decimal(args.get("k"), "k"),
+            incluir_serie=args.get("serie", "").lower() in ("1", "true", "si", "sí"),
+        )
+
+    except FiltroInvalido as e:
+        return jsonify({
+            "error": "Parámetros inválidos",
+            "detalle": str(e),
+        }), 400
+
+    except Exception as e:
+        return jsonify({
+            "error": "No se pudo calcular la analítica",
+            "detalle": str(e),
+        }), 500
+
+    return jsonify(resultado), 200
+
+
+@app.route("/api/ciudades/sugerencias", methods=["GET"])
+def sugerencias_ciudades():
+    """
+    Autocompletado de ciudades ya registradas:
+
+        GET /api/ciudades/sugerencias?q=cor&limit=10
+
+    Busca por prefijo del nombre o de cualquiera de sus palabras, sin
+    importar tildes ni mayúsculas (tolera un error de tipeo si no hay
+    coincidencias exactas). Ordena por cantidad de mediciones.
+    Respuesta: [{"id_ciudad", "nombre", "pais", "pais_nombre", "mediciones"}, ...]
+    """
+    texto = request.args.get("q", "")
+    limite = request.args.get("limit", SUGERENCIAS_POR_DEFECTO, type=int)
+
+    try:
+        sugerencias = sugerir_ciudades(texto, limite)
+
+    except Exception as e:
+        return jsonify({
+            "error": "No se pudieron obtener las sugerencias",
+            "detalle": str(e),
+        }), 500
+
+    return jsonify(sugerencias), 200
+
+
+@app.route("/api/ciudades/<int:id_ciudad>/ultima", methods=["GET"])
+def ultima_medicion_ciudad(id_ciudad):
+    """
+    Última medición de la ciudad, con la misma forma que cada elemento de
+    GET /api/mediciones. Sale de memoria, sin consultar la BD.
+    404 si la ciudad no existe o no tiene mediciones.
+    """
+    try:
+        medicion = ultima_medicion(id_ciudad)
+
+    except Exception as e:
+        return jsonify({
+            "error": "No se pudo obtener la última medición",
+            "detalle": str(e),
+        }), 500
+
+    if medicion is None:
+        return jsonify({
+            "error": "Sin mediciones",
+            "detalle": f"No hay mediciones para la ciudad {id_ciudad}.",
+        }), 404
+    return jsonify(medicion), 200
+
+
+@app.route("/api/ciudades/<int:id_ciudad>/recientes", methods=["GET"])
+def mediciones_recientes_ciudad(id_ciudad):
+    """
+    Mediciones recientes de la ciudad, de la más nueva a la más vieja:
+
+        GET /api/ciudades/7/recientes?limit=10
+
+    Como máximo ULTIMAS_POR_CIUDAD (las que se guardan en memoria), sin
+    consultar la BD. Respuesta: {"ciudad": {...}, "mediciones": [...]}.
+    404 si la ciudad no existe o no tiene mediciones.
+    """
+    limite = request.args.get("limit", ULTIMAS_POR_CIUDAD, type=int)
+
+    try:
+        recientes = mediciones_recientes(id_ciudad, limite)
+
+    except Exception as e:
+        return jsonify({
+            "error": "No se pudieron obtener las mediciones recientes",
+            "detalle": str(e),
+        }), 500
+
+    if recientes is None:
+        return jsonify({
+            "error": "Sin mediciones",
+            "detalle": f"No hay mediciones para la ciudad {id_ciudad}.",
+        }), 404
+    return jsonify(recientes), 200
+
+
+@app.route("/api/diagnostico", methods=["GET"])
+def diagnostico():
+    """
+    Devuelve métricas internas del backend:
+    - almacenamiento: backend de la BD (postgres / sqlite) y su estado.
+    - pool: conexiones en uso, libres, tiempos de espera y fallos.
+    - geocoding: aciertos en memoria / BD, llamadas a la API y negativos.
+    - clima: caché de clima actual y llamadas coalescidas.
+    - open_meteo: llamadas HTTP, reintentos, errores y latencias por endpoint.
+    - scheduler: ticks, duración, atraso y fallos (null si no está corriendo).
+    - mantenimiento: particiones creadas y retención de mediciones (null si no está corriendo).
+    - escritura: cola de la escritura diferida, lotes y latencia del commit (null si no se usó).
+    - respuestas: caché del listado (304, aciertos y consultas a la BD).
+    - version: escucha LISTEN/NOTIFY de la versión de los datos.
+    - sugerencias: tamaño del índice de autocompletado de ciudades.
+    - ultimas: ciudades y mediciones recientes en memoria (null si no se armó).
+    - metricas: tiempo promedio por etapa y pedidos lentos (detalle en /metrics).
+    """
+    return jsonify({
+        "almacenamiento": obtener_almacenamiento().stats(),
+        "pool": get_pool_stats(),
+        "geocoding": estadisticas_geocoding(),
+        "clima": estadisticas_clima(),
+        "open_meteo": cliente_open_meteo.stats(),
+        "scheduler": estadisticas_planificador(),
+        "mantenimiento": estadisticas_mantenimiento(),
+        "escritura": estadisticas_escritura(),
+        "respuestas": estadisticas_respuestas(),
+        "version": estadisticas_version(),
+        "sugerencias": estadisticas_sugerencias(),
+        "ultimas": estadisticas_ultimas(),
+        "metricas": estadisticas_metricas(),
+    }), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def metricas():
+    """
+    Métricas en formato de texto de Prometheus:
+    - lab_etapa_segundos: histograma por etapa (geocoding, clima, rango,
+      bd.<función del repositorio>, bd.conexion, open_meteo.<endpoint>).
+    - lab_http_pedido_segundos / lab_http_respuestas_total: por ruta.
+    - Open-Meteo (llamadas, reintentos, errores), cachés y conexiones a la BD.
+    - lab_escritura_*: cola de la escritura diferida; lab_lote_filas: filas
+      por lote (la latencia del commit es la etapa escritura.commit).
+    """
+    texto = texto_prometheus({
+        "open_meteo": cliente_open_meteo.stats(),
+        "geocoding": estadisticas_geocoding(),
+        "clima": estadisticas_clima(),
+        "respuestas": estadisticas_respuestas(),
+        "pool": get_pool_stats(),
+        "almacenamiento": obtener_almacenamiento().stats(),
+        "escritura": estadisticas_escritura(),
+    })
+    return Response(texto, status=200, mimetype="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
+    # Con debug=True el reloader levanta dos procesos: el scheduler
+    # corre solo en el hijo que atiende los pedidos
+    if os.getenv("WERKZEUG_RUN_MAIN") == "true":
+        if os.getenv("SCHEDULER_HABILITADO") == "1":
+            iniciar_planificador()
+        if os.getenv("MANTENIMIENTO_HABILITADO") == "1":
+            iniciar_mantenimiento()
+        # El índice de autocompletado y las últimas mediciones se arman al
+        # arrancar, sin demorar el inicio
+        threading.Thread(target=obtener_indice, name="indice-ciudades", daemon=True).start()
+        threading.Thread(target=obtener_ultimas, name="ultimas-mediciones", daemon=True).start()
     app.run(debug=True, port=5001)
@@ -0,0 +1,138 @@
+# benchmarks/bench_analitica.py
+"""
+Benchmark de la analítica vectorizada (services/analitica_service.py).
+
+Arma una serie sintética (sin BD) de --filas mediciones repartidas en
+--ciudades ciudades, desordenada como la devuelve la BD, y mide:
+- analizar(): orden, media móvil, anomalías, resumen diario y tendencia
+  sobre todas las filas, con NumPy,
+- lo mismo fila por fila en Python puro, sobre --filas-python filas
+  (se extrapola a filas por segundo para comparar),
+- la memoria de las tres columnas leídas.
+
+Con --bd además mide analitica_mediciones() completo (lectura de una sola
+vez desde el backend configurado en el .env + cálculo + JSON).
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_analitica --filas 10000000 --ciudades 1000
+    python -m benchmarks.bench_analitica --filas 100000 --bd --dias 30
+"""
+
+import argparse
+import json
+import statistics
+import time
+from collections import defaultdict, deque
+from datetime import date, timedelta
+
+import numpy as np
+
+from services.analitica_service import analitica_mediciones, analizar
+
+
+def serie_sintetica(filas: int, ciudades: int, semilla: int):
+    """Temperaturas con ciclo diario, ruido y algún pico, cada 15 minutos por ciudad."""
+    rng = np.random.default_rng(semilla)
+    id_ciudad = rng.integers(1, ciudades + 1, filas, dtype=np.int32)
+    paso = np.arange(filas) // ciudades
+    fecha = 1.7e9 + paso * 900.0 + rng.uniform(0, 900, filas)
+    valor = 15 + 8 * np.sin(fecha / 86400.0 * 2 * np.pi) + rng.normal(0, 1.5, filas)
+    valor[rng.random(filas) < 0.001] += 25
+    orden = rng.permutation(filas)
+    return {"id_ciudad": id_ciudad[orden], "fecha": fecha[orden], "valor": valor[orden]}
+
+
+def analizar_python(serie, ventana: int, k: float) -> int:
+    """La misma media móvil, anomalías y resumen diario, fila por fila."""
+    filas = sorted(zip(serie["id_ciudad"].tolist(), serie["fecha"].tolist(), serie["valor"].tolist()))
+    previas = defaultdict(lambda: deque(maxlen=ventana))
+    dias = {}
+    anomalias = 0
+    for id_ciudad, fecha, valor in filas:
+        ventana_ciudad = previas[id_ciudad]
+        if len(ventana_ciudad) >= max(2, ventana // 2):
+            media = statistics.fmean(ventana_ciudad)
+            desvio = statistics.pstdev(ventana_ciudad, media)
+            if desvio > 0 and abs(valor - media) > k * desvio:
+                anomalias += 1
+        ventana_ciudad.append(valor)
+        statistics.fmean(ventana_ciudad)  # media móvil
+
+        clave = (id_ciudad, int(fecha // 86400))
+        dia = dias.get(clave)
+        if dia is None:
+            dias[clave] = [valor, valor, valor, 1]
+        else:
+            dia[0] = min(dia[0], valor)
+            dia[1] = max(dia[1], valor)
+            dia[2] += valor
+            dia[3] += 1
+    return anomalias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filas", type=int, default=10_000_000)
+    parser.add_argument("--ciudades", type=int, default=1000)
+    parser.add_argument("--filas-python", type=int, default=200_000)
+    parser.add_argument("--ventana", type=int, default=24)
+    parser.add_argument("--k", type=float, default=3.0)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--bd", action="store_true", help="también analitica_mediciones() contra la BD del .env")
+    parser.add_argument("--dias", type=int, default=30)
+    args = parser.parse_args()
+
+    serie = serie_sintetica(args.filas, args.ciudades, args.semilla)
+    tiempos = []
+    for _ in range(args.repeticiones):
+        inicio = time.perf_counter()
+        resultado = analizar(serie, args.ventana, args.k)
+        tiempos.append(time.perf_counter() - inicio)
+    numpy_segundos = min(tiempos)
+
+    chica = {c: v[:args.filas_python] for c, v in serie.items()}
+    inicio = time.perf_counter()
+    anomalias_python = analizar_python(chica, args.ventana, args.k)
+    python_segundos = time.perf_counter() - inicio
+    anomalias_numpy = int(analizar(chica, args.ventana, args.k)["ciudades"]["anomalias"].sum())
+
+    filas_python = len(chica["valor"])
+    salida = {
+        "filas": args.filas,
+        "ciudades": args.ciudades,
+        "ventana": args.ventana,
+        "k": args.k,
+        "columnas_mb": round(sum(v.nbytes for v in serie.values()) / 1e6, 1),
+        "numpy": {
+            "segundos": round(numpy_segundos, 3),
+            "filas_por_segundo": round(args.filas / numpy_segundos),
+            "anomalias": int(resultado["ciudades"]["anomalias"].sum()),
+            "dias": len(resultado["dias"]["dia"]),
+        },
+        "python": {
+            "filas": filas_python,
+            "segundos": round(python_segundos, 3),
+            "filas_por_segundo": round(filas_python / python_segundos),
+            "mismas_anomalias": anomalias_python == anomalias_numpy,
+        },
+        "aceleracion": round((args.filas / numpy_segundos) / (filas_python / python_segundos), 1),
+    }
+
+    if args.bd:
+        hasta = date.today()
+        inicio = time.perf_counter()
+        respuesta = analitica_mediciones(desde=hasta - timedelta(days=args.dias - 1), hasta=hasta,
+                                         ventana=args.ventana, k=args.k)
+        salida["bd"] = {
+            "mediciones": respuesta["mediciones"],
+            "ciudades": len(respuesta["ciudades"]),
+            "segundos": round(time.perf_counter() - inicio, 3),
+            "bytes_json": len(json.dumps(respuesta)),
+        }
+
+    print(json.dumps(salida, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+# benchmarks/bench_e2e.py
+"""
+Benchmark de punta a punta de la API contra un Open-Meteo falso.
+
+1) Levanta el Open-Meteo falso (fake_open_meteo) con latencia, jitter y
+   tasa de errores configurables.
+2) Siembra la BD con N ciudades (ya geocodificadas) y M mediciones.
+3) Levanta app.py en un servidor HTTP local con hilos y le pega con
+   `--concurrencia` clientes a cada endpoint, de a uno por vez.
+4) Por endpoint informa pedidos por segundo, latencia p50/p95/p99, códigos
+   de respuesta, llamadas a Open-Meteo por pedido y uso de la BD por
+   pedido (checkouts de conexión y conexiones abiertas).
+
+Por defecto usa el backend SQLite en un archivo temporal (no hace falta
+nada instalado). Con --backend postgres usa la BD de .env y le agrega las
+ciudades y mediciones sembradas. Con --escritura-diferida, POST
+/api/mediciones responde 202 y escribe en grupos (ESCRITURA_DIFERIDA=1); el
+resultado agrega lo que tardó en vaciarse la cola y sus estadísticas.
+
+La salida es JSON con claves ordenadas, para guardar y comparar entre commits:
+
+    python -m benchmarks.bench_e2e --salida antes.json
+    (cambios)
+    python -m benchmarks.bench_e2e --salida despues.json
+    python -m benchmarks.bench_e2e --comparar antes.json despues.json
+
+--comparar sale con código 1 si algún p95 empeoró más que --umbral.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.fake_open_meteo import ServidorFalso, geocodificar
+
+
+ENDPOINTS = (
+    "POST /api/mediciones",
+    "GET /api/mediciones",
+    "GET /api/estadisticas",
+    "GET /api/ciudades/sugerencias",
+)
+
+
+def percentiles(muestras_s):
+    ordenadas = sorted(muestras_s)
+
+    def p(q):
+        return round(ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))] * 1000, 3)
+
+    return {"p50_ms": p(0.50), "p95_ms": p(0.95), "p99_ms": p(0.99), "max_ms": p(1.0)}
+
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# -----------------------------
+# Siembra
+# -----------------------------
+
+def sembrar(almacenamiento, nombres, mediciones, rnd):
+    """
+    Registra las ciudades con sus datos de geocoding (como si ya se hubieran
+    consultado) y reparte `mediciones` entre ellas, en lotes.
+    """
+    from services.normalizacion import normalizar_nombre
+    from services.rangos_service import clasificar_temperatura
+
+    ciudades = []
+    for nombre in nombres:
+        geo = geocodificar(nombre)["results"][0]
+        ciudades.append({
+            "nombre_ciudad": geo["name"],
+            "provincia": "Desconocida",
+            "pais": geo["country_code"],
+            "nombre_normalizado": normalizar_nombre(nombre),
+            "pais_nombre": geo["country"],
+            "latitud": geo["latitude"],
+            "longitud": geo["longitude"],
+        })
+
+    inicio = time.perf_counter()
+    restantes = mediciones
+    while restantes > 0:
+        # Cada ciudad una sola vez por lote (lo exige registrar_mediciones_lote)
+        for desde in range(0, min(restantes, len(ciudades)), 500):
+            lote = []
+            for ciudad in ciudades[desde:min(desde + 500, restantes)]:
+                temperatura = round(rnd.uniform(-10, 40), 1)
+                lote.append({
+                    **ciudad,
+                    "id_rango": clasificar_temperatura(temperatura)["id_rango"],
+                    "temperatura": temperatura,
+                    "humedad": rnd.randint(10, 100),
+                    "sensacion_termica": round(temperatura - rnd.uniform(0, 3), 1),
+                    "presion": round(rnd.uniform(990, 1030), 1),
+                    "velocidad_viento": round(rnd.uniform(0, 60), 1),
+                    "descripcion": "Sintética",
+                })
+            almacenamiento.registrar_mediciones_lote(lote)
+        restantes -= len(ciudades)
+
+    ids = {
+        c["nombre"]: c["id_ciudad"]
+        for c in almacenamiento.obtener_ciudades_con_cantidad()
+    }
+    return [ids[c["nombre_ciudad"]] for c in ciudades if c["nombre_ciudad"] in ids], time.perf_counter() - inicio
+
+
+# -----------------------------
+# Carga
+# -----------------------------
+
+def generadores(nombres, ids_ciudad, marca, nuevas, rnd):
+    """Por endpoint, una función que arma el pedido i: (método, ruta, json)."""
+    lock = threading.Lock()
+
+    # random.Random no es seguro entre hilos
+    def azar(secuencia):
+        with lock:
+            return rnd.choice(secuencia)
+
+    def sortear():
+        with lock:
+            return rnd.random()
+
+    def post(i):
+        # Una fracción de ciudades nunca vistas: geocoding + clima contra Open-Meteo
+        if sortear() < nuevas:
+            return "POST", "/api/mediciones", {"ciudad": f"Nueva E2E {marca} {i}"}
+        return "POST", "/api/mediciones", {"ciudad": azar(nombres)}
+
+    def listado(i):
+        if i % 3 == 0:
+            return "GET", "/api/mediciones?limit=50", None
+        return "GET", f"/api/mediciones?limit=50&id_ciudad={azar(ids_ciudad)}", None
+
+    def estadisticas(i):
+        return "GET", f"/api/estadisticas?id_ciudad={azar(ids_ciudad)}", None
+
+    def sugerencias(i):
+        nombre = azar(nombres)
+        return "GET", f"/api/ciudades/sugerencias?q={nombre[:1 + i % 6]}", None
+
+    return {
+        "POST /api/mediciones": post,
+        "GET /api/mediciones": listado,
+        "GET /api/estadisticas": estadisticas,
+        "GET /api/ciudades/sugerencias": sugerencias,
+    }
+
+
+def estado_bd(almacenamiento):
+    """Checkouts de conexión y conexiones abiertas, para cualquier backend."""
+    from database.connection import get_pool_stats
+
+    if almacenamiento.nombre == "postgres":
+        pool = get_pool_stats() or {}
+        return {"checkouts": pool.get("checkouts", 0), "conexiones": pool.get("total", 0)}
+    stats = almacenamiento.stats()
+    return {"checkouts": stats.get("checkouts", 0), "conexiones": stats.get("conexiones", 0)}
+
+
+def cargar(url, generador, pedidos, concurrencia, servidor, almacenamiento):
+    """Hace `pedidos` pedidos con `concurrencia` clientes; devuelve las métricas."""
+    local = threading.local()
+    latencias = [0.0] * pedidos
+    codigos = [0] * pedidos
+
+    def uno(i):
+        sesion = getattr(local, "sesion", None)
+        if sesion is None:
+            sesion = local.sesion = requests.Session()
+        metodo, ruta, cuerpo = generador(i)
+        inicio = time.perf_counter()
+        try:
+            resp = sesion.request(metodo, url + ruta, json=cuerpo, timeout=60)
+            codigos[i] = resp.status_code
+        except requests.RequestException:
+            codigos[i] = -1
+        latencias[i] = time.perf_counter() - inicio
+
+    servidor.reiniciar_contadores()
+    bd_antes = estado_bd(almacenamiento)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as ejecutor:
+        list(ejecutor.map(uno, range(pedidos)))
+    segundos = time.perf_counter() - inicio
+    bd_despues = estado_bd(almacenamiento)
+
+    with servidor._lock:
+        upstream = dict(servidor.llamadas)
+    checkouts = bd_despues["checkouts"] - bd_antes["checkouts"]
+    return {
+        "pedidos": pedidos,
+        "segundos": round(segundos, 3),
+        "pedidos_por_segundo": round(pedidos / segundos, 2) if segundos else None,
+        **percentiles(latencias),
+        "codigos": {str(k): v for k, v in sorted(Counter(codigos).items())},
+        "upstream": {
+            "llamadas": sum(upstream.values()),
+            "por_pedido": round(sum(upstream.values()) / pedidos, 3),
+            "por_ruta": upstream,
+        },
+        "bd": {
+            "checkouts": checkouts,
+            "checkouts_por_pedido": round(checkouts / pedidos, 3),
+            "conexiones_abiertas": bd_despues["conexiones"],
+        },
+    }
+
+
+def correr(args):
+    servidor = ServidorFalso(
+        latencia=args.latencia, jitter=args.jitter, tasa_error=args.tasa_error
+    ).iniciar()
+    # Las URLs y el backend se leen al importar: hay que setearlos antes
+    os.environ["OPEN_METEO_GEOCODING_BASE"] = servidor.url
+    os.environ["OPEN_METEO_FORECAST_BASE"] = servidor.url
+    if args.reintentos is not None:
+        os.environ["OPEN_METEO_REINTENTOS"] = str(args.reintentos)
+    directorio = None
+    if args.backend == "sqlite":
+        directorio = tempfile.TemporaryDirectory()
+        os.environ["DB_SQLITE_RUTA"] = os.path.join(directorio.name, "bench_e2e.sqlite3")
+    os.environ["DB_BACKEND"] = args.backend
+    if args.escritura_diferida:
+        os.environ["ESCRITURA_DIFERIDA"] = "1"
+
+    from werkzeug.serving import make_server
+
+    import app as aplicacion
+    from database.almacenamiento import cerrar_almacenamiento, obtener_almacenamiento
+    from services.escritura_diferida import detener_escritura, estadisticas_escritura
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    rnd = random.Random(args.semilla)
+    marca = int(time.time())
+    almacenamiento = obtener_almacenamiento()
+
+    http = make_server("127.0.0.1", 0, aplicacion.app, threaded=True)
+    hilo = threading.Thread(target=http.serve_forever, daemon=True)
+    hilo.start()
+    url = f"http://127.0.0.1:{http.server_port}"
+
+    try:
+        nombres = [f"Ciudad E2E {marca} {i}" for i in range(args.ciudades)]
+        ids_ciudad, segundos_siembra = sembrar(almacenamiento, nombres, args.mediciones, rnd)
+
+        escritura = None
+        elegidos = args.endpoints or list(ENDPOINTS)
+        por_endpoint = generadores(nombres, ids_ciudad, marca, args.nuevas, rnd)
+        resultados = {}
+        for endpoint in elegidos:
+            # Calentamiento: cachés en memoria e índices como en un proceso andando
+            cargar(url, por_endpoint[endpoint], min(args.calentamiento, args.pedidos),
+                   args.concurrencia, servidor, almacenamiento)
+            resultados[endpoint] = cargar(
+                url, por_endpoint[endpoint], args.pedidos, args.concurrencia, servidor, almacenamiento
+            )
+            if endpoint == "POST /api/mediciones" and args.escritura_diferida:
+                # Lo aceptado con 202 que todavía no se escribió
+                inicio = time.perf_counter()
+                detener_escritura()
+                escritura = {
+                    "vaciado_segundos": round(time.perf_counter() - inicio, 3),
+                    **(estadisticas_escritura() or {}),
+                }
+    finally:
+        http.shutdown()
+        detener_escritura()
+        servidor.detener()
+        cerrar_almacenamiento()
+        if directorio is not None:
+            directorio.cleanup()
+
+    return {
+        "commit": commit_actual(),
+        "config": {
+            "backend": args.backend,
+            "ciudades": args.ciudades,
+            "mediciones": args.mediciones,
+            "pedidos": args.pedidos,
+            "concurrencia": args.concurrencia,
+            "latencia_s": args.latencia,
+            "jitter_s": args.jitter,
+            "tasa_error": args.tasa_error,
+            "nuevas": args.nuevas,
+            "semilla": args.semilla,
+            "escritura_diferida": args.escritura_diferida,
+        },
+        "siembra_segundos": round(segundos_siembra, 3),
+        "endpoints": resultados,
+        "escritura": escritura,
+    }
+
+
+# -----------------------------
+# Comparación
+# -----------------------------
+
+METRICAS_COMPARADAS = ("pedidos_por_segundo", "p50_ms", "p95_ms", "p99_ms")
+
+
+def comparar(antes, despues, umbral):
+    """Cambio porcentual por endpoint y métrica; marca los p95 que empeoraron."""
+    cambios = {}
+    regresiones = []
+    for endpoint, nuevo in despues["endpoints"].items():
+        viejo = antes["endpoints"].get(endpoint)
+        if viejo is None:
+            continue
+        cambios[endpoint] = {}
+        for metrica in METRICAS_COMPARADAS:
+            a, b = viejo.get(metrica), nuevo.get(metrica)
+            cambio = round((b - a) / a * 100, 1) if a else None
+            cambios[endpoint][metrica] = {"antes": a, "despues": b, "cambio_pct": cambio}
+        p95 = cambios[endpoint]["p95_ms"]["cambio_pct"]
+        if p95 is not None and p95 > umbral * 100:
+            regresiones.append(endpoint)
+    return {
+        "antes": antes.get("commit"),
+        "despues": despues.get("commit"),
+        "cambios": cambios,
+        "regresiones_p95": regresiones,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de punta a punta de la API.")
+    parser.add_argument("--backend", choices=("sqlite", "postgres"), default="sqlite")
+    parser.add_argument("--ciudades", type=int, default=200)
+    parser.add_argument("--mediciones", type=int, default=20000)
+    parser.add_argument("--pedidos", type=int, default=1000, help="pedidos medidos por endpoint")
+    parser.add_argument("--calentamiento", type=int, default=100, help="pedidos previos sin medir")
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--latencia", type=float, default=0.02,
+                        help="segundos de demora por llamada al Open-Meteo falso")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="probabilidad de 503 (0..1)")
+    parser.add_argument("--reintentos", type=int, default=None,
+                        help="OPEN_METEO_REINTENTOS para la corrida (por defecto, el del entorno)")
+    parser.add_argument("--nuevas", type=float, default=0.5,
+                        help="fracción de POST con ciudades nunca vistas")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=None)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--escritura-diferida", action="store_true",
+                        help="POST /api/mediciones con escritura diferida (202 + group commit)")
+    parser.add_argument("--salida", help="guardar el JSON en este archivo")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DESPUES"),
+                        help="comparar dos salidas guardadas en lugar de correr")
+    parser.add_argument("--umbral", type=float, default=0.2,
+                        help="empeoramiento de p95 tolerado por --comparar (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.comparar:
+        with open(args.comparar[0], encoding="utf-8") as f:
+            antes = json.load(f)
+        with open(args.comparar[1], encoding="utf-8") as f:
+            despues = json.load(f)
+        resultado = comparar(antes, despues, args.umbral)
+        print(json.dumps(resultado, ensure_ascii=False, indent=2, sort_keys=True))
+        return 1 if resultado["regresiones_p95"] else 0
+
+    resultado = correr(args)
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2, sort_keys=True)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    print(texto)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
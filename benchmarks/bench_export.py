@@ -0,0 +1,135 @@
+# benchmarks/bench_export.py
+"""
+Benchmark de memoria de la exportación de mediciones.
+
+Compara el pico de memoria (tracemalloc, todos los hilos) de:
+- "lista": el enfoque de GET /api/mediciones?todas=true
+  (todas las filas en una lista + un dict por fila + json.dumps del total),
+- "ndjson" y "csv": lo que sirve /api/mediciones/export
+  (mediciones_service.exportar_mediciones: cursor del servidor para NDJSON,
+  carga_masiva_service.exportar_csv_en_bloques / COPY TO STDOUT para CSV).
+
+Por defecto arma una base SQLite temporal con --filas mediciones
+sintéticas (cargadas con la importación masiva). Con --bd usa la base
+configurada en .env tal como está.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_export --filas 1000000
+    python -m benchmarks.bench_export --bd
+"""
+
+import argparse
+import csv
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+
+COLUMNAS_SINTETICAS = [
+    "fecha", "temperatura", "humedad", "sensacion_termica", "presion",
+    "velocidad_viento", "descripcion", "ciudad", "provincia", "pais",
+]
+
+
+def escribir_csv_sintetico(ruta: str, cantidad: int) -> None:
+    """CSV para la importación masiva: 50 ciudades, una medición por minuto."""
+    ahora = datetime.now(timezone.utc)
+    with open(ruta, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNAS_SINTETICAS)
+        for i in range(cantidad):
+            writer.writerow((
+                (ahora - timedelta(minutes=i)).isoformat(),
+                15.3 + i % 20,
+                65,
+                14.2,
+                1013.4,
+                12.6,
+                "Parcialmente nublado",
+                f"Ciudad exportación {i % 50}",
+                "Desconocida",
+                "AR",
+            ))
+
+
+def medir(nombre, funcion):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    bytes_salida = funcion()
+    duracion = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "modo": nombre,
+        "segundos": round(duracion, 3),
+        "pico_mb": round(pico / (1024 * 1024), 2),
+        "bytes_salida": bytes_salida,
+    }
+
+
+def consumir(bloques):
+    """Simula enviar los bloques al cliente: solo cuenta bytes."""
+    total = 0
+    for bloque in bloques:
+        total += len(bloque.encode("utf-8"))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    parser.add_argument("--bd", action="store_true",
+                        help="usar la base del .env en lugar de una SQLite temporal con filas sintéticas")
+    parser.add_argument("--sin-lista", action="store_true",
+                        help="omitir el modo 'lista' (puede usar mucha memoria)")
+    args = parser.parse_args()
+
+    directorio = None
+    if not args.bd:
+        directorio = tempfile.TemporaryDirectory()
+        os.environ["DB_BACKEND"] = "sqlite"
+        os.environ["DB_SQLITE_RUTA"] = os.path.join(directorio.name, "bench_export.sqlite3")
+
+    # Recién ahora: los servicios leen el backend al importarse
+    from database.almacenamiento import obtener_almacenamiento
+    from repositories.mediciones_repository import fila_a_medicion, iterar_mediciones
+    from services.carga_masiva_service import importar_csv
+    from services.mediciones_service import exportar_mediciones
+
+    backend = obtener_almacenamiento().nombre
+    try:
+        carga = None
+        if not args.bd:
+            obtener_almacenamiento().inicializar()
+            ruta_csv = os.path.join(directorio.name, "sinteticas.csv")
+            escribir_csv_sintetico(ruta_csv, args.filas)
+            with open(ruta_csv, encoding="utf-8", newline="") as f:
+                carga = importar_csv(f)
+
+        resultados = []
+        if not args.sin_lista:
+            def lista():
+                filas = list(iterar_mediciones())
+                texto = json.dumps([fila_a_medicion(r) for r in filas], ensure_ascii=False)
+                return len(texto.encode("utf-8"))
+            resultados.append(medir("lista", lista))
+
+        resultados.append(medir("ndjson", lambda: consumir(exportar_mediciones("ndjson"))))
+        resultados.append(medir("csv", lambda: consumir(exportar_mediciones("csv"))))
+    finally:
+        obtener_almacenamiento().cerrar()
+        if directorio is not None:
+            directorio.cleanup()
+
+    print(json.dumps({
+        "filas": carga["insertadas"] if carga is not None else None,
+        "fuente": backend if args.bd else "sqlite_temporal",
+        "resultados": resultados,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/bench_historico.py
+"""
+Benchmark (y verificación) de la carga del historial horario
+(services/historico_service.py) contra el servidor falso de Open-Meteo.
+
+Sobre una base SQLite temporal (o la del .env con --backend postgres):
+1) carga --dias días de --ciudades ciudades y mide filas/s,
+2) vuelve a cargar lo mismo: no debe insertar nada (idempotente),
+3) carga una ciudad nueva cortada a la mitad y la retoma cargando el rango
+   completo: debe insertar solo lo que faltaba.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_historico --dias 365 --ciudades 3
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.fake_open_meteo import ServidorFalso
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dias", type=int, default=365)
+    parser.add_argument("--ciudades", type=int, default=3)
+    parser.add_argument("--dias-por-pedido", type=int, default=31)
+    parser.add_argument("--latencia", type=float, default=0.02, help="demora del servidor falso por llamada")
+    parser.add_argument("--backend", choices=("sqlite", "postgres"), default="sqlite")
+    args = parser.parse_args()
+
+    servidor = ServidorFalso(latencia=args.latencia).iniciar()
+    os.environ["OPEN_METEO_GEOCODING_BASE"] = servidor.url
+    os.environ["OPEN_METEO_ARCHIVE_BASE"] = servidor.url
+    directorio = None
+    if args.backend == "sqlite":
+        directorio = tempfile.TemporaryDirectory()
+        os.environ["DB_SQLITE_RUTA"] = os.path.join(directorio.name, "bench_historico.sqlite3")
+    os.environ["DB_BACKEND"] = args.backend
+
+    # Recién ahora: los servicios leen las URLs y el backend al importarse
+    from database.almacenamiento import obtener_almacenamiento
+    from services.historico_service import cargar_historico
+
+    obtener_almacenamiento().inicializar()
+    hasta = date.today() - timedelta(days=1)
+    desde = hasta - timedelta(days=args.dias - 1)
+    sufijo = int(time.time())
+    nombres = [f"Historico {sufijo} {i}" for i in range(args.ciudades)]
+
+    def cargar_todas(desde_carga, hasta_carga, ciudades):
+        inicio = time.perf_counter()
+        resumenes = [
+            cargar_historico(nombre, desde_carga, hasta_carga, dias_por_pedido=args.dias_por_pedido)
+            for nombre in ciudades
+        ]
+        segundos = time.perf_counter() - inicio
+        totales = {c: sum(r[c] for r in resumenes) for c in ("filas", "insertadas", "duplicadas", "descartadas")}
+        return {
+            **totales,
+            "tramos": sum(r["tramos"] for r in resumenes),
+            "segundos": round(segundos, 3),
+            "filas_por_segundo": round(totales["filas"] / segundos) if segundos > 0 else 0,
+        }
+
+    try:
+        primera = cargar_todas(desde, hasta, nombres)
+        llamadas = servidor.total_llamadas()
+        repetida = cargar_todas(desde, hasta, nombres)
+
+        otra = [f"Historico {sufijo} retomada"]
+        mitad = desde + timedelta(days=args.dias // 2)
+        cortada = cargar_todas(desde, mitad, otra)
+        retomada = cargar_todas(desde, hasta, otra)
+    finally:
+        servidor.detener()
+        obtener_almacenamiento().cerrar()
+        if directorio is not None:
+            directorio.cleanup()
+
+    horas = args.dias * 24
+    print(json.dumps({
+        "backend": args.backend,
+        "dias": args.dias,
+        "ciudades": args.ciudades,
+        "llamadas_api": llamadas,
+        "primera": primera,
+        "repetida": repetida,
+        "cortada": cortada,
+        "retomada": retomada,
+        "verificaciones": {
+            "todas_las_horas": primera["filas"] == horas * args.ciudades,
+            "sin_duplicar": repetida["insertadas"] == 0 and repetida["duplicadas"] == primera["insertadas"],
+            "retoma_sin_duplicar": (
+                cortada["insertadas"] + retomada["insertadas"] == retomada["filas"] - retomada["descartadas"]
+                and retomada["duplicadas"] == cortada["insertadas"]
+            ),
+        },
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
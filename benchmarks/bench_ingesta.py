@@ -0,0 +1,95 @@
+# benchmarks/bench_ingesta.py
+"""
+Benchmark de ingesta: camino síncrono vs motor asíncrono.
+
+Levanta el Open-Meteo falso con latencia inyectada y captura N ciudades:
+- "sync":  registrar_medicion_desde_api, una ciudad tras otra
+           (lo que hace hoy un hilo de Flask por cada POST),
+- "async": services.ingesta_async.ingerir_ciudades.
+
+Cada modo usa nombres de ciudad distintos para que ninguno aproveche
+las cachés del otro. Necesita la BD configurada en .env.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_ingesta --ciudades 200 --latencia 0.1
+"""
+
+import argparse
+import json
+import os
+import time
+
+from benchmarks.fake_open_meteo import ServidorFalso
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async contra un Open-Meteo falso.")
+    parser.add_argument("--ciudades", type=int, default=200)
+    parser.add_argument("--latencia", type=float, default=0.1,
+                        help="segundos de demora por llamada al servidor falso")
+    parser.add_argument("--concurrencia", type=int, default=50)
+    parser.add_argument("--lote", type=int, default=50)
+    args = parser.parse_args()
+
+    servidor = ServidorFalso(latencia=args.latencia).iniciar()
+    # Las URLs se leen al importar los servicios: hay que setearlas antes
+    os.environ["OPEN_METEO_GEOCODING_BASE"] = servidor.url
+    os.environ["OPEN_METEO_FORECAST_BASE"] = servidor.url
+    os.environ["OPEN_METEO_REINTENTOS"] = "0"
+
+    from services.ingesta_async import ingerir_ciudades_sync
+    from services.mediciones_service import registrar_medicion_desde_api
+
+    marca = int(time.time())
+    resultados = []
+
+    try:
+        # Sync
+        nombres = [f"Bench Sync {marca} {i}" for i in range(args.ciudades)]
+        servidor.reiniciar_contadores()
+        inicio = time.perf_counter()
+        errores = 0
+        for nombre in nombres:
+            try:
+                registrar_medicion_desde_api(nombre)
+            except Exception:
+                errores += 1
+        segundos = time.perf_counter() - inicio
+        resultados.append({
+            "modo": "sync",
+            "segundos": round(segundos, 3),
+            "ciudades_por_segundo": round(len(nombres) / segundos, 2),
+            "errores": errores,
+            "llamadas_upstream": servidor.total_llamadas(),
+        })
+
+        # Async
+        nombres = [f"Bench Async {marca} {i}" for i in range(args.ciudades)]
+        servidor.reiniciar_contadores()
+        resumen = ingerir_ciudades_sync(
+            nombres, concurrencia=args.concurrencia, tamanio_lote=args.lote
+        )
+        resultados.append({
+            "modo": "async",
+            "segundos": resumen["segundos"],
+            "ciudades_por_segundo": resumen["ciudades_por_segundo"],
+            "errores": len(resumen["errores"]),
+            "llamadas_upstream": servidor.total_llamadas(),
+            "lotes": resumen["lotes"],
+        })
+    finally:
+        servidor.detener()
+
+    sync, asincrono = resultados
+    print(json.dumps({
+        "ciudades": args.ciudades,
+        "latencia_s": args.latencia,
+        "concurrencia": args.concurrencia,
+        "resultados": resultados,
+        "aceleracion": round(sync["segundos"] / asincrono["segundos"], 2)
+        if asincrono["segundos"] else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
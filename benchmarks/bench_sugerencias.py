@@ -0,0 +1,107 @@
+# benchmarks/bench_sugerencias.py
+"""
+Benchmark del índice de autocompletado de ciudades (sugerencias_service).
+
+Arma un IndiceCiudades con ciudades sintéticas (no hace falta BD) y mide:
+- el tiempo de armado,
+- la latencia de consultas por prefijo (1 a 6 letras de nombres existentes),
+- aparte, la de consultas con un error de tipeo (búsqueda difusa),
+- la de sumar mediciones (lo que hace cada registro de medición).
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_sugerencias --ciudades 100000
+"""
+
+import argparse
+import json
+import random
+import time
+
+from services.sugerencias_service import IndiceCiudades
+
+
+SILABAS = [
+    "ba", "be", "bi", "ca", "co", "cu", "da", "de", "fe", "ga", "go", "la",
+    "le", "lo", "ma", "me", "mo", "na", "no", "pa", "pe", "po", "ra", "re",
+    "ri", "ro", "sa", "se", "so", "ta", "te", "to", "va", "vi", "za", "ña",
+]
+PRIMERAS = ["San", "Santa", "Villa", "Puerto", "General", "La", "El", "Mar del"]
+
+
+def ciudades_sinteticas(cantidad: int, rnd: random.Random):
+    """Nombres inventados, con algunos prefijos muy repetidos ("San ...")."""
+    for i in range(cantidad):
+        palabra = "".join(rnd.choice(SILABAS) for _ in range(rnd.randint(2, 4))).capitalize()
+        if rnd.random() < 0.3:
+            palabra = f"{rnd.choice(PRIMERAS)} {palabra}"
+        yield {
+            "id_ciudad": i + 1,
+            "nombre": palabra,
+            "pais": "ZZ",
+            "pais_nombre": "Sintético",
+            # Pocas ciudades muy medidas, muchas casi sin mediciones
+            "mediciones": int(rnd.paretovariate(1.2)),
+        }
+
+
+def con_error(texto: str, rnd: random.Random) -> str:
+    """Cambia una letra al azar (un error de tipeo)."""
+    i = rnd.randrange(len(texto))
+    return texto[:i] + rnd.choice("xqwkjh") + texto[i + 1:]
+
+
+def percentiles(muestras_s):
+    ordenadas = sorted(muestras_s)
+
+    def p(q):
+        return round(ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))] * 1e6, 1)
+
+    return {"p50_us": p(0.50), "p95_us": p(0.95), "p99_us": p(0.99), "max_us": p(1.0)}
+
+
+def medir(funcion, entradas):
+    muestras = []
+    for entrada in entradas:
+        inicio = time.perf_counter()
+        funcion(entrada)
+        muestras.append(time.perf_counter() - inicio)
+    return {"consultas": len(entradas), **percentiles(muestras)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ciudades", type=int, default=100_000)
+    parser.add_argument("--consultas", type=int, default=20_000)
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.semilla)
+    ciudades = list(ciudades_sinteticas(args.ciudades, rnd))
+
+    inicio = time.perf_counter()
+    indice = IndiceCiudades(ciudades)
+    armado = time.perf_counter() - inicio
+
+    nombres = [c["nombre"] for c in ciudades]
+    prefijos = [
+        nombre[:rnd.randint(1, min(6, len(nombre)))]
+        for nombre in rnd.choices(nombres, k=args.consultas)
+    ]
+    difusas = [
+        con_error(nombre[:rnd.randint(4, max(4, len(nombre)))], rnd)
+        for nombre in rnd.choices(nombres, k=max(1, args.consultas // 10))
+    ]
+    ids = [rnd.randint(1, args.ciudades) for _ in range(args.consultas)]
+
+    print(json.dumps({
+        "ciudades": args.ciudades,
+        "armado_segundos": round(armado, 3),
+        "indice": indice.stats(),
+        "prefijo": medir(indice.sugerir, prefijos),
+        "difusa": medir(indice.sugerir, difusas),
+        "sumar_mediciones": medir(indice.sumar_mediciones, ids),
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/bench_ultimas.py
+"""
+Benchmark del almacén de últimas mediciones en memoria (ultimas_mediciones).
+
+Arma un UltimasMediciones con ciudades y mediciones sintéticas (no hace
+falta BD) y mide:
+- la memoria por ciudad (tracemalloc) con los buffers llenos,
+- el tiempo de armado,
+- la latencia de agregar una medición nueva (lo que hace cada registro),
+- la de leer la última medición y las recientes de una ciudad.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.bench_ultimas --ciudades 10000 --por-ciudad 16
+"""
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.bench_sugerencias import medir
+from services.ultimas_mediciones import UltimasMediciones
+
+
+DESCRIPCIONES = ["Despejado", "Parcialmente nublado", "Nublado", "Lluvia", "Llovizna", "Niebla"]
+RANGOS = {i: {"id_rango": i, "nombre_rango": f"RANGO_{i}"} for i in range(1, 6)}
+
+
+def filas_sinteticas(ciudades: int, por_ciudad: int, rnd: random.Random):
+    """Filas con la forma de SELECT_MEDICIONES, de la más vieja a la más nueva por ciudad."""
+    inicio = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    id_medicion = 0
+    for id_ciudad in range(1, ciudades + 1):
+        # Strings nuevos por ciudad, como los que llegan de la BD
+        nombre = f"Ciudad sintética {id_ciudad}"
+        for j in range(por_ciudad):
+            id_medicion += 1
+            temperatura = round(rnd.uniform(-10, 40), 1)
+            yield (
+                id_medicion,
+                inicio + timedelta(minutes=15 * j),
+                temperatura,
+                rnd.randint(10, 100),
+                temperatura - 1.5,
+                round(rnd.uniform(990, 1030), 1),
+                round(rnd.uniform(0, 60), 1),
+                # Copia: cada fila de la BD trae su propio string
+                "".join(rnd.choice(DESCRIPCIONES)),
+                id_ciudad,
+                nombre,
+                "Desconocida",
+                "ZZ",
+                rnd.randint(1, 5),
+                None,
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ciudades", type=int, default=10_000)
+    parser.add_argument("--por-ciudad", type=int, default=16)
+    parser.add_argument("--consultas", type=int, default=20_000)
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.semilla)
+    lecturas = args.ciudades * args.por_ciudad
+
+    filas = list(filas_sinteticas(args.ciudades, args.por_ciudad, random.Random(args.semilla)))
+    inicio = time.perf_counter()
+    UltimasMediciones.desde_filas(filas, args.por_ciudad)
+    armado = time.perf_counter() - inicio
+    del filas
+
+    # Memoria en otra pasada (tracemalloc la hace mucho más lenta); las filas
+    # se generan de a una, así solo queda medido lo que guarda el almacén
+    tracemalloc.start()
+    antes = tracemalloc.take_snapshot()
+    ultimas = UltimasMediciones.desde_filas(
+        filas_sinteticas(args.ciudades, args.por_ciudad, rnd), args.por_ciudad
+    )
+    despues = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    bytes_totales = sum(s.size_diff for s in despues.compare_to(antes, "filename"))
+
+    rango_de = RANGOS.get
+    ids = [rnd.randint(1, args.ciudades) for _ in range(args.consultas)]
+    ahora = datetime.now(timezone.utc).isoformat()
+    siguiente = [lecturas]
+
+    def agregar(id_ciudad):
+        siguiente[0] += 1
+        ultimas.agregar(
+            {"id_ciudad": id_ciudad, "nombre": "x", "provincia": "x", "pais": "ZZ"},
+            siguiente[0], ahora,
+            {"id_rango": 3, "temperatura": 20.0, "humedad": 50, "sensacion_termica": 19.0,
+             "presion": 1013.0, "velocidad_viento": 10.0, "descripcion": "Despejado"},
+        )
+
+    print(json.dumps({
+        "ciudades": args.ciudades,
+        "por_ciudad": args.por_ciudad,
+        "armado_segundos": round(armado, 3),
+        "memoria": {
+            "bytes_totales": bytes_totales,
+            "bytes_por_ciudad": round(bytes_totales / args.ciudades),
+            "bytes_por_lectura": round(bytes_totales / lecturas, 1),
+        },
+        "almacen": ultimas.stats(),
+        "agregar": medir(agregar, ids),
+        "ultima": medir(lambda i: ultimas.ultima(i, rango_de), ids),
+        "recientes": medir(lambda i: ultimas.recientes(i, args.por_ciudad, rango_de), ids),
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
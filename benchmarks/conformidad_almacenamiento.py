@@ -0,0 +1,579 @@
+# benchmarks/conformidad_almacenamiento.py
+"""
+Verificación de conformidad de los backends de almacenamiento
+(database/almacenamiento): los mismos casos contra cada backend, para que
+cambiar DB_BACKEND no cambie el comportamiento de la API.
+
+- sqlite: usa un archivo temporal que se borra al terminar (no necesita nada).
+- postgres: usa la BD configurada en .env (ya inicializada con init_db.py).
+  Los casos solo tocan ciudades propias (país 'ZZ', nombre con un sufijo
+  al azar) y al final las borra junto con sus mediciones y sus resúmenes.
+  La retención se prueba con fechas de 2001.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.conformidad_almacenamiento                  # sqlite
+    python -m benchmarks.conformidad_almacenamiento --backend postgres
+    python -m benchmarks.conformidad_almacenamiento --backend todos
+
+Sale con código 1 si algún caso falla.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import traceback
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+from database.almacenamiento import BACKENDS, crear_almacenamiento, fila_a_medicion
+from database.almacenamiento.csv_masivo import leer_encabezado
+from services.normalizacion import normalizar_nombre
+
+
+class FalloConformidad(AssertionError):
+    pass
+
+
+def verificar(condicion, mensaje, *detalle):
+    if not condicion:
+        raise FalloConformidad(f"{mensaje} {detalle!r}" if detalle else mensaje)
+
+
+class Contexto:
+    """Datos compartidos por los casos de una corrida."""
+
+    def __init__(self, almacenamiento):
+        self.alm = almacenamiento
+        self.sufijo = uuid.uuid4().hex[:8]
+        self.rangos = []
+        self.ids_ciudad = set()
+        self.alias = set()
+
+    def nombre(self, base: str) -> str:
+        return f"Conformidad {base} {self.sufijo}"
+
+    def fila(self, base: str, temperatura: float, **extra):
+        """Fila con la forma de registrar_medicion_atomica / registrar_mediciones_lote."""
+        nombre = self.nombre(base)
+        return {
+            "nombre_ciudad": nombre,
+            "provincia": "Desconocida",
+            "pais": "ZZ",
+            "id_rango": self.rangos[int(temperatura) % len(self.rangos)]["id_rango"],
+            "temperatura": temperatura,
+            "humedad": 50 + int(temperatura) % 40,
+            "sensacion_termica": temperatura - 1.5,
+            "presion": 1013.25,
+            "velocidad_viento": 12.5,
+            "descripcion": "Sintética",
+            "nombre_normalizado": normalizar_nombre(nombre),
+            **extra,
+        }
+
+    def registrar(self, base: str, temperatura: float, **extra):
+        registro = self.alm.registrar_medicion_atomica(**self.fila(base, temperatura, **extra))
+        self.ids_ciudad.add(registro["ciudad"]["id_ciudad"])
+        return registro
+
+
+def paginas(alm, limite, filtros):
+    """Recorre todas las páginas como lo hace la API (cursor con fecha ISO)."""
+    vistas = []
+    despues_de = None
+    for _ in range(1000):
+        mediciones, siguiente = alm.obtener_pagina_mediciones(limite, despues_de, filtros)
+        vistas.extend(mediciones)
+        if siguiente is None:
+            return vistas
+        verificar(isinstance(siguiente[0], datetime), "el cursor debe traer un datetime", siguiente)
+        despues_de = (siguiente[0].isoformat(), siguiente[1])
+    raise FalloConformidad("la paginación no termina")
+
+
+# -----------------------------
+# Casos
+# -----------------------------
+
+def caso_rangos(ctx):
+    rangos = ctx.alm.obtener_rangos()
+    verificar(len(rangos) >= 2, "faltan rangos (¿catálogo cargado?)", rangos)
+    verificar(rangos[0]["temp_min"] is None, "el primer rango debe ser abierto abajo", rangos[0])
+    minimos = [r["temp_min"] for r in rangos[1:]]
+    verificar(minimos == sorted(minimos), "rangos fuera de orden", minimos)
+    verificar(set(rangos[0]) == {"id_rango", "nombre_rango", "temp_min", "temp_max"},
+              "claves de rango", rangos[0])
+    ctx.rangos = rangos
+
+
+def caso_ciudad_crear_y_buscar(ctx):
+    nombre = ctx.nombre("Manual")
+    id_ciudad = ctx.alm.crear_ciudad(nombre, "Desconocida", "ZZ")
+    ctx.ids_ciudad.add(id_ciudad)
+    verificar(isinstance(id_ciudad, int), "crear_ciudad debe devolver el id", id_ciudad)
+    ciudad = ctx.alm.obtener_ciudad_por_nombre(nombre)
+    verificar(ciudad == {"id_ciudad": id_ciudad, "nombre": nombre, "provincia": "Desconocida", "pais": "ZZ"},
+              "obtener_ciudad_por_nombre", ciudad)
+    verificar(ctx.alm.obtener_ciudad_por_nombre(nombre + " inexistente") is None,
+              "ciudad inexistente debe ser None")
+    # Sin coordenadas no cuenta como geocodificada
+    verificar(ctx.alm.obtener_ciudad_geo(normalizar_nombre(nombre)) is None,
+              "ciudad sin coordenadas no debe aparecer en obtener_ciudad_geo")
+
+
+def caso_registro_atomico_y_geocoding(ctx):
+    primero = ctx.registrar("Geo", 21.5)
+    verificar(isinstance(primero["id_medicion"], int), "id_medicion", primero)
+    fecha = datetime.fromisoformat(primero["fecha"])
+    verificar(fecha.tzinfo is not None, "la fecha debe tener zona horaria", primero["fecha"])
+    verificar(abs((datetime.now(fecha.tzinfo) - fecha).total_seconds()) < 300,
+              "la fecha debe ser la de ahora", primero["fecha"])
+
+    # La misma ciudad reusa el id y completa lo que faltaba, sin pisar lo que había
+    segundo = ctx.registrar("Geo", 22.0, pais_nombre="Zetalandia", latitud=-34.5, longitud=-58.4)
+    tercero = ctx.registrar("Geo", 22.5, pais_nombre="Otro", latitud=10.0, longitud=10.0)
+    ids = {r["ciudad"]["id_ciudad"] for r in (primero, segundo, tercero)}
+    verificar(len(ids) == 1, "upsert por (nombre, pais) debe reusar la ciudad", ids)
+    verificar(primero["id_medicion"] < segundo["id_medicion"] < tercero["id_medicion"],
+              "ids de medición crecientes")
+
+    geo = ctx.alm.obtener_ciudad_geo(normalizar_nombre(ctx.nombre("Geo")))
+    verificar(geo == {
+        "nombre": ctx.nombre("Geo"), "pais_nombre": "Zetalandia",
+        "codigo_pais": "ZZ", "latitud": -34.5, "longitud": -58.4,
+    }, "obtener_ciudad_geo (COALESCE de los datos de geocoding)", geo)
+
+
+def caso_alias_geo(ctx):
+    alias = normalizar_nombre(ctx.nombre("Alias, ZZ"))
+    ctx.alias.add(alias)
+    verificar(ctx.alm.obtener_ciudad_geo(alias) is None, "alias inexistente debe ser None")
+    geo = {
+        "nombre": ctx.nombre("Geo"), "pais_nombre": "Zetalandia",
+        "codigo_pais": "ZZ", "latitud": -34.5, "longitud": -58.4,
+    }
+    ctx.alm.guardar_alias_geo(alias, geo)
+    verificar(ctx.alm.obtener_ciudad_geo(alias) == geo, "obtener_ciudad_geo por alias",
+              ctx.alm.obtener_ciudad_geo(alias))
+    # Volver a guardar el mismo alias lo reemplaza
+    movido = {**geo, "latitud": -31.4, "longitud": -64.2}
+    ctx.alm.guardar_alias_geo(alias, movido)
+    verificar(ctx.alm.obtener_ciudad_geo(alias) == movido, "guardar_alias_geo reemplaza",
+              ctx.alm.obtener_ciudad_geo(alias))
+
+
+def caso_insertar_medicion(ctx):
+    registro = ctx.registrar("Insertar", 5.0)
+    id_ciudad = registro["ciudad"]["id_ciudad"]
+    fila = ctx.fila("Insertar", 6.0)
+    id_medicion = ctx.alm.insertar_medicion(
+        id_ciudad, fila["id_rango"], fila["temperatura"], fila["humedad"],
+        fila["sensacion_termica"], fila["presion"], fila["velocidad_viento"], fila["descripcion"],
+    )
+    mediciones, _ = ctx.alm.obtener_pagina_mediciones(10, None, {"id_ciudad": id_ciudad})
+    verificar([m["id_medicion"] for m in mediciones] == [id_medicion, registro["id_medicion"]],
+              "insertar_medicion debe quedar primera en el listado", mediciones)
+
+
+def caso_lote(ctx):
+    filas = [ctx.fila(f"Lote {i}", 10.0 + i) for i in range(5)]
+    resultados = ctx.alm.registrar_mediciones_lote(filas)
+    verificar(len(resultados) == len(filas), "un resultado por fila", resultados)
+    for fila, resultado in zip(filas, resultados):
+        ctx.ids_ciudad.add(resultado["ciudad"]["id_ciudad"])
+        verificar(resultado["ciudad"]["nombre"] == fila["nombre_ciudad"],
+                  "resultados en el mismo orden que las filas", resultado)
+        datetime.fromisoformat(resultado["fecha"])
+    verificar(len({r["id_medicion"] for r in resultados}) == len(filas), "ids distintos")
+    verificar(ctx.alm.registrar_mediciones_lote([]) == [], "lote vacío")
+
+    # Con `fecha` en la fila se guarda esa y no la del INSERT (escritura diferida)
+    medida = datetime.now(timezone.utc).replace(microsecond=123456) - timedelta(seconds=30)
+    con_fecha = ctx.alm.registrar_mediciones_lote([ctx.fila("Lote fecha", 11.0, fecha=medida)])[0]
+    ctx.ids_ciudad.add(con_fecha["ciudad"]["id_ciudad"])
+    verificar(datetime.fromisoformat(con_fecha["fecha"]) == medida, "lote con fecha explícita", con_fecha)
+    una = ctx.registrar("Atomica fecha", 11.5, fecha=medida)
+    verificar(datetime.fromisoformat(una["fecha"]) == medida, "registro atómico con fecha explícita", una)
+
+
+def caso_paginacion_y_filtros(ctx):
+    temperaturas = [-5.0, 0.0, 3.5, 12.0, 18.25, 25.0, 31.0]
+    registros = [ctx.registrar("Paginas", t) for t in temperaturas]
+    id_ciudad = registros[0]["ciudad"]["id_ciudad"]
+    esperados = [r["id_medicion"] for r in reversed(registros)]
+
+    vistas = paginas(ctx.alm, 3, {"id_ciudad": id_ciudad})
+    verificar([m["id_medicion"] for m in vistas] == esperados,
+              "keyset por ciudad: todas, sin repetir y de la más nueva a la más vieja",
+              [m["id_medicion"] for m in vistas])
+    medicion = vistas[0]
+    verificar(set(medicion) == {
+        "id_medicion", "fecha", "temperatura", "humedad", "sensacion_termica", "presion",
+        "velocidad_viento", "descripcion", "ciudad", "rango",
+    }, "claves de la medición", medicion)
+    verificar(medicion["temperatura"] == 31.0 and isinstance(medicion["humedad"], int),
+              "tipos numéricos", medicion)
+
+    nombre = normalizar_nombre(ctx.nombre("Paginas"))
+    por_nombre = paginas(ctx.alm, 4, {"nombre_normalizado": nombre})
+    verificar([m["id_medicion"] for m in por_nombre] == esperados, "filtro nombre_normalizado")
+
+    tibias = paginas(ctx.alm, 2, {"id_ciudad": id_ciudad, "temp_min": 0, "temp_max": 25})
+    verificar(sorted(m["temperatura"] for m in tibias) == [0.0, 3.5, 12.0, 18.25, 25.0],
+              "filtro temp_min / temp_max (inclusivos)", [m["temperatura"] for m in tibias])
+
+    rango = ctx.rangos[int(12.0) % len(ctx.rangos)]
+    por_rango = paginas(ctx.alm, 5, {"id_ciudad": id_ciudad, "nombre_rango": rango["nombre_rango"]})
+    verificar(por_rango and all(m["rango"]["id_rango"] == rango["id_rango"] for m in por_rango),
+              "filtro nombre_rango", por_rango)
+    por_id_rango = paginas(ctx.alm, 5, {"id_ciudad": id_ciudad, "id_rango": rango["id_rango"]})
+    verificar(por_id_rango == por_rango, "filtro id_rango")
+
+    hoy = date.today()
+    alrededor = {"id_ciudad": id_ciudad, "fecha_desde": hoy - timedelta(days=1),
+                 "fecha_hasta": hoy + timedelta(days=2)}
+    verificar(len(paginas(ctx.alm, 10, alrededor)) == len(temperaturas), "filtro de fechas (incluye)")
+    antes = {"id_ciudad": id_ciudad, "fecha_hasta": hoy - timedelta(days=1)}
+    verificar(paginas(ctx.alm, 10, antes) == [], "filtro de fechas (excluye)")
+
+    try:
+        ctx.alm.obtener_pagina_mediciones(5, None, {"no_existe": 1})
+    except ValueError:
+        pass
+    else:
+        raise FalloConformidad("un filtro desconocido debe dar ValueError")
+
+
+def caso_version(ctx):
+    registro = ctx.registrar("Version", 15.0)
+    filtros = {"id_ciudad": registro["ciudad"]["id_ciudad"]}
+    mediciones, siguiente, version = ctx.alm.obtener_pagina_con_version(10, None, filtros)
+    verificar(isinstance(version, int), "la versión debe ser un entero", version)
+    verificar([m["id_medicion"] for m in mediciones] == [registro["id_medicion"]] and siguiente is None,
+              "página con versión", mediciones)
+
+    ctx.registrar("Version", 16.0)
+    mediciones, _, nueva = ctx.alm.obtener_pagina_con_version(10, None, filtros)
+    verificar(nueva > version, "una medición nueva debe subir la versión", version, nueva)
+    verificar(len(mediciones) == 2, "la página debe ver la medición nueva", mediciones)
+
+
+def caso_listados_completos(ctx):
+    registro = ctx.registrar("Export", 9.0)
+    todas = ctx.alm.obtener_todas_las_mediciones()
+    verificar(any(m["id_medicion"] == registro["id_medicion"] for m in todas),
+              "obtener_todas_las_mediciones debe incluir la nueva")
+    claves = [(m["fecha"], m["id_medicion"]) for m in todas]
+
+    filas = list(ctx.alm.iterar_mediciones(itersize=7))
+    verificar(len(filas) == len(todas), "iterar_mediciones debe recorrer todo", len(filas), len(todas))
+    verificar(all(isinstance(f[1], datetime) for f in filas), "iterar_mediciones: fecha como datetime")
+    verificar([fila_a_medicion(f) for f in filas] == todas,
+              "iterar_mediciones: mismas filas y orden que obtener_todas_las_mediciones")
+    verificar(claves == sorted(claves, key=lambda c: (datetime.fromisoformat(c[0]), c[1]), reverse=True),
+              "orden fecha DESC, id DESC")
+
+
+def caso_ultimas_fechas(ctx):
+    registro = ctx.registrar("Ultima", 19.0)
+    nombre = normalizar_nombre(ctx.nombre("Ultima"))
+    ultimas = ctx.alm.obtener_ultimas_fechas_por_ciudad([nombre, nombre + " sin datos"])
+    verificar(set(ultimas) == {nombre}, "solo ciudades con mediciones", ultimas)
+    verificar(ultimas[nombre] == datetime.fromisoformat(registro["fecha"]),
+              "fecha de la última medición", ultimas[nombre], registro["fecha"])
+    verificar(ctx.alm.obtener_ultimas_fechas_por_ciudad([]) == {}, "lista vacía")
+
+
+def caso_ultimas_mediciones(ctx):
+    registros = [ctx.registrar("Recientes", t) for t in (5.0, 6.0, 7.0)]
+    id_ciudad = registros[0]["ciudad"]["id_ciudad"]
+    filas = [f for f in ctx.alm.obtener_ultimas_mediciones(2) if f[8] == id_ciudad]
+    verificar([f[0] for f in filas] == [r["id_medicion"] for r in registros[1:]],
+              "las 2 más recientes, de la más vieja a la más nueva", filas)
+    verificar(fila_a_medicion(filas[-1])["temperatura"] == 7.0 and isinstance(filas[-1][1], datetime),
+              "filas de SELECT_MEDICIONES", filas[-1])
+    una = [f for f in ctx.alm.obtener_ultimas_mediciones(1) if f[8] == id_ciudad]
+    verificar([f[0] for f in una] == [registros[-1]["id_medicion"]], "por_ciudad=1: solo la última", una)
+
+
+def caso_leer_serie(ctx):
+    registros = [ctx.registrar("Serie", t) for t in (3.5, -1.0, 12.25)]
+    id_ciudad = registros[0]["ciudad"]["id_ciudad"]
+    fechas = [datetime.fromisoformat(r["fecha"]) for r in registros]
+    desde, hasta = min(fechas) - timedelta(hours=1), max(fechas) + timedelta(hours=1)
+
+    serie = ctx.alm.leer_serie("temperatura", desde, hasta, [id_ciudad])
+    orden = serie["fecha"].argsort(kind="stable")
+    verificar(serie["id_ciudad"].tolist() == [id_ciudad] * 3, "solo la ciudad pedida", serie)
+    verificar(sorted(serie["valor"].tolist()) == [-1.0, 3.5, 12.25], "valores de la métrica", serie)
+    verificar(all(abs(e - f.timestamp()) < 0.001 for e, f in zip(serie["fecha"][orden].tolist(), sorted(fechas))),
+              "fecha en segundos desde epoch (UTC)", serie["fecha"])
+    humedad = ctx.alm.leer_serie("humedad", desde, hasta, [id_ciudad])
+    verificar(humedad["valor"].dtype.kind == "f" and len(humedad["valor"]) == 3, "otra métrica, como float", humedad)
+    verificar(len(ctx.alm.leer_serie("temperatura", desde, hasta, [])["valor"]) == 0, "sin ciudades: vacío")
+    verificar(len(ctx.alm.leer_serie("temperatura", hasta, hasta + timedelta(hours=1), [id_ciudad])["valor"]) == 0,
+              "hasta es exclusivo")
+
+
+def caso_resumen_diario(ctx):
+    temperaturas = [8.0, 14.5, 11.0]
+    registros = [ctx.registrar("Resumen", t) for t in temperaturas]
+    id_ciudad = registros[0]["ciudad"]["id_ciudad"]
+    dia = datetime.fromisoformat(registros[0]["fecha"]).date()
+    # Los límites del día dependen de la zona de cada backend: ventana amplia
+    desde, hasta = dia - timedelta(days=1), dia + timedelta(days=1)
+
+    def leer():
+        diario = ctx.alm.obtener_resumen_diario(id_ciudad, None, desde, hasta)
+        por_rango = ctx.alm.obtener_resumen_por_rango(id_ciudad, None, desde, hasta)
+        return diario, por_rango
+
+    diario, por_rango = leer()
+    verificar(sum(d["cantidad"] for d in diario) == len(temperaturas), "cantidad del resumen", diario)
+    verificar(all(isinstance(d["fecha"], date) for d in diario), "fecha del resumen como date")
+    temperatura = diario[0]["temperatura"]
+    verificar(temperatura["min"] == 8.0 and temperatura["max"] == 14.5 and temperatura["suma"] == 33.5,
+              "suma / min / max de temperatura", temperatura)
+    verificar(sum(r["mediciones"] for r in por_rango) == len(temperaturas), "resumen por rango", por_rango)
+
+    por_nombre = ctx.alm.obtener_resumen_diario(None, normalizar_nombre(ctx.nombre("Resumen")), desde, hasta)
+    verificar(por_nombre == diario, "resumen filtrado por nombre")
+
+    cantidades = {c["id_ciudad"]: c["mediciones"] for c in ctx.alm.obtener_ciudades_con_cantidad()}
+    verificar(cantidades.get(id_ciudad) == len(temperaturas), "obtener_ciudades_con_cantidad",
+              cantidades.get(id_ciudad))
+
+    filas = ctx.alm.recalcular_resumen(desde, hasta)
+    verificar(isinstance(filas, int) and filas >= 1, "recalcular_resumen devuelve las filas", filas)
+    verificar(leer() == (diario, por_rango), "recalcular_resumen debe ser idempotente")
+
+
+def caso_csv_masivo(ctx):
+    nombre = ctx.nombre("CSV")
+    texto = (
+        "fecha,ciudad,pais,temperatura,humedad,sensacion_termica,presion,velocidad_viento,descripcion\n"
+        f"2020-03-01T10:00:00+00:00,{nombre},ZZ,22.0,40,21.5,1010,5,\"Sol, poco viento\"\n"
+        f"2020-03-01T11:00:00+00:00,{nombre},ZZ,-3.5,80,-6,1020,15,Helada\n"
+        f"2020-03-01T11:00:00+00:00,{nombre},ZZ,-3.5,80,-6,1020,15,Helada\n"   # repetida
+        f"2020-03-01T12:00:00+00:00,{nombre},,10,50,10,1000,1,Sin país\n"      # descartada
+    )
+
+    def importar(contenido):
+        archivo = io.StringIO(contenido, newline="")
+        return ctx.alm.importar_csv(archivo, leer_encabezado(archivo), normalizar_nombre)
+
+    resumen = importar(texto)
+    ciudad = ctx.alm.obtener_ciudad_por_nombre(nombre)
+    verificar(ciudad is not None and ciudad["provincia"] == "Desconocida", "ciudad creada", ciudad)
+    ctx.ids_ciudad.add(ciudad["id_ciudad"])
+    verificar(
+        {k: resumen[k] for k in ("filas", "insertadas", "duplicadas", "descartadas", "ciudades_creadas")}
+        == {"filas": 4, "insertadas": 2, "duplicadas": 1, "descartadas": 1, "ciudades_creadas": 1},
+        "resumen de la importación", resumen,
+    )
+    verificar(ctx.alm.obtener_ciudad_geo(normalizar_nombre(nombre)) is None,
+              "las ciudades importadas no tienen coordenadas")
+
+    resumen = importar(texto)
+    verificar((resumen["insertadas"], resumen["duplicadas"]) == (0, 3), "reimportar no duplica", resumen)
+
+    mediciones = paginas(ctx.alm, 10, {"id_ciudad": ciudad["id_ciudad"]})
+    esperado = {
+        22.0: next(r for r in ctx.rangos if (r["temp_min"] is None or r["temp_min"] <= 22)
+                   and (r["temp_max"] is None or 22 < r["temp_max"]))["nombre_rango"],
+        -3.5: ctx.rangos[0]["nombre_rango"],
+    }
+    verificar({m["temperatura"]: m["rango"]["nombre_rango"] for m in mediciones} == esperado,
+              "rango calculado en SQL", mediciones)
+
+    try:
+        importar(texto.replace("22.0", "veintidós").replace(nombre, nombre + " Error"))
+    except Exception:
+        # ErrorImportacion en SQLite, psycopg2.DataError de COPY en PostgreSQL
+        pass
+    else:
+        raise FalloConformidad("un valor inválido debe fallar")
+    verificar(ctx.alm.obtener_ciudad_por_nombre(nombre + " Error") is None,
+              "una importación fallida no deja nada")
+
+    destino = io.StringIO()
+    exportado = ctx.alm.exportar_csv(destino)
+    filas = list(csv.DictReader(io.StringIO(destino.getvalue())))
+    verificar(exportado["filas"] == len(filas), "filas exportadas", exportado["filas"], len(filas))
+    propias = [f for f in filas if f["ciudad"] == nombre]
+    verificar(sorted(float(f["temperatura"]) for f in propias) == [-3.5, 22.0], "exportación", propias)
+    verificar(datetime.fromisoformat(propias[0]["fecha"]).tzinfo is not None, "fecha ISO con zona", propias[0])
+
+
+def caso_csv_simultaneo(ctx):
+    # Dos importaciones de las mismas horas a la vez (dos cargas del
+    # historial que se pisan): las dos pasan el NOT EXISTS, el índice
+    # único tiene que dejar una sola medición por hora
+    nombre = ctx.nombre("CSV simultáneo")
+    lineas = ["fecha,ciudad,pais,temperatura,humedad,sensacion_termica,presion,velocidad_viento,descripcion"]
+    inicio = datetime(2020, 4, 1, tzinfo=timezone.utc)
+    horas = 200
+    for h in range(horas):
+        lineas.append(f"{(inicio + timedelta(hours=h)).isoformat()},{nombre},ZZ,{h % 30}.5,50,10,1010,5,Simultánea")
+    texto = "\n".join(lineas) + "\n"
+
+    barrera = threading.Barrier(2)
+    resumenes, errores = [], []
+
+    def importar():
+        try:
+            archivo = io.StringIO(texto, newline="")
+            columnas = leer_encabezado(archivo)
+            barrera.wait()
+            resumenes.append(ctx.alm.importar_csv(archivo, columnas, normalizar_nombre))
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=importar) for _ in range(2)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    verificar(not errores, "las importaciones simultáneas no fallan", errores)
+
+    ciudad = ctx.alm.obtener_ciudad_por_nombre(nombre)
+    ctx.ids_ciudad.add(ciudad["id_ciudad"])
+    verificar(sum(r["insertadas"] for r in resumenes) == horas, "una medición por hora entre las dos", resumenes)
+    verificar(sum(r["duplicadas"] for r in resumenes) == horas, "las repetidas se cuentan", resumenes)
+    mediciones = paginas(ctx.alm, 100, {"id_ciudad": ciudad["id_ciudad"]})
+    verificar(len(mediciones) == horas, "sin horas duplicadas", len(mediciones))
+
+
+def caso_retencion(ctx):
+    # Fechas muy viejas: en una BD de PostgreSQL compartida la retención
+    # solo alcanza a las filas de este caso
+    nombre = ctx.nombre("Retención")
+    texto = (
+        "fecha,ciudad,pais,temperatura,humedad,sensacion_termica,presion,velocidad_viento,descripcion\n"
+        f"2001-01-15T10:05:00+00:00,{nombre},ZZ,5.0,40,4,1010,5,Vieja\n"
+        f"2001-01-15T10:35:00+00:00,{nombre},ZZ,7.0,50,6,1012,7,Vieja\n"
+        f"2001-01-15T11:10:00+00:00,{nombre},ZZ,9.0,60,8,1014,9,Vieja\n"
+    )
+    archivo = io.StringIO(texto, newline="")
+    ctx.alm.importar_csv(archivo, leer_encabezado(archivo), normalizar_nombre)
+    ciudad = ctx.alm.obtener_ciudad_por_nombre(nombre)
+    ctx.ids_ciudad.add(ciudad["id_ciudad"])
+    id_ciudad = ciudad["id_ciudad"]
+
+    particiones = ctx.alm.mantener_particiones(0)
+    verificar(isinstance(particiones["creadas"], list) and isinstance(particiones["particiones"], list),
+              "mantener_particiones", particiones)
+    verificar(ctx.alm.mantener_particiones(0)["creadas"] == [], "mantener_particiones es idempotente")
+
+    dias = (date(2001, 1, 14), date(2001, 1, 16))
+    diario = ctx.alm.obtener_resumen_diario(id_ciudad, None, *dias)
+    verificar(sum(d["cantidad"] for d in diario) == 3, "resumen antes de la retención", diario)
+
+    resultado = ctx.alm.aplicar_retencion(datetime.fromisoformat("2001-03-01T00:00:00+00:00"), "hora")
+    restantes = paginas(ctx.alm, 10, {"id_ciudad": id_ciudad})
+    if restantes:
+        # La partición histórica de una base migrada (006) solo se borra entera
+        verificar("mediciones_historico" in particiones["particiones"],
+                  "la retención debe borrar las mediciones viejas", restantes)
+        return
+
+    verificar(resultado["filas_borradas"] >= 3 and resultado["filas_horarias"] >= 2,
+              "filas borradas y compactadas por hora", resultado)
+    verificar(ctx.alm.obtener_resumen_diario(id_ciudad, None, *dias) == diario,
+              "el resumen diario sobrevive a la retención")
+    ctx.alm.recalcular_resumen(*dias)
+    verificar(ctx.alm.obtener_resumen_diario(id_ciudad, None, *dias) == diario,
+              "recalcular no rehace días ya borrados por la retención")
+
+
+CASOS = [
+    caso_rangos,
+    caso_ciudad_crear_y_buscar,
+    caso_registro_atomico_y_geocoding,
+    caso_alias_geo,
+    caso_insertar_medicion,
+    caso_lote,
+    caso_paginacion_y_filtros,
+    caso_version,
+    caso_listados_completos,
+    caso_ultimas_fechas,
+    caso_ultimas_mediciones,
+    caso_leer_serie,
+    caso_resumen_diario,
+    caso_csv_masivo,
+    caso_csv_simultaneo,
+    caso_retencion,
+]
+
+
+# -----------------------------
+# Corrida
+# -----------------------------
+
+def limpiar_postgres(ids_ciudad, alias):
+    """Borra las ciudades de prueba (con sus mediciones y su resumen) y sus alias."""
+    if not ids_ciudad and not alias:
+        return
+    from database.connection import pooled_connection
+
+    ids = list(ids_ciudad)
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM ciudad_alias WHERE alias = ANY(%s);", (list(alias),))
+            cur.execute("DELETE FROM mediciones WHERE id_ciudad = ANY(%s);", (ids,))
+            cur.execute("DELETE FROM mediciones_diarias WHERE id_ciudad = ANY(%s);", (ids,))
+            cur.execute("DELETE FROM mediciones_horarias WHERE id_ciudad = ANY(%s);", (ids,))
+            cur.execute("DELETE FROM ciudad WHERE id_ciudad = ANY(%s);", (ids,))
+        conn.commit()
+
+
+def correr(backend):
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio:
+        opciones = {"ruta": os.path.join(directorio, "conformidad.sqlite3")} if backend == "sqlite" else {}
+        alm = crear_almacenamiento(backend, **opciones)
+        ctx = Contexto(alm)
+        try:
+            for caso in CASOS:
+                try:
+                    caso(ctx)
+                    resultados.append({"caso": caso.__name__, "ok": True})
+                except Exception as e:
+                    resultados.append({
+                        "caso": caso.__name__,
+                        "ok": False,
+                        "error": f"{type(e).__name__}: {e}",
+                        "traza": traceback.format_exc(limit=3),
+                    })
+                    # Sin rangos no tiene sentido seguir
+                    if caso is caso_rangos:
+                        break
+        finally:
+            if backend == "postgres":
+                limpiar_postgres(ctx.ids_ciudad, ctx.alias)
+            alm.cerrar()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conformidad de los backends de almacenamiento.")
+    parser.add_argument("--backend", choices=BACKENDS + ("todos",), default="sqlite")
+    args = parser.parse_args()
+
+    backends = BACKENDS if args.backend == "todos" else (args.backend,)
+    salida = {backend: correr(backend) for backend in backends}
+    fallidos = {
+        backend: [r["caso"] for r in resultados if not r["ok"]]
+        for backend, resultados in salida.items()
+    }
+
+    print(json.dumps({"resultados": salida, "fallidos": fallidos}, ensure_ascii=False, indent=2))
+    return 1 if any(fallidos.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+# benchmarks/explain_filtros.py
+"""
+Verifica con EXPLAIN que los filtros comunes de GET /api/mediciones usan
+índices y no recorren la tabla entera (Seq Scan sobre `mediciones`).
+
+Las consultas se arman con la misma función que usa la API
+(mediciones_repository.armar_consulta_pagina). Con una tabla chica el
+planificador prefiere con razón un Seq Scan, así que por defecto se
+siembran filas sintéticas dentro de una transacción que al final se
+deshace (no queda nada en la BD). Necesita la BD configurada en .env.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.explain_filtros                  # siembra 200000 filas
+    python -m benchmarks.explain_filtros --sembrar 0      # usa los datos actuales
+    python -m benchmarks.explain_filtros --planes         # imprime los planes
+
+Con `mediciones` particionada (migración 006) se informan también las
+particiones que lee cada plan: los filtros por fecha solo deben leer las
+de esas fechas.
+
+Sale con código 1 si algún caso hace Seq Scan sobre mediciones (o sobre
+alguna de sus particiones).
+"""
+
+import argparse
+import json
+import sys
+from datetime import date, timedelta
+
+from database.connection import pooled_connection
+from repositories.mediciones_repository import armar_consulta_pagina
+from services.mediciones_service import filtros_mediciones
+
+
+def sembrar(cur, filas: int, ciudades: int = 500) -> None:
+    """Inserta ciudades y mediciones sintéticas (en la transacción abierta)."""
+    cur.execute(
+        """
+        INSERT INTO ciudad (nombre, provincia, pais, nombre_normalizado)
+        SELECT 'Explain ' || g, 'Desconocida', 'ZZ', 'explain ' || g
+        FROM generate_series(1, %s) AS g
+        ON CONFLICT ON CONSTRAINT uq_ciudad_nombre_pais DO NOTHING;
+        """,
+        (ciudades,)
+    )
+    cur.execute(
+        """
+        INSERT INTO mediciones (
+            id_ciudad, id_rango, fecha, temperatura,
+            humedad, sensacion_termica, presion, velocidad_viento, descripcion
+        )
+        SELECT
+            c.ids[1 + (g * 7919) %% array_length(c.ids, 1)],
+            r.ids[1 + g %% array_length(r.ids, 1)],
+            now() - g * interval '1 minute',
+            (g %% 45) - 10, g %% 100, (g %% 47) - 12, 990 + g %% 40, g %% 60,
+            'Sintética'
+        FROM generate_series(1, %s) AS g,
+             (SELECT array_agg(id_ciudad) AS ids FROM ciudad WHERE pais = 'ZZ') c,
+             (SELECT array_agg(id_rango) AS ids FROM rango) r;
+        """,
+        (filas,)
+    )
+    cur.execute("ANALYZE ciudad;")
+    cur.execute("ANALYZE mediciones;")
+
+
+def casos(cur):
+    """Filtros comunes a verificar: (nombre, filtros, despues_de)."""
+    cur.execute(
+        """
+        SELECT c.id_ciudad, c.nombre
+        FROM ciudad c
+        WHERE EXISTS (SELECT 1 FROM mediciones m WHERE m.id_ciudad = c.id_ciudad)
+        ORDER BY c.id_ciudad DESC
+        LIMIT 1;
+        """
+    )
+    fila = cur.fetchone()
+    if fila is None:
+        raise SystemExit("No hay mediciones: correr sin --sembrar 0 o cargar datos antes.")
+    id_ciudad, nombre = fila
+    cur.execute("SELECT id_rango, nombre_rango FROM rango ORDER BY id_rango LIMIT 1;")
+    id_rango, nombre_rango = cur.fetchone()
+    cur.execute("SELECT fecha, id_mediciones FROM mediciones ORDER BY fecha DESC, id_mediciones DESC OFFSET 100 LIMIT 1;")
+    cursor = cur.fetchone()
+
+    hoy = date.today()
+    semana = {"desde": hoy - timedelta(days=7), "hasta": hoy}
+    return [
+        ("sin filtros", {}, None),
+        ("sin filtros, página 2", {}, cursor),
+        ("id_ciudad", {"id_ciudad": id_ciudad}, None),
+        ("ciudad (nombre)", {"ciudad": nombre}, None),
+        ("id_rango", {"id_rango": id_rango}, None),
+        ("rango (nombre)", {"rango": nombre_rango}, None),
+        ("id_ciudad + fechas", {"id_ciudad": id_ciudad, **semana}, None),
+        ("id_rango + fechas", {"id_rango": id_rango, **semana}, None),
+        ("fechas", semana, None),
+        ("id_ciudad + temperatura", {"id_ciudad": id_ciudad, "temp_min": 0, "temp_max": 25}, None),
+        ("id_ciudad, página 2", {"id_ciudad": id_ciudad}, cursor),
+    ]
+
+
+def nodos(plan):
+    """Recorre el árbol del plan (formato JSON de EXPLAIN)."""
+    yield plan
+    for hijo in plan.get("Plans", []):
+        yield from nodos(hijo)
+
+
+def es_mediciones(relacion):
+    """`mediciones` o una de sus particiones (no los resúmenes)."""
+    return relacion == "mediciones" or (
+        relacion.startswith("mediciones_")
+        and relacion not in ("mediciones_diarias", "mediciones_horarias")
+    )
+
+
+def explicar(cur, filtros, despues_de):
+    sql, params = armar_consulta_pagina(50, despues_de, filtros_mediciones(**filtros))
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+    plan = cur.fetchone()[0][0]["Plan"]
+
+    leidas = [n for n in nodos(plan) if es_mediciones(n.get("Relation Name", ""))]
+    secuenciales = [n for n in leidas if n["Node Type"] == "Seq Scan"]
+    indices = sorted({n["Index Name"] for n in leidas if "Index Name" in n})
+    particiones = sorted({n["Relation Name"] for n in leidas})
+    return plan, not secuenciales, indices, particiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN de los filtros de GET /api/mediciones.")
+    parser.add_argument("--sembrar", type=int, default=200000,
+                        help="filas sintéticas a insertar (y deshacer al final); 0 = no sembrar")
+    parser.add_argument("--planes", action="store_true", help="incluir el plan completo")
+    args = parser.parse_args()
+
+    resultados = []
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                if args.sembrar > 0:
+                    sembrar(cur, args.sembrar)
+                for nombre, filtros, despues_de in casos(cur):
+                    plan, ok, indices, particiones = explicar(cur, filtros, despues_de)
+                    resultado = {"caso": nombre, "ok": ok, "indices": indices, "particiones": particiones}
+                    if args.planes or not ok:
+                        resultado["plan"] = plan
+                    resultados.append(resultado)
+        finally:
+            # Las filas sembradas nunca se confirman
+            conn.rollback()
+
+    fallidos = [r["caso"] for r in resultados if not r["ok"]]
+    print(json.dumps({
+        "filas_sembradas": args.sembrar,
+        "resultados": resultados,
+        "fallidos": fallidos,
+    }, ensure_ascii=False, indent=2, default=str))
+    return 1 if fallidos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
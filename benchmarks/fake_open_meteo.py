@@ -0,0 +1,248 @@
+# benchmarks/fake_open_meteo.py
+"""
+Servidor local que imita las APIs de Open-Meteo que usa el backend:
+
+    GET /v1/search     geocoding (name=...)
+    GET /v1/forecast   clima actual (latitude/longitude, admite listas con comas)
+    GET /v1/archive    historial horario (latitude/longitude, start_date/end_date)
+
+Las respuestas son deterministas (derivadas del nombre o de las
+coordenadas), con latencia y tasa de errores 503 configurables.
+Los nombres que empiezan con "zz" no se encuentran (results vacío).
+En el historial, una hora de cada 200 (aprox.) viene sin datos (null).
+
+Para que el backend lo use hay que apuntar las variables
+OPEN_METEO_GEOCODING_BASE / OPEN_METEO_FORECAST_BASE / OPEN_METEO_ARCHIVE_BASE
+a `servidor.url`
+ANTES de importar los servicios.
+
+Uso standalone:
+    python -m benchmarks.fake_open_meteo --puerto 8090 --latencia 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _numero(texto: str) -> int:
+    return int(hashlib.md5(texto.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def geocodificar(nombre: str):
+    """Coordenadas falsas pero estables para un nombre."""
+    if nombre.lower().startswith("zz"):
+        return {"generationtime_ms": 0.1}
+    n = _numero(nombre.lower())
+    return {
+        "results": [{
+            "name": nombre.strip().title(),
+            "country": "Argentina",
+            "country_code": "AR",
+            "latitude": round(-55 + (n % 3300) / 100, 4),
+            "longitude": round(-73 + (n // 3300 % 1600) / 100, 4),
+        }]
+    }
+
+
+def clima_actual(latitud: float, longitud: float):
+    """Clima falso estable por posición (cambia con cada intervalo de 15 min)."""
+    ahora = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    ahora = ahora.replace(minute=ahora.minute - ahora.minute % 15)
+    n = _numero(f"{latitud:.2f},{longitud:.2f},{ahora.isoformat()}")
+    return {
+        "latitude": latitud,
+        "longitude": longitud,
+        "current": {
+            "time": ahora.strftime("%Y-%m-%dT%H:%M"),
+            "interval": 900,
+            "temperature_2m": round(-10 + (n % 450) / 10, 1),
+            "relative_humidity_2m": n % 100,
+            "apparent_temperature": round(-12 + (n % 470) / 10, 1),
+            "pressure_msl": round(990 + (n % 400) / 10, 1),
+            "wind_speed_10m": round((n % 600) / 10, 1),
+            "weather_code": [0, 1, 2, 3, 45, 61, 63, 80, 95][n % 9],
+        },
+    }
+
+
+def historico_horario(latitud: float, longitud: float, desde: date, hasta: date):
+    """Serie horaria falsa estable por posición y hora, en columnas como la API de archivo."""
+    if hasta < desde:
+        raise ValueError("end_date anterior a start_date")
+    inicio = datetime(desde.year, desde.month, desde.day)
+    horas = [inicio + timedelta(hours=h) for h in range(((hasta - desde).days + 1) * 24)]
+    numeros = [_numero(f"{latitud:.2f},{longitud:.2f},{hora.isoformat()}") for hora in horas]
+
+    def columna(funcion):
+        return [None if n % 200 == 0 else funcion(n) for n in numeros]
+
+    return {
+        "latitude": latitud,
+        "longitude": longitud,
+        "timezone": "GMT",
+        "hourly": {
+            "time": [hora.strftime("%Y-%m-%dT%H:%M") for hora in horas],
+            "temperature_2m": columna(lambda n: round(-10 + (n % 450) / 10, 1)),
+            "relative_humidity_2m": columna(lambda n: n % 100),
+            "apparent_temperature": columna(lambda n: round(-12 + (n % 470) / 10, 1)),
+            "pressure_msl": columna(lambda n: round(990 + (n % 400) / 10, 1)),
+            "wind_speed_10m": columna(lambda n: round((n % 600) / 10, 1)),
+            "weather_code": columna(lambda n: [0, 1, 2, 3, 45, 61, 63, 80, 95][n % 9]),
+        },
+    }
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # El valor por defecto (5) hace esperar conexiones bajo carga concurrente
+    request_queue_size = 256
+
+
+class ServidorFalso:
+    """
+    Servidor HTTP en un hilo de fondo.
+
+    :param latencia: segundos de demora agregados a cada respuesta.
+    :param jitter: demora extra al azar entre 0 y `jitter` segundos.
+    :param tasa_error: probabilidad (0..1) de responder 503.
+    """
+
+    def __init__(self, host="127.0.0.1", puerto=0, latencia=0.0, jitter=0.0, tasa_error=0.0):
+        self.latencia = latencia
+        self.jitter = jitter
+        self.tasa_error = tasa_error
+        self.llamadas = Counter()
+        self._lock = threading.Lock()
+        self._rutas = {
+            "/v1/search": self._search,
+            "/v1/forecast": self._forecast,
+            "/v1/archive": self._archive,
+        }
+        self._httpd = _HTTPServer((host, puerto), self._handler())
+        self._hilo = None
+
+    @property
+    def url(self) -> str:
+        host, puerto = self._httpd.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def agregar_ruta(self, ruta: str, funcion) -> None:
+        """Registra un endpoint más: funcion(params) -> objeto JSON."""
+        self._rutas[ruta] = funcion
+
+    def iniciar(self) -> "ServidorFalso":
+        self._hilo = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def total_llamadas(self) -> int:
+        with self._lock:
+            return sum(self.llamadas.values())
+
+    def reiniciar_contadores(self) -> None:
+        with self._lock:
+            self.llamadas.clear()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    # -----------------------------
+    # Endpoints
+    # -----------------------------
+
+    @staticmethod
+    def _search(params):
+        return geocodificar(params.get("name", [""])[0])
+
+    @staticmethod
+    def _forecast(params):
+        lats = [float(x) for x in params["latitude"][0].split(",")]
+        lons = [float(x) for x in params["longitude"][0].split(",")]
+        ubicaciones = [clima_actual(lat, lon) for lat, lon in zip(lats, lons)]
+        return ubicaciones[0] if len(ubicaciones) == 1 else ubicaciones
+
+    @staticmethod
+    def _archive(params):
+        return historico_horario(
+            float(params["latitude"][0]),
+            float(params["longitude"][0]),
+            date.fromisoformat(params["start_date"][0]),
+            date.fromisoformat(params["end_date"][0]),
+        )
+
+    def _handler(self):
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                partes = urlparse(self.path)
+                with servidor._lock:
+                    servidor.llamadas[partes.path] += 1
+
+                demora = servidor.latencia + random.uniform(0, servidor.jitter)
+                if demora > 0:
+                    time.sleep(demora)
+
+                funcion = servidor._rutas.get(partes.path)
+                if funcion is None:
+                    return self._responder(404, {"error": True, "reason": "Not found"})
+                if random.random() < servidor.tasa_error:
+                    return self._responder(503, {"error": True, "reason": "Falla inyectada"})
+                try:
+                    cuerpo = funcion(parse_qs(partes.query))
+                except (KeyError, ValueError) as exc:
+                    return self._responder(400, {"error": True, "reason": str(exc)})
+                self._responder(200, cuerpo)
+
+            def _responder(self, status, cuerpo):
+                datos = json.dumps(cuerpo).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor falso de Open-Meteo.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8090)
+    parser.add_argument("--latencia", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--tasa-error", type=float, default=0.0)
+    args = parser.parse_args()
+
+    servidor = ServidorFalso(args.host, args.puerto, args.latencia, args.jitter, args.tasa_error)
+    print(f"Open-Meteo falso escuchando en {servidor.url}")
+    try:
+        servidor._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# benchmarks/simulacion_scheduler.py
+"""
+Simulación del planificador de la watchlist (services/scheduler.py) con
+un reloj falso: no espera de verdad, no llama a la API ni usa la BD.
+
+Corre --ticks ticks seguidos con la configuración por defecto (o la de
+los argumentos) y verifica que:
+- cada ciudad se mida exactamente una vez por tick, también cuando la
+  frescura sale solo de la BD (proceso recién iniciado, sin capturas
+  propias),
+- una ciudad que otro proceso midió justo al empezar el tick se saltee
+  en ese tick (la primera: su grupo es el primero en medirse).
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.simulacion_scheduler --ciudades 8 --ticks 6
+"""
+
+import argparse
+import json
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import services.scheduler as scheduler
+from services.normalizacion import normalizar_nombre
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 0.0
+
+    def monotonic(self) -> float:
+        return self.ahora
+
+    def avanzar(self, segundos: float) -> None:
+        self.ahora += max(0.0, segundos)
+
+
+class EventoFalso:
+    """Reemplaza a threading.Event en el planificador: esperar adelanta el reloj."""
+
+    def __init__(self, reloj: Reloj):
+        self.reloj = reloj
+
+    def wait(self, segundos=None) -> bool:
+        self.reloj.avanzar(segundos or 0.0)
+        return False
+
+    def is_set(self) -> bool:
+        return False
+
+
+def simular(args, sin_capturas: bool, externa: str = None, tick_externa: int = None):
+    """Corre los ticks; devuelve las ciudades medidas por tick (Counter por tick)."""
+    reloj = Reloj()
+
+    class DatetimeFalso(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return base + timedelta(seconds=reloj.ahora)
+
+    # Las fechas "de la BD" tienen que ser de la clase falsa: el
+    # planificador solo calcula la edad si isinstance(fecha, datetime)
+    base = DatetimeFalso(2024, 1, 1, tzinfo=timezone.utc)
+
+    ultimas_bd = {}
+    medidas = []
+
+    def registrar_lote(grupo):
+        reloj.avanzar(args.demora)
+        fecha = DatetimeFalso.now(timezone.utc)
+        for ciudad in grupo:
+            ultimas_bd[normalizar_nombre(ciudad)] = fecha
+            medidas[-1][ciudad] += 1
+        return {"resultados": [{"consulta": c} for c in grupo], "errores": []}
+
+    scheduler.time = SimpleNamespace(monotonic=reloj.monotonic)
+    scheduler.datetime = DatetimeFalso
+    scheduler.registrar_mediciones_lote_desde_api = registrar_lote
+    scheduler.obtener_ultimas_fechas_por_ciudad = lambda claves: {
+        c: ultimas_bd[c] for c in claves if c in ultimas_bd
+    }
+
+    ciudades = [f"c{i}" for i in range(args.ciudades)]
+    planificador = scheduler.PlanificadorWatchlist(
+        ciudades, intervalo=args.intervalo, slots=args.slots, jitter=args.jitter
+    )
+    planificador._detener = EventoFalso(reloj)
+
+    programado = 0.0
+    for numero in range(args.ticks):
+        reloj.avanzar(programado - reloj.ahora)
+        medidas.append(Counter())
+        if sin_capturas:
+            planificador._capturadas.clear()
+        if numero == tick_externa:
+            ultimas_bd[normalizar_nombre(externa)] = DatetimeFalso.now(timezone.utc)
+        planificador.tick(programado)
+        programado += args.intervalo
+    return medidas, planificador
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ciudades", type=int, default=8)
+    parser.add_argument("--ticks", type=int, default=6)
+    parser.add_argument("--intervalo", type=float, default=900.0)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--demora", type=float, default=2.0, help="segundos (simulados) de cada medición de un grupo")
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.semilla)
+    ciudades = [f"c{i}" for i in range(args.ciudades)]
+
+    def una_por_tick(medidas):
+        return all(all(tick[c] == 1 for c in ciudades) for tick in medidas)
+
+    propias, planificador = simular(args, sin_capturas=False)
+    solo_bd, _ = simular(args, sin_capturas=True)
+    externa = ciudades[0]
+    con_externa, _ = simular(args, sin_capturas=False, externa=externa, tick_externa=1)
+
+    print(json.dumps({
+        "ciudades": args.ciudades,
+        "ticks": args.ticks,
+        "frescura_segundos": round(planificador.frescura, 1),
+        "medidas_por_tick": [sum(tick.values()) for tick in propias],
+        "medidas_por_tick_solo_bd": [sum(tick.values()) for tick in solo_bd],
+        "verificaciones": {
+            "una_vez_por_tick": una_por_tick(propias),
+            "una_vez_por_tick_solo_bd": una_por_tick(solo_bd),
+            "saltea_medida_por_otro": (
+                con_externa[1][externa] == 0
+                and all(con_externa[1][c] == 1 for c in ciudades if c != externa)
+                and all(con_externa[t][externa] == 1 for t in range(len(con_externa)) if t != 1)
+            ),
+        },
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
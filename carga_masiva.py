@@ -0,0 +1,68 @@
+# carga_masiva.py
+"""
+CLI de importación / exportación masiva de mediciones en CSV
+(COPY en PostgreSQL; ver services/carga_masiva_service.py).
+
+Uso:
+    python carga_masiva.py importar historico.csv
+    python carga_masiva.py exportar mediciones.csv
+    python carga_masiva.py exportar - | gzip > mediciones.csv.gz
+
+El archivo se lee / escribe de a bloques (sirve para archivos de varios GB).
+El avance va a stderr; al terminar se imprime el resumen en JSON.
+"""
+import argparse
+import json
+import sys
+
+from services.carga_masiva_service import ErrorImportacion, exportar_csv, importar_csv
+
+
+def mostrar_avance(estado):
+    print(
+        f"\r{estado['filas']:>12,} filas  {estado['bytes'] / 1e6:>10.1f} MB  "
+        f"{estado['filas_por_segundo']:>12,.0f} filas/s",
+        end="", file=sys.stderr, flush=True,
+    )
+
+
+def abrir(ruta, modo):
+    # "-" = stdin / stdout; newline="" como pide el módulo csv
+    if ruta == "-":
+        flujo = sys.stdin if "r" in modo else sys.stdout
+        flujo.reconfigure(newline="")
+        return flujo
+    return open(ruta, modo, encoding="utf-8", newline="")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importación / exportación masiva de mediciones en CSV.")
+    parser.add_argument("operacion", choices=("importar", "exportar"))
+    parser.add_argument("archivo", help='archivo CSV ("-" = stdin / stdout)')
+    parser.add_argument("--silencioso", action="store_true", help="no mostrar el avance")
+    args = parser.parse_args()
+
+    progreso = None if args.silencioso else mostrar_avance
+
+    try:
+        if args.operacion == "importar":
+            with abrir(args.archivo, "r") as f:
+                resumen = importar_csv(f, progreso)
+        else:
+            with abrir(args.archivo, "w") as f:
+                resumen = exportar_csv(f, progreso)
+    except ErrorImportacion as e:
+        print(f"\nCSV inválido: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if progreso is not None:
+            print(file=sys.stderr)
+
+    # Si el CSV salió por stdout, el resumen va a stderr
+    salida = sys.stderr if args.operacion == "exportar" and args.archivo == "-" else sys.stdout
+    print(json.dumps(resumen, ensure_ascii=False, indent=2), file=salida)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
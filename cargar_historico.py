@@ -0,0 +1,105 @@
+# cargar_historico.py
+"""
+CLI de carga del historial horario de una ciudad desde la API de archivo
+de Open-Meteo (ver services/historico_service.py).
+
+Uso:
+    python cargar_historico.py "Córdoba" --desde 2024-01-01 --hasta 2024-12-31
+    python cargar_historico.py "Córdoba" --desde 2015-01-01 --hasta 2024-12-31 --estado cordoba.json
+
+Con --estado, después de cada tramo se guarda hasta qué día quedó
+cargado; si se vuelve a correr con la misma ciudad y el mismo --hasta,
+sigue desde el día siguiente. Sin él también se puede repetir: las
+mediciones que ya estaban no se duplican.
+El avance va a stderr; al terminar se imprime el resumen en JSON.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+from services.clima_service import CiudadNoEncontrada, ErrorAPIClima
+from services.filtros import FiltroInvalido, parsear_fecha
+from services.historico_service import HISTORICO_DIAS_POR_PEDIDO, cargar_historico
+
+
+def leer_estado(ruta, ciudad, hasta):
+    """Día hasta el que quedó cargado (date) según el archivo de estado, o None."""
+    if not ruta or not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding="utf-8") as f:
+        estado = json.load(f)
+    if estado.get("ciudad") != ciudad or estado.get("hasta") != hasta.isoformat():
+        return None
+    completado = estado.get("completado_hasta")
+    return date.fromisoformat(completado) if completado else None
+
+
+def guardar_estado(ruta, estado):
+    # Archivo temporal + reemplazo: un corte a mitad de escritura no lo deja roto
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(estado, f, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga del historial horario de una ciudad (Open-Meteo archive).")
+    parser.add_argument("ciudad")
+    parser.add_argument("--desde", required=True, help="primer día (YYYY-MM-DD)")
+    parser.add_argument("--hasta", required=True, help="último día, inclusive (YYYY-MM-DD)")
+    parser.add_argument("--estado", help="archivo JSON para retomar una carga cortada")
+    parser.add_argument("--dias-por-pedido", type=int, default=HISTORICO_DIAS_POR_PEDIDO,
+                        help="días por llamada a la API, por defecto HISTORICO_DIAS_POR_PEDIDO")
+    parser.add_argument("--silencioso", action="store_true", help="no mostrar el avance")
+    args = parser.parse_args()
+
+    try:
+        desde = parsear_fecha(args.desde, "desde")
+        hasta = parsear_fecha(args.hasta, "hasta")
+    except FiltroInvalido as e:
+        parser.error(str(e))
+
+    completado = leer_estado(args.estado, args.ciudad, hasta)
+    if completado is not None:
+        if completado >= hasta:
+            print(f"Ya estaba cargado hasta {completado.isoformat()}.", file=sys.stderr)
+            return 0
+        desde = max(desde, completado + timedelta(days=1))
+        print(f"Retomando desde {desde.isoformat()}.", file=sys.stderr)
+
+    def progreso(estado):
+        if args.estado:
+            guardar_estado(args.estado, {
+                "ciudad": args.ciudad,
+                "hasta": hasta.isoformat(),
+                "completado_hasta": estado["completado_hasta"],
+            })
+        if not args.silencioso:
+            print(
+                f"\rtramo {estado['tramo']}/{estado['tramos']}  hasta {estado['completado_hasta']}  "
+                f"{estado['insertadas']:>10,} insertadas  {estado['duplicadas']:>10,} duplicadas",
+                end="", file=sys.stderr, flush=True,
+            )
+
+    try:
+        resumen = cargar_historico(args.ciudad, desde, hasta, progreso, args.dias_por_pedido)
+    except ValueError as e:  # FiltroInvalido o --dias-por-pedido < 1
+        parser.error(str(e))
+    except CiudadNoEncontrada as e:
+        print(f"\n{e}", file=sys.stderr)
+        return 1
+    except ErrorAPIClima as e:
+        print(f"\nError al consultar la API de clima: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if not args.silencioso:
+            print(file=sys.stderr)
+
+    print(json.dumps(resumen, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# database/almacenamiento/__init__.py
+"""
+Backends de almacenamiento intercambiables.
+
+    DB_BACKEND=postgres   (por defecto) PostgreSQL vía psycopg2 y el pool
+    DB_BACKEND=sqlite     archivo SQLite en modo WAL (DB_SQLITE_RUTA)
+
+Los repositorios piden el backend del proceso con obtener_almacenamiento().
+"""
+
+import threading
+
+from database.config_db import get_backend, get_sqlite_config
+
+from .base import Almacenamiento, armar_consulta_pagina, fila_a_medicion
+
+
+BACKENDS = ("postgres", "sqlite")
+
+
+def crear_almacenamiento(backend: str = None, **opciones) -> Almacenamiento:
+    """
+    Crea un backend nuevo (sin compartir): `backend` o, si no se pasa, el
+    de config_db.get_backend(). Las `opciones` pisan las de la configuración
+    (p. ej. ruta=... para SQLite).
+
+    :raises ValueError: si el backend no existe.
+    """
+    backend = backend or get_backend()
+    if backend == "postgres":
+        # Import diferido: con SQLite no hace falta psycopg2
+        from .postgres import AlmacenamientoPostgres
+        return AlmacenamientoPostgres()
+    if backend == "sqlite":
+        from .sqlite import AlmacenamientoSQLite
+        return AlmacenamientoSQLite(**{**get_sqlite_config(), **opciones})
+    raise ValueError(f"Backend de almacenamiento desconocido: {backend!r}. Opciones: {', '.join(BACKENDS)}.")
+
+
+_almacenamiento = None
+_almacenamiento_lock = threading.Lock()
+
+
+def obtener_almacenamiento() -> Almacenamiento:
+    """Backend compartido por el proceso (se crea con el primer uso)."""
+    global _almacenamiento
+    if _almacenamiento is None:
+        with _almacenamiento_lock:
+            if _almacenamiento is None:
+                _almacenamiento = crear_almacenamiento()
+    return _almacenamiento
+
+
+def cerrar_almacenamiento() -> None:
+    """Cierra las conexiones del backend compartido (p. ej. al apagar el proceso)."""
+    global _almacenamiento
+    with _almacenamiento_lock:
+        if _almacenamiento is not None:
+            _almacenamiento.cerrar()
+            _almacenamiento = None
+
+
+__all__ = [
+    "Almacenamiento",
+    "BACKENDS",
+    "armar_consulta_pagina",
+    "cerrar_almacenamiento",
+    "crear_almacenamiento",
+    "fila_a_medicion",
+    "obtener_almacenamiento",
+]
@@ -0,0 +1,337 @@
+# database/almacenamiento/base.py
+"""
+Interfaz común de los backends de almacenamiento y el SQL que comparten.
+
+Los repositorios (repositories/*.py) delegan en el backend elegido en
+config_db.get_backend(); los servicios no saben cuál es.
+
+Contrato de tipos (igual en todos los backends):
+- `fecha` de una medición se devuelve como datetime con zona horaria
+  (en los dicts, como string ISO 8601),
+- `fecha` del resumen diario como date,
+- las métricas como float (humedad como int).
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+METRICAS = ("temperatura", "humedad", "sensacion_termica", "presion", "velocidad_viento")
+
+# Resúmenes que conserva la retención de las mediciones crudas que borra:
+# "dia" = solo mediciones_diarias (ya se mantiene al insertar),
+# "hora" = además mediciones_horarias
+RESUMENES_RETENCION = ("dia", "hora")
+
+
+SELECT_MEDICIONES = """
+    SELECT
+        m.id_mediciones,
+        m.fecha,
+        m.temperatura,
+        m.humedad,
+        m.sensacion_termica,
+        m.presion,
+        m.velocidad_viento,
+        m.descripcion,
+        c.id_ciudad,
+        c.nombre AS ciudad,
+        c.provincia,
+        c.pais,
+        r.id_rango,
+        r.nombre_rango
+    FROM mediciones m
+    JOIN ciudad c ON m.id_ciudad = c.id_ciudad
+    JOIN rango r ON m.id_rango = r.id_rango
+"""
+
+
+def fila_a_medicion(row):
+    """
+    Convierte una fila de SELECT_MEDICIONES en el dict que devuelve la API.
+    """
+    return {
+        "id_medicion": row[0],
+        "fecha": row[1].isoformat() if row[1] is not None else None,
+        "temperatura": row[2],
+        "humedad": row[3],
+        "sensacion_termica": row[4],
+        "presion": row[5],
+        "velocidad_viento": row[6],
+        "descripcion": row[7],
+        "ciudad": {
+            "id_ciudad": row[8],
+            "nombre": row[9],
+            "provincia": row[10],
+            "pais": row[11],
+        },
+        "rango": {
+            "id_rango": row[12],
+            "nombre_rango": row[13],
+        }
+    }
+
+
+# Filtros de listado: clave -> condición SQL (un parámetro cada una)
+CONDICIONES_FILTRO = {
+    "id_ciudad": "m.id_ciudad = %s",
+    # Puede haber varias ciudades con el mismo nombre en distintos países
+    "nombre_normalizado": (
+        "m.id_ciudad IN (SELECT id_ciudad FROM ciudad WHERE nombre_normalizado = %s)"
+    ),
+    "id_rango": "m.id_rango = %s",
+    "nombre_rango": "m.id_rango = (SELECT id_rango FROM rango WHERE nombre_rango = %s)",
+    "fecha_desde": "m.fecha >= %s",
+    "fecha_hasta": "m.fecha < %s",
+    "temp_min": "m.temperatura >= %s",
+    "temp_max": "m.temperatura <= %s",
+}
+
+
+def armar_consulta_pagina(limite: int, despues_de=None, filtros=None, marcador: str = "%s"):
+    """
+    Arma (sql, params) de una página de mediciones. Se expone aparte
+    para poder verificar el plan con EXPLAIN (benchmarks/explain_filtros.py).
+
+    :param filtros: dict con cualquiera de las claves de CONDICIONES_FILTRO
+        (los valores None se ignoran). `fecha_hasta` es exclusivo.
+    :param marcador: marcador de parámetro del driver ("%s" psycopg2, "?" sqlite3).
+    """
+    condiciones = []
+    params = []
+    for clave, valor in (filtros or {}).items():
+        if valor is None:
+            continue
+        if clave not in CONDICIONES_FILTRO:
+            raise ValueError(f"Filtro desconocido: {clave}")
+        condiciones.append(CONDICIONES_FILTRO[clave])
+        params.append(valor)
+
+    if despues_de is not None:
+        condiciones.append("(m.fecha, m.id_mediciones) < (%s, %s)")
+        params.extend(despues_de)
+
+    where = ("WHERE " + "\n      AND ".join(condiciones)) if condiciones else ""
+
+    # Pedimos una fila de más para saber si hay página siguiente
+    sql = SELECT_MEDICIONES + where + """
+        ORDER BY m.fecha DESC, m.id_mediciones DESC
+        LIMIT %s;
+    """
+    params.append(limite + 1)
+    if marcador != "%s":
+        sql = sql.replace("%s", marcador)
+    return sql, params
+
+
+def filtros_resumen(id_ciudad=None, nombre_normalizado=None, desde=None, hasta=None):
+    """Arma el WHERE (y sus parámetros) común a las consultas del resumen diario."""
+    condiciones = []
+    params = []
+    if id_ciudad is not None:
+        condiciones.append("d.id_ciudad = %s")
+        params.append(id_ciudad)
+    if nombre_normalizado is not None:
+        condiciones.append("c.nombre_normalizado = %s")
+        params.append(nombre_normalizado)
+    if desde is not None:
+        condiciones.append("d.fecha >= %s")
+        params.append(desde)
+    if hasta is not None:
+        condiciones.append("d.fecha <= %s")
+        params.append(hasta)
+
+    where = ("WHERE " + " AND ".join(condiciones)) if condiciones else ""
+    return where, params
+
+
+def filas_a_resumen_diario(rows) -> List[Dict[str, Any]]:
+    """Filas del SELECT de resumen diario -> dicts con {suma, min, max} por métrica."""
+    resultado = []
+    for row in rows:
+        fila = {
+            "id_ciudad": row[0],
+            "ciudad": row[1],
+            "provincia": row[2],
+            "pais": row[3],
+            "fecha": row[4],
+            "cantidad": row[5],
+        }
+        for i, metrica in enumerate(METRICAS):
+            suma, minimo, maximo = row[6 + i * 3: 9 + i * 3]
+            fila[metrica] = {"suma": suma, "min": minimo, "max": maximo}
+        resultado.append(fila)
+    return resultado
+
+
+class Almacenamiento(ABC):
+    """
+    Operaciones sobre ciudad, rango, mediciones y el resumen diario.
+
+    Cada método es una transacción completa: los que escriben confirman
+    antes de volver. Ver los repositorios para la documentación de cada
+    operación desde el punto de vista de los servicios.
+    """
+
+    #: nombre del backend (el valor de DB_BACKEND)
+    nombre = ""
+    #: True si avisa los cambios de version_datos por LISTEN/NOTIFY
+    notifica_versiones = False
+
+    # -----------------------------
+    # Ciudades
+    # -----------------------------
+
+    @abstractmethod
+    def obtener_ciudad_por_nombre(self, nombre: str) -> Optional[Dict[str, Any]]:
+        """{id_ciudad, nombre, provincia, pais} o None."""
+
+    @abstractmethod
+    def crear_ciudad(self, nombre: str, provincia: str, pais: str) -> int:
+        """Inserta una ciudad y devuelve su id."""
+
+    @abstractmethod
+    def obtener_ciudad_geo(self, nombre_normalizado: str) -> Optional[Dict[str, Any]]:
+        """
+        {nombre, pais_nombre, codigo_pais, latitud, longitud} por nombre
+        consultado (ciudad_alias) o, si no está, por nombre_normalizado de
+        una ciudad con coordenadas; None si no hay ninguno.
+        """
+
+    @abstractmethod
+    def guardar_alias_geo(self, alias: str, geo: Dict[str, Any]) -> None:
+        """Guarda (o reemplaza) el geocoding de un nombre consultado ya normalizado."""
+
+    @abstractmethod
+    def obtener_ciudades_con_cantidad(self) -> List[Dict[str, Any]]:
+        """[{id_ciudad, nombre, pais, pais_nombre, mediciones}] (cantidad desde el resumen)."""
+
+    # -----------------------------
+    # Rangos
+    # -----------------------------
+
+    @abstractmethod
+    def obtener_rangos(self) -> List[Dict[str, Any]]:
+        """[{id_rango, nombre_rango, temp_min, temp_max}] de menor a mayor."""
+
+    # -----------------------------
+    # Mediciones
+    # -----------------------------
+
+    @abstractmethod
+    def insertar_medicion(
+        self, id_ciudad: int, id_rango: int, temperatura: float, humedad: int,
+        sensacion_termica: float, presion: float, velocidad_viento: float, descripcion: str,
+    ) -> int:
+        """Inserta una medición con fecha = ahora y devuelve su id."""
+
+    @abstractmethod
+    def registrar_medicion_atomica(self, **datos) -> Dict[str, Any]:
+        """
+        Upsert de la ciudad + insert de la medición en una transacción.
+        `fecha` es optativa: sin ella (o None) se usa el momento del INSERT.
+        """
+
+    @abstractmethod
+    def registrar_mediciones_lote(self, filas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Igual que registrar_medicion_atomica para muchas filas, en una transacción."""
+
+    @abstractmethod
+    def obtener_todas_las_mediciones(self) -> List[Dict[str, Any]]:
+        """Todas las mediciones (fecha DESC, id DESC)."""
+
+    @abstractmethod
+    def obtener_pagina_mediciones(self, limite: int, despues_de=None, filtros=None) -> Tuple[list, Any]:
+        """(mediciones, siguiente) con paginación por keyset."""
+
+    @abstractmethod
+    def obtener_pagina_con_version(self, limite: int, despues_de=None, filtros=None) -> Tuple[list, Any, int]:
+        """(mediciones, siguiente, version) leídos en la misma foto de la BD."""
+
+    @abstractmethod
+    def iterar_mediciones(self, itersize: int = 2000) -> Iterator[tuple]:
+        """Filas crudas de SELECT_MEDICIONES, de a una y con memoria acotada."""
+
+    @abstractmethod
+    def obtener_ultimas_fechas_por_ciudad(self, nombres_normalizados: Iterable[str]) -> Dict[str, Any]:
+        """{nombre_normalizado: fecha de la última medición}."""
+
+    @abstractmethod
+    def obtener_ultimas_mediciones(self, por_ciudad: int) -> List[tuple]:
+        """
+        Filas crudas de SELECT_MEDICIONES: las `por_ciudad` mediciones más
+        recientes de cada ciudad, ordenadas por (id_ciudad, fecha, id).
+        """
+
+    @abstractmethod
+    def leer_serie(self, metrica: str, desde, hasta, ids_ciudad: Optional[Iterable[int]] = None) -> Dict[str, Any]:
+        """
+        Arreglos de NumPy {"id_ciudad", "fecha" (segundos desde epoch), "valor"}
+        de `metrica` (una de METRICAS) con fecha en [desde, hasta), sin orden;
+        todas las ciudades si `ids_ciudad` es None. Ver columnas.py.
+        """
+
+    # -----------------------------
+    # Resumen diario
+    # -----------------------------
+
+    @abstractmethod
+    def obtener_resumen_diario(self, id_ciudad=None, nombre_normalizado=None, desde=None, hasta=None):
+        """Una fila por (ciudad, día) con cantidad y {suma, min, max} por métrica."""
+
+    @abstractmethod
+    def obtener_resumen_por_rango(self, id_ciudad=None, nombre_normalizado=None, desde=None, hasta=None):
+        """[{id_rango, nombre_rango, dias, mediciones}]."""
+
+    @abstractmethod
+    def recalcular_resumen(self, desde, hasta) -> int:
+        """
+        Rehace el resumen de [desde, hasta]; devuelve las filas generadas.
+        No toca los días anteriores a lo que borró la retención.
+        """
+
+    # -----------------------------
+    # Particiones y retención
+    # -----------------------------
+
+    @abstractmethod
+    def mantener_particiones(self, meses_adelante: int) -> Dict[str, Any]:
+        """
+        Asegura las particiones de `mediciones` del mes actual y los
+        `meses_adelante` siguientes: {creadas: [...], particiones: [...]}.
+        """
+
+    @abstractmethod
+    def aplicar_retencion(self, limite, resumen: str) -> Dict[str, Any]:
+        """
+        Borra las mediciones crudas anteriores a `limite` (datetime con zona)
+        sin tocar mediciones_diarias. Con resumen="hora" antes las compacta en
+        mediciones_horarias. {particiones_borradas, filas_borradas, filas_horarias}.
+        """
+
+    # -----------------------------
+    # Importación / exportación masiva (CSV)
+    # -----------------------------
+
+    @abstractmethod
+    def importar_csv(self, archivo, columnas: List[str], normalizar, progreso=None) -> Dict[str, Any]:
+        """
+        Importa las filas de `archivo` (texto, ya leído el encabezado
+        `columnas`) por conjuntos: staging, ciudades, rango y merge en una
+        transacción. Ver csv_masivo.resumen_importacion para el resultado.
+        """
+
+    @abstractmethod
+    def exportar_csv(self, destino, progreso=None) -> Dict[str, Any]:
+        """Escribe todas las mediciones en CSV (con encabezado) en `destino`."""
+
+    # -----------------------------
+    # Ciclo de vida
+    # -----------------------------
+
+    def cerrar(self) -> None:
+        """Libera las conexiones del backend."""
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado del backend para /api/diagnostico."""
+        return {"backend": self.nombre}
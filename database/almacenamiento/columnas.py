@@ -0,0 +1,97 @@
+# database/almacenamiento/columnas.py
+"""
+Lectura de una métrica de `mediciones` en arreglos de NumPy (lo común a
+los backends), para la analítica (services/analitica_service.py).
+
+Se leen solo tres columnas: id_ciudad, fecha (segundos desde epoch, UTC)
+y el valor de la métrica, sin armar una tupla ni un dict de Python por
+fila:
+
+- PostgreSQL: COPY ... TO STDOUT (FORMAT binary). Como las tres columnas
+  son NOT NULL y de ancho fijo, cada fila ocupa siempre los mismos bytes y
+  el resultado se interpreta de una vez con np.frombuffer.
+- SQLite: np.fromiter sobre el cursor, directo a un arreglo estructurado.
+
+Los backends importan este módulo recién al usarlo: numpy solo hace falta
+para la analítica.
+"""
+
+from typing import Dict, Iterable
+
+import numpy as np
+
+
+# Fila de COPY binario: cantidad de campos (int16) y, por campo, largo (int32) + dato
+DTYPE_COPY = np.dtype([
+    ("campos", ">i2"),
+    ("largo_ciudad", ">i4"), ("id_ciudad", ">i4"),
+    ("largo_fecha", ">i4"), ("fecha", ">f8"),
+    ("largo_valor", ">i4"), ("valor", ">f8"),
+])
+FIRMA_COPY = b"PGCOPY\n\xff\r\n\x00"
+
+DTYPE_FILAS = np.dtype([("id_ciudad", "<i4"), ("fecha", "<f8"), ("valor", "<f8")])
+
+
+def sql_serie(metrica: str, filtro_ciudades: str, marcador: str, fecha_epoch: str) -> str:
+    """
+    SELECT de (id_ciudad, fecha en segundos, métrica) entre dos fechas
+    [desde, hasta). `metrica` ya tiene que estar validada contra METRICAS.
+    """
+    return f"""
+        SELECT id_ciudad, {fecha_epoch}, CAST({metrica} AS DOUBLE PRECISION)
+        FROM mediciones
+        WHERE fecha >= {marcador} AND fecha < {marcador}{filtro_ciudades}
+    """
+
+
+def serie_vacia() -> Dict[str, np.ndarray]:
+    return {
+        "id_ciudad": np.empty(0, dtype=np.int32),
+        "fecha": np.empty(0, dtype=np.float64),
+        "valor": np.empty(0, dtype=np.float64),
+    }
+
+
+def serie_desde_copy_binario(datos) -> Dict[str, np.ndarray]:
+    """
+    Interpreta la salida de COPY (SELECT id_ciudad, epoch, valor) TO STDOUT
+    WITH (FORMAT binary): encabezado, filas de DTYPE_COPY y el fin (-1).
+    `datos` puede ser bytes o un memoryview (BytesIO.getbuffer(), sin copiar).
+
+    :raises ValueError: si el formato no es el esperado.
+    """
+    datos = memoryview(datos)
+    if bytes(datos[:len(FIRMA_COPY)]) != FIRMA_COPY:
+        raise ValueError("La salida de COPY no tiene el encabezado binario esperado.")
+    extension = int.from_bytes(datos[15:19], "big")
+    inicio = 19 + extension
+    fin = len(datos) - 2
+    if bytes(datos[fin:]) != b"\xff\xff" or (fin - inicio) % DTYPE_COPY.itemsize:
+        raise ValueError("La salida de COPY no tiene filas de ancho fijo.")
+
+    filas = np.frombuffer(datos, dtype=DTYPE_COPY, offset=inicio, count=(fin - inicio) // DTYPE_COPY.itemsize)
+    if len(filas) and (
+        np.any(filas["campos"] != 3)
+        or np.any(filas["largo_ciudad"] != 4)
+        or np.any(filas["largo_fecha"] != 8)
+        or np.any(filas["largo_valor"] != 8)
+    ):
+        raise ValueError("La salida de COPY tiene campos nulos o de otro tipo.")
+
+    # astype: de big-endian al orden nativo, en arreglos contiguos
+    return {
+        "id_ciudad": filas["id_ciudad"].astype(np.int32),
+        "fecha": filas["fecha"].astype(np.float64),
+        "valor": filas["valor"].astype(np.float64),
+    }
+
+
+def serie_desde_filas(filas: Iterable[tuple]) -> Dict[str, np.ndarray]:
+    """Tuplas (id_ciudad, epoch, valor) -> arreglos, sin listas intermedias."""
+    datos = np.fromiter(filas, dtype=DTYPE_FILAS)
+    return {
+        "id_ciudad": np.ascontiguousarray(datos["id_ciudad"]),
+        "fecha": np.ascontiguousarray(datos["fecha"]),
+        "valor": np.ascontiguousarray(datos["valor"]),
+    }
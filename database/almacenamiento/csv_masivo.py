@@ -0,0 +1,199 @@
+# database/almacenamiento/csv_masivo.py
+"""
+Importación y exportación masiva de mediciones en CSV (lo común a los backends).
+
+El CSV tiene las columnas de COLUMNAS_CSV (las mismas que la exportación),
+con encabezado. Para importar alcanzan las de COLUMNAS_OBLIGATORIAS más,
+opcionalmente, `provincia`; las demás (ids, nombre_rango) se ignoran: la
+ciudad se resuelve por (ciudad, pais) y el rango se recalcula según la
+temperatura. Así un archivo exportado se puede volver a importar tal cual.
+
+Los archivos se leen y se escriben de a bloques a través de
+LectorConProgreso / EscritorConProgreso, que además cuentan filas y bytes
+para informar el avance.
+"""
+
+import csv
+import io
+import time
+from typing import Callable, Dict, List, Optional
+
+
+COLUMNAS_CSV = [
+    "id_medicion", "fecha", "temperatura", "humedad", "sensacion_termica",
+    "presion", "velocidad_viento", "descripcion", "id_ciudad", "ciudad",
+    "provincia", "pais", "id_rango", "nombre_rango",
+]
+
+COLUMNAS_OBLIGATORIAS = (
+    "fecha", "temperatura", "humedad", "sensacion_termica", "presion",
+    "velocidad_viento", "descripcion", "ciudad", "pais",
+)
+
+# Provincia de las ciudades creadas por una importación sin esa columna
+PROVINCIA_DESCONOCIDA = "Desconocida"
+
+# Tamaño de cada lectura del archivo (COPY pide de a bloques)
+TAMANIO_BLOQUE = 1 << 20
+
+# Cada cuántos segundos como mucho se llama a la función de avance
+INTERVALO_AVANCE = 0.5
+
+
+# SQL común sobre la tabla de staging `s` (alias) con el catálogo `rango r`:
+# fila completa, y temperatura dentro del rango [temp_min, temp_max) (NULL = sin límite)
+CONDICION_COMPLETA = " AND ".join(f"s.{c} IS NOT NULL" for c in COLUMNAS_OBLIGATORIAS)
+CONDICION_RANGO = (
+    "(r.temp_min IS NULL OR s.temperatura >= r.temp_min) "
+    "AND (r.temp_max IS NULL OR s.temperatura < r.temp_max)"
+)
+
+
+class ErrorImportacion(ValueError):
+    """El CSV no tiene el formato esperado (encabezado o valores inválidos)."""
+    pass
+
+
+def leer_encabezado(archivo) -> List[str]:
+    """
+    Lee la primera línea de `archivo` (abierto en modo texto) y devuelve
+    las columnas. El archivo queda posicionado en la primera fila de datos.
+
+    :raises ErrorImportacion: si está vacío, repite columnas, trae columnas
+        desconocidas o le falta alguna obligatoria.
+    """
+    linea = archivo.readline()
+    if not linea.strip():
+        raise ErrorImportacion("El archivo está vacío (se esperaba un encabezado).")
+
+    columnas = [c.strip().lower() for c in next(csv.reader([linea]))]
+    # Archivos guardados con BOM (p. ej. desde Excel)
+    columnas[0] = columnas[0].lstrip("\ufeff")
+
+    desconocidas = [c for c in columnas if c not in COLUMNAS_CSV]
+    if desconocidas:
+        raise ErrorImportacion(
+            f"Columnas desconocidas: {', '.join(desconocidas)}. "
+            f"Columnas válidas: {', '.join(COLUMNAS_CSV)}."
+        )
+    if len(set(columnas)) != len(columnas):
+        raise ErrorImportacion("El encabezado tiene columnas repetidas.")
+    faltantes = [c for c in COLUMNAS_OBLIGATORIAS if c not in columnas]
+    if faltantes:
+        raise ErrorImportacion(f"Faltan columnas obligatorias: {', '.join(faltantes)}.")
+    return columnas
+
+
+class _Avance:
+    """Cuenta filas y bytes y llama a `progreso` como mucho cada INTERVALO_AVANCE s."""
+
+    def __init__(self, progreso: Optional[Callable[[Dict], None]]):
+        self.progreso = progreso
+        self.inicio = time.perf_counter()
+        self.filas = 0
+        self.bytes = 0
+        self._ultimo = self.inicio
+
+    def sumar(self, texto: str) -> None:
+        self.filas += texto.count("\n")
+        self.bytes += len(texto.encode("utf-8"))
+        if self.progreso is not None:
+            ahora = time.perf_counter()
+            if ahora - self._ultimo >= INTERVALO_AVANCE:
+                self._ultimo = ahora
+                self.progreso(self.estado())
+
+    def estado(self) -> Dict:
+        segundos = time.perf_counter() - self.inicio
+        return {
+            "filas": self.filas,
+            "bytes": self.bytes,
+            "segundos": round(segundos, 3),
+            "filas_por_segundo": round(self.filas / segundos, 1) if segundos > 0 else 0.0,
+        }
+
+
+class LectorConProgreso(io.TextIOBase):
+    """
+    Envuelve un archivo de texto para COPY FROM STDIN (read) o csv.reader
+    (iteración por líneas). `filas` cuenta saltos de línea, así que es
+    aproximado si alguna descripción trae saltos de línea entre comillas.
+    """
+
+    def __init__(self, archivo, progreso=None):
+        self._archivo = archivo
+        self.avance = _Avance(progreso)
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        texto = self._archivo.read(size if size and size > 0 else TAMANIO_BLOQUE)
+        self.avance.sumar(texto)
+        return texto
+
+    def readline(self, size=-1):
+        texto = self._archivo.readline(size)
+        self.avance.sumar(texto)
+        return texto
+
+    def __next__(self):
+        texto = self.readline()
+        if not texto:
+            raise StopIteration
+        return texto
+
+
+class EscritorConProgreso(io.TextIOBase):
+    """
+    Envuelve el destino de COPY TO STDOUT (o de csv.writer) y cuenta lo
+    escrito. Es io.TextIOBase para que psycopg2 le entregue texto y no bytes.
+    """
+
+    def __init__(self, destino, progreso=None):
+        self._destino = destino
+        self.avance = _Avance(progreso)
+
+    def writable(self):
+        return True
+
+    def write(self, texto):
+        self._destino.write(texto)
+        self.avance.sumar(texto)
+        return len(texto)
+
+
+def resumen_importacion(avance: _Avance, filas: int, insertadas: int, validas: int, ciudades_creadas: int) -> Dict:
+    """
+    Resultado de una importación:
+    - filas: filas de datos leídas del archivo,
+    - insertadas: mediciones nuevas,
+    - duplicadas: ya existían (misma ciudad y fecha) o estaban repetidas en el archivo,
+    - descartadas: sin ciudad/país o con temperatura fuera de los rangos,
+    - ciudades_creadas, bytes, segundos y filas_por_segundo.
+    """
+    estado = avance.estado()
+    segundos = estado["segundos"]
+    return {
+        "filas": filas,
+        "insertadas": insertadas,
+        "duplicadas": validas - insertadas,
+        "descartadas": filas - validas,
+        "ciudades_creadas": ciudades_creadas,
+        "bytes": estado["bytes"],
+        "segundos": segundos,
+        "filas_por_segundo": round(filas / segundos, 1) if segundos > 0 else 0.0,
+    }
+
+
+def resumen_exportacion(avance: _Avance) -> Dict:
+    """Resultado de una exportación: filas (sin el encabezado), bytes y velocidad."""
+    estado = avance.estado()
+    filas = max(estado["filas"] - 1, 0)
+    segundos = estado["segundos"]
+    return {
+        "filas": filas,
+        "bytes": estado["bytes"],
+        "segundos": segundos,
+        "filas_por_segundo": round(filas / segundos, 1) if segundos > 0 else 0.0,
+    }
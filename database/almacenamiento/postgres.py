@@ -0,0 +1,814 @@
+# database/almacenamiento/postgres.py
+"""
+Backend PostgreSQL (psycopg2 + el pool de database/connection.py).
+
+Es el backend de producción: el esquema lo crean schema.sql y las
+migraciones (init_db.py), el resumen diario lo mantiene un trigger por
+sentencia, version_datos avisa sus cambios con NOTIFY y `mediciones` está
+particionada por mes (la retención borra particiones enteras).
+"""
+
+import io
+import os
+
+from psycopg2.extras import execute_values
+
+from database.connection import close_pool, pooled_connection
+
+from .base import (
+    METRICAS,
+    SELECT_MEDICIONES,
+    Almacenamiento,
+    armar_consulta_pagina,
+    fila_a_medicion,
+    filas_a_resumen_diario,
+    filtros_resumen,
+)
+from .csv_masivo import (
+    CONDICION_COMPLETA,
+    CONDICION_RANGO,
+    PROVINCIA_DESCONOCIDA,
+    TAMANIO_BLOQUE,
+    EscritorConProgreso,
+    LectorConProgreso,
+    resumen_importacion,
+    resumen_exportacion,
+)
+
+
+# Espera máxima del lock de `mediciones` al crear / borrar particiones:
+# si hay consultas largas, falla y se reintenta en el próximo mantenimiento
+# en lugar de frenar las inserciones detrás de él
+PARTICIONES_LOCK_TIMEOUT = os.getenv("PARTICIONES_LOCK_TIMEOUT", "5s")
+
+# Tabla de staging de la importación: una columna por columna posible del CSV.
+# Las que no se usan quedan como texto para que COPY no las valide.
+STAGING_IMPORTACION = """
+    CREATE TEMP TABLE importacion_mediciones (
+        id_medicion        TEXT,
+        fecha              TIMESTAMPTZ,
+        temperatura        REAL,
+        humedad            SMALLINT,
+        sensacion_termica  REAL,
+        presion            REAL,
+        velocidad_viento   REAL,
+        descripcion        TEXT,
+        id_ciudad          TEXT,
+        ciudad             TEXT,
+        provincia          TEXT,
+        pais               TEXT,
+        id_rango           TEXT,
+        nombre_rango       TEXT
+    ) ON COMMIT DROP;
+"""
+
+# Mismas columnas y orden que csv_masivo.COLUMNAS_CSV; `fecha` en ISO 8601
+# como la devuelve la API (to_json usa el formato con "T")
+SELECT_CSV = """
+    SELECT
+        m.id_mediciones AS id_medicion,
+        to_json(m.fecha) #>> '{}' AS fecha,
+        m.temperatura,
+        m.humedad,
+        m.sensacion_termica,
+        m.presion,
+        m.velocidad_viento,
+        m.descripcion,
+        c.id_ciudad,
+        c.nombre AS ciudad,
+        c.provincia,
+        c.pais,
+        r.id_rango,
+        r.nombre_rango
+    FROM mediciones m
+    JOIN ciudad c ON m.id_ciudad = c.id_ciudad
+    JOIN rango r ON m.id_rango = r.id_rango
+    ORDER BY m.fecha DESC, m.id_mediciones DESC
+"""
+
+
+class AlmacenamientoPostgres(Almacenamiento):
+    nombre = "postgres"
+    notifica_versiones = True
+
+    # -----------------------------
+    # Ciudades
+    # -----------------------------
+
+    def obtener_ciudad_por_nombre(self, nombre):
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT id_ciudad, nombre, provincia, pais
+                    FROM ciudad
+                    WHERE nombre = %s;
+                    """,
+                    (nombre,)
+                )
+                row = cur.fetchone()
+
+        if row:
+            return {
+                "id_ciudad": row[0],
+                "nombre": row[1],
+                "provincia": row[2],
+                "pais": row[3],
+            }
+        return None
+
+    def crear_ciudad(self, nombre, provincia, pais):
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO ciudad (nombre, provincia, pais)
+                    VALUES (%s, %s, %s)
+                    RETURNING id_ciudad;
+                    """,
+                    (nombre, provincia, pais)
+                )
+                new_id = cur.fetchone()[0]
+            conn.commit()
+        return new_id
+
+    def obtener_ciudad_geo(self, nombre_normalizado):
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT nombre, pais_nombre, codigo_pais, latitud, longitud
+                    FROM ciudad_alias
+                    WHERE alias = %s;
+                    """,
+                    (nombre_normalizado,)
+                )
+                row = cur.fetchone()
+                if row is None:
+                    cur.execute(
+                        """
+                        SELECT nombre, pais_nombre, pais, latitud, longitud
+                        FROM ciudad
+                        WHERE nombre_normalizado = %s
+                          AND latitud IS NOT NULL
+                        ORDER BY id_ciudad
+                        LIMIT 1;
+                        """,
+                        (nombre_normalizado,)
+                    )
+                    row = cur.fetchone()
+
+        if row:
+            return {
+                "nombre": row[0],
+                "pais_nombre": row[1],
+                "codigo_pais": row[2],
+                "latitud": row[3],
+                "longitud": row[4],
+            }
+        return None
+
+    def guardar_alias_geo(self, alias, geo):
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO ciudad_alias (
+                        alias, nombre, pais_nombre, codigo_pais, latitud, longitud
+                    )
+                    VALUES (
+                        %(alias)s, %(nombre)s, %(pais_nombre)s, %(codigo_pais)s,
+                        %(latitud)s, %(longitud)s
+                    )
+                    ON CONFLICT (alias) DO UPDATE SET
+                        nombre      = EXCLUDED.nombre,
+                        pais_nombre = EXCLUDED.pais_nombre,
+                        codigo_pais = EXCLUDED.codigo_pais,
+                        latitud     = EXCLUDED.latitud,
+                        longitud    = EXCLUDED.longitud;
+                    """,
+                    {"alias": alias, **geo}
+                )
+            conn.commit()
+
+    def obtener_ciudades_con_cantidad(self):
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT c.id_ciudad, c.nombre, c.pais, c.pais_nombre,
+                           COALESCE(d.mediciones, 0)
+                    FROM ciudad c
+                    LEFT JOIN (
+                        SELECT id_ciudad, SUM(cantidad) AS mediciones
+                        FROM mediciones_diarias
+                        GROUP BY id_ciudad
+                    ) d ON d.id_ciudad = c.id_ciudad;
+                    """
+                )
+                rows = cur.fetchall()
+
+        return [
+            {
+                "id_ciudad": row[0],
+                "nombre": row[1],
+                "pais": row[2],
+                "pais_nombre": row[3],
+                "mediciones": int(row[4]),
+            }
+            for row in rows
+        ]
+
+    # -----------------------------
+    # Rangos
+    # -----------------------------
+
+    def obtener_rangos(self):
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT id_rango, nombre_rango, temp_min, temp_max
+                    FROM rango
+                    ORDER BY temp_min NULLS FIRST;
+                    """
+                )
+                rows = cur.fetchall()
+
+        return [
+            {
+                "id_rango": row[0],
+                "nombre_rango": row[1],
+                "temp_min": row[2],
+                "temp_max": row[3],
+            }
+            for row in rows
+        ]
+
+    # -----------------------------
+    # Mediciones
+    # -----------------------------
+
+    def insertar_medicion(
+        self, id_ciudad, id_rango, temperatura, humedad,
+        sensacion_termica, presion, velocidad_viento, descripcion,
+    ):
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO mediciones (
+                        id_ciudad, id_rango, fecha, temperatura,
+                        humedad, sensacion_termica, presion,
+                        velocidad_viento, descripcion
+                    )
+                    VALUES (
+                        %s, %s, now(), %s,
+                        %s, %s, %s,
+                        %s, %s
+                    )
+                    RETURNING id_mediciones;
+                    """,
+                    (
+                        id_ciudad,
+                        id_rango,
+                        temperatura,
+                        humedad,
+                        sensacion_termica,
+                        presion,
+                        velocidad_viento,
+                        descripcion,
+                    )
+                )
+                new_id = cur.fetchone()[0]
+            conn.commit()
+        return new_id
+
+    def registrar_medicion_atomica(self, **datos):
+        # En una sola sentencia: upsert de la ciudad + insert de la medición
+        sql = """
+            WITH ciudad_upsert AS (
+                INSERT INTO ciudad (
+                    nombre, provincia, pais,
+                    nombre_normalizado, pais_nombre, latitud, longitud
+                )
+                VALUES (
+                    %(nombre)s, %(provincia)s, %(pais)s,
+                    %(nombre_normalizado)s, %(pais_nombre)s, %(latitud)s, %(longitud)s
+                )
+                ON CONFLICT ON CONSTRAINT uq_ciudad_nombre_pais
+                DO UPDATE SET
+                    nombre_normalizado = COALESCE(ciudad.nombre_normalizado, EXCLUDED.nombre_normalizado),
+                    pais_nombre        = COALESCE(ciudad.pais_nombre, EXCLUDED.pais_nombre),
+                    latitud            = COALESCE(ciudad.latitud, EXCLUDED.latitud),
+                    longitud           = COALESCE(ciudad.longitud, EXCLUDED.longitud)
+                RETURNING id_ciudad, nombre, provincia, pais
+            ),
+            nueva AS (
+                INSERT INTO mediciones (
+                    id_ciudad, id_rango, fecha, temperatura,
+                    humedad, sensacion_termica, presion,
+                    velocidad_viento, descripcion
+                )
+                SELECT
+                    c.id_ciudad, %(id_rango)s, COALESCE(%(fecha)s::timestamptz, now()), %(temperatura)s,
+                    %(humedad)s, %(sensacion_termica)s, %(presion)s,
+                    %(velocidad_viento)s, %(descripcion)s
+                FROM ciudad_upsert c
+                RETURNING id_mediciones, fecha
+            )
+            SELECT
+                n.id_mediciones, n.fecha,
+                c.id_ciudad, c.nombre, c.provincia, c.pais
+            FROM nueva n
+            CROSS JOIN ciudad_upsert c;
+        """
+        params = {
+            "nombre": datos["nombre_ciudad"],
+            "provincia": datos["provincia"],
+            "pais": datos["pais"],
+            "nombre_normalizado": datos.get("nombre_normalizado"),
+            "pais_nombre": datos.get("pais_nombre"),
+            "latitud": datos.get("latitud"),
+            "longitud": datos.get("longitud"),
+            "id_rango": datos["id_rango"],
+            "temperatura": datos["temperatura"],
+            "humedad": datos["humedad"],
+            "sensacion_termica": datos["sensacion_termica"],
+            "presion": datos["presion"],
+            "velocidad_viento": datos["velocidad_viento"],
+            "descripcion": datos["descripcion"],
+            "fecha": datos.get("fecha"),
+        }
+
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                row = cur.fetchone()
+            conn.commit()
+
+        return {
+            "id_medicion": row[0],
+            "fecha": row[1].isoformat(),
+            "ciudad": {
+                "id_ciudad": row[2],
+                "nombre": row[3],
+                "provincia": row[4],
+                "pais": row[5],
+            },
+        }
+
+    def registrar_mediciones_lote(self, filas):
+        if not filas:
+            return []
+
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                # 1) Ciudades
+                ciudades = execute_values(
+                    cur,
+                    """
+                    INSERT INTO ciudad (
+                        nombre, provincia, pais,
+                        nombre_normalizado, pais_nombre, latitud, longitud
+                    )
+                    VALUES %s
+                    ON CONFLICT ON CONSTRAINT uq_ciudad_nombre_pais
+                    DO UPDATE SET
+                        nombre_normalizado = COALESCE(ciudad.nombre_normalizado, EXCLUDED.nombre_normalizado),
+                        pais_nombre        = COALESCE(ciudad.pais_nombre, EXCLUDED.pais_nombre),
+                        latitud            = COALESCE(ciudad.latitud, EXCLUDED.latitud),
+                        longitud           = COALESCE(ciudad.longitud, EXCLUDED.longitud)
+                    RETURNING id_ciudad, nombre, provincia, pais;
+                    """,
+                    [
+                        (
+                            f["nombre_ciudad"], f["provincia"], f["pais"],
+                            f.get("nombre_normalizado"), f.get("pais_nombre"),
+                            f.get("latitud"), f.get("longitud"),
+                        )
+                        for f in filas
+                    ],
+                    fetch=True,
+                )
+                por_clave = {
+                    (row[1], row[3]): {
+                        "id_ciudad": row[0],
+                        "nombre": row[1],
+                        "provincia": row[2],
+                        "pais": row[3],
+                    }
+                    for row in ciudades
+                }
+
+                # 2) Mediciones
+                ids = execute_values(
+                    cur,
+                    """
+                    INSERT INTO mediciones (
+                        id_ciudad, id_rango, fecha, temperatura,
+                        humedad, sensacion_termica, presion,
+                        velocidad_viento, descripcion
+                    )
+                    VALUES %s
+                    RETURNING id_ciudad, id_mediciones, fecha;
+                    """,
+                    [
+                        (
+                            por_clave[(f["nombre_ciudad"], f["pais"])]["id_ciudad"],
+                            f["id_rango"],
+                            f.get("fecha"),
+                            f["temperatura"],
+                            f["humedad"],
+                            f["sensacion_termica"],
+                            f["presion"],
+                            f["velocidad_viento"],
+                            f["descripcion"],
+                        )
+                        for f in filas
+                    ],
+                    # Sin fecha en la fila: el momento del INSERT
+                    template="(%s, %s, COALESCE(%s::timestamptz, now()), %s, %s, %s, %s, %s, %s)",
+                    fetch=True,
+                )
+                # Una medición por ciudad: mapeamos por id_ciudad, sin depender del orden
+                por_ciudad = {row[0]: (row[1], row[2]) for row in ids}
+            conn.commit()
+
+        resultados = []
+        for f in filas:
+            ciudad = por_clave[(f["nombre_ciudad"], f["pais"])]
+            id_medicion, fecha = por_ciudad[ciudad["id_ciudad"]]
+            resultados.append({
+                "id_medicion": id_medicion,
+                "fecha": fecha.isoformat(),
+                "ciudad": ciudad,
+            })
+        return resultados
+
+    def obtener_todas_las_mediciones(self):
+        sql = SELECT_MEDICIONES + """
+            ORDER BY m.fecha DESC, m.id_mediciones DESC;
+        """
+
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                rows = cur.fetchall()
+
+        return [fila_a_medicion(row) for row in rows]
+
+    def obtener_pagina_mediciones(self, limite, despues_de=None, filtros=None):
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                return self._leer_pagina(cur, limite, despues_de, filtros)
+
+    def obtener_pagina_con_version(self, limite, despues_de=None, filtros=None):
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY;")
+                cur.execute("SELECT version FROM version_datos WHERE id = 1;")
+                version = cur.fetchone()[0]
+                mediciones, siguiente = self._leer_pagina(cur, limite, despues_de, filtros)
+
+        return mediciones, siguiente, version
+
+    @staticmethod
+    def _leer_pagina(cur, limite, despues_de, filtros):
+        sql, params = armar_consulta_pagina(limite, despues_de, filtros)
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+
+        hay_mas = len(rows) > limite
+        rows = rows[:limite]
+
+        siguiente = None
+        if hay_mas and rows:
+            ultima = rows[-1]
+            siguiente = (ultima[1], ultima[0])
+
+        return [fila_a_medicion(row) for row in rows], siguiente
+
+    def iterar_mediciones(self, itersize=2000):
+        sql = SELECT_MEDICIONES + """
+            ORDER BY m.fecha DESC, m.id_mediciones DESC;
+        """
+
+        with pooled_connection() as conn:
+            # Cursor con nombre = server-side cursor de PostgreSQL
+            with conn.cursor(name="exportar_mediciones") as cur:
+                cur.itersize = itersize
+                cur.execute(sql)
+                for row in cur:
+                    yield row
+
+    def obtener_ultimas_fechas_por_ciudad(self, nombres_normalizados):
+        if not nombres_normalizados:
+            return {}
+
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT c.nombre_normalizado, MAX(m.fecha)
+                    FROM ciudad c
+                    JOIN mediciones m ON m.id_ciudad = c.id_ciudad
+                    WHERE c.nombre_normalizado = ANY(%s)
+                    GROUP BY c.nombre_normalizado;
+                    """,
+                    (list(nombres_normalizados),)
+                )
+                rows = cur.fetchall()
+
+        return {row[0]: row[1] for row in rows}
+
+    def obtener_ultimas_mediciones(self, por_ciudad):
+        # LATERAL + LIMIT: por ciudad, un recorrido corto de idx_mediciones_ciudad_fecha
+        # (en cada partición, de la más nueva a la más vieja)
+        sql = """
+            SELECT
+                m.id_mediciones,
+                m.fecha,
+                m.temperatura,
+                m.humedad,
+                m.sensacion_termica,
+                m.presion,
+                m.velocidad_viento,
+                m.descripcion,
+                c.id_ciudad,
+                c.nombre AS ciudad,
+                c.provincia,
+                c.pais,
+                r.id_rango,
+                r.nombre_rango
+            FROM ciudad c
+            CROSS JOIN LATERAL (
+                SELECT *
+                FROM mediciones
+                WHERE id_ciudad = c.id_ciudad
+                ORDER BY fecha DESC, id_mediciones DESC
+                LIMIT %s
+            ) m
+            JOIN rango r ON m.id_rango = r.id_rango
+            ORDER BY c.id_ciudad, m.fecha, m.id_mediciones;
+        """
+
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, (por_ciudad,))
+                return cur.fetchall()
+
+    def leer_serie(self, metrica, desde, hasta, ids_ciudad=None):
+        # numpy solo hace falta para la analítica
+        from .columnas import serie_desde_copy_binario, serie_vacia, sql_serie
+
+        if metrica not in METRICAS:
+            raise ValueError(f"Métrica desconocida: {metrica!r}")
+        params = [desde, hasta]
+        filtro = ""
+        if ids_ciudad is not None:
+            ids_ciudad = list(ids_ciudad)
+            if not ids_ciudad:
+                return serie_vacia()
+            filtro = " AND id_ciudad = ANY(%s)"
+            params.append(ids_ciudad)
+
+        # COPY no admite parámetros: la consulta va ya armada con mogrify
+        buffer = io.BytesIO()
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                consulta = cur.mogrify(
+                    sql_serie(metrica, filtro, "%s", "EXTRACT(EPOCH FROM fecha)::float8"), params
+                ).decode()
+                cur.copy_expert(f"COPY ({consulta}) TO STDOUT WITH (FORMAT binary);", buffer)
+
+        return serie_desde_copy_binario(buffer.getbuffer())
+
+    # -----------------------------
+    # Resumen diario
+    # -----------------------------
+
+    def obtener_resumen_diario(self, id_ciudad=None, nombre_normalizado=None, desde=None, hasta=None):
+        where, params = filtros_resumen(id_ciudad, nombre_normalizado, desde, hasta)
+        agregados = ",\n".join(
+            f"SUM(d.{m}_suma), MIN(d.{m}_min), MAX(d.{m}_max)" for m in METRICAS
+        )
+
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"""
+                    SELECT
+                        d.id_ciudad, c.nombre, c.provincia, c.pais, d.fecha,
+                        SUM(d.cantidad),
+                        {agregados}
+                    FROM mediciones_diarias d
+                    JOIN ciudad c ON c.id_ciudad = d.id_ciudad
+                    {where}
+                    GROUP BY d.id_ciudad, c.nombre, c.provincia, c.pais, d.fecha
+                    ORDER BY d.fecha DESC, c.nombre;
+                    """,
+                    params
+                )
+                rows = cur.fetchall()
+
+        return filas_a_resumen_diario(rows)
+
+    def obtener_resumen_por_rango(self, id_ciudad=None, nombre_normalizado=None, desde=None, hasta=None):
+        where, params = filtros_resumen(id_ciudad, nombre_normalizado, desde, hasta)
+
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"""
+                    SELECT r.id_rango, r.nombre_rango, COUNT(*), SUM(d.cantidad)
+                    FROM mediciones_diarias d
+                    JOIN ciudad c ON c.id_ciudad = d.id_ciudad
+                    JOIN rango r ON r.id_rango = d.id_rango
+                    {where}
+                    GROUP BY r.id_rango, r.nombre_rango, r.temp_min
+                    ORDER BY r.temp_min NULLS FIRST;
+                    """,
+                    params
+                )
+                rows = cur.fetchall()
+
+        return [
+            {
+                "id_rango": row[0],
+                "nombre_rango": row[1],
+                "dias": row[2],
+                "mediciones": row[3],
+            }
+            for row in rows
+        ]
+
+    def recalcular_resumen(self, desde, hasta):
+        # Función recalcular_mediciones_diarias (migraciones 003 y 007)
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT recalcular_mediciones_diarias(%s, %s);",
+                    (desde, hasta)
+                )
+                filas = cur.fetchone()[0]
+            conn.commit()
+
+        return filas
+
+    # -----------------------------
+    # Particiones y retención
+    # -----------------------------
+
+    def mantener_particiones(self, meses_adelante):
+        # Funciones y vista de la migración 007
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL lock_timeout = %s;", (PARTICIONES_LOCK_TIMEOUT,))
+                cur.execute("SELECT mantener_particiones_mediciones(%s);", (meses_adelante,))
+                creadas = cur.fetchone()[0]
+                cur.execute(
+                    """
+                    SELECT nombre
+                    FROM particiones_mediciones
+                    ORDER BY es_default, desde NULLS FIRST;
+                    """
+                )
+                particiones = [row[0] for row in cur.fetchall()]
+            conn.commit()
+
+        return {"creadas": creadas, "particiones": particiones}
+
+    def aplicar_retencion(self, limite, resumen):
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL lock_timeout = %s;", (PARTICIONES_LOCK_TIMEOUT,))
+                cur.execute(
+                    "SELECT particion, filas, filas_horarias FROM aplicar_retencion_mediciones(%s, %s);",
+                    (limite, resumen)
+                )
+                rows = cur.fetchall()
+            conn.commit()
+
+        return {
+            "particiones_borradas": [row[0] for row in rows if row[0] != "mediciones_default"],
+            "filas_borradas": sum(row[1] for row in rows),
+            "filas_horarias": sum(row[2] for row in rows),
+        }
+
+    # -----------------------------
+    # Importación / exportación masiva (CSV)
+    # -----------------------------
+
+    def importar_csv(self, archivo, columnas, normalizar, progreso=None):
+        lector = LectorConProgreso(archivo, progreso)
+
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                # 1) COPY a una tabla temporal (sin WAL, se borra al confirmar)
+                cur.execute(STAGING_IMPORTACION)
+                cur.copy_expert(
+                    f"COPY importacion_mediciones ({', '.join(columnas)}) FROM STDIN WITH (FORMAT csv);",
+                    lector,
+                    size=TAMANIO_BLOQUE,
+                )
+                cur.execute("ANALYZE importacion_mediciones;")
+
+                cur.execute(
+                    f"""
+                    SELECT
+                        count(*),
+                        count(r.id_rango)
+                    FROM importacion_mediciones s
+                    -- Los rangos no se solapan: a lo sumo uno por fila
+                    LEFT JOIN rango r ON {CONDICION_COMPLETA} AND {CONDICION_RANGO};
+                    """
+                )
+                filas, validas = cur.fetchone()
+
+                # 2) Ciudades que faltan (una por ciudad, no por fila); el
+                #    nombre normalizado se calcula en Python como en el resto de la app
+                cur.execute(
+                    """
+                    SELECT DISTINCT ON (s.ciudad, s.pais) s.ciudad, s.pais, s.provincia
+                    FROM importacion_mediciones s
+                    WHERE s.ciudad IS NOT NULL
+                      AND s.pais IS NOT NULL
+                      AND NOT EXISTS (
+                          SELECT 1 FROM ciudad c
+                          WHERE c.nombre = s.ciudad AND c.pais = s.pais
+                      )
+                    ORDER BY s.ciudad, s.pais, s.provincia NULLS LAST;
+                    """
+                )
+                nuevas = cur.fetchall()
+                creadas = []
+                if nuevas:
+                    creadas = execute_values(
+                        cur,
+                        """
+                        INSERT INTO ciudad (nombre, provincia, pais, nombre_normalizado)
+                        VALUES %s
+                        ON CONFLICT ON CONSTRAINT uq_ciudad_nombre_pais DO NOTHING
+                        RETURNING id_ciudad;
+                        """,
+                        [
+                            (nombre, provincia or PROVINCIA_DESCONOCIDA, pais, normalizar(nombre))
+                            for nombre, pais, provincia in nuevas
+                        ],
+                        fetch=True,
+                    )
+
+                # 3) Rango por join con el catálogo y merge: una medición por
+                #    (ciudad, fecha), salteando las que ya estaban. El NOT EXISTS
+                #    evita la mayoría de los choques; el índice único (migración
+                #    009) saltea las que insertó otra carga al mismo tiempo. El
+                #    trigger por sentencia actualiza el resumen diario una sola vez.
+                cur.execute(
+                    f"""
+                    INSERT INTO mediciones (
+                        id_ciudad, id_rango, fecha, temperatura,
+                        humedad, sensacion_termica, presion,
+                        velocidad_viento, descripcion
+                    )
+                    SELECT DISTINCT ON (c.id_ciudad, s.fecha)
+                        c.id_ciudad, r.id_rango, s.fecha, s.temperatura,
+                        s.humedad, s.sensacion_termica, s.presion,
+                        s.velocidad_viento, s.descripcion
+                    FROM importacion_mediciones s
+                    JOIN ciudad c ON c.nombre = s.ciudad AND c.pais = s.pais
+                    JOIN rango r ON {CONDICION_RANGO}
+                    WHERE {CONDICION_COMPLETA}
+                      AND NOT EXISTS (
+                          SELECT 1 FROM mediciones m
+                          WHERE m.id_ciudad = c.id_ciudad AND m.fecha = s.fecha
+                      )
+                    ORDER BY c.id_ciudad, s.fecha
+                    ON CONFLICT (id_ciudad, fecha) DO NOTHING;
+                    """
+                )
+                insertadas = cur.rowcount
+            conn.commit()
+
+        return resumen_importacion(lector.avance, filas, insertadas, validas, len(creadas))
+
+    def exportar_csv(self, destino, progreso=None):
+        escritor = EscritorConProgreso(destino, progreso)
+
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.copy_expert(
+                    f"COPY ({SELECT_CSV}) TO STDOUT WITH (FORMAT csv, HEADER true);",
+                    escritor,
+                    size=TAMANIO_BLOQUE,
+                )
+            conn.commit()
+
+        return resumen_exportacion(escritor.avance)
+
+    # -----------------------------
+    # Ciclo de vida
+    # -----------------------------
+
+    def cerrar(self):
+        close_pool()
@@ -0,0 +1,945 @@
+# database/almacenamiento/sqlite.py
+"""
+Backend SQLite embebido (DB_BACKEND=sqlite), en modo WAL.
+
+Sirve para correr la API, la verificación de conformidad y los benchmarks
+sin un servidor PostgreSQL (despliegues chicos, máquinas de desarrollo).
+
+- Un archivo (DB_SQLITE_RUTA) con el esquema de schema_sqlite.sql, que se
+  aplica solo al abrir la base junto con catalogo.sql (todo idempotente).
+- Conexiones reusables: se prestan por consulta o transacción y quedan
+  hasta DB_POOL_MAX ociosas. En WAL los lectores no bloquean al escritor ni
+  al revés; las escrituras se serializan con BEGIN IMMEDIATE y esperan
+  hasta DB_SQLITE_TIMEOUT segundos el lock de otra.
+- `fecha` se guarda como texto ISO 8601 en UTC (ver schema_sqlite.sql) y
+  se devuelve como datetime, igual que el backend PostgreSQL.
+- Sin LISTEN/NOTIFY: la versión de los datos se lee de version_datos en
+  la misma transacción que cada página.
+
+Requiere SQLite >= 3.35 (RETURNING).
+"""
+
+import csv
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+
+from instrumentacion.latencias import registrar_etapa
+
+from .base import (
+    METRICAS,
+    SELECT_MEDICIONES,
+    Almacenamiento,
+    armar_consulta_pagina,
+    fila_a_medicion,
+    filas_a_resumen_diario,
+    filtros_resumen,
+)
+from .csv_masivo import (
+    COLUMNAS_CSV,
+    CONDICION_COMPLETA,
+    CONDICION_RANGO,
+    PROVINCIA_DESCONOCIDA,
+    ErrorImportacion,
+    EscritorConProgreso,
+    LectorConProgreso,
+    resumen_importacion,
+    resumen_exportacion,
+)
+
+
+DIR_DATABASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_PATH = os.path.join(DIR_DATABASE, "schema_sqlite.sql")
+CATALOGO_PATH = os.path.join(DIR_DATABASE, "catalogo.sql")
+
+FORMATO_FECHA = "%Y-%m-%dT%H:%M:%S.%f+00:00"
+
+# Filtros de listado cuyo valor es una fecha (se pasan a texto canónico)
+_FILTROS_FECHA = ("fecha_desde", "fecha_hasta")
+
+# Archivos de antes del índice único uq_mediciones_ciudad_fecha: antes de
+# crearlo se borran las repetidas (queda la de menor id), como la
+# migración 009 en PostgreSQL
+_SIN_INDICE_UNICO = """
+    SELECT 1
+    FROM sqlite_master t
+    WHERE t.type = 'table' AND t.name = 'mediciones'
+      AND NOT EXISTS (
+          SELECT 1 FROM sqlite_master i
+          WHERE i.type = 'index' AND i.name = 'uq_mediciones_ciudad_fecha'
+      );
+"""
+_BORRAR_REPETIDAS = """
+    DELETE FROM mediciones
+    WHERE EXISTS (
+        SELECT 1 FROM mediciones d
+        WHERE d.id_ciudad = mediciones.id_ciudad
+          AND d.fecha = mediciones.fecha
+          AND d.id_mediciones < mediciones.id_mediciones
+    );
+"""
+
+
+def texto_fecha(valor) -> str:
+    """
+    datetime / date / string ISO -> texto de `fecha` tal como se guarda
+    (UTC, con microsegundos). Las fechas sin zona se toman como UTC.
+    """
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor)
+    if not isinstance(valor, datetime):
+        valor = datetime(valor.year, valor.month, valor.day)
+    if valor.tzinfo is None:
+        valor = valor.replace(tzinfo=timezone.utc)
+    return valor.astimezone(timezone.utc).strftime(FORMATO_FECHA)
+
+
+def _leer_fecha(texto):
+    return datetime.fromisoformat(texto) if texto is not None else None
+
+
+# Columnas de la tabla de staging de la importación y cómo se convierte cada una
+_STAGING = (
+    ("fecha", texto_fecha),
+    ("temperatura", float),
+    ("humedad", lambda v: int(round(float(v)))),
+    ("sensacion_termica", float),
+    ("presion", float),
+    ("velocidad_viento", float),
+    ("descripcion", str),
+    ("ciudad", str),
+    ("provincia", str),
+    ("pais", str),
+)
+
+# Filas que se insertan en la tabla de staging por sentencia
+_FILAS_POR_LOTE = 5000
+
+# Mediciones que borra la retención por transacción (sin particiones, es DELETE)
+_RETENCION_POR_LOTE = 10000
+
+
+def _fila(row):
+    """Fila de SELECT_MEDICIONES con `fecha` convertida a datetime."""
+    return (row[0], _leer_fecha(row[1])) + tuple(row[2:])
+
+
+class AlmacenamientoSQLite(Almacenamiento):
+    """
+    :param ruta: archivo de la base (se crea si no existe).
+    :param timeout: segundos de espera por el lock de escritura.
+    :param max_libres: conexiones ociosas que se guardan para reusar.
+    """
+
+    nombre = "sqlite"
+    notifica_versiones = False
+
+    def __init__(self, ruta: str, timeout: float = 5.0, max_libres: int = 10):
+        self.ruta = ruta
+        self.timeout = timeout
+        self.max_libres = max_libres
+        self._lock = threading.Lock()
+        # Conexiones ociosas listas para reusar (LIFO: la última devuelta está "caliente")
+        self._libres = []
+        self._abiertas = 0
+        self._inicializada = False
+        # Veces que se tomó una conexión (equivale a los checkouts del pool)
+        self._checkouts = 0
+
+    # -----------------------------
+    # Conexiones y transacciones
+    # -----------------------------
+
+    def _abrir(self):
+        # isolation_level=None: las transacciones se manejan con BEGIN/COMMIT explícitos
+        conn = sqlite3.connect(
+            self.ruta, timeout=self.timeout, isolation_level=None, check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute("PRAGMA synchronous = NORMAL;")
+        conn.execute("PRAGMA foreign_keys = ON;")
+        return conn
+
+    def inicializar(self) -> None:
+        """Crea tablas, índices y triggers si faltan y carga los rangos."""
+        with self._lock:
+            if self._inicializada:
+                return
+            conn = self._abrir()
+            try:
+                if conn.execute(_SIN_INDICE_UNICO).fetchone() is not None:
+                    conn.execute(_BORRAR_REPETIDAS)
+                for path in (SCHEMA_PATH, CATALOGO_PATH):
+                    with open(path, "r", encoding="utf-8") as f:
+                        conn.executescript(f.read())
+            finally:
+                conn.close()
+            self._inicializada = True
+
+    @contextmanager
+    def _conexion(self):
+        """
+        Presta una conexión libre (o abre una si no hay) y la devuelve al
+        salir. Como mucho quedan `max_libres` ociosas; las que sobran se
+        cierran. No se ata la conexión al hilo: el servidor de desarrollo
+        crea un hilo por pedido y cada uno dejaría una conexión abierta.
+        """
+        inicio = time.perf_counter()
+        with self._lock:
+            self._checkouts += 1
+            conn = self._libres.pop() if self._libres else None
+        if conn is None:
+            self.inicializar()
+            conn = self._abrir()
+            with self._lock:
+                self._abiertas += 1
+        registrar_etapa("bd.conexion", time.perf_counter() - inicio)
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK;")
+            with self._lock:
+                if len(self._libres) < self.max_libres:
+                    self._libres.append(conn)
+                    conn = None
+                else:
+                    self._abiertas -= 1
+            if conn is not None:
+                conn.close()
+
+    @contextmanager
+    def _transaccion(self, escritura: bool = False):
+        """
+        BEGIN IMMEDIATE para escribir (toma el lock de escritura de entrada,
+        sin riesgo de deadlock al pasar de leer a escribir); BEGIN para
+        leer varias consultas en la misma foto.
+        """
+        with self._conexion() as conn:
+            conn.execute("BEGIN IMMEDIATE;" if escritura else "BEGIN;")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK;")
+                raise
+            conn.execute("COMMIT;")
+
+    # -----------------------------
+    # Ciudades
+    # -----------------------------
+
+    def obtener_ciudad_por_nombre(self, nombre):
+        with self._conexion() as conn:
+            row = conn.execute(
+                """
+                SELECT id_ciudad, nombre, provincia, pais
+                FROM ciudad
+                WHERE nombre = ?;
+                """,
+                (nombre,)
+            ).fetchone()
+
+        if row:
+            return {
+                "id_ciudad": row[0],
+                "nombre": row[1],
+                "provincia": row[2],
+                "pais": row[3],
+            }
+        return None
+
+    def crear_ciudad(self, nombre, provincia, pais):
+        with self._transaccion(escritura=True) as conn:
+            row = conn.execute(
+                """
+                INSERT INTO ciudad (nombre, provincia, pais)
+                VALUES (?, ?, ?)
+                RETURNING id_ciudad;
+                """,
+                (nombre, provincia, pais)
+            ).fetchone()
+        return row[0]
+
+    def obtener_ciudad_geo(self, nombre_normalizado):
+        with self._conexion() as conn:
+            row = conn.execute(
+                """
+                SELECT nombre, pais_nombre, codigo_pais, latitud, longitud
+                FROM ciudad_alias
+                WHERE alias = ?;
+                """,
+                (nombre_normalizado,)
+            ).fetchone()
+            if row is None:
+                row = conn.execute(
+                    """
+                    SELECT nombre, pais_nombre, pais, latitud, longitud
+                    FROM ciudad
+                    WHERE nombre_normalizado = ?
+                      AND latitud IS NOT NULL
+                    ORDER BY id_ciudad
+                    LIMIT 1;
+                    """,
+                    (nombre_normalizado,)
+                ).fetchone()
+
+        if row:
+            return {
+                "nombre": row[0],
+                "pais_nombre": row[1],
+                "codigo_pais": row[2],
+                "latitud": row[3],
+                "longitud": row[4],
+            }
+        return None
+
+    def guardar_alias_geo(self, alias, geo):
+        with self._transaccion(escritura=True) as conn:
+            conn.execute(
+                """
+                INSERT INTO ciudad_alias (
+                    alias, nombre, pais_nombre, codigo_pais, latitud, longitud
+                )
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (alias) DO UPDATE SET
+                    nombre      = excluded.nombre,
+                    pais_nombre = excluded.pais_nombre,
+                    codigo_pais = excluded.codigo_pais,
+                    latitud     = excluded.latitud,
+                    longitud    = excluded.longitud;
+                """,
+                (
+                    alias, geo["nombre"], geo["pais_nombre"], geo["codigo_pais"],
+                    geo["latitud"], geo["longitud"],
+                )
+            )
+
+    def obtener_ciudades_con_cantidad(self):
+        with self._conexion() as conn:
+            rows = conn.execute(
+                """
+                SELECT c.id_ciudad, c.nombre, c.pais, c.pais_nombre,
+                       COALESCE(d.mediciones, 0)
+                FROM ciudad c
+                LEFT JOIN (
+                    SELECT id_ciudad, SUM(cantidad) AS mediciones
+                    FROM mediciones_diarias
+                    GROUP BY id_ciudad
+                ) d ON d.id_ciudad = c.id_ciudad;
+                """
+            ).fetchall()
+
+        return [
+            {
+                "id_ciudad": row[0],
+                "nombre": row[1],
+                "pais": row[2],
+                "pais_nombre": row[3],
+                "mediciones": int(row[4]),
+            }
+            for row in rows
+        ]
+
+    # -----------------------------
+    # Rangos
+    # -----------------------------
+
+    def obtener_rangos(self):
+        with self._conexion() as conn:
+            rows = conn.execute(
+                """
+                SELECT id_rango, nombre_rango, temp_min, temp_max
+                FROM rango
+                ORDER BY temp_min NULLS FIRST;
+                """
+            ).fetchall()
+
+        return [
+            {
+                "id_rango": row[0],
+                "nombre_rango": row[1],
+                "temp_min": row[2],
+                "temp_max": row[3],
+            }
+            for row in rows
+        ]
+
+    # -----------------------------
+    # Mediciones
+    # -----------------------------
+
+    def insertar_medicion(
+        self, id_ciudad, id_rango, temperatura, humedad,
+        sensacion_termica, presion, velocidad_viento, descripcion,
+    ):
+        with self._transaccion(escritura=True) as conn:
+            id_medicion, _ = self._insertar_medicion(
+                conn, id_ciudad, texto_fecha(datetime.now(timezone.utc)),
+                {
+                    "id_rango": id_rango,
+                    "temperatura": temperatura,
+                    "humedad": humedad,
+                    "sensacion_termica": sensacion_termica,
+                    "presion": presion,
+                    "velocidad_viento": velocidad_viento,
+                    "descripcion": descripcion,
+                },
+            )
+        return id_medicion
+
+    @staticmethod
+    def _upsert_ciudad(conn, f):
+        """Upsert por (nombre, pais) completando los datos de geocoding que falten."""
+        row = conn.execute(
+            """
+            INSERT INTO ciudad (
+                nombre, provincia, pais,
+                nombre_normalizado, pais_nombre, latitud, longitud
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (nombre, pais)
+            DO UPDATE SET
+                nombre_normalizado = COALESCE(ciudad.nombre_normalizado, excluded.nombre_normalizado),
+                pais_nombre        = COALESCE(ciudad.pais_nombre, excluded.pais_nombre),
+                latitud            = COALESCE(ciudad.latitud, excluded.latitud),
+                longitud           = COALESCE(ciudad.longitud, excluded.longitud)
+            RETURNING id_ciudad, nombre, provincia, pais;
+            """,
+            (
+                f["nombre_ciudad"], f["provincia"], f["pais"],
+                f.get("nombre_normalizado"), f.get("pais_nombre"),
+                f.get("latitud"), f.get("longitud"),
+            )
+        ).fetchone()
+        return {
+            "id_ciudad": row[0],
+            "nombre": row[1],
+            "provincia": row[2],
+            "pais": row[3],
+        }
+
+    @staticmethod
+    def _insertar_medicion(conn, id_ciudad, fecha, f):
+        row = conn.execute(
+            """
+            INSERT INTO mediciones (
+                id_ciudad, id_rango, fecha, temperatura,
+                humedad, sensacion_termica, presion,
+                velocidad_viento, descripcion
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            RETURNING id_mediciones, fecha;
+            """,
+            (
+                id_ciudad,
+                f["id_rango"],
+                fecha,
+                f["temperatura"],
+                f["humedad"],
+                f["sensacion_termica"],
+                f["presion"],
+                f["velocidad_viento"],
+                f["descripcion"],
+            )
+        ).fetchone()
+        return row[0], _leer_fecha(row[1])
+
+    def registrar_medicion_atomica(self, **datos):
+        with self._transaccion(escritura=True) as conn:
+            ciudad = self._upsert_ciudad(conn, datos)
+            id_medicion, fecha = self._insertar_medicion(
+                conn, ciudad["id_ciudad"], texto_fecha(datos.get("fecha") or datetime.now(timezone.utc)), datos
+            )
+
+        return {
+            "id_medicion": id_medicion,
+            "fecha": fecha.isoformat(),
+            "ciudad": ciudad,
+        }
+
+    def registrar_mediciones_lote(self, filas):
+        if not filas:
+            return []
+
+        resultados = []
+        # Una transacción para todo el lote; sin red de por medio, una
+        # sentencia por fila cuesta lo mismo que una multi-fila
+        with self._transaccion(escritura=True) as conn:
+            # Misma fecha para todo el lote, como now() en PostgreSQL
+            fecha_lote = texto_fecha(datetime.now(timezone.utc))
+            for f in filas:
+                ciudad = self._upsert_ciudad(conn, f)
+                id_medicion, fecha = self._insertar_medicion(
+                    conn, ciudad["id_ciudad"],
+                    texto_fecha(f["fecha"]) if f.get("fecha") else fecha_lote, f
+                )
+                resultados.append({
+                    "id_medicion": id_medicion,
+                    "fecha": fecha.isoformat(),
+                    "ciudad": ciudad,
+                })
+        return resultados
+
+    def obtener_todas_las_mediciones(self):
+        with self._conexion() as conn:
+            rows = conn.execute(SELECT_MEDICIONES + """
+                ORDER BY m.fecha DESC, m.id_mediciones DESC;
+            """).fetchall()
+        return [fila_a_medicion(_fila(row)) for row in rows]
+
+    def obtener_pagina_mediciones(self, limite, despues_de=None, filtros=None):
+        with self._conexion() as conn:
+            return self._leer_pagina(conn, limite, despues_de, filtros)
+
+    def obtener_pagina_con_version(self, limite, despues_de=None, filtros=None):
+        # En WAL, una transacción de lectura ve una sola foto de la base
+        with self._transaccion() as conn:
+            version = conn.execute("SELECT version FROM version_datos WHERE id = 1;").fetchone()[0]
+            mediciones, siguiente = self._leer_pagina(conn, limite, despues_de, filtros)
+
+        return mediciones, siguiente, version
+
+    @staticmethod
+    def _leer_pagina(conn, limite, despues_de, filtros):
+        filtros = {
+            clave: texto_fecha(valor) if clave in _FILTROS_FECHA and valor is not None else valor
+            for clave, valor in (filtros or {}).items()
+        }
+        if despues_de is not None:
+            despues_de = (texto_fecha(despues_de[0]), despues_de[1])
+
+        sql, params = armar_consulta_pagina(limite, despues_de, filtros, marcador="?")
+        rows = conn.execute(sql, params).fetchall()
+
+        hay_mas = len(rows) > limite
+        rows = [_fila(row) for row in rows[:limite]]
+
+        siguiente = None
+        if hay_mas and rows:
+            ultima = rows[-1]
+            siguiente = (ultima[1], ultima[0])
+
+        return [fila_a_medicion(row) for row in rows], siguiente
+
+    def iterar_mediciones(self, itersize=2000):
+        sql = SELECT_MEDICIONES + """
+            ORDER BY m.fecha DESC, m.id_mediciones DESC;
+        """
+
+        # Conexión propia: la exportación puede durar más que un pedido
+        self.inicializar()
+        conn = self._abrir()
+        try:
+            cur = conn.execute(sql)
+            while True:
+                rows = cur.fetchmany(itersize)
+                if not rows:
+                    break
+                for row in rows:
+                    yield _fila(row)
+        finally:
+            conn.close()
+
+    def obtener_ultimas_fechas_por_ciudad(self, nombres_normalizados):
+        nombres = list(nombres_normalizados)
+        if not nombres:
+            return {}
+
+        marcadores = ", ".join("?" for _ in nombres)
+        with self._conexion() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT c.nombre_normalizado, MAX(m.fecha)
+                FROM ciudad c
+                JOIN mediciones m ON m.id_ciudad = c.id_ciudad
+                WHERE c.nombre_normalizado IN ({marcadores})
+                GROUP BY c.nombre_normalizado;
+                """,
+                nombres
+            ).fetchall()
+
+        return {row[0]: _leer_fecha(row[1]) for row in rows}
+
+    def obtener_ultimas_mediciones(self, por_ciudad):
+        # Una consulta con LIMIT por ciudad, cada una un recorrido corto de
+        # idx_mediciones_ciudad_fecha; sin red de por medio es más barato que
+        # numerar toda la tabla con ROW_NUMBER()
+        sql = SELECT_MEDICIONES + """
+            WHERE m.id_ciudad = ?
+            ORDER BY m.fecha DESC, m.id_mediciones DESC
+            LIMIT ?;
+        """
+        filas = []
+        with self._transaccion() as conn:
+            ciudades = conn.execute("SELECT id_ciudad FROM ciudad ORDER BY id_ciudad;").fetchall()
+            for (id_ciudad,) in ciudades:
+                rows = conn.execute(sql, (id_ciudad, por_ciudad)).fetchall()
+                filas.extend(_fila(row) for row in reversed(rows))
+        return filas
+
+    def leer_serie(self, metrica, desde, hasta, ids_ciudad=None):
+        # numpy solo hace falta para la analítica
+        from .columnas import serie_desde_filas, serie_vacia, sql_serie
+
+        if metrica not in METRICAS:
+            raise ValueError(f"Métrica desconocida: {metrica!r}")
+        params = [texto_fecha(desde), texto_fecha(hasta)]
+        filtro = ""
+        if ids_ciudad is not None:
+            ids_ciudad = list(ids_ciudad)
+            if not ids_ciudad:
+                return serie_vacia()
+            filtro = f" AND id_ciudad IN ({', '.join('?' for _ in ids_ciudad)})"
+            params.extend(ids_ciudad)
+
+        # 2440587.5 = día juliano del 1970-01-01 (epoch); julianday guarda
+        # milisegundos y la cuenta en float los deja en ...59.999: se redondea
+        sql = sql_serie(metrica, filtro, "?", "ROUND((julianday(fecha) - 2440587.5) * 86400.0, 3)")
+        with self._conexion() as conn:
+            return serie_desde_filas(conn.execute(sql, params))
+
+    # -----------------------------
+    # Resumen diario
+    # -----------------------------
+
+    @staticmethod
+    def _filtros_resumen(id_ciudad, nombre_normalizado, desde, hasta):
+        where, params = filtros_resumen(
+            id_ciudad, nombre_normalizado,
+            desde.isoformat() if desde is not None else None,
+            hasta.isoformat() if hasta is not None else None,
+        )
+        return where.replace("%s", "?"), params
+
+    def obtener_resumen_diario(self, id_ciudad=None, nombre_normalizado=None, desde=None, hasta=None):
+        where, params = self._filtros_resumen(id_ciudad, nombre_normalizado, desde, hasta)
+        agregados = ",\n".join(
+            f"SUM(d.{m}_suma), MIN(d.{m}_min), MAX(d.{m}_max)" for m in METRICAS
+        )
+
+        with self._conexion() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT
+                    d.id_ciudad, c.nombre, c.provincia, c.pais, d.fecha,
+                    SUM(d.cantidad),
+                    {agregados}
+                FROM mediciones_diarias d
+                JOIN ciudad c ON c.id_ciudad = d.id_ciudad
+                {where}
+                GROUP BY d.id_ciudad, c.nombre, c.provincia, c.pais, d.fecha
+                ORDER BY d.fecha DESC, c.nombre;
+                """,
+                params
+            ).fetchall()
+
+        return filas_a_resumen_diario(
+            (row[:4] + (date.fromisoformat(row[4]),) + row[5:]) for row in rows
+        )
+
+    def obtener_resumen_por_rango(self, id_ciudad=None, nombre_normalizado=None, desde=None, hasta=None):
+        where, params = self._filtros_resumen(id_ciudad, nombre_normalizado, desde, hasta)
+
+        with self._conexion() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT r.id_rango, r.nombre_rango, COUNT(*), SUM(d.cantidad)
+                FROM mediciones_diarias d
+                JOIN ciudad c ON c.id_ciudad = d.id_ciudad
+                JOIN rango r ON r.id_rango = d.id_rango
+                {where}
+                GROUP BY r.id_rango, r.nombre_rango, r.temp_min
+                ORDER BY r.temp_min NULLS FIRST;
+                """,
+                params
+            ).fetchall()
+
+        return [
+            {
+                "id_rango": row[0],
+                "nombre_rango": row[1],
+                "dias": row[2],
+                "mediciones": row[3],
+            }
+            for row in rows
+        ]
+
+    def recalcular_resumen(self, desde, hasta):
+        # Igual que recalcular_mediciones_diarias (migración 003): borrar y
+        # volver a agregar los días pedidos, en una transacción de escritura
+        agregados = ",\n".join(f"SUM({m}), MIN({m}), MAX({m})" for m in METRICAS)
+        columnas = ", ".join(f"{m}_suma, {m}_min, {m}_max" for m in METRICAS)
+
+        with self._transaccion(escritura=True) as conn:
+            # Los días anteriores a lo que borró la retención no se rehacen
+            borrado = conn.execute(
+                "SELECT borrado_hasta FROM retencion_mediciones WHERE id = 1;"
+            ).fetchone()[0]
+            if borrado is not None:
+                dia = _leer_fecha(borrado).date()
+                desde = max(desde, dia if texto_fecha(dia) == borrado else dia + timedelta(days=1))
+            if desde > hasta:
+                return 0
+
+            conn.execute(
+                "DELETE FROM mediciones_diarias WHERE fecha BETWEEN ? AND ?;",
+                (desde.isoformat(), hasta.isoformat())
+            )
+            cur = conn.execute(
+                f"""
+                INSERT INTO mediciones_diarias (id_ciudad, fecha, id_rango, cantidad, {columnas})
+                SELECT id_ciudad, date(fecha), id_rango, COUNT(*),
+                       {agregados}
+                FROM mediciones
+                WHERE fecha >= ? AND fecha < ?
+                GROUP BY id_ciudad, date(fecha), id_rango;
+                """,
+                (texto_fecha(desde), texto_fecha(hasta + timedelta(days=1)))
+            )
+            filas = cur.rowcount
+
+        return filas
+
+    # -----------------------------
+    # Particiones y retención
+    # -----------------------------
+
+    def mantener_particiones(self, meses_adelante):
+        # SQLite no tiene particiones: no hay nada que crear
+        return {"creadas": [], "particiones": []}
+
+    @staticmethod
+    def _compactar_horarias(conn, condicion, valor):
+        """Suma al resumen por hora las mediciones que cumplen `condicion` (sobre fecha)."""
+        agregados = ",\n".join(f"SUM({m}), MIN({m}), MAX({m})" for m in METRICAS)
+        columnas = ", ".join(f"{m}_suma, {m}_min, {m}_max" for m in METRICAS)
+        acumular = ",\n".join(
+            f"{m}_suma = {m}_suma + excluded.{m}_suma, "
+            f"{m}_min = min({m}_min, excluded.{m}_min), "
+            f"{m}_max = max({m}_max, excluded.{m}_max)"
+            for m in METRICAS
+        )
+        # Con el formato fijo de `fecha`, los primeros 13 caracteres son la hora UTC
+        cur = conn.execute(
+            f"""
+            INSERT INTO mediciones_horarias (id_ciudad, hora, id_rango, cantidad, {columnas})
+            SELECT id_ciudad, substr(fecha, 1, 13) || ':00:00.000000+00:00' AS hora, id_rango, COUNT(*),
+                   {agregados}
+            FROM mediciones
+            WHERE fecha {condicion} ?
+            GROUP BY id_ciudad, hora, id_rango
+            ON CONFLICT (id_ciudad, hora, id_rango) DO UPDATE SET
+                cantidad = cantidad + excluded.cantidad,
+                {acumular};
+            """,
+            (valor,)
+        )
+        return cur.rowcount
+
+    def aplicar_retencion(self, limite, resumen):
+        # Sin particiones que borrar: DELETE de las filas más viejas por
+        # lotes de _RETENCION_POR_LOTE, cada uno en una transacción corta
+        # para no retener el lock de escritura
+        hasta = texto_fecha(limite)
+        borradas = horarias = 0
+
+        while True:
+            with self._transaccion(escritura=True) as conn:
+                row = conn.execute(
+                    "SELECT fecha FROM mediciones WHERE fecha < ? ORDER BY fecha LIMIT 1 OFFSET ?;",
+                    (hasta, _RETENCION_POR_LOTE)
+                ).fetchone()
+                # Último lote: todo lo anterior a `limite`; si no, hasta la fila N inclusive
+                condicion, corte = ("<", hasta) if row is None else ("<=", row[0])
+
+                if resumen == "hora":
+                    horarias += self._compactar_horarias(conn, condicion, corte)
+                lote = conn.execute(f"DELETE FROM mediciones WHERE fecha {condicion} ?;", (corte,)).rowcount
+                if lote:
+                    conn.execute(
+                        """
+                        UPDATE retencion_mediciones
+                        SET borrado_hasta = max(coalesce(borrado_hasta, ''), ?)
+                        WHERE id = 1;
+                        """,
+                        (corte,)
+                    )
+            borradas += lote
+            if row is None:
+                break
+
+        return {"particiones_borradas": [], "filas_borradas": borradas, "filas_horarias": horarias}
+
+    # -----------------------------
+    # Importación / exportación masiva (CSV)
+    # -----------------------------
+
+    def _filas_staging(self, lector, columnas):
+        """Filas del CSV convertidas a las columnas de _STAGING ('' = NULL)."""
+        posiciones = [
+            (columnas.index(nombre), convertir) if nombre in columnas else (None, None)
+            for nombre, convertir in _STAGING
+        ]
+        # Línea 1 = encabezado
+        for numero, fila in enumerate(csv.reader(lector), start=2):
+            try:
+                yield tuple(
+                    convertir(fila[i]) if i is not None and i < len(fila) and fila[i] != "" else None
+                    for i, convertir in posiciones
+                )
+            except ValueError as e:
+                raise ErrorImportacion(f"Línea {numero}: {e}") from e
+
+    def importar_csv(self, archivo, columnas, normalizar, progreso=None):
+        # Sin COPY: el CSV se lee en Python y se carga de a lotes en una tabla
+        # temporal (de la conexión, no bloquea la base); el resto es el mismo
+        # SQL por conjuntos que en PostgreSQL, en una transacción de escritura.
+        lector = LectorConProgreso(archivo, progreso)
+        nombres = ", ".join(nombre for nombre, _ in _STAGING)
+        marcadores = ", ".join("?" for _ in _STAGING)
+
+        with self._conexion() as conn:
+            conn.execute("DROP TABLE IF EXISTS temp.importacion_mediciones;")
+            conn.execute(
+                """
+                CREATE TEMP TABLE importacion_mediciones (
+                    fecha TEXT, temperatura REAL, humedad INTEGER,
+                    sensacion_termica REAL, presion REAL, velocidad_viento REAL,
+                    descripcion TEXT, ciudad TEXT, provincia TEXT, pais TEXT
+                );
+                """
+            )
+            try:
+                # 1) Staging
+                conn.execute("BEGIN;")
+                lote = []
+                for fila in self._filas_staging(lector, columnas):
+                    lote.append(fila)
+                    if len(lote) >= _FILAS_POR_LOTE:
+                        conn.executemany(f"INSERT INTO importacion_mediciones ({nombres}) VALUES ({marcadores});", lote)
+                        lote = []
+                if lote:
+                    conn.executemany(f"INSERT INTO importacion_mediciones ({nombres}) VALUES ({marcadores});", lote)
+                conn.execute("COMMIT;")
+
+                conn.execute("BEGIN IMMEDIATE;")
+                filas, validas = conn.execute(
+                    f"""
+                    SELECT
+                        count(*),
+                        count(r.id_rango)
+                    FROM importacion_mediciones s
+                    -- Los rangos no se solapan: a lo sumo uno por fila
+                    LEFT JOIN rango r ON {CONDICION_COMPLETA} AND {CONDICION_RANGO};
+                    """
+                ).fetchone()
+
+                # 2) Ciudades que faltan
+                nuevas = conn.execute(
+                    """
+                    SELECT s.ciudad, s.pais, MAX(s.provincia)
+                    FROM importacion_mediciones s
+                    WHERE s.ciudad IS NOT NULL
+                      AND s.pais IS NOT NULL
+                      AND NOT EXISTS (
+                          SELECT 1 FROM ciudad c
+                          WHERE c.nombre = s.ciudad AND c.pais = s.pais
+                      )
+                    GROUP BY s.ciudad, s.pais;
+                    """
+                ).fetchall()
+                antes = conn.total_changes
+                conn.executemany(
+                    """
+                    INSERT INTO ciudad (nombre, provincia, pais, nombre_normalizado)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (nombre, pais) DO NOTHING;
+                    """,
+                    [
+                        (nombre, provincia or PROVINCIA_DESCONOCIDA, pais, normalizar(nombre))
+                        for nombre, pais, provincia in nuevas
+                    ],
+                )
+                ciudades_creadas = conn.total_changes - antes
+
+                # 3) Rango + merge (GROUP BY: una medición por ciudad y fecha;
+                #    el índice único saltea lo que otra carga insertó antes)
+                insertadas = conn.execute(
+                    f"""
+                    INSERT INTO mediciones (
+                        id_ciudad, id_rango, fecha, temperatura,
+                        humedad, sensacion_termica, presion,
+                        velocidad_viento, descripcion
+                    )
+                    SELECT
+                        c.id_ciudad, r.id_rango, s.fecha, s.temperatura,
+                        s.humedad, s.sensacion_termica, s.presion,
+                        s.velocidad_viento, s.descripcion
+                    FROM importacion_mediciones s
+                    JOIN ciudad c ON c.nombre = s.ciudad AND c.pais = s.pais
+                    JOIN rango r ON {CONDICION_RANGO}
+                    WHERE {CONDICION_COMPLETA}
+                      AND NOT EXISTS (
+                          SELECT 1 FROM mediciones m
+                          WHERE m.id_ciudad = c.id_ciudad AND m.fecha = s.fecha
+                      )
+                    GROUP BY c.id_ciudad, s.fecha
+                    ON CONFLICT (id_ciudad, fecha) DO NOTHING;
+                    """
+                ).rowcount
+                conn.execute("COMMIT;")
+            finally:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK;")
+                conn.execute("DROP TABLE IF EXISTS temp.importacion_mediciones;")
+
+        return resumen_importacion(lector.avance, filas, insertadas, validas, ciudades_creadas)
+
+    def exportar_csv(self, destino, progreso=None):
+        escritor = EscritorConProgreso(destino, progreso)
+        writer = csv.writer(escritor)
+        writer.writerow(COLUMNAS_CSV)
+        # `fecha` ya está guardada en ISO 8601 (UTC): se escribe tal cual
+        sql = SELECT_MEDICIONES + """
+            ORDER BY m.fecha DESC, m.id_mediciones DESC;
+        """
+
+        self.inicializar()
+        conn = self._abrir()
+        try:
+            cur = conn.execute(sql)
+            while True:
+                rows = cur.fetchmany(2000)
+                if not rows:
+                    break
+                writer.writerows(rows)
+        finally:
+            conn.close()
+
+        return resumen_exportacion(escritor.avance)
+
+    # -----------------------------
+    # Ciclo de vida
+    # -----------------------------
+
+    def cerrar(self):
+        with self._lock:
+            libres = self._libres
+            self._libres = []
+            self._abiertas -= len(libres)
+        for conn in libres:
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.nombre,
+                "ruta": self.ruta,
+                "conexiones": self._abiertas,
+                "libres": len(self._libres),
+                "checkouts": self._checkouts,
+            }
@@ -18,3 +18,26 @@ def get_db_config():
 
 def get_search_path():
     return os.getenv("DB_SEARCH_PATH", "lab_mediciones_db,public")
+
+def get_pool_config():
+    return {
+        "minconn": int(os.getenv("DB_POOL_MIN", "1")),
+        "maxconn": int(os.getenv("DB_POOL_MAX", "10")),
+        # Segundos máximos esperando una conexión libre antes de fallar
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT", "5")),
+        # Conexiones ociosas por más de estos segundos se verifican con SELECT 1
+        "health_check_interval": float(os.getenv("DB_POOL_HEALTHCHECK", "30")),
+    }
+
+def get_backend():
+    """Backend de almacenamiento: "postgres" (por defecto) o "sqlite"."""
+    return os.getenv("DB_BACKEND", "postgres").strip().lower()
+
+def get_sqlite_config():
+    return {
+        "ruta": os.getenv("DB_SQLITE_RUTA", os.path.join(BASE_DIR, "lab_mediciones.sqlite3")),
+        # Segundos que una escritura espera el lock de otra antes de fallar
+        "timeout": float(os.getenv("DB_SQLITE_TIMEOUT", "5")),
+        # Conexiones ociosas que se guardan para reusar (mismo límite que el pool de PostgreSQL)
+        "max_libres": int(os.getenv("DB_POOL_MAX", "10")),
+    }
@@ -1,17 +1,302 @@
 # database/connection.py
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
-from .config_db import get_db_config, get_search_path
+import psycopg2.extensions
+
+from instrumentacion.latencias import registrar_etapa
+
+from .config_db import get_db_config, get_search_path, get_pool_config
+
 
+class PoolAgotado(Exception):
+    """Se lanza cuando no hay conexiones libres dentro del tiempo de espera."""
+    pass
 
-def get_connection():
+
+def get_connection(**opciones):
     """
     Crea y devuelve una conexión nueva a PostgreSQL
     usando los datos del .env y seteando el search_path.
+    `opciones` se suman a los parámetros de conexión (p. ej. keepalives).
+
+    El search_path se confirma con commit para que quede fijo
+    durante toda la sesión, aunque después se haga rollback.
     """
     db_config = get_db_config()
-    conn = psycopg2.connect(**db_config)
+    conn = psycopg2.connect(**db_config, **opciones)
     search_path = get_search_path()
     with conn.cursor() as cur:
         cur.execute(f"SET search_path TO {search_path};")
+    conn.commit()
 
     return conn
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones thread-safe.
+
+    - Mantiene entre `minconn` y `maxconn` conexiones físicas.
+    - Cada conexión física setea el search_path una sola vez (get_connection).
+    - Al prestar una conexión que estuvo ociosa más de
+      `health_check_interval` segundos, la verifica con SELECT 1
+      y la reemplaza si está rota.
+    - Si no hay conexiones libres y ya se llegó a `maxconn`, espera
+      hasta `timeout` segundos y después lanza PoolAgotado.
+    """
+
+    def __init__(self, minconn=1, maxconn=10, timeout=5.0, health_check_interval=30.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError(
+                f"Tamaños de pool inválidos: min={minconn}, max={maxconn}"
+            )
+
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        self._libres = []      # lista de (conn, instante_de_devolucion), LIFO
+        self._total = 0        # conexiones físicas abiertas (libres + en uso)
+        self._en_uso = 0
+        self._cerrado = False
+
+        # Estadísticas
+        self._checkouts = 0
+        self._fallos_checkout = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+        self._creadas = 0
+        self._descartadas = 0
+
+        for _ in range(minconn):
+            conn = self._crear_conexion()
+            with self._cond:
+                self._total += 1
+                self._libres.append((conn, time.monotonic()))
+
+    # -----------------------------
+    # Helpers internos
+    # -----------------------------
+
+    def _crear_conexion(self):
+        conn = get_connection()
+        with self._cond:
+            self._creadas += 1
+        return conn
+
+    def _esta_sana(self, conn, devuelta_en):
+        if conn.closed:
+            return False
+        if time.monotonic() - devuelta_en < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _cerrar_silencioso(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    # -----------------------------
+    # API pública
+    # -----------------------------
+
+    def getconn(self):
+        """
+        Presta una conexión del pool. Hay que devolverla con putconn
+        (o usar el context manager `connection`).
+        """
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        conn = None
+        devuelta_en = None
+
+        with self._cond:
+            while True:
+                if self._cerrado:
+                    raise PoolAgotado("El pool de conexiones está cerrado.")
+                if self._libres:
+                    conn, devuelta_en = self._libres.pop()
+                    break
+                if self._total < self.maxconn:
+                    # Reservamos el lugar y creamos la conexión fuera del lock
+                    self._total += 1
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._fallos_checkout += 1
+                    raise PoolAgotado(
+                        f"No hubo conexiones libres en {self.timeout} s "
+                        f"(max={self.maxconn})."
+                    )
+                self._cond.wait(restante)
+            self._en_uso += 1
+
+        try:
+            if conn is not None and not self._esta_sana(conn, devuelta_en):
+                self._cerrar_silencioso(conn)
+                with self._cond:
+                    self._descartadas += 1
+                conn = None
+            if conn is None:
+                conn = self._crear_conexion()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._en_uso -= 1
+                self._fallos_checkout += 1
+                self._cond.notify()
+            raise
+
+        espera = time.monotonic() - inicio
+        with self._cond:
+            self._checkouts += 1
+            self._espera_total += espera
+            if espera > self._espera_max:
+                self._espera_max = espera
+        # Espera por una conexión libre + conexión nueva o verificación con SELECT 1
+        registrar_etapa("bd.conexion", espera)
+
+        return conn
+
+    def putconn(self, conn, descartar=False):
+        """
+        Devuelve una conexión al pool. Si quedó con una transacción abierta
+        se hace rollback; si está rota (o descartar=True) se cierra.
+        """
+        if not conn.closed and not descartar:
+            try:
+                status = conn.info.transaction_status
+                if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                descartar = True
+
+        with self._cond:
+            self._en_uso -= 1
+            if conn.closed or descartar or self._cerrado:
+                self._total -= 1
+                self._descartadas += 1
+                cerrar = True
+            else:
+                self._libres.append((conn, time.monotonic()))
+                cerrar = False
+            self._cond.notify()
+
+        if cerrar:
+            self._cerrar_silencioso(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager para pedir y devolver una conexión:
+
+            with pool.connection() as conn:
+                ...
+
+        Si el bloque lanza un error de conexión, la conexión se descarta.
+        El commit sigue quedando a cargo de quien la usa.
+        """
+        conn = self.getconn()
+        descartar = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            descartar = True
+            raise
+        finally:
+            self.putconn(conn, descartar=descartar)
+
+    def closeall(self):
+        """Cierra las conexiones libres y marca el pool como cerrado."""
+        with self._cond:
+            self._cerrado = True
+            libres = self._libres
+            self._libres = []
+            self._total -= len(libres)
+            self._cond.notify_all()
+        for conn, _ in libres:
+            self._cerrar_silencioso(conn)
+
+    def stats(self):
+        """Devuelve un dict con el estado y las métricas del pool."""
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "total": self._total,
+                "en_uso": self._en_uso,
+                "libres": len(self._libres),
+                "checkouts": checkouts,
+                "fallos_checkout": self._fallos_checkout,
+                "creadas": self._creadas,
+                "descartadas": self._descartadas,
+                "espera_total_ms": round(self._espera_total * 1000, 3),
+                "espera_max_ms": round(self._espera_max * 1000, 3),
+                "espera_promedio_ms": (
+                    round(self._espera_total * 1000 / checkouts, 3) if checkouts else 0.0
+                ),
+            }
+
+
+# -----------------------------
+# Pool compartido por los repositorios
+# -----------------------------
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Devuelve el pool compartido, creándolo la primera vez
+    con la configuración de config_db.get_pool_config().
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(**get_pool_config())
+    return _pool
+
+
+def pooled_connection():
+    """
+    Atajo para `get_pool().connection()`:
+
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                ...
+    """
+    return get_pool().connection()
+
+
+def get_pool_stats():
+    """
+    Estadísticas del pool compartido. Si todavía no se creó,
+    devuelve None en lugar de abrir conexiones.
+    """
+    if _pool is None:
+        return None
+    return _pool.stats()
+
+
+def close_pool():
+    """Cierra el pool compartido (por ejemplo al apagar el proceso)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
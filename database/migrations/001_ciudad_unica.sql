@@ -0,0 +1,42 @@
+-- Migración 001: una sola fila de ciudad por (nombre, pais).
+--
+-- Antes de este cambio dos POST concurrentes para una ciudad nueva podían
+-- crear filas duplicadas. Se conserva la de menor id, se le reasignan las
+-- mediciones de las duplicadas y recién después se agrega la restricción.
+-- Es idempotente: se puede correr sobre una base ya migrada.
+SET search_path TO lab_mediciones_db, public;
+
+BEGIN;
+
+-- 1) Reasignar mediciones de ciudades duplicadas a la de menor id
+WITH duplicadas AS (
+    SELECT id_ciudad,
+           MIN(id_ciudad) OVER (PARTITION BY nombre, pais) AS id_conservar
+    FROM ciudad
+)
+UPDATE mediciones m
+SET id_ciudad = d.id_conservar
+FROM duplicadas d
+WHERE m.id_ciudad = d.id_ciudad
+  AND d.id_ciudad <> d.id_conservar;
+
+-- 2) Borrar las ciudades duplicadas (ya sin mediciones)
+DELETE FROM ciudad c
+USING ciudad c2
+WHERE c.nombre = c2.nombre
+  AND c.pais = c2.pais
+  AND c.id_ciudad > c2.id_ciudad;
+
+-- 3) Restricción única (si todavía no existe)
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'uq_ciudad_nombre_pais'
+    ) THEN
+        ALTER TABLE ciudad
+            ADD CONSTRAINT uq_ciudad_nombre_pais UNIQUE (nombre, pais);
+    END IF;
+END
+$$;
+
+COMMIT;
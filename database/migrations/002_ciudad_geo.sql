@@ -0,0 +1,15 @@
+-- Migración 002: coordenadas y país en `ciudad` (caché de geocoding).
+--
+-- Las coordenadas de una ciudad no cambian, así que se guardan la primera
+-- vez que se geocodifica y después se buscan por nombre normalizado
+-- (minúsculas, sin tildes) sin volver a llamar a la API.
+-- Las filas existentes se completan en su próxima medición.
+SET search_path TO lab_mediciones_db, public;
+
+ALTER TABLE ciudad ADD COLUMN IF NOT EXISTS nombre_normalizado VARCHAR(100);
+ALTER TABLE ciudad ADD COLUMN IF NOT EXISTS pais_nombre        VARCHAR(100);
+ALTER TABLE ciudad ADD COLUMN IF NOT EXISTS latitud            DOUBLE PRECISION;
+ALTER TABLE ciudad ADD COLUMN IF NOT EXISTS longitud           DOUBLE PRECISION;
+
+CREATE INDEX IF NOT EXISTS idx_ciudad_nombre_normalizado
+    ON ciudad (nombre_normalizado);
@@ -0,0 +1,124 @@
+-- Migración 003: resumen diario incremental (mediciones_diarias).
+--
+-- Un trigger por sentencia (con tabla de transición) suma las filas nuevas
+-- de `mediciones` en la misma transacción del INSERT, agrupadas por
+-- (ciudad, día, rango): un insert por lote actualiza cada grupo una sola vez.
+--
+-- recalcular_mediciones_diarias(desde, hasta) rehace el resumen de un rango
+-- de días a partir de los datos crudos; es idempotente y sirve como
+-- "catch-up" si el resumen quedó desfasado. Los borrados de `mediciones`
+-- NO se descuentan: el resumen conserva la historia.
+SET search_path TO lab_mediciones_db, public;
+
+-- Filas agregadas a partir de un conjunto de mediciones.
+-- (los valores todavía son VARCHAR: se convierten a número acá)
+CREATE OR REPLACE FUNCTION fn_mediciones_diarias_acumular()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO mediciones_diarias AS d (
+        id_ciudad, fecha, id_rango, cantidad,
+        temperatura_suma, temperatura_min, temperatura_max,
+        humedad_suma, humedad_min, humedad_max,
+        sensacion_termica_suma, sensacion_termica_min, sensacion_termica_max,
+        presion_suma, presion_min, presion_max,
+        velocidad_viento_suma, velocidad_viento_min, velocidad_viento_max
+    )
+    SELECT
+        n.id_ciudad, n.fecha::date, n.id_rango, COUNT(*),
+        SUM(n.temperatura), MIN(n.temperatura), MAX(n.temperatura),
+        SUM(n.humedad::double precision), MIN(n.humedad::double precision), MAX(n.humedad::double precision),
+        SUM(n.sensacion_termica::double precision), MIN(n.sensacion_termica::double precision), MAX(n.sensacion_termica::double precision),
+        SUM(n.presion::double precision), MIN(n.presion::double precision), MAX(n.presion::double precision),
+        SUM(n.velocidad_viento::double precision), MIN(n.velocidad_viento::double precision), MAX(n.velocidad_viento::double precision)
+    FROM nuevas n
+    GROUP BY n.id_ciudad, n.fecha::date, n.id_rango
+    -- Orden fijo de claves: evita deadlocks entre lotes concurrentes
+    ORDER BY n.id_ciudad, n.fecha::date, n.id_rango
+    ON CONFLICT ON CONSTRAINT pk_mediciones_diarias DO UPDATE SET
+        cantidad               = d.cantidad + EXCLUDED.cantidad,
+        temperatura_suma       = d.temperatura_suma + EXCLUDED.temperatura_suma,
+        temperatura_min        = LEAST(d.temperatura_min, EXCLUDED.temperatura_min),
+        temperatura_max        = GREATEST(d.temperatura_max, EXCLUDED.temperatura_max),
+        humedad_suma           = d.humedad_suma + EXCLUDED.humedad_suma,
+        humedad_min            = LEAST(d.humedad_min, EXCLUDED.humedad_min),
+        humedad_max            = GREATEST(d.humedad_max, EXCLUDED.humedad_max),
+        sensacion_termica_suma = d.sensacion_termica_suma + EXCLUDED.sensacion_termica_suma,
+        sensacion_termica_min  = LEAST(d.sensacion_termica_min, EXCLUDED.sensacion_termica_min),
+        sensacion_termica_max  = GREATEST(d.sensacion_termica_max, EXCLUDED.sensacion_termica_max),
+        presion_suma           = d.presion_suma + EXCLUDED.presion_suma,
+        presion_min            = LEAST(d.presion_min, EXCLUDED.presion_min),
+        presion_max            = GREATEST(d.presion_max, EXCLUDED.presion_max),
+        velocidad_viento_suma  = d.velocidad_viento_suma + EXCLUDED.velocidad_viento_suma,
+        velocidad_viento_min   = LEAST(d.velocidad_viento_min, EXCLUDED.velocidad_viento_min),
+        velocidad_viento_max   = GREATEST(d.velocidad_viento_max, EXCLUDED.velocidad_viento_max);
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_mediciones_diarias ON mediciones;
+CREATE TRIGGER trg_mediciones_diarias
+    AFTER INSERT ON mediciones
+    REFERENCING NEW TABLE AS nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_mediciones_diarias_acumular();
+
+
+-- Catch-up idempotente: rehace [desde, hasta] (días inclusive).
+-- Devuelve la cantidad de filas de resumen generadas.
+CREATE OR REPLACE FUNCTION recalcular_mediciones_diarias(desde DATE, hasta DATE)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    filas INTEGER;
+BEGIN
+    -- Bloquea a los triggers concurrentes hasta el COMMIT: sus filas
+    -- se suman después, sobre el resumen ya recalculado
+    LOCK TABLE mediciones_diarias IN SHARE ROW EXCLUSIVE MODE;
+
+    DELETE FROM mediciones_diarias
+    WHERE fecha BETWEEN desde AND hasta;
+
+    INSERT INTO mediciones_diarias (
+        id_ciudad, fecha, id_rango, cantidad,
+        temperatura_suma, temperatura_min, temperatura_max,
+        humedad_suma, humedad_min, humedad_max,
+        sensacion_termica_suma, sensacion_termica_min, sensacion_termica_max,
+        presion_suma, presion_min, presion_max,
+        velocidad_viento_suma, velocidad_viento_min, velocidad_viento_max
+    )
+    SELECT
+        m.id_ciudad, m.fecha::date, m.id_rango, COUNT(*),
+        SUM(m.temperatura), MIN(m.temperatura), MAX(m.temperatura),
+        SUM(m.humedad::double precision), MIN(m.humedad::double precision), MAX(m.humedad::double precision),
+        SUM(m.sensacion_termica::double precision), MIN(m.sensacion_termica::double precision), MAX(m.sensacion_termica::double precision),
+        SUM(m.presion::double precision), MIN(m.presion::double precision), MAX(m.presion::double precision),
+        SUM(m.velocidad_viento::double precision), MIN(m.velocidad_viento::double precision), MAX(m.velocidad_viento::double precision)
+    FROM mediciones m
+    WHERE m.fecha >= desde
+      AND m.fecha < hasta + 1
+    GROUP BY m.id_ciudad, m.fecha::date, m.id_rango;
+
+    GET DIAGNOSTICS filas = ROW_COUNT;
+    RETURN filas;
+END;
+$$;
+
+
+-- Primera carga (solo si el resumen está vacío)
+DO $$
+DECLARE
+    primera DATE;
+    ultima  DATE;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM mediciones_diarias) THEN
+        SELECT MIN(fecha)::date, MAX(fecha)::date INTO primera, ultima FROM mediciones;
+        IF primera IS NOT NULL THEN
+            PERFORM recalcular_mediciones_diarias(primera, ultima);
+        END IF;
+    END IF;
+END
+$$;
@@ -0,0 +1,235 @@
+# database/migrations/004_mediciones_numericas.py
+"""
+Migración 004: tipos numéricos y fecha con hora en `mediciones`.
+
+- temperatura:        INTEGER     -> REAL
+- humedad:            VARCHAR(10) -> SMALLINT
+- sensacion_termica:  VARCHAR(10) -> REAL
+- presion:            VARCHAR(10) -> REAL
+- velocidad_viento:   VARCHAR(10) -> REAL
+- fecha:              DATE        -> TIMESTAMPTZ (las filas viejas quedan a las 00:00)
+
+Un ALTER COLUMN ... TYPE reescribiría la tabla con un lock exclusivo
+durante todo el proceso. En cambio se hace en línea, con la app andando:
+
+1) Se agregan columnas nuevas (<columna>_num, fecha_ts) y un trigger que
+   las completa en cada INSERT/UPDATE que todavía use las columnas viejas.
+2) Backfill por lotes de ids: MIGRACION_LOTE filas por transacción, con una
+   pausa de MIGRACION_PAUSA segundos entre lotes.
+3) Índices nuevos sobre fecha_ts con CREATE INDEX CONCURRENTLY y un CHECK
+   NOT VALID que se valida sin frenar escrituras (así SET NOT NULL no
+   recorre la tabla).
+4) Intercambio en una transacción corta: se borran las columnas viejas y se
+   renombran las nuevas. Si no consigue el lock en MIGRACION_LOCK_TIMEOUT
+   falla sin tocar nada y se puede reintentar.
+
+Es idempotente y reanudable: cada paso chequea si ya se hizo. Una base
+creada con el schema.sql actual ya tiene los tipos nuevos y no hace nada.
+
+La ejecuta init_db.py (llama a migrar(conn) con una conexión autocommit).
+"""
+import os
+import time
+
+from database.config_db import get_search_path
+
+
+# (columna, columna nueva, tipo nuevo, conversión desde la vieja; {c} = referencia)
+COLUMNAS = [
+    ("temperatura", "temperatura_num", "REAL", "{c}::real"),
+    ("humedad", "humedad_num", "SMALLINT", "round({c}::numeric)::smallint"),
+    ("sensacion_termica", "sensacion_termica_num", "REAL", "{c}::real"),
+    ("presion", "presion_num", "REAL", "{c}::real"),
+    ("velocidad_viento", "velocidad_viento_num", "REAL", "{c}::real"),
+    ("fecha", "fecha_ts", "TIMESTAMPTZ", "{c}::timestamptz"),
+]
+
+# Índices que incluyen `fecha`: se borran con la columna vieja, así que se
+# construyen antes sobre fecha_ts (con sufijo _ts) y se renombran al final
+INDICES_FECHA = {
+    "idx_mediciones_fecha_id": "fecha_ts DESC, id_mediciones DESC",
+    "idx_mediciones_ciudad_fecha": "id_ciudad, fecha_ts DESC, id_mediciones DESC",
+    "idx_mediciones_rango_fecha": "id_rango, fecha_ts DESC, id_mediciones DESC",
+}
+CHECK_NO_NULOS = "chk_mediciones_num_no_nulos"
+
+
+def _columnas_de(cur):
+    cur.execute(
+        """
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND table_name = 'mediciones';
+        """
+    )
+    return dict(cur.fetchall())
+
+
+# -----------------------------
+# Pasos
+# -----------------------------
+
+def _preparar(cur):
+    """1) Columnas nuevas (sin default: es solo metadata) y trigger de sincronización."""
+    agregar = ", ".join(
+        f"ADD COLUMN IF NOT EXISTS {nueva} {tipo}" for _, nueva, tipo, _ in COLUMNAS
+    )
+    cur.execute(f"ALTER TABLE mediciones {agregar};")
+
+    asignaciones = "\n".join(
+        f"    NEW.{nueva} := {conversion.format(c='NEW.' + vieja)};"
+        for vieja, nueva, _, conversion in COLUMNAS
+    )
+    cur.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION fn_mediciones_num_sincronizar()
+        RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+        {asignaciones}
+            RETURN NEW;
+        END;
+        $$;
+        """
+    )
+    viejas = ", ".join(vieja for vieja, _, _, _ in COLUMNAS)
+    cur.execute("DROP TRIGGER IF EXISTS trg_mediciones_num_sincronizar ON mediciones;")
+    cur.execute(
+        f"""
+        CREATE TRIGGER trg_mediciones_num_sincronizar
+            BEFORE INSERT OR UPDATE OF {viejas} ON mediciones
+            FOR EACH ROW
+            EXECUTE FUNCTION fn_mediciones_num_sincronizar();
+        """
+    )
+
+
+def _backfill(cur, lote, pausa):
+    """2) Completa las filas existentes por rangos de id (una transacción por lote)."""
+    cur.execute("SELECT MIN(id_mediciones), MAX(id_mediciones) FROM mediciones;")
+    primero, ultimo = cur.fetchone()
+    if primero is None:
+        return 0
+
+    asignaciones = ", ".join(
+        f"{nueva} = {conversion.format(c=vieja)}" for vieja, nueva, _, conversion in COLUMNAS
+    )
+    total = 0
+    for desde in range(primero, ultimo + 1, lote):
+        # Las filas posteriores a `ultimo` ya las completa el trigger
+        cur.execute(
+            f"""
+            UPDATE mediciones
+            SET {asignaciones}
+            WHERE id_mediciones BETWEEN %s AND %s
+              AND fecha_ts IS NULL;
+            """,
+            (desde, desde + lote - 1)
+        )
+        total += cur.rowcount
+        if pausa > 0:
+            time.sleep(pausa)
+    return total
+
+
+def _indices_y_check(cur):
+    """3) Índices sobre fecha_ts y CHECK de no nulos, sin bloquear escrituras."""
+    for nombre, columnas in INDICES_FECHA.items():
+        nuevo = f"{nombre}_ts"
+        # Un CREATE INDEX CONCURRENTLY cortado deja un índice inválido: se rehace
+        cur.execute(
+            """
+            SELECT i.indisvalid
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = %s
+              AND c.relnamespace = current_schema()::regnamespace;
+            """,
+            (nuevo,)
+        )
+        row = cur.fetchone()
+        if row is not None and not row[0]:
+            cur.execute(f"DROP INDEX CONCURRENTLY {nuevo};")
+            row = None
+        if row is None:
+            cur.execute(f"CREATE INDEX CONCURRENTLY {nuevo} ON mediciones ({columnas});")
+
+    cur.execute(
+        "SELECT 1 FROM pg_constraint WHERE conname = %s AND conrelid = 'mediciones'::regclass;",
+        (CHECK_NO_NULOS,)
+    )
+    if cur.fetchone() is None:
+        no_nulos = " AND ".join(f"{nueva} IS NOT NULL" for _, nueva, _, _ in COLUMNAS)
+        cur.execute(
+            f"ALTER TABLE mediciones ADD CONSTRAINT {CHECK_NO_NULOS} CHECK ({no_nulos}) NOT VALID;"
+        )
+    cur.execute(f"ALTER TABLE mediciones VALIDATE CONSTRAINT {CHECK_NO_NULOS};")
+
+
+def _intercambiar(conn, lock_timeout):
+    """4) Borra las columnas viejas y renombra las nuevas en una transacción corta."""
+    conn.autocommit = False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL lock_timeout = %s;", (lock_timeout,))
+            cur.execute("LOCK TABLE mediciones IN ACCESS EXCLUSIVE MODE;")
+            cur.execute("DROP TRIGGER IF EXISTS trg_mediciones_num_sincronizar ON mediciones;")
+            cur.execute("DROP FUNCTION IF EXISTS fn_mediciones_num_sincronizar();")
+
+            # Se lleva también los índices sobre la fecha vieja
+            borrar = ", ".join(f"DROP COLUMN {vieja}" for vieja, _, _, _ in COLUMNAS)
+            cur.execute(f"ALTER TABLE mediciones {borrar};")
+            for vieja, nueva, _, _ in COLUMNAS:
+                cur.execute(f"ALTER TABLE mediciones RENAME COLUMN {nueva} TO {vieja};")
+
+            # El CHECK validado evita que SET NOT NULL recorra la tabla
+            no_nulos = ", ".join(
+                f"ALTER COLUMN {vieja} SET NOT NULL" for vieja, _, _, _ in COLUMNAS
+            )
+            cur.execute(
+                f"ALTER TABLE mediciones {no_nulos}, ALTER COLUMN fecha SET DEFAULT now();"
+            )
+            # En otra sentencia: dentro del mismo ALTER los DROP van primero
+            cur.execute(f"ALTER TABLE mediciones DROP CONSTRAINT {CHECK_NO_NULOS};")
+            for nombre in INDICES_FECHA:
+                cur.execute(f"ALTER INDEX {nombre}_ts RENAME TO {nombre};")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = True
+
+
+def migrar(conn):
+    """
+    Aplica la migración sobre una conexión en modo autocommit.
+    Si la tabla ya tiene los tipos nuevos no hace nada.
+    """
+    lote = int(os.getenv("MIGRACION_LOTE", "5000"))
+    pausa = float(os.getenv("MIGRACION_PAUSA", "0.05"))
+    lock_timeout = os.getenv("MIGRACION_LOCK_TIMEOUT", "5s")
+
+    with conn.cursor() as cur:
+        cur.execute(f"SET search_path TO {get_search_path()};")
+        columnas = _columnas_de(cur)
+        if columnas.get("humedad") != "character varying" and "humedad_num" not in columnas:
+            print("  mediciones ya tiene tipos numéricos, nada que hacer.")
+            return
+
+        # 1) Columnas nuevas + trigger
+        _preparar(cur)
+
+        # 2) Backfill por lotes
+        inicio = time.monotonic()
+        filas = _backfill(cur, lote, pausa)
+        print(f"  backfill: {filas} filas en {time.monotonic() - inicio:.1f} s")
+
+        # 3) Índices y CHECK
+        _indices_y_check(cur)
+
+    # 4) Intercambio
+    _intercambiar(conn, lock_timeout)
+    print("  columnas numéricas en uso.")
@@ -0,0 +1,43 @@
+-- Migración 005: versión de los datos para la caché de respuestas (ETag).
+--
+-- Cada sentencia que cambia `mediciones` o `rango` incrementa la única fila
+-- de `version_datos` y avisa por NOTIFY en el canal 'version_datos' con la
+-- versión nueva como payload. El aviso se entrega recién al COMMIT (y nunca
+-- si hay ROLLBACK): cada proceso de la API escucha el canal y sabe la
+-- versión vigente sin consultar la BD.
+--
+-- El trigger es por sentencia: un insert por lote es un solo incremento.
+SET search_path TO lab_mediciones_db, public;
+
+INSERT INTO version_datos (id, version)
+VALUES (1, 0)
+ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION fn_version_datos_incrementar()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    nueva BIGINT;
+BEGIN
+    UPDATE version_datos
+    SET version = version + 1
+    WHERE id = 1
+    RETURNING version INTO nueva;
+
+    PERFORM pg_notify('version_datos', nueva::text);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_version_datos_mediciones ON mediciones;
+CREATE TRIGGER trg_version_datos_mediciones
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON mediciones
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_version_datos_incrementar();
+
+DROP TRIGGER IF EXISTS trg_version_datos_rango ON rango;
+CREATE TRIGGER trg_version_datos_rango
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON rango
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION fn_version_datos_incrementar();
@@ -0,0 +1,227 @@
+# database/migrations/006_mediciones_particionadas.py
+"""
+Migración 006: `mediciones` particionada por rango de `fecha`.
+
+Convertir la tabla copiando las filas a una tabla nueva la reescribiría
+entera. En cambio la tabla actual pasa a ser UNA partición, la histórica
+(mediciones_historico, desde MINVALUE hasta el primer mes sin datos), de
+una tabla particionada nueva que toma su nombre:
+
+1) CHECK (fecha < corte) NOT VALID y su validación: con esa restricción el
+   ATTACH PARTITION no recorre la tabla. `corte` es el comienzo (UTC) del
+   mes siguiente a la última medición (o a hoy).
+2) Índice único (id_mediciones, fecha) con CREATE INDEX CONCURRENTLY: la PK
+   de una tabla particionada tiene que incluir la clave de partición.
+3) Intercambio en una transacción corta (con MIGRACION_LOCK_TIMEOUT, como
+   la 004): se renombra la tabla vieja y sus índices, se crea la
+   particionada con las mismas columnas, índices, PK y FKs, se adjunta la
+   vieja (usa sus índices, no los reconstruye), se crea la partición por
+   defecto y se pasan los triggers de las migraciones 003 y 005 a la tabla
+   nueva. La secuencia de id_mediciones pasa a ser de la tabla nueva.
+
+Las particiones mensuales, la retención y el resumen por hora están en la
+migración 007. La histórica se borra entera cuando toda ella queda fuera
+de la retención.
+
+Es idempotente: si `mediciones` ya está particionada (una base creada con
+el schema.sql actual) solo asegura la partición por defecto.
+"""
+import os
+
+from database.config_db import get_search_path
+
+
+HISTORICA = "mediciones_historico"
+POR_DEFECTO = "mediciones_default"
+CHECK_CORTE = "chk_mediciones_historico_corte"
+INDICE_PK = "idx_mediciones_historico_pk"
+
+# Índices de schema.sql (la tabla vieja los conserva con sufijo _historico)
+INDICES = {
+    "idx_mediciones_fecha_id": "fecha DESC, id_mediciones DESC",
+    "idx_mediciones_ciudad_fecha": "id_ciudad, fecha DESC, id_mediciones DESC",
+    "idx_mediciones_rango_fecha": "id_rango, fecha DESC, id_mediciones DESC",
+}
+
+# Triggers de las migraciones 003 y 005 (las funciones no cambian)
+TRIGGERS = [
+    """
+    CREATE TRIGGER trg_mediciones_diarias
+        AFTER INSERT ON mediciones
+        REFERENCING NEW TABLE AS nuevas
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION fn_mediciones_diarias_acumular();
+    """,
+    """
+    CREATE TRIGGER trg_version_datos_mediciones
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON mediciones
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION fn_version_datos_incrementar();
+    """,
+]
+
+
+def _tipo_de(cur, tabla):
+    """'p' = particionada, 'r' = tabla común, None = no existe."""
+    cur.execute(
+        """
+        SELECT relkind
+        FROM pg_class
+        WHERE relname = %s
+          AND relnamespace = current_schema()::regnamespace;
+        """,
+        (tabla,)
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _crear_por_defecto(cur):
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {POR_DEFECTO} PARTITION OF mediciones DEFAULT;")
+
+
+# -----------------------------
+# Pasos
+# -----------------------------
+
+def _check_corte(cur):
+    """1) CHECK (fecha < corte) validado sin frenar escrituras. Devuelve `corte`."""
+    cur.execute(
+        """
+        SELECT pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conname = %s AND conrelid = 'mediciones'::regclass;
+        """,
+        (CHECK_CORTE,)
+    )
+    if cur.fetchone() is None:
+        cur.execute(
+            """
+            SELECT (date_trunc('month', GREATEST(now(), MAX(fecha)) AT TIME ZONE 'UTC')
+                    + interval '1 month') AT TIME ZONE 'UTC'
+            FROM mediciones;
+            """
+        )
+        corte = cur.fetchone()[0]
+        cur.execute(
+            f"ALTER TABLE mediciones ADD CONSTRAINT {CHECK_CORTE} CHECK (fecha < %s) NOT VALID;",
+            (corte,)
+        )
+    cur.execute(f"ALTER TABLE mediciones VALIDATE CONSTRAINT {CHECK_CORTE};")
+
+    # El corte guardado en la restricción (si ya existía de una corrida anterior)
+    cur.execute(
+        """
+        SELECT substring(pg_get_constraintdef(oid) FROM '''([^'']+)''')::timestamptz
+        FROM pg_constraint
+        WHERE conname = %s AND conrelid = 'mediciones'::regclass;
+        """,
+        (CHECK_CORTE,)
+    )
+    return cur.fetchone()[0]
+
+
+def _indice_pk(cur):
+    """2) Índice único (id_mediciones, fecha) para la PK de la partición."""
+    cur.execute(
+        """
+        SELECT i.indisvalid
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s
+          AND c.relnamespace = current_schema()::regnamespace;
+        """,
+        (INDICE_PK,)
+    )
+    row = cur.fetchone()
+    if row is not None and not row[0]:
+        cur.execute(f"DROP INDEX CONCURRENTLY {INDICE_PK};")
+        row = None
+    if row is None:
+        cur.execute(f"CREATE UNIQUE INDEX CONCURRENTLY {INDICE_PK} ON mediciones (id_mediciones, fecha);")
+
+
+def _intercambiar(conn, corte, lock_timeout):
+    """3) Tabla vieja -> partición histórica de la tabla particionada nueva."""
+    conn.autocommit = False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL lock_timeout = %s;", (lock_timeout,))
+            cur.execute("LOCK TABLE mediciones IN ACCESS EXCLUSIVE MODE;")
+
+            cur.execute("SELECT pg_get_serial_sequence('mediciones', 'id_mediciones');")
+            secuencia = cur.fetchone()[0]
+            cur.execute(
+                "SELECT conname FROM pg_constraint WHERE conrelid = 'mediciones'::regclass AND contype = 'p';"
+            )
+            pk_vieja = cur.fetchone()[0]
+
+            # Los triggers de sentencia quedan en la tabla nueva
+            cur.execute("DROP TRIGGER IF EXISTS trg_mediciones_diarias ON mediciones;")
+            cur.execute("DROP TRIGGER IF EXISTS trg_version_datos_mediciones ON mediciones;")
+
+            cur.execute(f"ALTER TABLE mediciones RENAME TO {HISTORICA};")
+            cur.execute(
+                f"ALTER TABLE {HISTORICA} DROP CONSTRAINT {pk_vieja}, "
+                f"ADD CONSTRAINT {HISTORICA}_pkey PRIMARY KEY USING INDEX {INDICE_PK};"
+            )
+            for nombre in INDICES:
+                cur.execute(f"ALTER INDEX IF EXISTS {nombre} RENAME TO {nombre}_historico;")
+
+            cur.execute(
+                f"""
+                CREATE TABLE mediciones (
+                    LIKE {HISTORICA} INCLUDING DEFAULTS,
+                    CONSTRAINT mediciones_pkey PRIMARY KEY (id_mediciones, fecha),
+                    CONSTRAINT fk_mediciones_ciudad
+                        FOREIGN KEY (id_ciudad) REFERENCES ciudad (id_ciudad),
+                    CONSTRAINT fk_mediciones_rango
+                        FOREIGN KEY (id_rango) REFERENCES rango (id_rango)
+                ) PARTITION BY RANGE (fecha);
+                """
+            )
+            for nombre, columnas in INDICES.items():
+                cur.execute(f"CREATE INDEX {nombre} ON mediciones ({columnas});")
+            cur.execute(f"ALTER SEQUENCE {secuencia} OWNED BY mediciones.id_mediciones;")
+
+            # Con el CHECK validado no recorre la tabla; los índices equivalentes se adjuntan
+            cur.execute(
+                f"ALTER TABLE mediciones ATTACH PARTITION {HISTORICA} FOR VALUES FROM (MINVALUE) TO (%s);",
+                (corte,)
+            )
+            cur.execute(f"ALTER TABLE {HISTORICA} DROP CONSTRAINT {CHECK_CORTE};")
+            _crear_por_defecto(cur)
+
+            for trigger in TRIGGERS:
+                cur.execute(trigger)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = True
+
+
+def migrar(conn):
+    """
+    Aplica la migración sobre una conexión en modo autocommit.
+    Si `mediciones` ya está particionada solo asegura la partición por defecto.
+    """
+    lock_timeout = os.getenv("MIGRACION_LOCK_TIMEOUT", "5s")
+
+    with conn.cursor() as cur:
+        cur.execute(f"SET search_path TO {get_search_path()};")
+        if _tipo_de(cur, "mediciones") == "p":
+            _crear_por_defecto(cur)
+            print("  mediciones ya está particionada.")
+            return
+
+        # 1) CHECK del corte
+        corte = _check_corte(cur)
+
+        # 2) Índice de la PK nueva
+        _indice_pk(cur)
+
+    # 3) Intercambio
+    _intercambiar(conn, corte, lock_timeout)
+    print(f"  mediciones particionada; las filas anteriores a {corte} quedaron en {HISTORICA}.")
@@ -0,0 +1,300 @@
+-- Migración 007: particiones mensuales, retención y resumen por hora.
+--
+-- `mediciones` está particionada por rango de `fecha` (migración 006):
+-- una partición por mes UTC (mediciones_AAAA_MM), la histórica de la 006
+-- si la base venía de antes y una por defecto que recibe lo que no cae en
+-- ninguna (importaciones de datos viejos, meses todavía sin crear).
+--
+-- mantener_particiones_mediciones(meses) crea el mes actual y los
+-- siguientes, y a los meses que tengan filas en la partición por defecto
+-- les crea su partición moviéndoles esas filas. La llama periódicamente
+-- services/retencion_service.py (y esta migración, al final).
+--
+-- aplicar_retencion_mediciones(limite, resumen) borra con DROP TABLE las
+-- particiones que terminan antes de `limite` (sin DELETE ni VACUUM) y con
+-- DELETE solo lo viejo de la partición por defecto. mediciones_diarias no
+-- se toca: ya se sumó al insertar y los borrados no se descuentan (003).
+-- Con resumen = 'hora' antes de borrar compacta las filas en
+-- mediciones_horarias. Registra hasta dónde borró en retencion_mediciones.
+SET search_path TO lab_mediciones_db, public;
+
+INSERT INTO retencion_mediciones (id, borrado_hasta)
+VALUES (1, NULL)
+ON CONFLICT (id) DO NOTHING;
+
+-- Particiones de `mediciones` con sus límites (NULL = MINVALUE / MAXVALUE).
+-- Los límites se leen del texto de pg_get_expr, que los escribe con zona.
+CREATE OR REPLACE VIEW particiones_mediciones AS
+SELECT
+    c.relname::text AS nombre,
+    pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT' AS es_default,
+    substring(pg_get_expr(c.relpartbound, c.oid) FROM 'FROM \(''([^'']+)''\)')::timestamptz AS desde,
+    substring(pg_get_expr(c.relpartbound, c.oid) FROM 'TO \(''([^'']+)''\)')::timestamptz AS hasta
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'mediciones'::regclass;
+
+
+-- Crea la partición del mes de `mes` (UTC). Si el mes ya está cubierto
+-- por otra partición no hace nada y devuelve NULL. Las filas de ese mes
+-- que estén en la partición por defecto se mueven a la nueva (sin pasar
+-- por los triggers: ya están contadas en el resumen).
+CREATE OR REPLACE FUNCTION crear_particion_mediciones(mes DATE)
+RETURNS TEXT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    inicio  TIMESTAMPTZ := date_trunc('month', mes::timestamp) AT TIME ZONE 'UTC';
+    fin     TIMESTAMPTZ := (date_trunc('month', mes::timestamp) + interval '1 month') AT TIME ZONE 'UTC';
+    tabla   TEXT := 'mediciones_' || to_char(mes, 'YYYY_MM');
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM particiones_mediciones p
+        WHERE NOT p.es_default
+          AND (p.desde IS NULL OR p.desde < fin)
+          AND (p.hasta IS NULL OR p.hasta > inicio)
+    ) THEN
+        RETURN NULL;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE mediciones INCLUDING DEFAULTS)', tabla);
+    -- Con el CHECK el ATTACH no recorre la tabla
+    EXECUTE format(
+        'ALTER TABLE %I ADD CONSTRAINT %I CHECK (fecha >= %L AND fecha < %L)',
+        tabla, tabla || '_rango', inicio, fin
+    );
+    EXECUTE format(
+        'WITH movidas AS (
+             DELETE FROM mediciones_default
+             WHERE fecha >= $1 AND fecha < $2
+             RETURNING *
+         )
+         INSERT INTO %I SELECT * FROM movidas',
+        tabla
+    ) USING inicio, fin;
+    EXECUTE format(
+        'ALTER TABLE mediciones ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        tabla, inicio, fin
+    );
+    EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', tabla, tabla || '_rango');
+    RETURN tabla;
+END;
+$$;
+
+
+-- Asegura las particiones del mes actual y los `meses_adelante` siguientes,
+-- y las de los meses con filas en la partición por defecto.
+-- Devuelve los nombres de las particiones creadas.
+CREATE OR REPLACE FUNCTION mantener_particiones_mediciones(meses_adelante INTEGER)
+RETURNS TEXT[]
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    actual   DATE := date_trunc('month', now() AT TIME ZONE 'UTC')::date;
+    mes      DATE;
+    tabla    TEXT;
+    creadas  TEXT[] := '{}';
+BEGIN
+    -- Un solo mantenimiento a la vez (app y cron pueden coincidir)
+    PERFORM pg_advisory_xact_lock(hashtext('particiones_mediciones'));
+
+    FOR mes IN
+        SELECT generate_series(actual::timestamp, actual + make_interval(months => meses_adelante), interval '1 month')::date
+        UNION
+        SELECT DISTINCT date_trunc('month', fecha AT TIME ZONE 'UTC')::date
+        FROM mediciones_default
+        ORDER BY 1
+    LOOP
+        tabla := crear_particion_mediciones(mes);
+        IF tabla IS NOT NULL THEN
+            creadas := creadas || tabla;
+        END IF;
+    END LOOP;
+
+    RETURN creadas;
+END;
+$$;
+
+
+-- Suma las filas de `tabla` con fecha < hasta (NULL = todas) al resumen
+-- por hora. Devuelve las filas de resumen afectadas.
+CREATE OR REPLACE FUNCTION compactar_mediciones_horarias(tabla TEXT, hasta TIMESTAMPTZ)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    filas INTEGER;
+BEGIN
+    EXECUTE format(
+        $sql$
+        INSERT INTO mediciones_horarias AS h (
+            id_ciudad, hora, id_rango, cantidad,
+            temperatura_suma, temperatura_min, temperatura_max,
+            humedad_suma, humedad_min, humedad_max,
+            sensacion_termica_suma, sensacion_termica_min, sensacion_termica_max,
+            presion_suma, presion_min, presion_max,
+            velocidad_viento_suma, velocidad_viento_min, velocidad_viento_max
+        )
+        SELECT
+            m.id_ciudad, date_trunc('hour', m.fecha), m.id_rango, COUNT(*),
+            SUM(m.temperatura::double precision), MIN(m.temperatura), MAX(m.temperatura),
+            SUM(m.humedad), MIN(m.humedad), MAX(m.humedad),
+            SUM(m.sensacion_termica::double precision), MIN(m.sensacion_termica), MAX(m.sensacion_termica),
+            SUM(m.presion::double precision), MIN(m.presion), MAX(m.presion),
+            SUM(m.velocidad_viento::double precision), MIN(m.velocidad_viento), MAX(m.velocidad_viento)
+        FROM %I m
+        WHERE $1 IS NULL OR m.fecha < $1
+        GROUP BY m.id_ciudad, date_trunc('hour', m.fecha), m.id_rango
+        ORDER BY m.id_ciudad, date_trunc('hour', m.fecha), m.id_rango
+        ON CONFLICT ON CONSTRAINT pk_mediciones_horarias DO UPDATE SET
+            cantidad               = h.cantidad + EXCLUDED.cantidad,
+            temperatura_suma       = h.temperatura_suma + EXCLUDED.temperatura_suma,
+            temperatura_min        = LEAST(h.temperatura_min, EXCLUDED.temperatura_min),
+            temperatura_max        = GREATEST(h.temperatura_max, EXCLUDED.temperatura_max),
+            humedad_suma           = h.humedad_suma + EXCLUDED.humedad_suma,
+            humedad_min            = LEAST(h.humedad_min, EXCLUDED.humedad_min),
+            humedad_max            = GREATEST(h.humedad_max, EXCLUDED.humedad_max),
+            sensacion_termica_suma = h.sensacion_termica_suma + EXCLUDED.sensacion_termica_suma,
+            sensacion_termica_min  = LEAST(h.sensacion_termica_min, EXCLUDED.sensacion_termica_min),
+            sensacion_termica_max  = GREATEST(h.sensacion_termica_max, EXCLUDED.sensacion_termica_max),
+            presion_suma           = h.presion_suma + EXCLUDED.presion_suma,
+            presion_min            = LEAST(h.presion_min, EXCLUDED.presion_min),
+            presion_max            = GREATEST(h.presion_max, EXCLUDED.presion_max),
+            velocidad_viento_suma  = h.velocidad_viento_suma + EXCLUDED.velocidad_viento_suma,
+            velocidad_viento_min   = LEAST(h.velocidad_viento_min, EXCLUDED.velocidad_viento_min),
+            velocidad_viento_max   = GREATEST(h.velocidad_viento_max, EXCLUDED.velocidad_viento_max)
+        $sql$,
+        tabla
+    ) USING hasta;
+
+    GET DIAGNOSTICS filas = ROW_COUNT;
+    RETURN filas;
+END;
+$$;
+
+
+-- Retención: una fila por partición borrada (o 'mediciones_default' si se
+-- borraron filas de ahí) con las mediciones borradas y las filas de
+-- resumen por hora generadas. `resumen`: 'dia' (solo queda el resumen
+-- diario) u 'hora' (además, compacta en mediciones_horarias).
+CREATE OR REPLACE FUNCTION aplicar_retencion_mediciones(limite TIMESTAMPTZ, resumen TEXT)
+RETURNS TABLE (particion TEXT, filas BIGINT, filas_horarias INTEGER)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    p          RECORD;
+    horizonte  TIMESTAMPTZ;
+    nueva      BIGINT;
+BEGIN
+    IF resumen NOT IN ('dia', 'hora') THEN
+        RAISE EXCEPTION 'Resumen de retención desconocido: % (opciones: dia, hora)', resumen;
+    END IF;
+
+    PERFORM pg_advisory_xact_lock(hashtext('particiones_mediciones'));
+
+    FOR p IN
+        SELECT pm.nombre, pm.hasta
+        FROM particiones_mediciones pm
+        WHERE NOT pm.es_default
+          AND pm.hasta <= limite
+        ORDER BY pm.hasta
+    LOOP
+        particion := p.nombre;
+        EXECUTE format('SELECT COUNT(*) FROM %I', p.nombre) INTO filas;
+        filas_horarias := 0;
+        IF resumen = 'hora' THEN
+            filas_horarias := compactar_mediciones_horarias(p.nombre, NULL);
+        END IF;
+        EXECUTE format('DROP TABLE %I', p.nombre);
+        horizonte := GREATEST(horizonte, p.hasta);
+        RETURN NEXT;
+    END LOOP;
+
+    -- La partición por defecto no se puede borrar: DELETE de lo viejo (suele estar casi vacía)
+    particion := 'mediciones_default';
+    filas_horarias := 0;
+    IF resumen = 'hora' THEN
+        filas_horarias := compactar_mediciones_horarias('mediciones_default', limite);
+    END IF;
+    DELETE FROM mediciones_default WHERE fecha < limite;
+    GET DIAGNOSTICS filas = ROW_COUNT;
+    IF filas > 0 THEN
+        horizonte := GREATEST(horizonte, limite);
+        RETURN NEXT;
+    END IF;
+
+    IF horizonte IS NOT NULL THEN
+        UPDATE retencion_mediciones
+        SET borrado_hasta = GREATEST(borrado_hasta, horizonte)
+        WHERE id = 1;
+
+        -- DROP TABLE no dispara los triggers de la 005: se avisa acá
+        UPDATE version_datos
+        SET version = version + 1
+        WHERE id = 1
+        RETURNING version INTO nueva;
+        PERFORM pg_notify('version_datos', nueva::text);
+    END IF;
+END;
+$$;
+
+
+-- Reemplaza la de la migración 003: no rehace los días anteriores a lo
+-- que borró la retención (sus mediciones crudas ya no están completas y
+-- el DELETE del resumen perdería la historia).
+CREATE OR REPLACE FUNCTION recalcular_mediciones_diarias(desde DATE, hasta DATE)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    filas    INTEGER;
+    borrado  TIMESTAMPTZ;
+BEGIN
+    SELECT borrado_hasta INTO borrado FROM retencion_mediciones WHERE id = 1;
+    IF borrado IS NOT NULL THEN
+        -- Primer día entero con mediciones crudas
+        desde := GREATEST(
+            desde,
+            CASE WHEN borrado::date::timestamptz = borrado THEN borrado::date ELSE borrado::date + 1 END
+        );
+    END IF;
+    IF desde > hasta THEN
+        RETURN 0;
+    END IF;
+
+    -- Bloquea a los triggers concurrentes hasta el COMMIT: sus filas
+    -- se suman después, sobre el resumen ya recalculado
+    LOCK TABLE mediciones_diarias IN SHARE ROW EXCLUSIVE MODE;
+
+    DELETE FROM mediciones_diarias
+    WHERE fecha BETWEEN desde AND hasta;
+
+    INSERT INTO mediciones_diarias (
+        id_ciudad, fecha, id_rango, cantidad,
+        temperatura_suma, temperatura_min, temperatura_max,
+        humedad_suma, humedad_min, humedad_max,
+        sensacion_termica_suma, sensacion_termica_min, sensacion_termica_max,
+        presion_suma, presion_min, presion_max,
+        velocidad_viento_suma, velocidad_viento_min, velocidad_viento_max
+    )
+    SELECT
+        m.id_ciudad, m.fecha::date, m.id_rango, COUNT(*),
+        SUM(m.temperatura), MIN(m.temperatura), MAX(m.temperatura),
+        SUM(m.humedad::double precision), MIN(m.humedad::double precision), MAX(m.humedad::double precision),
+        SUM(m.sensacion_termica::double precision), MIN(m.sensacion_termica::double precision), MAX(m.sensacion_termica::double precision),
+        SUM(m.presion::double precision), MIN(m.presion::double precision), MAX(m.presion::double precision),
+        SUM(m.velocidad_viento::double precision), MIN(m.velocidad_viento::double precision), MAX(m.velocidad_viento::double precision)
+    FROM mediciones m
+    WHERE m.fecha >= desde
+      AND m.fecha < hasta + 1
+    GROUP BY m.id_ciudad, m.fecha::date, m.id_rango;
+
+    GET DIAGNOSTICS filas = ROW_COUNT;
+    RETURN filas;
+END;
+$$;
+
+
+-- Particiones del mes actual y los 3 siguientes (el resto lo hace el mantenimiento periódico)
+SELECT mantener_particiones_mediciones(3);
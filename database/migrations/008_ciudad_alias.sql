@@ -0,0 +1,17 @@
+-- Migración 008: caché de geocoding por nombre consultado (ciudad_alias).
+--
+-- La caché persistente de la migración 002 busca por el nombre_normalizado
+-- de la ciudad, que sale del nombre canónico que devuelve la API. Lo que
+-- escribe el usuario ("CABA", "Cordoba, AR") puede no coincidir, y entonces
+-- cada proceso nuevo volvía a llamar a la API. Cada geocoding exitoso se
+-- guarda acá con la consulta normalizada como clave.
+SET search_path TO lab_mediciones_db, public;
+
+CREATE TABLE IF NOT EXISTS ciudad_alias (
+    alias        TEXT PRIMARY KEY,
+    nombre       VARCHAR(100) NOT NULL,
+    pais_nombre  VARCHAR(100),
+    codigo_pais  VARCHAR(100),
+    latitud      DOUBLE PRECISION NOT NULL,
+    longitud     DOUBLE PRECISION NOT NULL
+);
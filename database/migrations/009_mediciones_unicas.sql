@@ -0,0 +1,28 @@
+-- Migración 009: una sola medición por (ciudad, fecha).
+--
+-- La importación masiva y la carga del historial saltean las (ciudad,
+-- fecha) que ya estaban con un NOT EXISTS, pero dos cargas que se pisan
+-- (dos POST /api/mediciones/historico, el CLI junto al endpoint) pasan
+-- las dos ese control y duplicaban las horas. Con el índice único la
+-- segunda espera a la primera y sus filas repetidas se saltean con
+-- ON CONFLICT DO NOTHING (se siguen contando como duplicadas).
+--
+-- En una tabla particionada el índice único tiene que incluir la clave de
+-- partición, y `fecha` lo es. Las mediciones en vivo no chocan: llevan
+-- now() (o la hora de la medición) y un lote tiene una sola por ciudad.
+--
+-- Antes se borran las repetidas que pudieran haber entrado (queda la de
+-- menor id). mediciones_diarias ya las había sumado: si hubo, rehacer el
+-- resumen de esos días con recalcular_estadisticas.py.
+SET search_path TO lab_mediciones_db, public;
+
+DELETE FROM mediciones m
+USING mediciones d
+WHERE d.id_ciudad = m.id_ciudad
+  AND d.fecha = m.fecha
+  AND d.id_mediciones < m.id_mediciones;
+
+-- En una base creada con el schema.sql actual ya existe (la restricción
+-- uq_mediciones_ciudad_fecha crea un índice con ese nombre)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_mediciones_ciudad_fecha
+    ON mediciones (id_ciudad, fecha);
@@ -5,7 +5,27 @@ CREATE TABLE IF NOT EXISTS ciudad (
     id_ciudad   SERIAL PRIMARY KEY,
     nombre      VARCHAR(100) NOT NULL,
     provincia   VARCHAR(100) NOT NULL,
-    pais        VARCHAR(100) NOT NULL
+    pais        VARCHAR(100) NOT NULL,
+
+    -- Datos de geocoding (caché persistente de Open-Meteo)
+    nombre_normalizado  VARCHAR(100),
+    pais_nombre         VARCHAR(100),
+    latitud             DOUBLE PRECISION,
+    longitud            DOUBLE PRECISION,
+
+    CONSTRAINT uq_ciudad_nombre_pais UNIQUE (nombre, pais)
+);
+
+-- Resultado del geocoding por nombre consultado (normalizado), tal como lo
+-- escribió el usuario: "caba" o "cordoba, ar" no coinciden con el
+-- nombre_normalizado de la ciudad que devuelve la API (ver migración 008).
+CREATE TABLE IF NOT EXISTS ciudad_alias (
+    alias        TEXT PRIMARY KEY,
+    nombre       VARCHAR(100) NOT NULL,
+    pais_nombre  VARCHAR(100),
+    codigo_pais  VARCHAR(100),
+    latitud      DOUBLE PRECISION NOT NULL,
+    longitud     DOUBLE PRECISION NOT NULL
 );
 
 CREATE TABLE IF NOT EXISTS rango (
@@ -17,21 +37,131 @@ CREATE TABLE IF NOT EXISTS rango (
     CONSTRAINT uq_rango_nombre UNIQUE (nombre_rango)
 );
 
+-- Particionada por mes de `fecha` (ver migraciones 006 y 007): la
+-- retención borra particiones enteras en lugar de hacer DELETE.
 CREATE TABLE IF NOT EXISTS mediciones (
-    id_mediciones     SERIAL PRIMARY KEY,
+    id_mediciones     SERIAL,
     id_ciudad         INTEGER NOT NULL,
     id_rango          INTEGER NOT NULL,
-    fecha             DATE NOT NULL DEFAULT CURRENT_DATE,
-    temperatura       INTEGER NOT NULL, 
-    humedad           VARCHAR(10) NOT NULL,
-    sensacion_termica VARCHAR(10) NOT NULL,
-    presion           VARCHAR(10) NOT NULL,
-    velocidad_viento  VARCHAR(10) NOT NULL,
+    fecha             TIMESTAMPTZ NOT NULL DEFAULT now(),
+    temperatura       REAL NOT NULL,         -- °C
+    humedad           SMALLINT NOT NULL,     -- %
+    sensacion_termica REAL NOT NULL,         -- °C
+    presion           REAL NOT NULL,         -- hPa
+    velocidad_viento  REAL NOT NULL,         -- km/h
     descripcion       VARCHAR(100) NOT NULL,
 
+    -- La clave de partición tiene que estar en la PK
+    CONSTRAINT mediciones_pkey PRIMARY KEY (id_mediciones, fecha),
+
+    -- Una medición por ciudad y fecha (migración 009): las importaciones
+    -- que se pisan no duplican
+    CONSTRAINT uq_mediciones_ciudad_fecha UNIQUE (id_ciudad, fecha),
+
     CONSTRAINT fk_mediciones_ciudad
         FOREIGN KEY (id_ciudad) REFERENCES ciudad (id_ciudad),
 
     CONSTRAINT fk_mediciones_rango
         FOREIGN KEY (id_rango) REFERENCES rango (id_rango)
+) PARTITION BY RANGE (fecha);
+
+-- Listado paginado (keyset) de GET /api/mediciones
+CREATE INDEX IF NOT EXISTS idx_mediciones_fecha_id
+    ON mediciones (fecha DESC, id_mediciones DESC);
+
+-- Listado filtrado por ciudad / por rango (mismo orden que el keyset)
+CREATE INDEX IF NOT EXISTS idx_mediciones_ciudad_fecha
+    ON mediciones (id_ciudad, fecha DESC, id_mediciones DESC);
+
+CREATE INDEX IF NOT EXISTS idx_mediciones_rango_fecha
+    ON mediciones (id_rango, fecha DESC, id_mediciones DESC);
+
+-- Resumen diario por ciudad y rango (lo mantiene un trigger, ver migración 003)
+CREATE TABLE IF NOT EXISTS mediciones_diarias (
+    id_ciudad               INTEGER NOT NULL,
+    fecha                   DATE NOT NULL,
+    id_rango                INTEGER NOT NULL,
+    cantidad                INTEGER NOT NULL,
+
+    temperatura_suma        DOUBLE PRECISION NOT NULL,
+    temperatura_min         DOUBLE PRECISION NOT NULL,
+    temperatura_max         DOUBLE PRECISION NOT NULL,
+    humedad_suma            DOUBLE PRECISION NOT NULL,
+    humedad_min             DOUBLE PRECISION NOT NULL,
+    humedad_max             DOUBLE PRECISION NOT NULL,
+    sensacion_termica_suma  DOUBLE PRECISION NOT NULL,
+    sensacion_termica_min   DOUBLE PRECISION NOT NULL,
+    sensacion_termica_max   DOUBLE PRECISION NOT NULL,
+    presion_suma            DOUBLE PRECISION NOT NULL,
+    presion_min             DOUBLE PRECISION NOT NULL,
+    presion_max             DOUBLE PRECISION NOT NULL,
+    velocidad_viento_suma   DOUBLE PRECISION NOT NULL,
+    velocidad_viento_min    DOUBLE PRECISION NOT NULL,
+    velocidad_viento_max    DOUBLE PRECISION NOT NULL,
+
+    CONSTRAINT pk_mediciones_diarias PRIMARY KEY (id_ciudad, fecha, id_rango),
+
+    CONSTRAINT fk_mediciones_diarias_ciudad
+        FOREIGN KEY (id_ciudad) REFERENCES ciudad (id_ciudad),
+
+    CONSTRAINT fk_mediciones_diarias_rango
+        FOREIGN KEY (id_rango) REFERENCES rango (id_rango)
+);
+
+CREATE INDEX IF NOT EXISTS idx_mediciones_diarias_fecha
+    ON mediciones_diarias (fecha);
+
+-- Resumen por hora de las mediciones que borró la retención con
+-- RETENCION_RESUMEN=hora (ver migración 007). Mismas columnas que el diario.
+CREATE TABLE IF NOT EXISTS mediciones_horarias (
+    id_ciudad               INTEGER NOT NULL,
+    hora                    TIMESTAMPTZ NOT NULL,
+    id_rango                INTEGER NOT NULL,
+    cantidad                INTEGER NOT NULL,
+
+    temperatura_suma        DOUBLE PRECISION NOT NULL,
+    temperatura_min         DOUBLE PRECISION NOT NULL,
+    temperatura_max         DOUBLE PRECISION NOT NULL,
+    humedad_suma            DOUBLE PRECISION NOT NULL,
+    humedad_min             DOUBLE PRECISION NOT NULL,
+    humedad_max             DOUBLE PRECISION NOT NULL,
+    sensacion_termica_suma  DOUBLE PRECISION NOT NULL,
+    sensacion_termica_min   DOUBLE PRECISION NOT NULL,
+    sensacion_termica_max   DOUBLE PRECISION NOT NULL,
+    presion_suma            DOUBLE PRECISION NOT NULL,
+    presion_min             DOUBLE PRECISION NOT NULL,
+    presion_max             DOUBLE PRECISION NOT NULL,
+    velocidad_viento_suma   DOUBLE PRECISION NOT NULL,
+    velocidad_viento_min    DOUBLE PRECISION NOT NULL,
+    velocidad_viento_max    DOUBLE PRECISION NOT NULL,
+
+    CONSTRAINT pk_mediciones_horarias PRIMARY KEY (id_ciudad, hora, id_rango),
+
+    CONSTRAINT fk_mediciones_horarias_ciudad
+        FOREIGN KEY (id_ciudad) REFERENCES ciudad (id_ciudad),
+
+    CONSTRAINT fk_mediciones_horarias_rango
+        FOREIGN KEY (id_rango) REFERENCES rango (id_rango)
+);
+
+CREATE INDEX IF NOT EXISTS idx_mediciones_horarias_hora
+    ON mediciones_horarias (hora);
+
+-- Hasta dónde borró la retención (una sola fila; NULL = nunca borró).
+-- Antes de ese instante las mediciones crudas están incompletas y el
+-- resumen diario ya no se puede rehacer desde ellas.
+CREATE TABLE IF NOT EXISTS retencion_mediciones (
+    id             SMALLINT PRIMARY KEY DEFAULT 1,
+    borrado_hasta  TIMESTAMPTZ,
+
+    CONSTRAINT ck_retencion_mediciones_una_fila CHECK (id = 1)
+);
+
+-- Versión de los datos que muestran los listados (una sola fila).
+-- La incrementa un trigger en cada cambio de mediciones / rango (ver migración 005).
+CREATE TABLE IF NOT EXISTS version_datos (
+    id       SMALLINT PRIMARY KEY DEFAULT 1,
+    version  BIGINT NOT NULL DEFAULT 0,
+
+    CONSTRAINT ck_version_datos_una_fila CHECK (id = 1)
 );
@@ -0,0 +1,257 @@
+-- Esquema del backend SQLite (DB_BACKEND=sqlite).
+--
+-- Mismas tablas, columnas e índices que schema.sql + migraciones, con los
+-- tipos de SQLite. Lo aplica AlmacenamientoSQLite al abrir la base (todo es
+-- IF NOT EXISTS) y después catalogo.sql carga los rangos.
+--
+-- `mediciones` no está particionada (SQLite no tiene particiones): la
+-- retención borra las filas viejas por lotes con DELETE.
+--
+-- `fecha` se guarda como texto ISO 8601 en UTC con microsegundos
+-- ('2025-01-31T18:04:05.123456+00:00'): con un formato fijo el orden de
+-- texto es el orden cronológico y los índices sirven para el keyset.
+
+CREATE TABLE IF NOT EXISTS ciudad (
+    id_ciudad   INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre      TEXT NOT NULL,
+    provincia   TEXT NOT NULL,
+    pais        TEXT NOT NULL,
+
+    -- Datos de geocoding (caché persistente de Open-Meteo)
+    nombre_normalizado  TEXT,
+    pais_nombre         TEXT,
+    latitud             REAL,
+    longitud            REAL,
+
+    CONSTRAINT uq_ciudad_nombre_pais UNIQUE (nombre, pais)
+);
+
+CREATE INDEX IF NOT EXISTS idx_ciudad_nombre_normalizado
+    ON ciudad (nombre_normalizado);
+
+-- Resultado del geocoding por nombre consultado (normalizado)
+CREATE TABLE IF NOT EXISTS ciudad_alias (
+    alias        TEXT PRIMARY KEY,
+    nombre       TEXT NOT NULL,
+    pais_nombre  TEXT,
+    codigo_pais  TEXT,
+    latitud      REAL NOT NULL,
+    longitud     REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS rango (
+    id_rango      INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre_rango  TEXT NOT NULL,
+    temp_min      INTEGER,
+    temp_max      INTEGER,
+
+    CONSTRAINT uq_rango_nombre UNIQUE (nombre_rango)
+);
+
+CREATE TABLE IF NOT EXISTS mediciones (
+    id_mediciones     INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_ciudad         INTEGER NOT NULL,
+    id_rango          INTEGER NOT NULL,
+    fecha             TEXT NOT NULL
+                      DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now')),
+    temperatura       REAL NOT NULL,         -- °C
+    humedad           INTEGER NOT NULL,      -- %
+    sensacion_termica REAL NOT NULL,         -- °C
+    presion           REAL NOT NULL,         -- hPa
+    velocidad_viento  REAL NOT NULL,         -- km/h
+    descripcion       TEXT NOT NULL,
+
+    CONSTRAINT fk_mediciones_ciudad
+        FOREIGN KEY (id_ciudad) REFERENCES ciudad (id_ciudad),
+
+    CONSTRAINT fk_mediciones_rango
+        FOREIGN KEY (id_rango) REFERENCES rango (id_rango)
+);
+
+-- Listado paginado (keyset) de GET /api/mediciones
+CREATE INDEX IF NOT EXISTS idx_mediciones_fecha_id
+    ON mediciones (fecha DESC, id_mediciones DESC);
+
+-- Listado filtrado por ciudad / por rango (mismo orden que el keyset)
+CREATE INDEX IF NOT EXISTS idx_mediciones_ciudad_fecha
+    ON mediciones (id_ciudad, fecha DESC, id_mediciones DESC);
+
+CREATE INDEX IF NOT EXISTS idx_mediciones_rango_fecha
+    ON mediciones (id_rango, fecha DESC, id_mediciones DESC);
+
+-- Una medición por ciudad y fecha (migración 009 en PostgreSQL): las
+-- importaciones que se pisan no duplican. En un archivo de antes de este
+-- índice, inicializar() borra primero las repetidas.
+CREATE UNIQUE INDEX IF NOT EXISTS uq_mediciones_ciudad_fecha
+    ON mediciones (id_ciudad, fecha);
+
+-- Resumen diario por ciudad y rango (fecha = día UTC, 'YYYY-MM-DD')
+CREATE TABLE IF NOT EXISTS mediciones_diarias (
+    id_ciudad               INTEGER NOT NULL,
+    fecha                   TEXT NOT NULL,
+    id_rango                INTEGER NOT NULL,
+    cantidad                INTEGER NOT NULL,
+
+    temperatura_suma        REAL NOT NULL,
+    temperatura_min         REAL NOT NULL,
+    temperatura_max         REAL NOT NULL,
+    humedad_suma            REAL NOT NULL,
+    humedad_min             REAL NOT NULL,
+    humedad_max             REAL NOT NULL,
+    sensacion_termica_suma  REAL NOT NULL,
+    sensacion_termica_min   REAL NOT NULL,
+    sensacion_termica_max   REAL NOT NULL,
+    presion_suma            REAL NOT NULL,
+    presion_min             REAL NOT NULL,
+    presion_max             REAL NOT NULL,
+    velocidad_viento_suma   REAL NOT NULL,
+    velocidad_viento_min    REAL NOT NULL,
+    velocidad_viento_max    REAL NOT NULL,
+
+    CONSTRAINT pk_mediciones_diarias PRIMARY KEY (id_ciudad, fecha, id_rango),
+
+    CONSTRAINT fk_mediciones_diarias_ciudad
+        FOREIGN KEY (id_ciudad) REFERENCES ciudad (id_ciudad),
+
+    CONSTRAINT fk_mediciones_diarias_rango
+        FOREIGN KEY (id_rango) REFERENCES rango (id_rango)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_mediciones_diarias_fecha
+    ON mediciones_diarias (fecha);
+
+-- Resumen por hora de las mediciones que borró la retención con
+-- RETENCION_RESUMEN=hora (hora = 'YYYY-MM-DDTHH:00:00.000000+00:00', UTC)
+CREATE TABLE IF NOT EXISTS mediciones_horarias (
+    id_ciudad               INTEGER NOT NULL,
+    hora                    TEXT NOT NULL,
+    id_rango                INTEGER NOT NULL,
+    cantidad                INTEGER NOT NULL,
+
+    temperatura_suma        REAL NOT NULL,
+    temperatura_min         REAL NOT NULL,
+    temperatura_max         REAL NOT NULL,
+    humedad_suma            REAL NOT NULL,
+    humedad_min             REAL NOT NULL,
+    humedad_max             REAL NOT NULL,
+    sensacion_termica_suma  REAL NOT NULL,
+    sensacion_termica_min   REAL NOT NULL,
+    sensacion_termica_max   REAL NOT NULL,
+    presion_suma            REAL NOT NULL,
+    presion_min             REAL NOT NULL,
+    presion_max             REAL NOT NULL,
+    velocidad_viento_suma   REAL NOT NULL,
+    velocidad_viento_min    REAL NOT NULL,
+    velocidad_viento_max    REAL NOT NULL,
+
+    CONSTRAINT pk_mediciones_horarias PRIMARY KEY (id_ciudad, hora, id_rango),
+
+    CONSTRAINT fk_mediciones_horarias_ciudad
+        FOREIGN KEY (id_ciudad) REFERENCES ciudad (id_ciudad),
+
+    CONSTRAINT fk_mediciones_horarias_rango
+        FOREIGN KEY (id_rango) REFERENCES rango (id_rango)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_mediciones_horarias_hora
+    ON mediciones_horarias (hora);
+
+-- Hasta dónde borró la retención (NULL = nunca): antes de ese instante el
+-- resumen diario no se puede rehacer desde las mediciones crudas
+CREATE TABLE IF NOT EXISTS retencion_mediciones (
+    id             INTEGER PRIMARY KEY DEFAULT 1,
+    borrado_hasta  TEXT,
+
+    CONSTRAINT ck_retencion_mediciones_una_fila CHECK (id = 1)
+);
+
+INSERT INTO retencion_mediciones (id, borrado_hasta) VALUES (1, NULL)
+ON CONFLICT (id) DO NOTHING;
+
+-- Cada medición nueva se suma a su fila del resumen en la misma transacción
+-- (SQLite no tiene triggers por sentencia: es uno por fila)
+CREATE TRIGGER IF NOT EXISTS trg_mediciones_diarias
+AFTER INSERT ON mediciones
+BEGIN
+    INSERT INTO mediciones_diarias (
+        id_ciudad, fecha, id_rango, cantidad,
+        temperatura_suma, temperatura_min, temperatura_max,
+        humedad_suma, humedad_min, humedad_max,
+        sensacion_termica_suma, sensacion_termica_min, sensacion_termica_max,
+        presion_suma, presion_min, presion_max,
+        velocidad_viento_suma, velocidad_viento_min, velocidad_viento_max
+    )
+    VALUES (
+        NEW.id_ciudad, date(NEW.fecha), NEW.id_rango, 1,
+        NEW.temperatura, NEW.temperatura, NEW.temperatura,
+        NEW.humedad, NEW.humedad, NEW.humedad,
+        NEW.sensacion_termica, NEW.sensacion_termica, NEW.sensacion_termica,
+        NEW.presion, NEW.presion, NEW.presion,
+        NEW.velocidad_viento, NEW.velocidad_viento, NEW.velocidad_viento
+    )
+    ON CONFLICT (id_ciudad, fecha, id_rango) DO UPDATE SET
+        cantidad               = cantidad + 1,
+        temperatura_suma       = temperatura_suma + excluded.temperatura_suma,
+        temperatura_min        = min(temperatura_min, excluded.temperatura_min),
+        temperatura_max        = max(temperatura_max, excluded.temperatura_max),
+        humedad_suma           = humedad_suma + excluded.humedad_suma,
+        humedad_min            = min(humedad_min, excluded.humedad_min),
+        humedad_max            = max(humedad_max, excluded.humedad_max),
+        sensacion_termica_suma = sensacion_termica_suma + excluded.sensacion_termica_suma,
+        sensacion_termica_min  = min(sensacion_termica_min, excluded.sensacion_termica_min),
+        sensacion_termica_max  = max(sensacion_termica_max, excluded.sensacion_termica_max),
+        presion_suma           = presion_suma + excluded.presion_suma,
+        presion_min            = min(presion_min, excluded.presion_min),
+        presion_max            = max(presion_max, excluded.presion_max),
+        velocidad_viento_suma  = velocidad_viento_suma + excluded.velocidad_viento_suma,
+        velocidad_viento_min   = min(velocidad_viento_min, excluded.velocidad_viento_min),
+        velocidad_viento_max   = max(velocidad_viento_max, excluded.velocidad_viento_max);
+END;
+
+-- Versión de los datos que muestran los listados (una sola fila).
+-- Sin NOTIFY: cada proceso la lee en la misma transacción que la página.
+CREATE TABLE IF NOT EXISTS version_datos (
+    id       INTEGER PRIMARY KEY DEFAULT 1,
+    version  INTEGER NOT NULL DEFAULT 0,
+
+    CONSTRAINT ck_version_datos_una_fila CHECK (id = 1)
+);
+
+INSERT INTO version_datos (id, version) VALUES (1, 0)
+ON CONFLICT (id) DO NOTHING;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_datos_mediciones_insert
+AFTER INSERT ON mediciones
+BEGIN
+    UPDATE version_datos SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_datos_mediciones_update
+AFTER UPDATE ON mediciones
+BEGIN
+    UPDATE version_datos SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_datos_mediciones_delete
+AFTER DELETE ON mediciones
+BEGIN
+    UPDATE version_datos SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_datos_rango_insert
+AFTER INSERT ON rango
+BEGIN
+    UPDATE version_datos SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_datos_rango_update
+AFTER UPDATE ON rango
+BEGIN
+    UPDATE version_datos SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_datos_rango_delete
+AFTER DELETE ON rango
+BEGIN
+    UPDATE version_datos SET version = version + 1 WHERE id = 1;
+END;
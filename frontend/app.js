@@ -3,6 +3,7 @@
 // =======================================
 const API_BASE_URL = "http://localhost:5001";
 const API_MEDICIONES_URL = `${API_BASE_URL}/api/mediciones`;
+const API_SUGERENCIAS_URL = `${API_BASE_URL}/api/ciudades/sugerencias`;
 
 // =======================================
 // Referencias a elementos del DOM
@@ -32,62 +33,67 @@ const statusFill       = document.getElementById("statusFill");
 
 // Tabla de historial
 const tbodyResultados = document.getElementById("tbodyResultados");
+const btnCargarMas    = document.getElementById("btnCargarMas");
 
 // =======================================
-// Autocomplete de ciudades (lista simple)
+// Autocomplete de ciudades (sugerencias del backend)
 // =======================================
-const CIUDADES_ARG = [
-  "Buenos Aires",
-  "Córdoba",
-  "Rosario",
-  "Mendoza",
-  "La Plata",
-  "Mar del Plata",
-  "Bahía Blanca",
-  "Tucumán",
-  "Neuquén",
-  "Bariloche",
-  "Ushuaia",
-  "Salta",
-  "Santa Fe",
-  "Corrientes",
-  "Posadas"
-];
+const AUTOCOMPLETE_DEMORA_MS = 150;
+let autocompleteTimer = null;
+let autocompletePedido = null;
 
 function limpiarAutocomplete() {
   if (!autocompleteList) return;
   autocompleteList.innerHTML = "";
 }
 
-function mostrarAutocomplete(coincidencias) {
+function mostrarAutocomplete(sugerencias) {
   limpiarAutocomplete();
-  if (!autocompleteList || coincidencias.length === 0) return;
+  if (!autocompleteList || sugerencias.length === 0) return;
 
-  coincidencias.forEach(ciudad => {
+  sugerencias.forEach(ciudad => {
     const li = document.createElement("li");
-    li.textContent = ciudad;
+    const pais = ciudad.pais_nombre || ciudad.pais;
+    li.textContent = pais ? `${ciudad.nombre}, ${pais}` : ciudad.nombre;
     li.classList.add("autocomplete-item");
     li.addEventListener("click", () => {
-      ciudadInput.value = ciudad;
+      ciudadInput.value = ciudad.nombre;
       limpiarAutocomplete();
     });
     autocompleteList.appendChild(li);
   });
 }
 
+async function buscarSugerencias(texto) {
+  // Cancela el pedido anterior: solo importa la última tecla
+  if (autocompletePedido) autocompletePedido.abort();
+  autocompletePedido = new AbortController();
+
+  try {
+    const params = new URLSearchParams({ q: texto, limit: 10 });
+    const resp = await fetch(`${API_SUGERENCIAS_URL}?${params}`, {
+      signal: autocompletePedido.signal
+    });
+    if (!resp.ok) return;
+    mostrarAutocomplete(await resp.json());
+  } catch (err) {
+    if (err.name !== "AbortError") {
+      console.error("Error al obtener sugerencias:", err);
+    }
+  }
+}
+
 if (ciudadInput) {
   ciudadInput.addEventListener("input", () => {
-    const texto = ciudadInput.value.trim().toLowerCase();
+    const texto = ciudadInput.value.trim();
+    clearTimeout(autocompleteTimer);
     if (!texto) {
+      if (autocompletePedido) autocompletePedido.abort();
       limpiarAutocomplete();
       return;
     }
 
-    const coincidencias = CIUDADES_ARG.filter(c =>
-      c.toLowerCase().startsWith(texto)
-    );
-
-    mostrarAutocomplete(coincidencias);
+    autocompleteTimer = setTimeout(() => buscarSugerencias(texto), AUTOCOMPLETE_DEMORA_MS);
   });
 
   // Cerrar lista al salir del input (pequeño delay para permitir click)
@@ -203,16 +209,24 @@ function agregarFilaHistorial(temperatura, categoria, fechaHoraTexto, ciudadLabe
 // Funciones de integración con backend
 // =======================================
 
-// GET /api/mediciones  -> carga historial desde la base
-async function cargarHistorialDesdeAPI() {
+// GET /api/mediciones  -> carga historial desde la base (paginado por cursor)
+const HISTORIAL_LIMITE = 50;
+let historialCursor = null;
+
+async function cargarHistorialDesdeAPI(cursor = null) {
   try {
-    const resp = await fetch(API_MEDICIONES_URL);
+    const params = new URLSearchParams({ limit: HISTORIAL_LIMITE });
+    if (cursor) params.set("cursor", cursor);
+
+    const resp = await fetch(`${API_MEDICIONES_URL}?${params}`);
     if (!resp.ok) {
       console.warn("No se pudo obtener historial desde la API:", resp.status);
       return;
     }
 
-    const datos = await resp.json();
+    const pagina = await resp.json();
+    // Compatibilidad: versiones anteriores devolvían un array plano
+    const datos = Array.isArray(pagina) ? pagina : pagina.mediciones;
     if (!Array.isArray(datos)) return;
 
     datos.forEach(med => {
@@ -228,6 +242,9 @@ async function cargarHistorialDesdeAPI() {
       agregarFilaHistorial(temp, cat, fechaTxt, nombreCiudad, false);
     });
 
+    historialCursor = Array.isArray(pagina) ? null : pagina.next_cursor;
+    if (btnCargarMas) btnCargarMas.hidden = !historialCursor;
+
   } catch (error) {
     console.error("Error al cargar historial desde API:", error);
   }
@@ -380,6 +397,13 @@ if (btnBuscarCiudad) {
   });
 }
 
+// Historial: siguiente página
+if (btnCargarMas) {
+  btnCargarMas.addEventListener("click", () => {
+    if (historialCursor) cargarHistorialDesdeAPI(historialCursor);
+  });
+}
+
 // =======================================
 // Inicialización
 // =======================================
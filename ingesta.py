@@ -0,0 +1,64 @@
+# ingesta.py
+"""
+CLI de ingesta masiva: captura una medición por ciudad usando el motor
+asíncrono (services/ingesta_async.py).
+
+Uso:
+    python ingesta.py "Buenos Aires" Córdoba Rosario
+    python ingesta.py --archivo ciudades.txt --concurrencia 50 --lote 100
+"""
+import argparse
+import json
+import sys
+
+from services.ingesta_async import (
+    CONCURRENCIA_POR_DEFECTO,
+    TAMANIO_LOTE_POR_DEFECTO,
+    ingerir_ciudades_sync,
+)
+
+
+def leer_ciudades(args):
+    ciudades = list(args.ciudades)
+    if args.archivo:
+        with open(args.archivo, "r", encoding="utf-8") as f:
+            ciudades.extend(linea.strip() for linea in f if linea.strip())
+    return ciudades
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingesta masiva de mediciones por ciudad.")
+    parser.add_argument("ciudades", nargs="*", help="nombres de ciudades")
+    parser.add_argument("--archivo", help="archivo con una ciudad por línea")
+    parser.add_argument("--concurrencia", type=int, default=CONCURRENCIA_POR_DEFECTO)
+    parser.add_argument("--lote", type=int, default=TAMANIO_LOTE_POR_DEFECTO,
+                        help="mediciones por transacción")
+    parser.add_argument("--detalle", action="store_true",
+                        help="imprimir también el resultado de cada ciudad")
+    args = parser.parse_args()
+
+    ciudades = leer_ciudades(args)
+    if not ciudades:
+        parser.error("No se indicó ninguna ciudad.")
+
+    resumen = ingerir_ciudades_sync(
+        ciudades, concurrencia=args.concurrencia, tamanio_lote=args.lote
+    )
+
+    salida = {
+        "ciudades": len(ciudades),
+        "registradas": len(resumen["resultados"]),
+        "errores": resumen["errores"],
+        "segundos": resumen["segundos"],
+        "ciudades_por_segundo": resumen["ciudades_por_segundo"],
+        "lotes": resumen["lotes"],
+    }
+    if args.detalle:
+        salida["resultados"] = resumen["resultados"]
+
+    print(json.dumps(salida, ensure_ascii=False, indent=2))
+    return 1 if resumen["errores"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
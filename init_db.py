@@ -1,7 +1,9 @@
 # scripts/init_db.py
+import importlib.util
 import os
 import psycopg2
-from database.config_db import get_db_config, get_search_path
+from database.almacenamiento import crear_almacenamiento
+from database.config_db import get_backend, get_db_config, get_search_path
 
 
 
@@ -11,7 +13,38 @@ def run_sql_file(cursor, path):
         sql = f.read()
     cursor.execute(sql)
 
+def run_py_migration(conn, path):
+    """
+    Ejecuta una migración en Python (para las que necesitan varias
+    transacciones, p. ej. backfills por lotes): llama a migrar(conn).
+    """
+    nombre = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(f"migracion_{nombre}", path)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    modulo.migrar(conn)
+
+def init_sqlite():
+    """
+    Backend SQLite: crea el esquema (schema_sqlite.sql) y carga los rangos.
+    No hay migraciones: el esquema ya es el final.
+    """
+    almacenamiento = crear_almacenamiento("sqlite")
+    print(f"Inicializando SQLite en {almacenamiento.ruta} ...")
+    almacenamiento.inicializar()
+
+    print("\nRangos cargados:")
+    for rango in almacenamiento.obtener_rangos():
+        print(tuple(rango.values()))
+
+    almacenamiento.cerrar()
+    print("\n✔ Base de datos inicializada correctamente.")
+
 def main():
+    if get_backend() == "sqlite":
+        init_sqlite()
+        return
+
     db_config = get_db_config()
     search_path = get_search_path()
 
@@ -32,7 +65,19 @@ def main():
         print(f"Ejecutando {catalogo_path} ...")
         run_sql_file(cur, catalogo_path)
 
-        # 3) Prueba rápida: ver rangos
+        # 3) Aplicar migraciones (idempotentes, en orden de nombre; .sql o .py)
+        migraciones_dir = os.path.join(BASE_DIR, "database", "migrations")
+        for nombre in sorted(os.listdir(migraciones_dir)):
+            if not nombre.endswith((".sql", ".py")):
+                continue
+            migracion_path = os.path.join(migraciones_dir, nombre)
+            print(f"Aplicando migración {migracion_path} ...")
+            if nombre.endswith(".py"):
+                run_py_migration(conn, migracion_path)
+            else:
+                run_sql_file(cur, migracion_path)
+
+        # 4) Prueba rápida: ver rangos
         cur.execute(f"SET search_path TO {search_path};")
         cur.execute("SELECT id_rango, nombre_rango, temp_min, temp_max FROM rango;")
         rows = cur.fetchall()
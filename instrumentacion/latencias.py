@@ -0,0 +1,228 @@
+# instrumentacion/latencias.py
+"""
+Instrumentación liviana de latencias (histogramas por etapa).
+
+- Cada etapa (geocoding, clima, rango, funciones de repositorios, toma de
+  conexión...) se mide con `medir("etapa")` o con el decorador
+  `@medido("etapa")` y suma su duración a un histograma por etapa.
+- Durante un pedido HTTP (iniciar_pedido / terminar_pedido, desde app.py)
+  también se arma el desglose por etapa de ESE pedido; si tarda más de
+  METRICAS_PEDIDO_LENTO_MS se loguea con el desglose. Las etapas pueden
+  anidarse (bd.conexion queda dentro de bd.registrar_medicion_atomica).
+- Los tamaños de lote (registrar_tamanio) van a otro histograma, en
+  filas en vez de segundos.
+
+Está fuera de services/ y solo usa la biblioteca estándar: lo importan
+database/, repositories/ y services/ sin invertir las capas ni armar
+ciclos. La exportación (GET /metrics y /api/diagnostico) está en
+services/metricas.py.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Límites superiores (segundos) de los buckets, como los de los clientes de Prometheus
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Límites (filas) para los tamaños de lote
+BUCKETS_FILAS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Pedidos más lentos que esto se loguean con su desglose (0 = nunca)
+METRICAS_PEDIDO_LENTO_MS = float(os.getenv("METRICAS_PEDIDO_LENTO_MS", "0"))
+
+logger = logging.getLogger(__name__)
+
+
+class Histograma:
+    """Histograma de buckets fijos (no acumulados: se acumulan al exportar)."""
+
+    __slots__ = ("buckets", "_conteos", "_suma", "_lock")
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        # Un casillero más para lo que supera el último bucket (+Inf)
+        self._conteos = [0] * (len(buckets) + 1)
+        self._suma = 0.0
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float) -> None:
+        i = bisect_left(self.buckets, valor)
+        with self._lock:
+            self._conteos[i] += 1
+            self._suma += valor
+
+    def foto(self) -> Tuple[List[int], int, float]:
+        """(conteos acumulados por bucket, total, suma) en un mismo instante."""
+        with self._lock:
+            conteos = list(self._conteos)
+            suma = self._suma
+        acumulados = []
+        total = 0
+        for c in conteos:
+            total += c
+            acumulados.append(total)
+        return acumulados, total, suma
+
+
+_lock = threading.Lock()
+_etapas: Dict[str, Histograma] = {}
+_pedidos: Dict[Tuple[str, str], Histograma] = {}
+_respuestas: Dict[Tuple[str, str, int], int] = {}
+_tamanios: Dict[str, Histograma] = {}
+_pedidos_lentos = 0
+
+
+def _histograma(tabla: dict, clave, buckets=BUCKETS) -> Histograma:
+    hist = tabla.get(clave)
+    if hist is None:
+        with _lock:
+            hist = tabla.setdefault(clave, Histograma(buckets))
+    return hist
+
+
+# -----------------------------
+# Medición de etapas
+# -----------------------------
+
+class _Pedido:
+    __slots__ = ("inicio", "etapas")
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        # etapa -> [segundos, veces]
+        self.etapas: Dict[str, List[float]] = {}
+
+
+_pedido_actual: ContextVar[Optional[_Pedido]] = ContextVar("pedido_metricas", default=None)
+
+
+def registrar_etapa(etapa: str, segundos: float) -> None:
+    """Suma una duración ya medida al histograma de la etapa (y al pedido en curso)."""
+    _histograma(_etapas, etapa).observar(segundos)
+    pedido = _pedido_actual.get()
+    if pedido is not None:
+        acumulado = pedido.etapas.get(etapa)
+        if acumulado is None:
+            pedido.etapas[etapa] = [segundos, 1]
+        else:
+            acumulado[0] += segundos
+            acumulado[1] += 1
+
+
+class _Medicion:
+    __slots__ = ("etapa", "inicio")
+
+    def __init__(self, etapa: str):
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registrar_etapa(self.etapa, time.perf_counter() - self.inicio)
+        return False
+
+
+def medir(etapa: str) -> _Medicion:
+    """
+    Context manager que mide el bloque (también si lanza una excepción):
+
+        with medir("geocoding"):
+            ...
+    """
+    return _Medicion(etapa)
+
+
+def medido(etapa: str):
+    """Decorador: mide cada llamada a la función como la etapa `etapa`."""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                registrar_etapa(etapa, time.perf_counter() - inicio)
+        return envoltura
+    return decorador
+
+
+def registrar_tamanio(lote: str, filas: int) -> None:
+    """Suma el tamaño (en filas) de un lote escrito al histograma de `lote`."""
+    _histograma(_tamanios, lote, BUCKETS_FILAS).observar(filas)
+
+
+# -----------------------------
+# Pedidos HTTP
+# -----------------------------
+
+def iniciar_pedido() -> None:
+    """Empieza el desglose por etapas del pedido actual."""
+    _pedido_actual.set(_Pedido())
+
+
+def terminar_pedido(metodo: str, ruta: str, codigo: int) -> Optional[float]:
+    """
+    Cierra el pedido actual: suma su duración al histograma de la ruta,
+    cuenta el código de respuesta y, si fue lento, loguea el desglose.
+
+    :return: duración en segundos, o None si no había pedido iniciado.
+    """
+    global _pedidos_lentos
+
+    pedido = _pedido_actual.get()
+    if pedido is None:
+        return None
+    _pedido_actual.set(None)
+
+    segundos = time.perf_counter() - pedido.inicio
+    _histograma(_pedidos, (metodo, ruta)).observar(segundos)
+    clave = (metodo, ruta, codigo)
+    with _lock:
+        _respuestas[clave] = _respuestas.get(clave, 0) + 1
+
+    if METRICAS_PEDIDO_LENTO_MS > 0 and segundos * 1000 >= METRICAS_PEDIDO_LENTO_MS:
+        with _lock:
+            _pedidos_lentos += 1
+        logger.warning(
+            "Pedido lento: %s %s -> %s en %.1f ms. Etapas: %s",
+            metodo, ruta, codigo, segundos * 1000,
+            json.dumps(desglose(pedido), ensure_ascii=False),
+        )
+    return segundos
+
+
+def desglose(pedido: _Pedido) -> Dict[str, Dict[str, Any]]:
+    """Etapas del pedido, de la que más tardó a la que menos."""
+    return {
+        etapa: {"ms": round(segundos * 1000, 3), "veces": int(veces)}
+        for etapa, (segundos, veces) in sorted(
+            pedido.etapas.items(), key=lambda item: item[1][0], reverse=True
+        )
+    }
+
+
+def foto_registros() -> Dict[str, Any]:
+    """
+    Copia de los registros en un mismo instante, para exportarlos:
+    {"etapas", "pedidos", "respuestas", "tamanios", "pedidos_lentos"}.
+    """
+    with _lock:
+        return {
+            "etapas": dict(_etapas),
+            "pedidos": dict(_pedidos),
+            "respuestas": dict(_respuestas),
+            "tamanios": dict(_tamanios),
+            "pedidos_lentos": _pedidos_lentos,
+        }
@@ -0,0 +1,37 @@
+# mantener_mediciones.py
+"""
+CLI de mantenimiento de `mediciones`: crea las particiones mensuales que
+falten y aplica la retención (ver services/retencion_service.py).
+Pensado para cron si el mantenimiento no corre dentro de app.py.
+
+Uso:
+    python mantener_mediciones.py                         # según el .env
+    python mantener_mediciones.py --dias 365 --resumen hora
+    python mantener_mediciones.py --dias 0                # solo particiones
+"""
+import argparse
+import json
+import sys
+
+from database.almacenamiento.base import RESUMENES_RETENCION
+from services.retencion_service import mantener_mediciones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Particiones y retención de mediciones.")
+    parser.add_argument("--dias", type=int, help="días de mediciones crudas a conservar (0 = todas), por defecto RETENCION_DIAS")
+    parser.add_argument("--resumen", choices=RESUMENES_RETENCION, help="resumen que se conserva, por defecto RETENCION_RESUMEN")
+    parser.add_argument("--meses-adelante", type=int, help="meses futuros con partición, por defecto PARTICIONES_MESES_ADELANTE")
+    args = parser.parse_args()
+
+    try:
+        resultado = mantener_mediciones(args.dias, args.resumen, args.meses_adelante)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(json.dumps(resultado, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+# recalcular_estadisticas.py
+"""
+CLI de catch-up del resumen diario (mediciones_diarias).
+
+El resumen se mantiene solo con un trigger en cada INSERT; este script
+lo rehace desde las mediciones crudas para un rango de días, por si
+quedó desfasado (carga manual, restauración, etc.). Es idempotente.
+
+Uso:
+    python recalcular_estadisticas.py                      # ayer y hoy
+    python recalcular_estadisticas.py --desde 2025-01-01 --hasta 2025-01-31
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+from services.estadisticas_service import recalcular_estadisticas
+from services.filtros import FiltroInvalido, parsear_fecha
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula el resumen diario de mediciones.")
+    parser.add_argument("--desde", help="primer día (YYYY-MM-DD), por defecto ayer")
+    parser.add_argument("--hasta", help="último día (YYYY-MM-DD), por defecto hoy")
+    args = parser.parse_args()
+
+    try:
+        hasta = parsear_fecha(args.hasta, "hasta") or date.today()
+        desde = parsear_fecha(args.desde, "desde") or hasta - timedelta(days=1)
+        filas = recalcular_estadisticas(desde, hasta)
+    except FiltroInvalido as e:
+        parser.error(str(e))
+
+    print(f"Resumen recalculado del {desde} al {hasta}: {filas} filas.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,53 +1,51 @@
 # repositories/ciudad_repository.py
-from database.connection import get_connection
+from database.almacenamiento import obtener_almacenamiento
+from instrumentacion.latencias import medido
 
 
+@medido("bd.obtener_ciudad_por_nombre")
 def obtener_ciudad_por_nombre(nombre: str):
     """
     Devuelve un dict con la ciudad si existe, o None si no existe.
     """
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT id_ciudad, nombre, provincia, pais
-                FROM ciudad
-                WHERE nombre = %s;
-                """,
-                (nombre,)
-            )
-            row = cur.fetchone()
-
-        if row:
-            return {
-                "id_ciudad": row[0],
-                "nombre": row[1],
-                "provincia": row[2],
-                "pais": row[3],
-            }
-        return None
-    finally:
-        conn.close()
+    return obtener_almacenamiento().obtener_ciudad_por_nombre(nombre)
 
 
+@medido("bd.crear_ciudad")
 def crear_ciudad(nombre: str, provincia: str, pais: str):
     """
     Inserta una ciudad nueva y devuelve su id.
     """
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO ciudad (nombre, provincia, pais)
-                VALUES (%s, %s, %s)
-                RETURNING id_ciudad;
-                """,
-                (nombre, provincia, pais)
-            )
-            new_id = cur.fetchone()[0]
-        conn.commit()
-        return new_id
-    finally:
-        conn.close()
+    return obtener_almacenamiento().crear_ciudad(nombre, provincia, pais)
+
+
+@medido("bd.obtener_ciudad_geo")
+def obtener_ciudad_geo(nombre_normalizado: str):
+    """
+    Busca una ciudad ya geocodificada por su nombre normalizado.
+    Devuelve un dict con nombre, pais_nombre, codigo_pais, latitud y longitud,
+    o None si no existe o todavía no tiene coordenadas.
+    """
+    return obtener_almacenamiento().obtener_ciudad_geo(nombre_normalizado)
+
+
+@medido("bd.guardar_alias_geo")
+def guardar_alias_geo(alias: str, geo: dict):
+    """
+    Guarda el geocoding de un nombre consultado (ya normalizado) para que
+    obtener_ciudad_geo lo encuentre aunque no sea el nombre canónico.
+    `geo` tiene las mismas claves que devuelve obtener_ciudad_geo.
+    """
+    return obtener_almacenamiento().guardar_alias_geo(alias, geo)
+
+
+@medido("bd.obtener_ciudades_con_cantidad")
+def obtener_ciudades_con_cantidad():
+    """
+    Devuelve todas las ciudades con su cantidad de mediciones
+    (id_ciudad, nombre, pais, pais_nombre, mediciones).
+
+    La cantidad sale del resumen diario (mediciones_diarias), no de contar
+    la tabla de mediciones completa.
+    """
+    return obtener_almacenamiento().obtener_ciudades_con_cantidad()
@@ -0,0 +1,51 @@
+# repositories/estadisticas_repository.py
+"""
+Consultas sobre el resumen diario `mediciones_diarias`
+(una fila por ciudad, día y rango; ver migración 003).
+"""
+from database.almacenamiento import obtener_almacenamiento
+from database.almacenamiento.base import METRICAS
+from instrumentacion.latencias import medido
+
+
+@medido("bd.obtener_resumen_diario")
+def obtener_resumen_diario(id_ciudad=None, nombre_normalizado=None, desde=None, hasta=None):
+    """
+    Devuelve una fila por (ciudad, día) sumando todos los rangos:
+    cantidad y, por cada métrica, suma / mínimo / máximo.
+    Ordenado del día más reciente al más antiguo.
+    """
+    return obtener_almacenamiento().obtener_resumen_diario(
+        id_ciudad, nombre_normalizado, desde, hasta
+    )
+
+
+@medido("bd.obtener_resumen_por_rango")
+def obtener_resumen_por_rango(id_ciudad=None, nombre_normalizado=None, desde=None, hasta=None):
+    """
+    Devuelve, por rango, cuántos días-ciudad tuvieron al menos una
+    medición en ese rango y cuántas mediciones suman.
+    """
+    return obtener_almacenamiento().obtener_resumen_por_rango(
+        id_ciudad, nombre_normalizado, desde, hasta
+    )
+
+
+@medido("bd.leer_serie")
+def leer_serie(metrica, desde, hasta, ids_ciudad=None):
+    """
+    Una métrica de `mediciones` en arreglos de NumPy, de una sola lectura:
+    {"id_ciudad", "fecha" (segundos desde epoch, UTC), "valor"}, para
+    fecha en [desde, hasta) y las ciudades pedidas (None = todas). Sin orden.
+    """
+    return obtener_almacenamiento().leer_serie(metrica, desde, hasta, ids_ciudad)
+
+
+@medido("bd.recalcular_resumen")
+def recalcular_resumen(desde, hasta):
+    """
+    Rehace el resumen de los días [desde, hasta] a partir de `mediciones`
+    (función recalcular_mediciones_diarias de la migración 003).
+    Es idempotente. Devuelve la cantidad de filas de resumen generadas.
+    """
+    return obtener_almacenamiento().recalcular_resumen(desde, hasta)
@@ -1,139 +1,245 @@
 # repositories/mediciones_repository.py
-from database.connection import get_connection
+from datetime import datetime
 
-
-def obtener_rango_por_temperatura(temperatura: int):
-    """
-    Devuelve el id_rango correspondiente a la temperatura dada,
-    según los campos temp_min y temp_max de la tabla rango.
-    """
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT id_rango, nombre_rango
-                FROM rango
-                WHERE (temp_min IS NULL OR %s >= temp_min)
-                  AND (temp_max IS NULL OR %s < temp_max);
-                """,
-                (temperatura, temperatura)
-            )
-            row = cur.fetchone()
-
-        if not row:
-            return None
-
-        return {
-            "id_rango": row[0],
-            "nombre_rango": row[1],
-        }
-    finally:
-        conn.close()
+from database.almacenamiento import obtener_almacenamiento
+from database.almacenamiento.base import armar_consulta_pagina, fila_a_medicion
+from instrumentacion.latencias import medido
 
 
+@medido("bd.insertar_medicion")
 def insertar_medicion(
     id_ciudad: int,
     id_rango: int,
-    temperatura: int,
-    humedad: str,
-    sensacion_termica: str,
-    presion: str,
-    velocidad_viento: str,
+    temperatura: float,
+    humedad: int,
+    sensacion_termica: float,
+    presion: float,
+    velocidad_viento: float,
     descripcion: str,
 ):
     """
     Inserta una medición y devuelve el id_mediciones generado.
     """
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO mediciones (
-                    id_ciudad, id_rango, fecha, temperatura,
-                    humedad, sensacion_termica, presion,
-                    velocidad_viento, descripcion
-                )
-                VALUES (
-                    %s, %s, CURRENT_DATE, %s,
-                    %s, %s, %s,
-                    %s, %s
-                )
-                RETURNING id_mediciones;
-                """,
-                (
-                    id_ciudad,
-                    id_rango,
-                    temperatura,
-                    humedad,
-                    sensacion_termica,
-                    presion,
-                    velocidad_viento,
-                    descripcion,
-                )
-            )
-            new_id = cur.fetchone()[0]
-        conn.commit()
-        return new_id
-    finally:
-        conn.close()
+    return obtener_almacenamiento().insertar_medicion(
+        id_ciudad,
+        id_rango,
+        temperatura,
+        humedad,
+        sensacion_termica,
+        presion,
+        velocidad_viento,
+        descripcion,
+    )
+
+
+@medido("bd.registrar_medicion_atomica")
+def registrar_medicion_atomica(
+    nombre_ciudad: str,
+    provincia: str,
+    pais: str,
+    id_rango: int,
+    temperatura: float,
+    humedad: int,
+    sensacion_termica: float,
+    presion: float,
+    velocidad_viento: float,
+    descripcion: str,
+    nombre_normalizado: str = None,
+    pais_nombre: str = None,
+    latitud: float = None,
+    longitud: float = None,
+    fecha: datetime = None,
+):
+    """
+    En una sola transacción:
+    - hace upsert de la ciudad por (nombre, pais), completando sus datos
+      de geocoding si vienen y todavía no estaban,
+    - inserta la medición con el rango ya resuelto, con `fecha` (datetime
+      con zona) o, si no viene, el momento del INSERT.
+
+    Devuelve un dict con id_medicion, fecha (ISO 8601) y la ciudad
+    (existente o nueva).
+    """
+    return obtener_almacenamiento().registrar_medicion_atomica(
+        nombre_ciudad=nombre_ciudad,
+        provincia=provincia,
+        pais=pais,
+        id_rango=id_rango,
+        temperatura=temperatura,
+        humedad=humedad,
+        sensacion_termica=sensacion_termica,
+        presion=presion,
+        velocidad_viento=velocidad_viento,
+        descripcion=descripcion,
+        nombre_normalizado=nombre_normalizado,
+        pais_nombre=pais_nombre,
+        latitud=latitud,
+        longitud=longitud,
+        fecha=fecha,
+    )
+
+
+@medido("bd.registrar_mediciones_lote")
+def registrar_mediciones_lote(filas):
+    """
+    Inserta muchas mediciones en UNA transacción (upsert de las ciudades
+    + insert de las mediciones).
+
+    :param filas: lista de dicts con las mismas claves que los parámetros de
+        registrar_medicion_atomica (nombre_ciudad, provincia, pais, id_rango,
+        temperatura, humedad, ..., latitud, longitud y opcionalmente fecha).
+        Cada ciudad (nombre_ciudad, pais) debe aparecer una sola vez.
+    :return: lista de dicts {"id_medicion", "fecha", "ciudad"} en el mismo orden.
+    """
+    if not filas:
+        return []
+    return obtener_almacenamiento().registrar_mediciones_lote(filas)
 
 
+@medido("bd.obtener_todas_las_mediciones")
 def obtener_todas_las_mediciones():
     """
     Devuelve todas las mediciones con info de ciudad y rango.
     """
-    # from database.connection import get_connection  
-
-    sql = """
-        SELECT
-            m.id_mediciones,
-            m.fecha,
-            m.temperatura,
-            m.humedad,
-            m.sensacion_termica,
-            m.presion,
-            m.velocidad_viento,
-            m.descripcion,
-            c.id_ciudad,
-            c.nombre AS ciudad,
-            c.provincia,
-            c.pais,
-            r.id_rango,
-            r.nombre_rango
-        FROM mediciones m
-        JOIN ciudad c ON m.id_ciudad = c.id_ciudad
-        JOIN rango r ON m.id_rango = r.id_rango
-        ORDER BY m.fecha DESC, m.id_mediciones DESC;
-    """
-
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(sql)
-            rows = cur.fetchall()
-
-    resultados = []
-    for row in rows:
-        resultados.append({
-            "id_medicion": row[0],
-            "fecha": row[1].isoformat() if row[1] is not None else None,
-            "temperatura": row[2],
-            "humedad": row[3],
-            "sensacion_termica": row[4],
-            "presion": row[5],
-            "velocidad_viento": row[6],
-            "descripcion": row[7],
-            "ciudad": {
-                "id_ciudad": row[8],
-                "nombre": row[9],
-                "provincia": row[10],
-                "pais": row[11],
-            },
-            "rango": {
-                "id_rango": row[12],
-                "nombre_rango": row[13],
-            }
-        })
-
-    return resultados
+    return obtener_almacenamiento().obtener_todas_las_mediciones()
+
+
+@medido("bd.obtener_pagina_mediciones")
+def obtener_pagina_mediciones(limite: int, despues_de=None, filtros=None):
+    """
+    Paginación por keyset (seek) sobre (fecha DESC, id_mediciones DESC).
+
+    :param limite: cantidad máxima de mediciones a devolver.
+    :param despues_de: tupla (fecha, id_mediciones) de la última medición
+        de la página anterior, o None para la primera página.
+    :param filtros: ver armar_consulta_pagina.
+    :return: (mediciones, siguiente) donde `siguiente` es la tupla
+        (fecha, id_mediciones) para pedir la próxima página, o None
+        si no hay más.
+
+    Sin filtros usa idx_mediciones_fecha_id; filtrando por ciudad o rango,
+    idx_mediciones_ciudad_fecha / idx_mediciones_rango_fecha. En todos los
+    casos cada página es un range scan que arranca justo después de la
+    última fila vista, sin OFFSET.
+    """
+    return obtener_almacenamiento().obtener_pagina_mediciones(limite, despues_de, filtros)
+
+
+@medido("bd.obtener_pagina_con_version")
+def obtener_pagina_con_version(limite: int, despues_de=None, filtros=None):
+    """
+    Igual que obtener_pagina_mediciones, pero lee también la versión de los
+    datos (tabla version_datos) en la MISMA foto de la BD:
+    la página devuelta corresponde exactamente a esa versión.
+
+    :return: (mediciones, siguiente, version)
+    """
+    return obtener_almacenamiento().obtener_pagina_con_version(limite, despues_de, filtros)
+
+
+def iterar_mediciones(itersize: int = 2000):
+    """
+    Generador que recorre todas las mediciones (mismo orden y columnas que
+    obtener_todas_las_mediciones) con un cursor del lado del servidor
+    (en SQLite, de a `itersize` filas).
+
+    Devuelve las filas crudas (tuplas) de a una: en memoria solo hay
+    como máximo `itersize` filas por vez, sin importar el tamaño de la tabla.
+    La conexión queda tomada hasta que se agota o se cierra el generador.
+    """
+    return obtener_almacenamiento().iterar_mediciones(itersize)
+
+
+@medido("bd.obtener_ultimas_fechas_por_ciudad")
+def obtener_ultimas_fechas_por_ciudad(nombres_normalizados):
+    """
+    Devuelve {nombre_normalizado: fecha de la última medición} para las
+    ciudades pedidas que ya tienen mediciones.
+    """
+    if not nombres_normalizados:
+        return {}
+    return obtener_almacenamiento().obtener_ultimas_fechas_por_ciudad(nombres_normalizados)
+
+
+@medido("bd.obtener_ultimas_mediciones")
+def obtener_ultimas_mediciones(por_ciudad: int):
+    """
+    Las `por_ciudad` mediciones más recientes de cada ciudad, como filas
+    crudas de SELECT_MEDICIONES (ver fila_a_medicion), ordenadas por
+    ciudad y de la más vieja a la más nueva.
+    """
+    return obtener_almacenamiento().obtener_ultimas_mediciones(por_ciudad)
+
+
+@medido("bd.importar_mediciones_csv")
+def importar_mediciones_csv(archivo, columnas, normalizar, progreso=None):
+    """
+    Importación masiva desde un CSV ya validado (ver services/carga_masiva_service.py).
+    En PostgreSQL usa COPY FROM STDIN a una tabla temporal; después crea las
+    ciudades que faltan, clasifica los rangos con un join contra `rango` e
+    inserta las mediciones nuevas, todo en una transacción.
+
+    :param archivo: texto posicionado después del encabezado (se lee de a bloques).
+    :param columnas: columnas del encabezado, en orden.
+    :param normalizar: función para el nombre_normalizado de las ciudades nuevas.
+    :param progreso: función opcional que recibe {filas, bytes, segundos, filas_por_segundo}.
+    :return: dict con filas, insertadas, duplicadas, descartadas, ciudades_creadas,
+        bytes, segundos y filas_por_segundo.
+    """
+    return obtener_almacenamiento().importar_csv(archivo, columnas, normalizar, progreso)
+
+
+@medido("bd.exportar_mediciones_csv")
+def exportar_mediciones_csv(destino, progreso=None):
+    """
+    Escribe todas las mediciones en CSV en `destino` (cualquier objeto con
+    write(str)), de a bloques; en PostgreSQL con COPY TO STDOUT.
+
+    :return: dict con filas, bytes, segundos y filas_por_segundo.
+    """
+    return obtener_almacenamiento().exportar_csv(destino, progreso)
+
+
+@medido("bd.mantener_particiones")
+def mantener_particiones(meses_adelante: int):
+    """
+    Crea las particiones mensuales de `mediciones` que falten: el mes actual,
+    los `meses_adelante` siguientes y los meses con filas en la partición por
+    defecto (migración 007). En SQLite no hace nada.
+
+    :return: {"creadas": [...], "particiones": [...]}
+    """
+    return obtener_almacenamiento().mantener_particiones(meses_adelante)
+
+
+@medido("bd.aplicar_retencion")
+def aplicar_retencion(limite, resumen: str = "dia"):
+    """
+    Borra las mediciones crudas anteriores a `limite`: en PostgreSQL con
+    DROP TABLE de las particiones que terminan antes (y DELETE en la
+    partición por defecto), en SQLite con DELETE por lotes. El resumen
+    diario se conserva; con resumen="hora" antes se compactan en
+    mediciones_horarias.
+
+    :return: {"particiones_borradas", "filas_borradas", "filas_horarias"}
+    """
+    return obtener_almacenamiento().aplicar_retencion(limite, resumen)
+
+
+__all__ = [
+    "insertar_medicion",
+    "registrar_medicion_atomica",
+    "registrar_mediciones_lote",
+    "obtener_todas_las_mediciones",
+    "armar_consulta_pagina",
+    "obtener_pagina_mediciones",
+    "obtener_pagina_con_version",
+    "fila_a_medicion",
+    "iterar_mediciones",
+    "obtener_ultimas_fechas_por_ciudad",
+    "obtener_ultimas_mediciones",
+    "importar_mediciones_csv",
+    "exportar_mediciones_csv",
+    "mantener_particiones",
+    "aplicar_retencion",
+]
@@ -0,0 +1,13 @@
+# repositories/rango_repository.py
+from database.almacenamiento import obtener_almacenamiento
+from instrumentacion.latencias import medido
+
+
+@medido("bd.obtener_rangos")
+def obtener_rangos():
+    """
+    Devuelve el catálogo completo de rangos como lista de dicts
+    (id_rango, nombre_rango, temp_min, temp_max). Los límites NULL
+    se devuelven como None (extremo abierto).
+    """
+    return obtener_almacenamiento().obtener_rangos()
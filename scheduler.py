@@ -0,0 +1,42 @@
+# scheduler.py
+"""
+Corre el planificador de la watchlist como proceso independiente.
+
+Uso:
+    WATCHLIST="Buenos Aires,Córdoba,Rosario" python scheduler.py
+    WATCHLIST_ARCHIVO=ciudades.txt SCHEDULER_INTERVALO=600 python scheduler.py
+"""
+import json
+import logging
+import signal
+import sys
+
+from services.scheduler import PlanificadorWatchlist
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    planificador = PlanificadorWatchlist.desde_entorno()
+    if not planificador.ciudades:
+        print("La watchlist está vacía: configurar WATCHLIST o WATCHLIST_ARCHIVO.")
+        return 1
+
+    def detener(*_):
+        planificador.detener()
+
+    signal.signal(signal.SIGINT, detener)
+    signal.signal(signal.SIGTERM, detener)
+
+    print(
+        f"Midiendo {len(planificador.ciudades)} ciudades "
+        f"cada {planificador.intervalo:.0f} s (Ctrl+C para salir)..."
+    )
+    planificador.correr()
+
+    print(json.dumps(planificador.stats(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
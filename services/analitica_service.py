@@ -0,0 +1,339 @@
+# services/analitica_service.py
+"""
+Analítica sobre el historial de mediciones, vectorizada con NumPy.
+
+Para un conjunto de ciudades y un rango de fechas se lee una métrica de
+una sola vez en tres arreglos (id_ciudad, fecha, valor; ver
+database/almacenamiento/columnas.py) y todo el cálculo se hace sobre los
+arreglos ordenados por (ciudad, fecha), sin recorrer las filas en Python:
+
+- media móvil de las últimas `ventana` mediciones de cada ciudad,
+- anomalías: mediciones a más de `k` desvíos de la media de las
+  `ventana` mediciones anteriores (sin contar la propia),
+- mínimo / máximo / promedio por ciudad y día (UTC),
+- tendencia: pendiente de mínimos cuadrados, en unidades por día,
+- resumen por ciudad (cantidad, promedio, desvío, extremos).
+
+Las ventanas y los grupos se resuelven con sumas acumuladas y
+np.*.reduceat sobre los cortes de cada ciudad / día, así el costo es
+lineal en la cantidad de mediciones y no depende de `ventana`.
+"""
+
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from repositories.estadisticas_repository import METRICAS, leer_serie
+from services.estadisticas_service import rango_de_fechas
+from services.filtros import FiltroInvalido
+from instrumentacion.latencias import medir
+
+
+ANALITICA_DIAS_MAXIMO = int(os.getenv("ANALITICA_DIAS_MAXIMO", "92"))
+ANALITICA_VENTANA = int(os.getenv("ANALITICA_VENTANA", "24"))
+ANALITICA_K = float(os.getenv("ANALITICA_K", "3"))
+# Anomalías detalladas por ciudad (las más recientes); el total siempre se informa
+ANALITICA_ANOMALIAS_MAXIMO = int(os.getenv("ANALITICA_ANOMALIAS_MAXIMO", "50"))
+# Puntos como máximo en la respuesta con serie=1 (sumando todas las ciudades)
+ANALITICA_SERIE_MAXIMO = int(os.getenv("ANALITICA_SERIE_MAXIMO", "20000"))
+
+VENTANA_MAXIMA = 10_000
+SEGUNDOS_DIA = 86400.0
+
+
+# -----------------------------
+# Cálculo (solo NumPy, sin BD)
+# -----------------------------
+
+def _ordenar(serie: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    ciudad, fecha, valor = serie["id_ciudad"], serie["fecha"], serie["valor"]
+    if len(ciudad) > 1 and not (
+        np.all(ciudad[1:] >= ciudad[:-1])
+        and np.all((ciudad[1:] != ciudad[:-1]) | (fecha[1:] >= fecha[:-1]))
+    ):
+        orden = _orden_ciudad_fecha(ciudad, fecha)
+        ciudad, fecha, valor = ciudad[orden], fecha[orden], valor[orden]
+    return {"id_ciudad": ciudad, "fecha": fecha, "valor": valor}
+
+
+def _orden_ciudad_fecha(ciudad: np.ndarray, fecha: np.ndarray) -> np.ndarray:
+    """
+    Índices que ordenan por (ciudad, fecha). Si entra, se ordena una sola
+    clave int64 (ciudad en los bits altos, microsegundos desde la primera
+    fecha en los bajos): unas 5 veces más rápido que np.lexsort.
+    """
+    micros = np.rint((fecha - fecha.min()) * 1e6).astype(np.int64)
+    bits = int(micros.max()).bit_length()
+    if ciudad.min() < 0 or int(ciudad.max()).bit_length() + bits > 62:
+        return np.lexsort((fecha, ciudad))
+    return np.argsort((ciudad.astype(np.int64) << bits) | micros)
+
+
+def _cortes(*claves: np.ndarray) -> np.ndarray:
+    """Índices donde empieza cada grupo de claves consecutivas iguales."""
+    cambia = np.zeros(len(claves[0]), dtype=bool)
+    cambia[0] = True
+    for clave in claves:
+        cambia[1:] |= clave[1:] != clave[:-1]
+    return np.flatnonzero(cambia)
+
+
+def _suma_ventana(acumulada: np.ndarray, hasta: np.ndarray, cantidad: np.ndarray) -> np.ndarray:
+    """Suma de los `cantidad` elementos anteriores a cada posición `hasta` (acumulada[0] = 0)."""
+    return acumulada[hasta] - acumulada[hasta - cantidad]
+
+
+def analizar(serie: Dict[str, np.ndarray], ventana: int = ANALITICA_VENTANA, k: float = ANALITICA_K) -> Dict[str, Any]:
+    """
+    Calcula todo sobre una serie de columnas.py ({"id_ciudad", "fecha",
+    "valor"}, en cualquier orden). Devuelve arreglos de NumPy:
+
+    - "puntos": la serie ordenada por (ciudad, fecha) más "media_movil",
+      "media_previa", "desvio_previo", "z" y "anomalia" por medición,
+    - "ciudades": una posición por ciudad ("id_ciudad", "inicio", "cantidad",
+      "promedio", "desvio", "minimo", "maximo", "tendencia_por_dia",
+      "anomalias"),
+    - "dias": una posición por ciudad y día ("id_ciudad", "dia" en días
+      desde epoch, "minimo", "maximo", "promedio", "cantidad").
+    """
+    serie = _ordenar(serie)
+    ciudad, fecha, valor = serie["id_ciudad"], serie["fecha"], serie["valor"]
+    n = len(valor)
+    if n == 0:
+        vacio = np.empty(0)
+        return {
+            "puntos": {**serie, "media_movil": vacio, "media_previa": vacio,
+                       "desvio_previo": vacio, "z": vacio, "anomalia": np.empty(0, dtype=bool)},
+            "ciudades": {"id_ciudad": ciudad, "inicio": np.empty(0, dtype=np.int64),
+                         "cantidad": np.empty(0, dtype=np.int64), "promedio": vacio, "desvio": vacio,
+                         "minimo": vacio, "maximo": vacio, "tendencia_por_dia": vacio,
+                         "anomalias": np.empty(0, dtype=np.int64)},
+            "dias": {"id_ciudad": ciudad, "dia": np.empty(0, dtype=np.int64), "minimo": vacio,
+                     "maximo": vacio, "promedio": vacio, "cantidad": np.empty(0, dtype=np.int64)},
+        }
+
+    # Grupos por ciudad
+    inicios = _cortes(ciudad)
+    cantidades = np.diff(np.append(inicios, n))
+    inicio_de = np.repeat(inicios, cantidades)
+    posicion = np.arange(n) - inicio_de
+
+    sumas = np.add.reduceat(valor, inicios)
+    promedios = sumas / cantidades
+    # Centrado por ciudad: las sumas acumuladas de cuadrados no pierden precisión
+    desplazamiento = np.repeat(promedios, cantidades)
+    centrado = valor - desplazamiento
+    acumulada = np.concatenate(([0.0], np.cumsum(centrado)))
+    acumulada_cuadrados = np.concatenate(([0.0], np.cumsum(centrado * centrado)))
+    indices = np.arange(n)
+
+    # Media móvil: las últimas `ventana` mediciones, incluida la propia
+    cantidad_movil = np.minimum(posicion + 1, ventana)
+    media_movil = _suma_ventana(acumulada, indices + 1, cantidad_movil) / cantidad_movil
+
+    # Referencia para anomalías: las `ventana` anteriores, sin la propia
+    cantidad_previa = np.minimum(posicion, ventana)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media_previa = _suma_ventana(acumulada, indices, cantidad_previa) / cantidad_previa
+        varianza = _suma_ventana(acumulada_cuadrados, indices, cantidad_previa) / cantidad_previa - media_previa ** 2
+        desvio_previo = np.sqrt(np.maximum(varianza, 0.0))
+        z = (centrado - media_previa) / desvio_previo
+    suficientes = (cantidad_previa >= max(2, ventana // 2)) & (desvio_previo > 1e-9 * np.maximum(1.0, np.abs(valor)))
+    z = np.where(suficientes, z, np.nan)
+    anomalia = suficientes & (np.abs(np.nan_to_num(z)) > k)
+
+    media_movil += desplazamiento
+    media_previa = np.where(cantidad_previa > 0, media_previa + desplazamiento, np.nan)
+    desvio_previo = np.where(cantidad_previa > 0, desvio_previo, np.nan)
+
+    # Tendencia: pendiente de mínimos cuadrados de valor contra tiempo (días)
+    tiempo = (fecha - fecha[inicio_de]) / SEGUNDOS_DIA
+    tiempo_centrado = tiempo - np.repeat(np.add.reduceat(tiempo, inicios) / cantidades, cantidades)
+    covarianza = np.add.reduceat(tiempo_centrado * centrado, inicios)
+    dispersion = np.add.reduceat(tiempo_centrado * tiempo_centrado, inicios)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        tendencia = np.where(dispersion > 0, covarianza / dispersion, np.nan)
+
+    # Por ciudad y día (UTC)
+    dia = np.floor(fecha / SEGUNDOS_DIA).astype(np.int64)
+    inicios_dia = _cortes(ciudad, dia)
+    cantidades_dia = np.diff(np.append(inicios_dia, n))
+
+    return {
+        "puntos": {
+            **serie,
+            "media_movil": media_movil,
+            "media_previa": media_previa,
+            "desvio_previo": desvio_previo,
+            "z": z,
+            "anomalia": anomalia,
+        },
+        "ciudades": {
+            "id_ciudad": ciudad[inicios],
+            "inicio": inicios,
+            "cantidad": cantidades,
+            "promedio": promedios,
+            "desvio": np.sqrt(np.add.reduceat(centrado * centrado, inicios) / cantidades),
+            "minimo": np.minimum.reduceat(valor, inicios),
+            "maximo": np.maximum.reduceat(valor, inicios),
+            "tendencia_por_dia": tendencia,
+            "anomalias": np.add.reduceat(anomalia.astype(np.int64), inicios),
+        },
+        "dias": {
+            "id_ciudad": ciudad[inicios_dia],
+            "dia": dia[inicios_dia],
+            "minimo": np.minimum.reduceat(valor, inicios_dia),
+            "maximo": np.maximum.reduceat(valor, inicios_dia),
+            "promedio": np.add.reduceat(valor, inicios_dia) / cantidades_dia,
+            "cantidad": cantidades_dia,
+        },
+    }
+
+
+# -----------------------------
+# Armado de la respuesta
+# -----------------------------
+
+def _redondeados(valores: np.ndarray) -> List[Optional[float]]:
+    """Arreglo -> lista JSON con 2 decimales (NaN -> None)."""
+    redondeados = np.round(valores, 2)
+    lista = redondeados.tolist()
+    if np.isnan(redondeados).any():
+        return [None if v != v else v for v in lista]
+    return lista
+
+
+def _fechas_iso(segundos: np.ndarray) -> List[str]:
+    return np.datetime_as_string(
+        (segundos * 1e6).astype("datetime64[us]"), unit="s", timezone="UTC"
+    ).tolist()
+
+
+def _dias_iso(dias: np.ndarray) -> List[str]:
+    return np.datetime_as_string(dias.astype("datetime64[D]")).tolist()
+
+
+def _columnas(tabla: Dict[str, np.ndarray], desde: int, hasta: int, formatos: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Filas [desde, hasta) de un dict de arreglos -> lista de dicts, columna por columna."""
+    nombres = list(formatos)
+    valores = [formatos[c](tabla[c][desde:hasta]) for c in nombres]
+    return [dict(zip(nombres, fila)) for fila in zip(*valores)]
+
+
+def _validar(metrica: str, ventana: int, k: float) -> None:
+    if metrica not in METRICAS:
+        raise FiltroInvalido(f"'metrica' debe ser una de {', '.join(METRICAS)} (recibido: {metrica!r}).")
+    if not 2 <= ventana <= VENTANA_MAXIMA:
+        raise FiltroInvalido(f"'ventana' debe estar entre 2 y {VENTANA_MAXIMA} (recibido: {ventana}).")
+    if not 0 < k <= 100:
+        raise FiltroInvalido(f"'k' debe ser mayor que 0 y como mucho 100 (recibido: {k}).")
+
+
+def analitica_mediciones(
+    ids_ciudad: Optional[List[int]] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    metrica: str = "temperatura",
+    ventana: Optional[int] = None,
+    k: Optional[float] = None,
+    incluir_serie: bool = False,
+) -> Dict[str, Any]:
+    """
+    Analítica de una métrica por ciudad en el rango [desde, hasta] (días
+    UTC, por defecto los últimos 30; como mucho ANALITICA_DIAS_MAXIMO).
+
+    :param ids_ciudad: ciudades a analizar (None = todas las que tengan mediciones).
+    :param ventana: mediciones de la media móvil y de la referencia de anomalías.
+    :param k: desvíos a partir de los cuales una medición es anómala.
+    :param incluir_serie: agrega cada medición con su media móvil y su z
+        (como mucho ANALITICA_SERIE_MAXIMO puntos en total).
+    :return: {"desde", "hasta", "metrica", "ventana", "k", "mediciones",
+        "ciudades": [{"id_ciudad", "resumen", "tendencia_por_dia",
+        "anomalias", "dias", ["serie"]}, ...]}
+    :raises FiltroInvalido: si algún parámetro no es válido.
+    """
+    ventana = ANALITICA_VENTANA if ventana is None else ventana
+    k = ANALITICA_K if k is None else k
+    _validar(metrica, ventana, k)
+    desde, hasta = rango_de_fechas(desde, hasta, maximo=ANALITICA_DIAS_MAXIMO)
+
+    serie = leer_serie(
+        metrica,
+        datetime(desde.year, desde.month, desde.day, tzinfo=timezone.utc),
+        datetime(hasta.year, hasta.month, hasta.day, tzinfo=timezone.utc) + timedelta(days=1),
+        ids_ciudad,
+    )
+    if incluir_serie and len(serie["valor"]) > ANALITICA_SERIE_MAXIMO:
+        raise FiltroInvalido(
+            f"Con serie=1 el pedido no puede superar {ANALITICA_SERIE_MAXIMO} mediciones "
+            f"(hay {len(serie['valor'])}); acotá las ciudades o las fechas."
+        )
+
+    with medir("analitica.calculo"):
+        resultado = analizar(serie, ventana, k)
+
+    with medir("analitica.respuesta"):
+        ciudades = _armar_ciudades(resultado, incluir_serie)
+
+    return {
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "metrica": metrica,
+        "ventana": ventana,
+        "k": k,
+        "mediciones": int(len(serie["valor"])),
+        "ciudades": ciudades,
+    }
+
+
+def _armar_ciudades(resultado: Dict[str, Any], incluir_serie: bool) -> List[Dict[str, Any]]:
+    puntos, ciudades, dias = resultado["puntos"], resultado["ciudades"], resultado["dias"]
+
+    if not len(ciudades["id_ciudad"]):
+        return []
+
+    # Cortes de cada ciudad en la tabla por día (mismo orden de ciudades)
+    cortes_dia = np.append(_cortes(dias["id_ciudad"]), len(dias["dia"]))
+    indices_anomalias = np.flatnonzero(puntos["anomalia"])
+    cortes_anomalias = np.searchsorted(indices_anomalias, np.append(ciudades["inicio"], len(puntos["valor"])))
+
+    formato_dia = {"fecha": _dias_iso, "minimo": _redondeados, "maximo": _redondeados,
+                   "promedio": _redondeados, "cantidad": lambda c: c.tolist()}
+    dias_tabla = {**dias, "fecha": dias["dia"]}
+    formato_anomalia = {"fecha": _fechas_iso, "valor": _redondeados, "media_previa": _redondeados,
+                        "desvio_previo": _redondeados, "z": _redondeados}
+    formato_punto = {"fecha": _fechas_iso, "valor": _redondeados, "media_movil": _redondeados,
+                     "z": _redondeados, "anomalia": lambda a: a.tolist()}
+
+    salida = []
+    for i, id_ciudad in enumerate(ciudades["id_ciudad"].tolist()):
+        inicio = int(ciudades["inicio"][i])
+        fin = inicio + int(ciudades["cantidad"][i])
+
+        seleccion = indices_anomalias[cortes_anomalias[i]:cortes_anomalias[i + 1]][-ANALITICA_ANOMALIAS_MAXIMO:]
+        anomalias = {c: puntos[c][seleccion] for c in formato_anomalia}
+
+        ciudad = {
+            "id_ciudad": id_ciudad,
+            "resumen": {
+                "cantidad": int(ciudades["cantidad"][i]),
+                "desde": _fechas_iso(puntos["fecha"][inicio:inicio + 1])[0],
+                "hasta": _fechas_iso(puntos["fecha"][fin - 1:fin])[0],
+                "promedio": _redondeados(ciudades["promedio"][i:i + 1])[0],
+                "desvio": _redondeados(ciudades["desvio"][i:i + 1])[0],
+                "minimo": _redondeados(ciudades["minimo"][i:i + 1])[0],
+                "maximo": _redondeados(ciudades["maximo"][i:i + 1])[0],
+            },
+            "tendencia_por_dia": _redondeados(ciudades["tendencia_por_dia"][i:i + 1])[0],
+            "anomalias": {
+                "cantidad": int(ciudades["anomalias"][i]),
+                "ultimas": _columnas(anomalias, 0, len(seleccion), formato_anomalia),
+            },
+            "dias": _columnas(dias_tabla, int(cortes_dia[i]), int(cortes_dia[i + 1]), formato_dia),
+        }
+        if incluir_serie:
+            ciudad["serie"] = _columnas(puntos, inicio, fin, formato_punto)
+        salida.append(ciudad)
+    return salida
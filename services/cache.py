@@ -0,0 +1,157 @@
+# services/cache.py
+"""
+Cachés en memoria, thread-safe, compartidas por los servicios.
+
+Ninguna clase de este módulo habla con la API ni con la base de datos:
+solo guardan valores por clave dentro del proceso.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+# Valor centinela para distinguir "no está" de un valor None guardado
+FALTA = object()
+
+
+class CacheLRU:
+    """
+    Caché LRU de tamaño acotado con vencimiento opcional por entrada.
+
+    - get() devuelve FALTA si la clave no está o ya venció.
+    - set(..., ttl=None) guarda sin vencimiento; con ttl en segundos vence.
+    - Al superar `maxsize` se descarta la entrada usada hace más tiempo.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        if maxsize < 1:
+            raise ValueError("maxsize debe ser >= 1")
+        self.maxsize = maxsize
+        self._datos: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._vencidas = 0
+        self._desalojadas = 0
+
+    def get(self, clave: Hashable) -> Any:
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self._misses += 1
+                return FALTA
+
+            valor, vence_en = entrada
+            if vence_en is not None and time.monotonic() >= vence_en:
+                del self._datos[clave]
+                self._vencidas += 1
+                self._misses += 1
+                return FALTA
+
+            self._datos.move_to_end(clave)
+            self._hits += 1
+            return valor
+
+    def set(self, clave: Hashable, valor: Any, ttl: Optional[float] = None) -> None:
+        vence_en = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._datos[clave] = (valor, vence_en)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maxsize:
+                self._datos.popitem(last=False)
+                self._desalojadas += 1
+
+    def delete(self, clave: Hashable) -> None:
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tamanio": len(self._datos),
+                "maximo": self.maxsize,
+                "hits": self._hits,
+                "misses": self._misses,
+                "vencidas": self._vencidas,
+                "desalojadas": self._desalojadas,
+            }
+
+
+class _Vuelo:
+    __slots__ = ("evento", "resultado", "error")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalescencia de llamadas concurrentes ("single-flight").
+
+    Si varios hilos piden la misma clave a la vez, solo el primero ejecuta
+    la función; los demás esperan y reciben el mismo resultado (o la
+    misma excepción).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_vuelo: Dict[Hashable, _Vuelo] = {}
+        self._ejecutadas = 0
+        self._compartidas = 0
+
+    def do(self, clave: Hashable, funcion):
+        """
+        Ejecuta `funcion()` una sola vez por clave en vuelo.
+
+        :return: (resultado, compartido) donde `compartido` es True si el
+            resultado vino de la llamada de otro hilo.
+        """
+        with self._lock:
+            vuelo = self._en_vuelo.get(clave)
+            if vuelo is None:
+                vuelo = _Vuelo()
+                self._en_vuelo[clave] = vuelo
+                lider = True
+                self._ejecutadas += 1
+            else:
+                lider = False
+                self._compartidas += 1
+
+        if not lider:
+            vuelo.evento.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            return vuelo.resultado, True
+
+        try:
+            vuelo.resultado = funcion()
+        except BaseException as exc:
+            vuelo.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._en_vuelo[clave]
+            vuelo.evento.set()
+
+        return vuelo.resultado, False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "en_vuelo": len(self._en_vuelo),
+                "ejecutadas": self._ejecutadas,
+                "compartidas": self._compartidas,
+            }
@@ -0,0 +1,206 @@
+# services/carga_masiva_service.py
+"""
+Importación y exportación masiva de mediciones en CSV.
+
+- importar_csv / exportar_csv: para el CLI (carga_masiva.py), con una
+  función de avance opcional.
+- importar_csv_con_avance / exportar_csv_en_bloques: para los endpoints.
+  Corren la operación en un hilo y la entregan como generador (eventos de
+  avance o bloques de texto) a través de una cola acotada: si el cliente
+  lee lento la operación espera, y nada del archivo queda entero en memoria.
+
+El formato del CSV y lo que hace cada backend están en
+database/almacenamiento/csv_masivo.py.
+"""
+
+from __future__ import annotations
+
+import json
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from database.almacenamiento.csv_masivo import COLUMNAS_CSV, ErrorImportacion, leer_encabezado
+from repositories.mediciones_repository import exportar_mediciones_csv, importar_mediciones_csv
+from services.normalizacion import normalizar_nombre
+from services.sugerencias_service import invalidar_indice
+from services.ultimas_mediciones import invalidar_ultimas
+from services.version_datos import registrar_escritura
+
+
+# Texto que se junta antes de entregar un bloque de la exportación
+BYTES_POR_BLOQUE = 64 * 1024
+
+
+class OperacionCancelada(Exception):
+    """El que consumía el generador lo cerró (p. ej. el cliente HTTP se desconectó)."""
+    pass
+
+
+def importar_csv(archivo, progreso: Optional[Callable[[Dict], None]] = None) -> Dict[str, Any]:
+    """
+    Importa un CSV (abierto en modo texto, con encabezado).
+
+    :raises ErrorImportacion: si el encabezado o algún valor es inválido
+        (en ese caso no se importa nada).
+    """
+    return _importar(archivo, leer_encabezado(archivo), progreso)
+
+
+def _importar(archivo, columnas, progreso):
+    try:
+        resumen = importar_mediciones_csv(archivo, columnas, normalizar_nombre, progreso)
+    finally:
+        registrar_escritura()
+    if resumen["insertadas"] or resumen["ciudades_creadas"]:
+        # Ciudades nuevas y cantidades distintas para el autocompletado,
+        # y quizás mediciones más nuevas que las que hay en memoria
+        invalidar_indice()
+        invalidar_ultimas()
+    return resumen
+
+
+def exportar_csv(destino, progreso: Optional[Callable[[Dict], None]] = None) -> Dict[str, Any]:
+    """Escribe todas las mediciones en `destino` (write(str))."""
+    return exportar_mediciones_csv(destino, progreso)
+
+
+# -----------------------------
+# Ejecución en un hilo, consumida como generador
+# -----------------------------
+
+_FIN = object()
+
+
+def en_segundo_plano(tarea, tamanio_cola: int = 16, nombre: str = "carga-masiva") -> Iterator:
+    """
+    Corre tarea(emitir) en un hilo y entrega lo que va emitiendo.
+    Al final entrega ("fin", resultado) o relanza la excepción de la tarea.
+
+    Si el generador se cierra antes de tiempo, la próxima llamada a emitir
+    lanza OperacionCancelada: la tarea corta y libera su conexión.
+    """
+    cola = queue.Queue(maxsize=tamanio_cola)
+    cancelado = threading.Event()
+
+    def emitir(item):
+        while True:
+            if cancelado.is_set():
+                raise OperacionCancelada()
+            try:
+                cola.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def correr():
+        try:
+            resultado = tarea(emitir)
+        except BaseException as exc:
+            final = (_FIN, exc, None)
+        else:
+            final = (_FIN, None, resultado)
+        # La cola acotada no debe trabar el final si nadie la lee
+        while not cancelado.is_set():
+            try:
+                cola.put(final, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    hilo = threading.Thread(target=correr, name=nombre, daemon=True)
+    hilo.start()
+    try:
+        while True:
+            item = cola.get()
+            if isinstance(item, tuple) and item and item[0] is _FIN:
+                _, error, resultado = item
+                if error is not None:
+                    raise error
+                yield ("fin", resultado)
+                return
+            yield item
+    finally:
+        cancelado.set()
+
+
+class _Acumulador:
+    """Junta lo escrito por la exportación y lo emite en bloques de BYTES_POR_BLOQUE."""
+
+    def __init__(self, emitir):
+        self.emitir = emitir
+        self.partes = []
+        self.tamanio = 0
+
+    def write(self, texto):
+        self.partes.append(texto)
+        self.tamanio += len(texto)
+        if self.tamanio >= BYTES_POR_BLOQUE:
+            self.flush()
+
+    def flush(self):
+        if self.partes:
+            self.emitir("".join(self.partes))
+            self.partes = []
+            self.tamanio = 0
+
+
+def exportar_csv_en_bloques() -> Iterator[str]:
+    """Generador de bloques de texto CSV con todas las mediciones."""
+    def tarea(emitir):
+        acumulador = _Acumulador(emitir)
+        resumen = exportar_csv(acumulador)
+        acumulador.flush()
+        return resumen
+
+    for item in en_segundo_plano(tarea):
+        if isinstance(item, str):
+            yield item
+
+
+def importar_csv_con_avance(archivo) -> Iterator[str]:
+    """
+    Valida el encabezado YA (ErrorImportacion antes de empezar a responder)
+    y devuelve un generador de líneas NDJSON:
+
+        {"estado": "importando", "filas", "bytes", "segundos", "filas_por_segundo"}  (cada ~0,5 s)
+        {"estado": "terminado", ...resumen de importar_csv}
+        {"estado": "error", "error", "detalle"}  si falla a mitad de camino (no se importa nada)
+    """
+    columnas = leer_encabezado(archivo)
+
+    def tarea(emitir):
+        return _importar(
+            archivo, columnas, lambda estado: emitir({"estado": "importando", **estado})
+        )
+
+    def lineas():
+        try:
+            for item in en_segundo_plano(tarea):
+                if isinstance(item, tuple):
+                    yield linea_ndjson({"estado": "terminado", **item[1]})
+                else:
+                    yield linea_ndjson(item)
+        except ErrorImportacion as e:
+            yield linea_ndjson({"estado": "error", "error": "CSV inválido", "detalle": str(e)})
+        except Exception as e:
+            yield linea_ndjson({"estado": "error", "error": "No se pudo importar el CSV", "detalle": str(e)})
+
+    return lineas()
+
+
+def linea_ndjson(evento: Dict[str, Any]) -> str:
+    return json.dumps(evento, ensure_ascii=False) + "\n"
+
+
+__all__ = [
+    "COLUMNAS_CSV",
+    "ErrorImportacion",
+    "OperacionCancelada",
+    "en_segundo_plano",
+    "exportar_csv",
+    "exportar_csv_en_bloques",
+    "importar_csv",
+    "importar_csv_con_avance",
+    "linea_ndjson",
+]
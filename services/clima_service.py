@@ -12,14 +12,21 @@ y devuelven diccionarios listos para que los use el servicio de mediciones.
 
 from __future__ import annotations
 
+import math
+import os
+import time
 from dataclasses import dataclass
-from typing import Optional, Dict, Any
+from datetime import date
+from typing import Optional, Dict, Any, List, Tuple
 
 import requests
 
+from services.cache import CacheLRU, FALTA, SingleFlight
+from services.open_meteo_client import cliente
 
-GEOCODING_URL = "https://geocoding-api.open-meteo.com/v1/search"
-WEATHER_URL = "https://api.open-meteo.com/v1/forecast"
+
+GEOCODING_URL = cliente.url("geocoding")
+WEATHER_URL = cliente.url("forecast")
 
 
 # -----------------------------
@@ -59,6 +66,8 @@ class ClimaActual:
     presion: Optional[float]           # hPa aprox
     velocidad_viento: Optional[float]  # km/h aprox
     descripcion: str                   # texto en castellano
+    obtenido_en: float = 0.0           # epoch (time.time()) de la consulta a la API
+    intervalo: int = 900               # cada cuántos segundos actualiza la API "current"
 
 
 # -----------------------------
@@ -76,15 +85,8 @@ def geocodificar_ciudad(nombre_ciudad: str) -> CiudadGeo:
     :raises CiudadNoEncontrada: si la API no devuelve resultados.
     :raises ErrorAPIClima: si hay un problema de red o de respuesta.
     """
-    params = {
-        "name": nombre_ciudad,
-        "count": 1,        # solo queremos el mejor resultado
-        "language": "es",
-        "format": "json",
-    }
-
     try:
-        resp = requests.get(GEOCODING_URL, params=params, timeout=10)
+        resp = cliente.get("geocoding", parametros_geocoding(nombre_ciudad))
     except requests.RequestException as exc:
         raise ErrorAPIClima(f"Error de red al consultar geocoding: {exc}") from exc
 
@@ -93,8 +95,25 @@ def geocodificar_ciudad(nombre_ciudad: str) -> CiudadGeo:
             f"Error en geocoding (status {resp.status_code}): {resp.text}"
         )
 
-    data = resp.json()
+    return parsear_geocoding(resp.json(), nombre_ciudad)
+
+
+def parametros_geocoding(nombre_ciudad: str) -> Dict[str, Any]:
+    """Parámetros del GET de geocoding para una ciudad."""
+    return {
+        "name": nombre_ciudad,
+        "count": 1,        # solo queremos el mejor resultado
+        "language": "es",
+        "format": "json",
+    }
+
+
+def parsear_geocoding(data: Dict[str, Any], nombre_ciudad: str) -> CiudadGeo:
+    """
+    Convierte la respuesta JSON de geocoding en CiudadGeo.
 
+    :raises CiudadNoEncontrada: si la respuesta no trae resultados.
+    """
     results = data.get("results") or []
     if not results:
         raise CiudadNoEncontrada(f"No se encontró la ciudad '{nombre_ciudad}'.")
@@ -115,6 +134,20 @@ def geocodificar_ciudad(nombre_ciudad: str) -> CiudadGeo:
 # -----------------------------
 
 
+# Variables "current" que pedimos a la API
+VARIABLES_CURRENT = (
+    "temperature_2m,"
+    "relative_humidity_2m,"
+    "apparent_temperature,"
+    "pressure_msl,"
+    "wind_speed_10m,"
+    "weather_code"
+)
+
+# Máximo de posiciones por llamada multi-ubicación (límite de largo de URL)
+CLIMA_LOTE_MAXIMO = int(os.getenv("CLIMA_LOTE_MAXIMO", "100"))
+
+
 def obtener_clima_actual(latitud: float, longitud: float) -> ClimaActual:
     """
     Consulta Open-Meteo para obtener el clima actual en una posición dada.
@@ -124,23 +157,63 @@ def obtener_clima_actual(latitud: float, longitud: float) -> ClimaActual:
     :return: ClimaActual con temperatura, humedad, presión, etc.
     :raises ErrorAPIClima: si hay problemas con la API.
     """
-    params = {
+    data = _consultar_forecast(parametros_clima_actual(latitud, longitud))
+    return parsear_current(data.get("current") or {})
+
+
+def parametros_clima_actual(latitud: float, longitud: float) -> Dict[str, Any]:
+    """Parámetros del GET de forecast para el clima actual de una posición."""
+    return {
         "latitude": latitud,
         "longitude": longitud,
         # Pedimos solo las variables que necesitamos
-        "current": (
-            "temperature_2m,"
-            "relative_humidity_2m,"
-            "apparent_temperature,"
-            "pressure_msl,"
-            "wind_speed_10m,"
-            "weather_code"
-        ),
+        "current": VARIABLES_CURRENT,
         "timezone": "auto",
     }
 
+
+def obtener_clima_actual_lote(
+    coordenadas: List[Tuple[float, float]],
+) -> List[ClimaActual]:
+    """
+    Clima actual de muchas posiciones en UNA sola llamada a la API
+    (Open-Meteo acepta latitude/longitude separados por comas y devuelve
+    una lista con un resultado por posición, en el mismo orden).
+
+    :param coordenadas: lista de (latitud, longitud); como máximo
+        CLIMA_LOTE_MAXIMO por llamada.
+    :return: lista de ClimaActual en el mismo orden.
+    :raises ErrorAPIClima: si hay problemas con la API.
+    """
+    if not coordenadas:
+        return []
+    if len(coordenadas) > CLIMA_LOTE_MAXIMO:
+        raise ValueError(
+            f"Se pueden pedir como máximo {CLIMA_LOTE_MAXIMO} posiciones por llamada."
+        )
+
+    params = {
+        "latitude": ",".join(str(lat) for lat, _ in coordenadas),
+        "longitude": ",".join(str(lon) for _, lon in coordenadas),
+        "current": VARIABLES_CURRENT,
+        "timezone": "auto",
+    }
+
+    data = _consultar_forecast(params)
+    # Con una sola posición la API devuelve un objeto, no una lista
+    ubicaciones = data if isinstance(data, list) else [data]
+    if len(ubicaciones) != len(coordenadas):
+        raise ErrorAPIClima(
+            f"La API devolvió {len(ubicaciones)} resultados para "
+            f"{len(coordenadas)} posiciones."
+        )
+
+    return [parsear_current(u.get("current") or {}) for u in ubicaciones]
+
+
+def _consultar_forecast(params: Dict[str, Any]) -> Any:
     try:
-        resp = requests.get(WEATHER_URL, params=params, timeout=10)
+        resp = cliente.get("forecast", params)
     except requests.RequestException as exc:
         raise ErrorAPIClima(f"Error de red al consultar clima: {exc}") from exc
 
@@ -149,15 +222,18 @@ def obtener_clima_actual(latitud: float, longitud: float) -> ClimaActual:
             f"Error en clima (status {resp.status_code}): {resp.text}"
         )
 
-    data = resp.json()
-    current: Dict[str, Any] = data.get("current") or {}
+    return resp.json()
+
 
+def parsear_current(current: Dict[str, Any]) -> ClimaActual:
+    """Convierte el bloque "current" de la respuesta de forecast en ClimaActual."""
     temperatura = current.get("temperature_2m")
     humedad = current.get("relative_humidity_2m")
     sensacion = current.get("apparent_temperature")
     presion = current.get("pressure_msl")
     viento = current.get("wind_speed_10m")
     weather_code = current.get("weather_code")
+    intervalo = current.get("interval") or 900
 
     descripcion = describir_weather_code(weather_code)
 
@@ -168,9 +244,215 @@ def obtener_clima_actual(latitud: float, longitud: float) -> ClimaActual:
         presion=float(presion) if presion is not None else None,
         velocidad_viento=float(viento) if viento is not None else None,
         descripcion=descripcion,
+        obtenido_en=time.time(),
+        intervalo=int(intervalo),
     )
 
 
+# -----------------------------
+# Historial horario (API de archivo): coordenadas + fechas -> columnas
+# -----------------------------
+
+
+# Variable del bloque "hourly" -> campo de la medición (las mismas que "current")
+COLUMNAS_HORARIAS = {
+    "temperature_2m": "temperatura",
+    "relative_humidity_2m": "humedad",
+    "apparent_temperature": "sensacion_termica",
+    "pressure_msl": "presion",
+    "wind_speed_10m": "velocidad_viento",
+}
+
+
+def obtener_historico_horario(latitud: float, longitud: float, desde: date, hasta: date) -> Dict[str, list]:
+    """
+    Serie horaria (UTC) de los días [desde, hasta] desde la API de archivo
+    de Open-Meteo, en columnas (ver parsear_hourly).
+
+    :raises ErrorAPIClima: si hay problemas con la API.
+    """
+    try:
+        resp = cliente.get("archive", parametros_historico(latitud, longitud, desde, hasta))
+    except requests.RequestException as exc:
+        raise ErrorAPIClima(f"Error de red al consultar el historial: {exc}") from exc
+
+    if resp.status_code != 200:
+        raise ErrorAPIClima(
+            f"Error en el historial (status {resp.status_code}): {resp.text}"
+        )
+
+    return parsear_hourly(resp.json().get("hourly") or {})
+
+
+def parametros_historico(latitud: float, longitud: float, desde: date, hasta: date) -> Dict[str, Any]:
+    """Parámetros del GET de archivo para una posición y un rango de días."""
+    return {
+        "latitude": latitud,
+        "longitude": longitud,
+        "start_date": desde.isoformat(),
+        "end_date": hasta.isoformat(),
+        "hourly": VARIABLES_CURRENT,
+        "timezone": "GMT",
+    }
+
+
+def parsear_hourly(hourly: Dict[str, Any]) -> Dict[str, list]:
+    """
+    Convierte el bloque "hourly" (una lista por variable) en columnas con
+    los campos de la medición, sin armar un objeto por hora: los valores
+    quedan en las listas tal como vinieron (None = hora sin dato). Solo se
+    recorren la fecha (se le agrega la zona, UTC) y weather_code (una
+    traducción por código distinto).
+
+    :return: {"fecha", "temperatura", "humedad", "sensacion_termica",
+        "presion", "velocidad_viento", "descripcion"}, todas del mismo largo.
+    :raises ErrorAPIClima: si alguna variable no tiene una posición por hora.
+    """
+    horas = hourly.get("time") or []
+    columnas = {"fecha": [f"{hora}+00:00" for hora in horas]}
+
+    for variable, campo in COLUMNAS_HORARIAS.items():
+        valores = hourly.get(variable)
+        columnas[campo] = valores if valores is not None else [None] * len(horas)
+
+    codigos = hourly.get("weather_code") or [None] * len(horas)
+    traducciones = {codigo: describir_weather_code(codigo) for codigo in set(codigos)}
+    columnas["descripcion"] = [traducciones[codigo] for codigo in codigos]
+
+    largos = {campo: len(valores) for campo, valores in columnas.items()}
+    if any(largo != len(horas) for largo in largos.values()):
+        raise ErrorAPIClima(f"El historial trae columnas de distinto largo: {largos}")
+    return columnas
+
+
+# -----------------------------
+# Caché de clima actual (TTL alineado + single-flight)
+# -----------------------------
+
+# Decimales de lat/lon en la clave (2 decimales ~ 1 km)
+CLIMA_DECIMALES_CLAVE = int(os.getenv("CLIMA_DECIMALES_CLAVE", "2"))
+CLIMA_CACHE_TAMANIO = int(os.getenv("CLIMA_CACHE_TAMANIO", "5000"))
+
+_cache_clima = CacheLRU(maxsize=CLIMA_CACHE_TAMANIO)
+_vuelos_clima = SingleFlight()
+
+
+def clave_clima(latitud: float, longitud: float) -> Tuple[float, float]:
+    """Clave de caché: coordenadas redondeadas a CLIMA_DECIMALES_CLAVE."""
+    return (
+        round(latitud, CLIMA_DECIMALES_CLAVE),
+        round(longitud, CLIMA_DECIMALES_CLAVE),
+    )
+
+
+def segundos_hasta_actualizacion(clima: ClimaActual) -> float:
+    """
+    Segundos que faltan para que la API publique el próximo valor "current".
+    Open-Meteo actualiza en múltiplos de `intervalo` (15 min), así que la
+    entrada vence justo en el próximo límite en lugar de un TTL fijo.
+    """
+    proximo = (math.floor(clima.obtenido_en / clima.intervalo) + 1) * clima.intervalo
+    return max(1.0, proximo - time.time())
+
+
+def guardar_clima_en_cache(latitud: float, longitud: float, clima: ClimaActual) -> None:
+    """Guarda un ClimaActual ya obtenido (por ejemplo en un pedido por lotes)."""
+    _cache_clima.set(
+        clave_clima(latitud, longitud),
+        clima,
+        ttl=segundos_hasta_actualizacion(clima),
+    )
+
+
+def obtener_clima_cacheado(latitud: float, longitud: float) -> Optional[ClimaActual]:
+    """Devuelve el ClimaActual en caché para esas coordenadas, o None."""
+    clima = _cache_clima.get(clave_clima(latitud, longitud))
+    return None if clima is FALTA else clima
+
+
+def obtener_clima_actual_cacheado(
+    latitud: float, longitud: float
+) -> Tuple[ClimaActual, Dict[str, Any]]:
+    """
+    Igual que obtener_clima_actual pero con caché en memoria:
+    - si hay un valor vigente para las coordenadas redondeadas, lo devuelve;
+    - si no, hace UNA sola llamada a la API aunque muchos hilos pidan
+      la misma ciudad a la vez (los demás esperan ese resultado).
+
+    :return: (clima, info_cache) con info_cache =
+        {"hit": bool, "compartida": bool, "edad_segundos": float}
+    :raises ErrorAPIClima: si hay problemas con la API.
+    """
+    clave = clave_clima(latitud, longitud)
+
+    clima = _cache_clima.get(clave)
+    hit = clima is not FALTA
+    compartida = False
+
+    if not hit:
+        def buscar():
+            nuevo = obtener_clima_actual(latitud, longitud)
+            _cache_clima.set(clave, nuevo, ttl=segundos_hasta_actualizacion(nuevo))
+            return nuevo
+
+        clima, compartida = _vuelos_clima.do(clave, buscar)
+
+    return clima, {
+        "hit": hit,
+        "compartida": compartida,
+        "edad_segundos": round(max(0.0, time.time() - clima.obtenido_en), 1),
+    }
+
+
+def obtener_clima_actual_lote_cacheado(
+    coordenadas: List[Tuple[float, float]],
+) -> List[Tuple[ClimaActual, Dict[str, Any]]]:
+    """
+    Versión por lotes de obtener_clima_actual_cacheado: las posiciones
+    que ya están en caché no se piden; el resto se pide en llamadas
+    multi-ubicación de hasta CLIMA_LOTE_MAXIMO posiciones.
+
+    :return: lista de (clima, info_cache) en el mismo orden que `coordenadas`.
+    :raises ErrorAPIClima: si hay problemas con la API.
+    """
+    resultados: List[Optional[Tuple[ClimaActual, Dict[str, Any]]]] = [None] * len(coordenadas)
+    faltantes: List[int] = []
+
+    for i, (lat, lon) in enumerate(coordenadas):
+        clima = _cache_clima.get(clave_clima(lat, lon))
+        if clima is FALTA:
+            faltantes.append(i)
+        else:
+            resultados[i] = (clima, {"hit": True, "compartida": False})
+
+    for inicio in range(0, len(faltantes), CLIMA_LOTE_MAXIMO):
+        indices = faltantes[inicio:inicio + CLIMA_LOTE_MAXIMO]
+        climas = obtener_clima_actual_lote([coordenadas[i] for i in indices])
+        for i, clima in zip(indices, climas):
+            lat, lon = coordenadas[i]
+            guardar_clima_en_cache(lat, lon, clima)
+            resultados[i] = (clima, {"hit": False, "compartida": False})
+
+    ahora = time.time()
+    for clima, info in resultados:
+        info["edad_segundos"] = round(max(0.0, ahora - clima.obtenido_en), 1)
+
+    return resultados
+
+
+def limpiar_cache_clima() -> None:
+    """Vacía la caché de clima actual."""
+    _cache_clima.clear()
+
+
+def estadisticas_clima() -> Dict[str, Any]:
+    """Estado de la caché de clima y de la coalescencia de llamadas."""
+    return {
+        "cache": _cache_clima.stats(),
+        "coalescencia": _vuelos_clima.stats(),
+    }
+
+
 # -----------------------------
 # Traducción de weather_code a texto
 # -----------------------------
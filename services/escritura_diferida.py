@@ -0,0 +1,422 @@
+# services/escritura_diferida.py
+"""
+Escritura diferida (write-behind) de POST /api/mediciones.
+
+Con ESCRITURA_DIFERIDA=1 el pedido no espera el INSERT: apenas tiene el
+clima y el rango encola la fila y responde 202 con un id provisional. Un
+hilo escritor vacía la cola y escribe las filas en grupos, con un solo
+commit por grupo (registrar_mediciones_lote):
+
+- la cola es acotada (ESCRITURA_COLA_TAMANIO); llena, encolar() espera
+  hasta ESCRITURA_ESPERA_COLA segundos y después lanza ColaLlena (-> 503),
+- un grupo se escribe al juntar ESCRITURA_LOTE_MAXIMO filas o cuando pasan
+  ESCRITURA_ESPERA_LOTE_MS desde su primera fila, lo que ocurra antes,
+- si el grupo falla se reintenta fila por fila, para que una fila mala no
+  se lleve a las demás; las que fallan igual se cuentan como perdidas,
+- al cerrar el proceso (atexit) o con detener_escritura() se escribe lo
+  que quedaba en la cola antes de salir,
+- un error inesperado con un grupo (o en lo que se actualiza después del
+  commit) se loguea y el hilo sigue: si terminara, la cola se llenaría y
+  todo POST daría 503 hasta reiniciar.
+
+El estado de cada id provisional (pendiente / escrita / perdida, con el id
+definitivo) se recuerda en una CacheLRU para GET
+/api/mediciones/pendientes/<id>. Profundidad de la cola, tamaño de los
+grupos y latencia del commit salen en stats() y en /metrics.
+
+La cola es del proceso: lo que está encolado se pierde si el proceso
+muere sin cerrar (kill -9, corte de luz). Por eso es optativo.
+"""
+
+from __future__ import annotations
+
+import atexit
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from repositories.mediciones_repository import (
+    registrar_medicion_atomica,
+    registrar_mediciones_lote,
+)
+from services.cache import CacheLRU, FALTA
+from instrumentacion.latencias import registrar_etapa, registrar_tamanio
+from services.sugerencias_service import registrar_ciudad_medida
+from services.ultimas_mediciones import registrar_medicion_reciente
+from services.version_datos import registrar_escritura
+
+
+logger = logging.getLogger(__name__)
+
+ESCRITURA_DIFERIDA = os.getenv("ESCRITURA_DIFERIDA") == "1"
+ESCRITURA_COLA_TAMANIO = int(os.getenv("ESCRITURA_COLA_TAMANIO", "10000"))
+ESCRITURA_LOTE_MAXIMO = int(os.getenv("ESCRITURA_LOTE_MAXIMO", "500"))
+ESCRITURA_ESPERA_LOTE_MS = float(os.getenv("ESCRITURA_ESPERA_LOTE_MS", "50"))
+ESCRITURA_ESPERA_COLA = float(os.getenv("ESCRITURA_ESPERA_COLA", "1"))
+ESCRITURA_SEGUIMIENTO_TAMANIO = int(os.getenv("ESCRITURA_SEGUIMIENTO_TAMANIO", "100000"))
+
+PENDIENTE = "pendiente"
+ESCRITA = "escrita"
+PERDIDA = "perdida"
+
+# Marca de fin en la cola: todo lo encolado antes se escribe
+_FIN = object()
+
+
+class ColaLlena(Exception):
+    """La cola de escritura siguió llena durante ESCRITURA_ESPERA_COLA segundos."""
+    pass
+
+
+class ColaCerrada(Exception):
+    """El escritor se está deteniendo y ya no acepta filas."""
+    pass
+
+
+def _clave_ciudad(fila: Dict[str, Any]):
+    return (fila["nombre_ciudad"], fila["pais"])
+
+
+def separar_por_ciudad(filas: List[Any], clave=_clave_ciudad) -> List[List[Any]]:
+    """
+    Reparte un grupo en tandas sin ciudades repetidas, respetando el orden:
+    registrar_mediciones_lote admite una sola medición por ciudad.
+    La primera medición de cada ciudad va a la primera tanda, la segunda a
+    la segunda, etc.; sin repetidas queda una sola tanda.
+    """
+    tandas: List[List[Any]] = []
+    vistas: Dict[Any, int] = {}
+    for item in filas:
+        k = clave(item)
+        n = vistas.get(k, 0)
+        vistas[k] = n + 1
+        if n == len(tandas):
+            tandas.append([])
+        tandas[n].append(item)
+    return tandas
+
+
+class _Pendiente:
+    __slots__ = ("id_provisional", "fila", "encolada")
+
+    def __init__(self, id_provisional: str, fila: Dict[str, Any]):
+        self.id_provisional = id_provisional
+        self.fila = fila
+        self.encolada = time.monotonic()
+
+
+class EscritorDiferido:
+    """
+    Cola acotada + hilo escritor con group commit.
+
+    :param escribir_lote: recibe una lista de filas (sin ciudades repetidas)
+        y devuelve un registro por fila, en el mismo orden, con una sola
+        transacción (como registrar_mediciones_lote).
+    :param escribir_una: fallback fila por fila si el grupo falla.
+    """
+
+    def __init__(
+        self,
+        capacidad: int = ESCRITURA_COLA_TAMANIO,
+        lote_maximo: int = ESCRITURA_LOTE_MAXIMO,
+        espera_lote: float = ESCRITURA_ESPERA_LOTE_MS / 1000,
+        espera_cola: float = ESCRITURA_ESPERA_COLA,
+        escribir_lote: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]] = registrar_mediciones_lote,
+        escribir_una: Callable[..., Dict[str, Any]] = registrar_medicion_atomica,
+        seguimiento: int = ESCRITURA_SEGUIMIENTO_TAMANIO,
+    ):
+        if capacidad < 1 or lote_maximo < 1:
+            raise ValueError("La capacidad de la cola y el lote máximo deben ser >= 1")
+        self.capacidad = capacidad
+        self.lote_maximo = lote_maximo
+        self.espera_lote = espera_lote
+        self.espera_cola = espera_cola
+        self._escribir_lote = escribir_lote
+        self._escribir_una = escribir_una
+
+        self._cola: "queue.Queue[Any]" = queue.Queue(maxsize=capacidad)
+        self._estados = CacheLRU(maxsize=seguimiento)
+        self._prefijo = uuid.uuid4().hex[:8]
+        self._secuencia = itertools.count(1)
+
+        self._lock = threading.Lock()
+        self._cerrada = False
+        # encolar() en curso que ya pasaron el control de _cerrada:
+        # detener() los espera antes de poner _FIN en la cola
+        self._encolando = 0
+        self._sin_encolando = threading.Condition(self._lock)
+        self._hilo = threading.Thread(target=self._bucle, name="escritura-diferida", daemon=True)
+        self._stats: Dict[str, Any] = {
+            "encoladas": 0,
+            "rechazadas": 0,
+            "escritas": 0,
+            "perdidas": 0,
+            "errores_despues_commit": 0,
+            "lotes": 0,
+            "lotes_fallidos": 0,
+            "lote_maximo_visto": 0,
+            "commit_ms_total": 0.0,
+            "commit_ms_maximo": 0.0,
+            "ultimo_lote": None,
+            "ultimo_error": None,
+        }
+        self._hilo.start()
+
+    # -----------------------------
+    # Lado de los pedidos
+    # -----------------------------
+
+    def encolar(self, fila: Dict[str, Any]) -> str:
+        """
+        Encola una fila (el dict de fila_para_lote) y devuelve su id provisional.
+
+        :raises ColaLlena: si no hubo lugar en ESCRITURA_ESPERA_COLA segundos.
+        :raises ColaCerrada: si el escritor se está deteniendo.
+        """
+        with self._lock:
+            if self._cerrada:
+                raise ColaCerrada("La escritura diferida se está deteniendo.")
+            self._encolando += 1
+
+        try:
+            id_provisional = f"{self._prefijo}-{next(self._secuencia)}"
+            self._estados.set(id_provisional, {"estado": PENDIENTE})
+            try:
+                # Sin el lock: con la cola llena se espera a que el hilo la vacíe
+                self._cola.put(_Pendiente(id_provisional, fila), timeout=self.espera_cola)
+            except queue.Full:
+                self._estados.delete(id_provisional)
+                with self._lock:
+                    self._stats["rechazadas"] += 1
+                raise ColaLlena(
+                    f"La cola de escritura está llena ({self.capacidad} mediciones pendientes)."
+                )
+            with self._lock:
+                self._stats["encoladas"] += 1
+            return id_provisional
+        finally:
+            with self._lock:
+                self._encolando -= 1
+                if not self._encolando:
+                    self._sin_encolando.notify_all()
+
+    def estado(self, id_provisional: str) -> Optional[Dict[str, Any]]:
+        """{"estado": ..., "id_medicion", "fecha"} o None si el id no se conoce (o ya se olvidó)."""
+        valor = self._estados.get(id_provisional)
+        return None if valor is FALTA else dict(valor)
+
+    def detener(self, timeout: Optional[float] = None) -> None:
+        """Deja de aceptar filas, escribe las que quedaban y espera al hilo."""
+        with self._lock:
+            primera_vez = not self._cerrada
+            self._cerrada = True
+            # Lo que estaba entrando queda en la cola antes que _FIN
+            # (si la cola está llena, el hilo la va vaciando)
+            while self._encolando:
+                self._sin_encolando.wait()
+        if primera_vez and self._hilo.is_alive():
+            # Bloquea si la cola está llena: el hilo la va vaciando
+            self._cola.put(_FIN)
+        self._hilo.join(timeout)
+
+    # -----------------------------
+    # Hilo escritor
+    # -----------------------------
+
+    def _bucle(self) -> None:
+        # Después de _FIN se sigue vaciando sin esperar hasta que no quede
+        # nada (detener() no pone _FIN hasta que terminaron los encolar())
+        cerrando = False
+        while True:
+            try:
+                primero = self._cola.get_nowait() if cerrando else self._cola.get()
+            except queue.Empty:
+                return
+            if primero is _FIN:
+                cerrando = True
+                continue
+
+            grupo = [primero]
+            limite = time.monotonic() + self.espera_lote
+            while len(grupo) < self.lote_maximo:
+                restante = limite - time.monotonic()
+                try:
+                    if restante > 0 and not cerrando:
+                        item = self._cola.get(timeout=restante)
+                    else:
+                        item = self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _FIN:
+                    cerrando = True
+                    continue
+                grupo.append(item)
+
+            try:
+                for tanda in separar_por_ciudad(grupo, lambda p: _clave_ciudad(p.fila)):
+                    self._escribir(tanda)
+            except Exception as e:
+                logger.exception("Falló la escritura de un grupo de %d mediciones", len(grupo))
+                self._marcar_perdidas(grupo, e)
+
+    def _escribir(self, tanda: List[_Pendiente]) -> None:
+        # Cuánto esperó en la cola la fila más vieja de la tanda
+        registrar_etapa("escritura.espera_cola", time.monotonic() - tanda[0].encolada)
+        registrar_tamanio("escritura", len(tanda))
+
+        inicio = time.perf_counter()
+        try:
+            registros = self._escribir_lote([p.fila for p in tanda])
+        except Exception as e:
+            logger.exception("Falló un lote de %d mediciones; se reintenta de a una", len(tanda))
+            with self._lock:
+                self._stats["lotes_fallidos"] += 1
+                self._stats["ultimo_error"] = {"error": type(e).__name__, "detalle": str(e)}
+            self._escribir_de_a_una(tanda)
+            return
+        segundos = time.perf_counter() - inicio
+        registrar_etapa("escritura.commit", segundos)
+
+        for pendiente, registro in zip(tanda, registros):
+            self._marcar_escrita(pendiente, registro)
+
+        ms = segundos * 1000
+        with self._lock:
+            self._stats["lotes"] += 1
+            self._stats["escritas"] += len(tanda)
+            self._stats["lote_maximo_visto"] = max(self._stats["lote_maximo_visto"], len(tanda))
+            self._stats["commit_ms_total"] += ms
+            self._stats["commit_ms_maximo"] = max(self._stats["commit_ms_maximo"], ms)
+            self._stats["ultimo_lote"] = {"filas": len(tanda), "commit_ms": round(ms, 3)}
+
+    def _escribir_de_a_una(self, tanda: List[_Pendiente]) -> None:
+        for pendiente in tanda:
+            try:
+                registro = self._escribir_una(**pendiente.fila)
+            except Exception as e:
+                logger.error(
+                    "Se perdió la medición %s de %s: %s",
+                    pendiente.id_provisional, pendiente.fila.get("nombre_ciudad"), e,
+                )
+                self._estados.set(pendiente.id_provisional, {"estado": PERDIDA, "detalle": str(e)})
+                with self._lock:
+                    self._stats["perdidas"] += 1
+                    self._stats["ultimo_error"] = {"error": type(e).__name__, "detalle": str(e)}
+                continue
+            self._marcar_escrita(pendiente, registro)
+            with self._lock:
+                self._stats["escritas"] += 1
+
+    def _marcar_perdidas(self, grupo: List[_Pendiente], error: Exception) -> None:
+        """Las filas del grupo que quedaron pendientes pasan a perdidas."""
+        perdidas = 0
+        for pendiente in grupo:
+            estado = self._estados.get(pendiente.id_provisional)
+            if estado is FALTA or estado["estado"] == PENDIENTE:
+                self._estados.set(pendiente.id_provisional, {"estado": PERDIDA, "detalle": str(error)})
+                perdidas += 1
+        with self._lock:
+            self._stats["perdidas"] += perdidas
+            self._stats["ultimo_error"] = {"error": type(error).__name__, "detalle": str(error)}
+
+    def _error_despues_commit(self, pendiente: _Pendiente, error: Exception) -> None:
+        # La fila ya está en la BD: solo se pierde la actualización en memoria
+        logger.exception("Falló lo posterior al commit de la medición %s", pendiente.id_provisional)
+        with self._lock:
+            self._stats["errores_despues_commit"] += 1
+            self._stats["ultimo_error"] = {"error": type(error).__name__, "detalle": str(error)}
+
+    def _marcar_escrita(self, pendiente: _Pendiente, registro: Dict[str, Any]) -> None:
+        # Antes de publicar "escrita": un GET posterior ya la tiene que ver
+        try:
+            registrar_escritura()
+        except Exception as e:
+            self._error_despues_commit(pendiente, e)
+        self._estados.set(pendiente.id_provisional, {
+            "estado": ESCRITA,
+            "id_medicion": registro["id_medicion"],
+            "fecha": registro["fecha"],
+        })
+        # El autocompletado y la última medición la ven sin releer la BD
+        try:
+            registrar_ciudad_medida(registro["ciudad"])
+            registrar_medicion_reciente(registro, pendiente.fila)
+        except Exception as e:
+            self._error_despues_commit(pendiente, e)
+
+    # -----------------------------
+    # Métricas
+    # -----------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            datos = dict(self._stats)
+        lotes = datos["lotes"]
+        datos["lote_promedio"] = round(datos["escritas"] / lotes, 2) if lotes else 0.0
+        datos["commit_ms_promedio"] = round(datos.pop("commit_ms_total") / lotes, 3) if lotes else 0.0
+        datos["commit_ms_maximo"] = round(datos["commit_ms_maximo"], 3)
+        datos.update({
+            "activo": self._hilo.is_alive() and not self._cerrada,
+            "profundidad": self._cola.qsize(),
+            "capacidad": self.capacidad,
+            "lote_maximo": self.lote_maximo,
+            "espera_lote_ms": self.espera_lote * 1000,
+            "seguimiento": self._estados.stats(),
+        })
+        return datos
+
+
+# -----------------------------
+# Escritor del proceso
+# -----------------------------
+
+_lock = threading.Lock()
+_escritor: Optional[EscritorDiferido] = None
+
+
+def escritura_diferida_habilitada() -> bool:
+    return ESCRITURA_DIFERIDA
+
+
+def obtener_escritor() -> EscritorDiferido:
+    """
+    El escritor del proceso; se crea con el primer uso (así, con un
+    servidor que hace fork, cada worker tiene su propio hilo) y se
+    detiene vaciando la cola al salir.
+    """
+    global _escritor
+    if _escritor is None:
+        with _lock:
+            if _escritor is None:
+                _escritor = EscritorDiferido()
+                atexit.register(detener_escritura)
+    return _escritor
+
+
+def encolar_medicion(fila: Dict[str, Any]) -> str:
+    """Encola una fila en el escritor del proceso. Ver EscritorDiferido.encolar."""
+    return obtener_escritor().encolar(fila)
+
+
+def estado_pendiente(id_provisional: str) -> Optional[Dict[str, Any]]:
+    if _escritor is None:
+        return None
+    return _escritor.estado(id_provisional)
+
+
+def detener_escritura(timeout: Optional[float] = None) -> None:
+    """Escribe lo que quedaba en la cola y detiene el hilo (si estaba corriendo)."""
+    if _escritor is not None:
+        _escritor.detener(timeout)
+
+
+def estadisticas_escritura() -> Optional[Dict[str, Any]]:
+    """Métricas de la escritura diferida, o None si no se usó todavía."""
+    if _escritor is None:
+        return None
+    return _escritor.stats()
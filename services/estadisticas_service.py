@@ -0,0 +1,90 @@
+# services/estadisticas_service.py
+"""
+Estadísticas diarias servidas desde el resumen `mediciones_diarias`,
+sin recorrer la tabla de mediciones.
+"""
+
+from datetime import date, timedelta
+from typing import Any, Dict, Optional
+
+from repositories.estadisticas_repository import (
+    METRICAS,
+    obtener_resumen_diario,
+    obtener_resumen_por_rango,
+    recalcular_resumen,
+)
+from services.filtros import FiltroInvalido
+from services.normalizacion import normalizar_nombre
+
+
+DIAS_POR_DEFECTO = 30
+DIAS_MAXIMO = 366
+
+
+def rango_de_fechas(desde: Optional[date], hasta: Optional[date], maximo: int = DIAS_MAXIMO):
+    """
+    Completa y valida el rango pedido: sin 'hasta' es hoy, sin 'desde'
+    son los últimos DIAS_POR_DEFECTO días. Como máximo `maximo` días.
+
+    :raises FiltroInvalido: si el rango está invertido o es demasiado largo.
+    """
+    if hasta is None:
+        hasta = date.today() if desde is None else desde + timedelta(days=DIAS_POR_DEFECTO - 1)
+    if desde is None:
+        desde = hasta - timedelta(days=DIAS_POR_DEFECTO - 1)
+
+    if desde > hasta:
+        raise FiltroInvalido("'desde' no puede ser posterior a 'hasta'.")
+    if (hasta - desde).days + 1 > maximo:
+        raise FiltroInvalido(f"El rango de fechas no puede superar {maximo} días.")
+    return desde, hasta
+
+
+def _con_promedios(fila: Dict[str, Any]) -> Dict[str, Any]:
+    cantidad = fila["cantidad"]
+    for metrica in METRICAS:
+        datos = fila[metrica]
+        suma = datos.pop("suma")
+        datos["promedio"] = round(suma / cantidad, 2) if cantidad else None
+    fila["fecha"] = fila["fecha"].isoformat()
+    return fila
+
+
+def obtener_estadisticas(
+    id_ciudad: Optional[int] = None,
+    ciudad: Optional[str] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+) -> Dict[str, Any]:
+    """
+    Estadísticas por ciudad y día (promedio / mínimo / máximo de cada
+    métrica) y días por rango, filtradas por ciudad y rango de fechas.
+
+    :param id_ciudad: filtra por id de ciudad.
+    :param ciudad: filtra por nombre (sin importar tildes ni mayúsculas).
+    :return: {"desde", "hasta", "dias": [...], "rangos": [...]}
+    """
+    desde, hasta = rango_de_fechas(desde, hasta)
+    filtros = {
+        "id_ciudad": id_ciudad,
+        "nombre_normalizado": normalizar_nombre(ciudad) if ciudad else None,
+        "desde": desde,
+        "hasta": hasta,
+    }
+
+    return {
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "dias": [_con_promedios(f) for f in obtener_resumen_diario(**filtros)],
+        "rangos": obtener_resumen_por_rango(**filtros),
+    }
+
+
+def recalcular_estadisticas(desde: date, hasta: date) -> int:
+    """
+    Catch-up idempotente del resumen para los días [desde, hasta].
+    Devuelve la cantidad de filas de resumen generadas.
+    """
+    if desde > hasta:
+        raise FiltroInvalido("'desde' no puede ser posterior a 'hasta'.")
+    return recalcular_resumen(desde, hasta)
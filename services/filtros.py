@@ -0,0 +1,78 @@
+# services/filtros.py
+"""
+Validación de los parámetros de filtro que llegan por query string.
+"""
+
+from datetime import date
+from typing import List, Optional
+
+
+class FiltroInvalido(ValueError):
+    """Se lanza cuando un parámetro de filtro no tiene un formato válido."""
+    pass
+
+
+def parsear_fecha(valor: Optional[str], nombre: str) -> Optional[date]:
+    """
+    Convierte 'YYYY-MM-DD' en date. Vacío o None -> None.
+
+    :raises FiltroInvalido: si el formato no es válido.
+    """
+    if valor is None or not valor.strip():
+        return None
+    try:
+        return date.fromisoformat(valor.strip())
+    except ValueError as exc:
+        raise FiltroInvalido(
+            f"'{nombre}' debe tener formato YYYY-MM-DD (recibido: {valor!r})."
+        ) from exc
+
+
+def parsear_entero(valor: Optional[str], nombre: str) -> Optional[int]:
+    """
+    Convierte un entero del query string. Vacío o None -> None.
+
+    :raises FiltroInvalido: si no es un entero.
+    """
+    if valor is None or not valor.strip():
+        return None
+    try:
+        return int(valor.strip())
+    except ValueError as exc:
+        raise FiltroInvalido(f"'{nombre}' debe ser un entero (recibido: {valor!r}).") from exc
+
+
+def parsear_lista_enteros(valor: Optional[str], nombre: str) -> Optional[List[int]]:
+    """
+    Convierte enteros separados por coma ('1,2,3'), sin repetidos. Vacío o None -> None.
+
+    :raises FiltroInvalido: si algún elemento no es un entero.
+    """
+    if valor is None or not valor.strip():
+        return None
+    numeros = []
+    for parte in valor.split(","):
+        try:
+            numeros.append(int(parte.strip()))
+        except ValueError as exc:
+            raise FiltroInvalido(
+                f"'{nombre}' debe ser una lista de enteros separados por coma (recibido: {valor!r})."
+            ) from exc
+    return list(dict.fromkeys(numeros))
+
+
+def parsear_decimal(valor: Optional[str], nombre: str) -> Optional[float]:
+    """
+    Convierte un número (admite decimales) del query string. Vacío o None -> None.
+
+    :raises FiltroInvalido: si no es un número finito.
+    """
+    if valor is None or not valor.strip():
+        return None
+    try:
+        numero = float(valor.strip())
+    except ValueError as exc:
+        raise FiltroInvalido(f"'{nombre}' debe ser un número (recibido: {valor!r}).") from exc
+    if numero != numero or numero in (float("inf"), float("-inf")):
+        raise FiltroInvalido(f"'{nombre}' debe ser un número (recibido: {valor!r}).")
+    return numero
@@ -0,0 +1,156 @@
+# services/geocoding_service.py
+"""
+Geocoding con caché de dos niveles delante de la API de Open-Meteo.
+
+1) LRU en memoria del proceso, por nombre normalizado (sin tildes, minúsculas).
+2) Base de datos: la tabla `ciudad_alias`, por el nombre consultado tal
+   como lo escribió el usuario (normalizado), y si no, las columnas
+   latitud/longitud/pais_nombre de `ciudad` por nombre_normalizado
+   (lecturas indexadas). Así "CABA" o "Cordoba, AR", que no son el nombre
+   canónico que devuelve la API, tampoco vuelven a la API en otro proceso.
+3) Recién si no está en ninguno, se llama a la API y el resultado se
+   guarda en los dos niveles.
+
+Las coordenadas de una ciudad no cambian, así que los aciertos no vencen.
+Los "no encontrada" se guardan solo GEOCODING_TTL_NEGATIVO segundos.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from repositories.ciudad_repository import guardar_alias_geo, obtener_ciudad_geo
+from services.cache import CacheLRU, FALTA
+from services.clima_service import CiudadGeo, CiudadNoEncontrada, geocodificar_ciudad
+from services.normalizacion import normalizar_nombre
+
+
+GEOCODING_CACHE_TAMANIO = int(os.getenv("GEOCODING_CACHE_TAMANIO", "10000"))
+GEOCODING_TTL_NEGATIVO = float(os.getenv("GEOCODING_TTL_NEGATIVO", "300"))
+
+# Valor guardado en la caché para las ciudades que la API no encontró
+_NO_ENCONTRADA = object()
+
+_cache = CacheLRU(maxsize=GEOCODING_CACHE_TAMANIO)
+_lock = threading.Lock()
+_contadores = {
+    "hits_memoria": 0,
+    "hits_bd": 0,
+    "hits_negativos": 0,
+    "llamadas_api": 0,
+    "no_encontradas": 0,
+    "errores_guardar_bd": 0,
+}
+
+
+def _contar(nombre: str) -> None:
+    with _lock:
+        _contadores[nombre] += 1
+
+
+def buscar_geocoding_en_cache(nombre_ciudad: str) -> Optional[CiudadGeo]:
+    """
+    Busca la ciudad en la caché en memoria y después en la tabla `ciudad`,
+    sin llamar a la API.
+
+    :return: CiudadGeo, o None si hay que preguntarle a la API.
+    :raises CiudadNoEncontrada: si hay un negativo vigente en la caché.
+    """
+    clave = normalizar_nombre(nombre_ciudad)
+
+    # 1) Memoria
+    cacheado = _cache.get(clave)
+    if cacheado is _NO_ENCONTRADA:
+        _contar("hits_negativos")
+        raise CiudadNoEncontrada(f"No se encontró la ciudad '{nombre_ciudad}'.")
+    if cacheado is not FALTA:
+        _contar("hits_memoria")
+        return cacheado
+
+    # 2) Base de datos
+    fila = obtener_ciudad_geo(clave)
+    if fila is not None:
+        _contar("hits_bd")
+        ciudad_geo = CiudadGeo(
+            nombre=fila["nombre"],
+            pais=fila["pais_nombre"] or "",
+            codigo_pais=fila["codigo_pais"] or "",
+            latitud=fila["latitud"],
+            longitud=fila["longitud"],
+        )
+        _cache.set(clave, ciudad_geo)
+        return ciudad_geo
+
+    return None
+
+
+def guardar_geocoding(nombre_ciudad: str, ciudad_geo: Optional[CiudadGeo]) -> None:
+    """
+    Guarda el resultado de una consulta a la API en la caché en memoria.
+    ciudad_geo=None significa "no encontrada" (se guarda con TTL corto).
+    """
+    clave = normalizar_nombre(nombre_ciudad)
+    _contar("llamadas_api")
+    if ciudad_geo is None:
+        _contar("no_encontradas")
+        _cache.set(clave, _NO_ENCONTRADA, ttl=GEOCODING_TTL_NEGATIVO)
+    else:
+        _cache.set(clave, ciudad_geo)
+
+
+def persistir_geocoding(nombre_ciudad: str, ciudad_geo: CiudadGeo) -> None:
+    """
+    Guarda el resultado de la API en `ciudad_alias`, con el nombre
+    consultado (normalizado) como clave. Si la BD falla solo se cuenta:
+    la caché es una optimización y el geocoding ya se resolvió.
+    """
+    try:
+        guardar_alias_geo(normalizar_nombre(nombre_ciudad), {
+            "nombre": ciudad_geo.nombre,
+            "pais_nombre": ciudad_geo.pais or None,
+            "codigo_pais": ciudad_geo.codigo_pais or None,
+            "latitud": ciudad_geo.latitud,
+            "longitud": ciudad_geo.longitud,
+        })
+    except Exception:
+        _contar("errores_guardar_bd")
+
+
+def geocodificar_ciudad_cacheado(nombre_ciudad: str) -> CiudadGeo:
+    """
+    Igual que clima_service.geocodificar_ciudad, pero pasando antes por
+    la caché en memoria y por la tabla `ciudad`.
+
+    :raises CiudadNoEncontrada: si la API no la encuentra (o no la encontró
+        hace menos de GEOCODING_TTL_NEGATIVO segundos).
+    :raises ErrorAPIClima: si hay un problema de red o de respuesta.
+    """
+    ciudad_geo = buscar_geocoding_en_cache(nombre_ciudad)
+    if ciudad_geo is not None:
+        return ciudad_geo
+
+    # 3) API
+    try:
+        ciudad_geo = geocodificar_ciudad(nombre_ciudad)
+    except CiudadNoEncontrada:
+        guardar_geocoding(nombre_ciudad, None)
+        raise
+
+    guardar_geocoding(nombre_ciudad, ciudad_geo)
+    persistir_geocoding(nombre_ciudad, ciudad_geo)
+    return ciudad_geo
+
+
+def estadisticas_geocoding() -> Dict[str, Any]:
+    """Contadores de aciertos/fallos por nivel y estado de la LRU."""
+    with _lock:
+        contadores = dict(_contadores)
+    contadores["cache"] = _cache.stats()
+    return contadores
+
+
+def limpiar_cache_geocoding() -> None:
+    """Vacía la caché en memoria (la de la BD no se toca)."""
+    _cache.clear()
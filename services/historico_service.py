@@ -0,0 +1,260 @@
+# services/historico_service.py
+"""
+Carga del historial horario de una ciudad desde la API de archivo de
+Open-Meteo (backfill): una ciudad recién seguida arranca con historia y
+no solo con la medición de "ahora".
+
+cargar_historico(ciudad, desde, hasta):
+1) geocodifica la ciudad (con caché, como POST /api/mediciones),
+2) pide la serie horaria de a tramos de HISTORICO_DIAS_POR_PEDIDO días,
+3) cada tramo llega en columnas (clima_service.parsear_hourly) que se
+   escriben tal cual como CSV en memoria y entran por la importación
+   masiva: COPY en PostgreSQL, el rango sale de un join con el catálogo
+   (por conjuntos, no fila por fila) y el merge saltea las (ciudad, fecha)
+   que ya estaban. Volver a cargar el mismo rango no duplica nada, ni
+   dos cargas que se pisan (índice único por ciudad y fecha).
+
+Cada tramo se confirma por separado: si la carga se corta, lo ya cargado
+queda y el avance informa `completado_hasta` para retomar desde el día
+siguiente (cargar_historico.py lo guarda en un archivo con --estado).
+El archivo de Open-Meteo se publica con unos días de atraso: las últimas
+horas de un rango que llega hasta hoy vienen sin datos, y
+`completado_hasta` no avanza sobre ellas (ver ultimo_dia_con_datos), así
+una carga retomada más adelante las vuelve a pedir.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from itertools import repeat
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from repositories.mediciones_repository import importar_mediciones_csv
+from services.carga_masiva_service import en_segundo_plano, linea_ndjson
+from services.clima_service import CiudadGeo, obtener_historico_horario
+from services.filtros import FiltroInvalido
+from services.geocoding_service import geocodificar_ciudad_cacheado
+from services.mediciones_service import PROVINCIA_DESCONOCIDA, pais_de
+from services.normalizacion import normalizar_nombre
+from services.sugerencias_service import invalidar_indice
+from services.ultimas_mediciones import invalidar_ultimas
+from services.version_datos import registrar_escritura
+
+
+HISTORICO_DIAS_POR_PEDIDO = int(os.getenv("HISTORICO_DIAS_POR_PEDIDO", "31"))
+HISTORICO_DIAS_MAXIMO = int(os.getenv("HISTORICO_DIAS_MAXIMO", "3660"))
+
+# Columnas del CSV de cada tramo (subconjunto de csv_masivo.COLUMNAS_CSV)
+COLUMNAS_HISTORICO = [
+    "fecha", "ciudad", "pais", "provincia", "temperatura", "humedad",
+    "sensacion_termica", "presion", "velocidad_viento", "descripcion",
+]
+
+# Se suman tramo a tramo en el resumen
+CONTADORES = ("filas", "insertadas", "duplicadas", "descartadas", "ciudades_creadas")
+
+
+def hoy_utc() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def validar_rango(desde: Optional[date], hasta: Optional[date]) -> None:
+    """
+    :raises FiltroInvalido: si falta alguna fecha, el rango está invertido,
+        termina en el futuro o supera HISTORICO_DIAS_MAXIMO días.
+    """
+    if desde is None or hasta is None:
+        raise FiltroInvalido("Se requieren 'desde' y 'hasta' (YYYY-MM-DD).")
+    if desde > hasta:
+        raise FiltroInvalido("'desde' no puede ser posterior a 'hasta'.")
+    if hasta > hoy_utc():
+        raise FiltroInvalido("'hasta' no puede ser una fecha futura.")
+    if (hasta - desde).days + 1 > HISTORICO_DIAS_MAXIMO:
+        raise FiltroInvalido(f"El rango de fechas no puede superar {HISTORICO_DIAS_MAXIMO} días.")
+
+
+def tramos(desde: date, hasta: date, dias: int = HISTORICO_DIAS_POR_PEDIDO) -> List[Tuple[date, date]]:
+    """[desde, hasta] en tramos consecutivos de hasta `dias` días (inclusive)."""
+    if dias < 1:
+        raise ValueError("'dias' debe ser al menos 1.")
+    resultado = []
+    inicio = desde
+    while inicio <= hasta:
+        fin = min(hasta, inicio + timedelta(days=dias - 1))
+        resultado.append((inicio, fin))
+        inicio = fin + timedelta(days=1)
+    return resultado
+
+
+def ultimo_dia_con_datos(columnas: Dict[str, list], fin: date) -> Optional[date]:
+    """
+    Último día del tramo que se puede dar por cargado: `fin` si la última
+    hora trae datos; si el tramo termina en horas sin datos (todavía no
+    publicadas), el día anterior a la primera de ellas; None si no trae
+    ningún dato. Las horas sueltas sin datos en el medio no cuentan: esas
+    no van a aparecer después.
+    """
+    temperaturas = columnas["temperatura"]
+    i = len(temperaturas)
+    while i > 0 and temperaturas[i - 1] is None:
+        i -= 1
+    if i == 0:
+        return None
+    if i == len(temperaturas):
+        return fin
+    return date.fromisoformat(columnas["fecha"][i][:10]) - timedelta(days=1)
+
+
+def csv_de_columnas(columnas: Dict[str, list], ciudad: str, pais: str, provincia: str) -> io.StringIO:
+    """
+    Columnas de parsear_hourly -> CSV en memoria (sin encabezado, listo
+    para leer) con COLUMNAS_HISTORICO. None queda vacío (NULL): esas horas
+    la importación las cuenta como descartadas.
+    """
+    n = len(columnas["fecha"])
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(zip(
+        columnas["fecha"], repeat(ciudad, n), repeat(pais, n), repeat(provincia, n),
+        columnas["temperatura"], columnas["humedad"], columnas["sensacion_termica"],
+        columnas["presion"], columnas["velocidad_viento"], columnas["descripcion"],
+    ))
+    buffer.seek(0)
+    return buffer
+
+
+def preparar_historico(nombre_ciudad: str, desde: Optional[date], hasta: Optional[date]) -> CiudadGeo:
+    """
+    Valida el rango y geocodifica la ciudad (lo que puede fallar antes de
+    empezar a cargar).
+
+    :raises FiltroInvalido: si el rango no es válido.
+    :raises CiudadNoEncontrada / ErrorAPIClima: como en POST /api/mediciones.
+    """
+    validar_rango(desde, hasta)
+    return geocodificar_ciudad_cacheado(nombre_ciudad)
+
+
+def cargar_historico(
+    nombre_ciudad: str,
+    desde: Optional[date],
+    hasta: Optional[date],
+    progreso: Optional[Callable[[Dict], None]] = None,
+    dias_por_pedido: int = HISTORICO_DIAS_POR_PEDIDO,
+) -> Dict[str, Any]:
+    """
+    Carga las mediciones horarias de [desde, hasta] (días UTC) de la ciudad.
+
+    :param progreso: se llama después de confirmar cada tramo con
+        {"tramo", "tramos", "completado_hasta", ...contadores acumulados}.
+    :return: {"ciudad", "desde", "hasta", "tramos", "completado_hasta",
+        "filas", "insertadas", "duplicadas", "descartadas",
+        "ciudades_creadas", "segundos", "filas_por_segundo"}
+    :raises FiltroInvalido / CiudadNoEncontrada / ErrorAPIClima
+    """
+    ciudad_geo = preparar_historico(nombre_ciudad, desde, hasta)
+    return cargar_tramos(ciudad_geo, desde, hasta, progreso, dias_por_pedido)
+
+
+def cargar_tramos(
+    ciudad_geo: CiudadGeo,
+    desde: date,
+    hasta: date,
+    progreso: Optional[Callable[[Dict], None]] = None,
+    dias_por_pedido: int = HISTORICO_DIAS_POR_PEDIDO,
+) -> Dict[str, Any]:
+    """Pide e importa tramo por tramo (ver cargar_historico)."""
+    pais = pais_de(ciudad_geo)
+    partes = tramos(desde, hasta, dias_por_pedido)
+    totales = dict.fromkeys(CONTADORES, 0)
+    completado_hasta = None
+    inicio = time.perf_counter()
+
+    try:
+        for numero, (inicio_tramo, fin_tramo) in enumerate(partes, start=1):
+            columnas = obtener_historico_horario(
+                ciudad_geo.latitud, ciudad_geo.longitud, inicio_tramo, fin_tramo
+            )
+            resumen = importar_mediciones_csv(
+                csv_de_columnas(columnas, ciudad_geo.nombre, pais, PROVINCIA_DESCONOCIDA),
+                COLUMNAS_HISTORICO,
+                normalizar_nombre,
+            )
+            for contador in CONTADORES:
+                totales[contador] += resumen[contador]
+            con_datos = ultimo_dia_con_datos(columnas, fin_tramo)
+            if con_datos is not None and (completado_hasta is None or con_datos.isoformat() > completado_hasta):
+                completado_hasta = con_datos.isoformat()
+
+            if progreso is not None:
+                progreso({
+                    "tramo": numero,
+                    "tramos": len(partes),
+                    "completado_hasta": completado_hasta,
+                    **totales,
+                    "segundos": round(time.perf_counter() - inicio, 3),
+                })
+    finally:
+        registrar_escritura()
+        if totales["insertadas"] or totales["ciudades_creadas"]:
+            # Igual que tras importar un CSV (también si se cortó a mitad)
+            invalidar_indice()
+            invalidar_ultimas()
+
+    segundos = round(time.perf_counter() - inicio, 3)
+    return {
+        "ciudad": {
+            "nombre": ciudad_geo.nombre,
+            "pais": pais,
+            "latitud": ciudad_geo.latitud,
+            "longitud": ciudad_geo.longitud,
+        },
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "tramos": len(partes),
+        "completado_hasta": completado_hasta,
+        **totales,
+        "segundos": segundos,
+        "filas_por_segundo": round(totales["filas"] / segundos, 1) if segundos > 0 else 0.0,
+    }
+
+
+def cargar_historico_con_avance(nombre_ciudad: str, desde: Optional[date], hasta: Optional[date]) -> Iterator[str]:
+    """
+    Valida y geocodifica YA (las excepciones de preparar_historico salen
+    antes de empezar a responder) y devuelve un generador de líneas NDJSON:
+
+        {"estado": "cargando", "tramo", "tramos", "completado_hasta", "insertadas", ...}  (por tramo)
+        {"estado": "terminado", ...resumen de cargar_historico}
+        {"estado": "error", "error", "detalle", "completado_hasta"}  si falla a mitad de camino
+            (los tramos anteriores quedan cargados: se retoma desde el día siguiente)
+    """
+    ciudad_geo = preparar_historico(nombre_ciudad, desde, hasta)
+    avance = {"completado_hasta": None}
+
+    def tarea(emitir):
+        def progreso(estado):
+            avance["completado_hasta"] = estado["completado_hasta"]
+            emitir({"estado": "cargando", **estado})
+
+        return cargar_tramos(ciudad_geo, desde, hasta, progreso)
+
+    def lineas():
+        try:
+            for item in en_segundo_plano(tarea, nombre="historico"):
+                if isinstance(item, tuple):
+                    yield linea_ndjson({"estado": "terminado", **item[1]})
+                else:
+                    yield linea_ndjson(item)
+        except Exception as e:
+            yield linea_ndjson({
+                "estado": "error",
+                "error": "No se pudo cargar el historial",
+                "detalle": str(e),
+                "completado_hasta": avance["completado_hasta"],
+            })
+
+    return lineas()
@@ -0,0 +1,305 @@
+# services/ingesta_async.py
+"""
+Motor de ingesta asíncrono (asyncio) para capturar muchas ciudades a la vez.
+
+Es un camino alternativo a registrar_medicion_desde_api, pensado para
+cargas grandes (listas de ciudades, CLI, scheduler):
+
+    ciudad -> geocoding -> clima -> rango -> cola -> escritor por lotes
+
+- Las llamadas HTTP a Open-Meteo son asíncronas (aiohttp) y cada ciudad
+  avanza de geocoding a clima apenas tiene sus coordenadas, sin esperar
+  a las demás. Un semáforo limita cuántas ciudades están en vuelo.
+- Usa las mismas cachés que el camino síncrono (geocoding y clima),
+  las mismas URLs base, reintentos y métricas del cliente de Open-Meteo.
+- La BD se usa a través del pool de psycopg2, desde un ThreadPoolExecutor
+  del mismo tamaño que el pool: el event loop nunca se bloquea esperando
+  a PostgreSQL. Un único escritor agrupa las mediciones listas y las
+  inserta con registrar_mediciones_lote (una transacción por lote).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from database.config_db import get_pool_config
+from repositories.mediciones_repository import registrar_mediciones_lote
+from services.clima_service import (
+    CiudadNoEncontrada,
+    ErrorAPIClima,
+    guardar_clima_en_cache,
+    obtener_clima_cacheado,
+    parametros_clima_actual,
+    parametros_geocoding,
+    parsear_current,
+    parsear_geocoding,
+)
+from services.geocoding_service import (
+    buscar_geocoding_en_cache,
+    guardar_geocoding,
+    persistir_geocoding,
+)
+from services.mediciones_service import (
+    armar_resultado,
+    fila_para_lote,
+    pais_de,
+    valores_medicion,
+)
+from services.open_meteo_client import ESTADOS_REINTENTABLES, cliente
+from services.rangos_service import obtener_clasificador
+from services.sugerencias_service import registrar_ciudad_medida
+from services.ultimas_mediciones import registrar_medicion_reciente
+from services.version_datos import registrar_escritura
+
+
+CONCURRENCIA_POR_DEFECTO = 20
+TAMANIO_LOTE_POR_DEFECTO = 50
+
+
+async def _get_json(session: aiohttp.ClientSession, endpoint: str, params: Dict[str, Any]) -> Any:
+    """
+    GET asíncrono con la misma política de reintentos que ClienteOpenMeteo.get.
+
+    :raises ErrorAPIClima: si falla la red en todos los intentos o la
+        respuesta final no es 200.
+    """
+    url = cliente.url(endpoint)
+    inicio = time.perf_counter()
+    reintentos = 0
+
+    for intento in range(cliente.reintentos + 1):
+        ultimo = intento == cliente.reintentos
+        retry_after = None
+        try:
+            async with session.get(url, params=params) as resp:
+                if resp.status in ESTADOS_REINTENTABLES and not ultimo:
+                    retry_after = resp.headers.get("Retry-After")
+                else:
+                    cliente.registrar_llamada(
+                        endpoint, time.perf_counter() - inicio, reintentos, resp.status >= 400
+                    )
+                    if resp.status != 200:
+                        raise ErrorAPIClima(
+                            f"Error en {endpoint} (status {resp.status}): {await resp.text()}"
+                        )
+                    return await resp.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            if ultimo:
+                cliente.registrar_llamada(endpoint, time.perf_counter() - inicio, reintentos, True)
+                raise ErrorAPIClima(f"Error de red al consultar {endpoint}: {exc}") from exc
+
+        reintentos += 1
+        await asyncio.sleep(cliente.espera_reintento(intento, retry_after))
+
+    raise RuntimeError("Bucle de reintentos terminado sin resultado")
+
+
+class IngestaAsync:
+    """
+    Una corrida de ingesta. Se usa a través de ingerir_ciudades().
+    """
+
+    def __init__(self, concurrencia: int, tamanio_lote: int, ejecutor: ThreadPoolExecutor):
+        self.concurrencia = concurrencia
+        self.tamanio_lote = tamanio_lote
+        self.ejecutor = ejecutor
+        self.resultados: List[Dict[str, Any]] = []
+        self.errores: List[Dict[str, Any]] = []
+        self.lotes_escritos = 0
+
+    async def _en_hilo(self, funcion, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.ejecutor, funcion, *args)
+
+    def _error(self, consulta: str, error: str, exc: Exception) -> None:
+        self.errores.append({"consulta": consulta, "error": error, "detalle": str(exc)})
+
+    # -----------------------------
+    # Productores: una corrutina por ciudad
+    # -----------------------------
+
+    async def _procesar(self, session, semaforo, cola, nombre: str) -> None:
+        async with semaforo:
+            try:
+                # 1) Geocoding: caché en memoria / BD (en hilo) y si no, API
+                ciudad_geo = await self._en_hilo(buscar_geocoding_en_cache, nombre)
+                if ciudad_geo is None:
+                    data = await _get_json(session, "geocoding", parametros_geocoding(nombre))
+                    try:
+                        ciudad_geo = parsear_geocoding(data, nombre)
+                    except CiudadNoEncontrada:
+                        guardar_geocoding(nombre, None)
+                        raise
+                    guardar_geocoding(nombre, ciudad_geo)
+                    await self._en_hilo(persistir_geocoding, nombre, ciudad_geo)
+
+                # 2) Clima actual: caché y si no, API
+                clima = obtener_clima_cacheado(ciudad_geo.latitud, ciudad_geo.longitud)
+                hit = clima is not None
+                if not hit:
+                    data = await _get_json(
+                        session,
+                        "forecast",
+                        parametros_clima_actual(ciudad_geo.latitud, ciudad_geo.longitud),
+                    )
+                    clima = parsear_current(data.get("current") or {})
+                    guardar_clima_en_cache(ciudad_geo.latitud, ciudad_geo.longitud, clima)
+
+                # 3) Rango en memoria
+                valores = valores_medicion(clima)
+                rango = obtener_clasificador().clasificar(valores["temperatura"])
+                if rango is None:
+                    raise ValueError(
+                        f"No se encontró un rango de temperatura válido para {valores['temperatura']}°C"
+                    )
+
+                info_cache = {
+                    "hit": hit,
+                    "compartida": False,
+                    "edad_segundos": round(max(0.0, time.time() - clima.obtenido_en), 1),
+                }
+                fila = fila_para_lote(ciudad_geo, valores, rango)
+
+            except CiudadNoEncontrada as e:
+                self._error(nombre, "Ciudad no encontrada", e)
+                return
+            except ErrorAPIClima as e:
+                self._error(nombre, "Error al consultar la API de clima", e)
+                return
+            except Exception as e:
+                # Como en el camino por lotes síncrono: una ciudad que falla
+                # (BD, respuesta inesperada, ...) no corta la corrida
+                self._error(nombre, "No se pudo registrar la medición", e)
+                return
+
+            await cola.put((nombre, ciudad_geo, fila, rango, info_cache))
+
+    # -----------------------------
+    # Consumidor: escritor por lotes
+    # -----------------------------
+
+    async def _escribir(self, lote) -> None:
+        try:
+            registros = await self._en_hilo(registrar_mediciones_lote, [item[2] for item in lote])
+        except Exception as e:
+            for item in lote:
+                self._error(item[0], "No se pudo registrar la medición", e)
+            return
+
+        self.lotes_escritos += 1
+        registrar_escritura()
+        for item, registro in zip(lote, registros):
+            registrar_ciudad_medida(registro["ciudad"])
+            registrar_medicion_reciente(registro, item[2])
+        for (consulta, ciudad_geo, fila, rango, info_cache), registro in zip(lote, registros):
+            self.resultados.append(
+                armar_resultado(consulta, registro, rango, fila, ciudad_geo, info_cache)
+            )
+
+    async def _escritor(self, cola: asyncio.Queue) -> None:
+        lote = []
+        claves = set()
+        while True:
+            item = await cola.get()
+            if item is None:
+                break
+
+            ciudad_geo = item[1]
+            clave = (ciudad_geo.nombre, pais_de(ciudad_geo))
+            # Un lote no puede tener dos veces la misma ciudad (upsert)
+            if clave in claves:
+                await self._escribir(lote)
+                lote, claves = [], set()
+
+            lote.append(item)
+            claves.add(clave)
+
+            # Se escribe al llenar el lote o cuando no hay nada más esperando:
+            # mientras se escribe, la cola sigue llenándose para el próximo
+            if len(lote) >= self.tamanio_lote or cola.empty():
+                await self._escribir(lote)
+                lote, claves = [], set()
+
+        if lote:
+            await self._escribir(lote)
+
+    # -----------------------------
+    # Corrida completa
+    # -----------------------------
+
+    async def correr(self, nombres: List[str]) -> None:
+        # El catálogo de rangos se carga antes (puede ir a la BD)
+        await self._en_hilo(obtener_clasificador)
+
+        semaforo = asyncio.Semaphore(self.concurrencia)
+        cola: asyncio.Queue = asyncio.Queue(maxsize=self.tamanio_lote * 4)
+        timeout = aiohttp.ClientTimeout(
+            sock_connect=cliente.timeout[0],
+            sock_read=cliente.timeout[1],
+        )
+        conector = aiohttp.TCPConnector(limit=self.concurrencia)
+
+        async with aiohttp.ClientSession(timeout=timeout, connector=conector) as session:
+            escritor = asyncio.create_task(self._escritor(cola))
+            try:
+                # return_exceptions: gather vuelve recién cuando terminaron
+                # todos los productores, aunque alguno haya fallado
+                fallas = await asyncio.gather(*(
+                    self._procesar(session, semaforo, cola, nombre) for nombre in nombres
+                ), return_exceptions=True)
+                for nombre, falla in zip(nombres, fallas):
+                    if isinstance(falla, Exception):
+                        self._error(nombre, "No se pudo registrar la medición", falla)
+            finally:
+                # Después de esto nadie más encola: el escritor vacía y termina
+                await cola.put(None)
+                await escritor
+
+
+async def ingerir_ciudades(
+    nombres: List[str],
+    concurrencia: int = CONCURRENCIA_POR_DEFECTO,
+    tamanio_lote: int = TAMANIO_LOTE_POR_DEFECTO,
+    ejecutor: Optional[ThreadPoolExecutor] = None,
+) -> Dict[str, Any]:
+    """
+    Captura una medición por cada ciudad de `nombres`.
+
+    :param concurrencia: ciudades en vuelo a la vez (y conexiones HTTP).
+    :param tamanio_lote: máximo de mediciones por transacción.
+    :param ejecutor: hilos para la BD; por defecto uno del tamaño del pool.
+    :return: {"resultados", "errores", "segundos", "ciudades_por_segundo", "lotes"}
+    """
+    propio = ejecutor is None
+    if propio:
+        ejecutor = ThreadPoolExecutor(
+            max_workers=get_pool_config()["maxconn"],
+            thread_name_prefix="ingesta-bd",
+        )
+
+    ingesta = IngestaAsync(concurrencia, tamanio_lote, ejecutor)
+    inicio = time.perf_counter()
+    try:
+        await ingesta.correr(nombres)
+    finally:
+        if propio:
+            ejecutor.shutdown(wait=True)
+    segundos = time.perf_counter() - inicio
+
+    return {
+        "resultados": ingesta.resultados,
+        "errores": ingesta.errores,
+        "segundos": round(segundos, 3),
+        "ciudades_por_segundo": round(len(nombres) / segundos, 2) if segundos > 0 else None,
+        "lotes": ingesta.lotes_escritos,
+    }
+
+
+def ingerir_ciudades_sync(nombres: List[str], **kwargs) -> Dict[str, Any]:
+    """Atajo para usar el motor desde código síncrono (asyncio.run)."""
+    return asyncio.run(ingerir_ciudades(nombres, **kwargs))
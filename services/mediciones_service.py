@@ -1,81 +1,124 @@
 # services/mediciones_service.py
 
-from repositories.ciudad_repository import (
-    obtener_ciudad_por_nombre,
-    crear_ciudad,
-)
+import base64
+import binascii
+import hashlib
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
 
 from repositories.mediciones_repository import (
-    obtener_rango_por_temperatura,
-    insertar_medicion,
+    registrar_medicion_atomica,
+    registrar_mediciones_lote,
     obtener_todas_las_mediciones,
+    obtener_pagina_mediciones,
+    obtener_pagina_con_version,
+    iterar_mediciones,
+    fila_a_medicion,
+)
+
+from services.rangos_service import clasificar_lote, clasificar_temperatura
+from services.geocoding_service import geocodificar_ciudad_cacheado
+from services.normalizacion import normalizar_nombre
+from services.filtros import FiltroInvalido
+from services.cache import CacheLRU, FALTA
+from services.version_datos import (
+    marca_version,
+    observar_version,
+    registrar_escritura,
+    version_actual,
+)
+from services.sugerencias_service import registrar_ciudad_medida
+from services.ultimas_mediciones import registrar_medicion_reciente
+from instrumentacion.latencias import medir
+from services.carga_masiva_service import exportar_csv_en_bloques
+from services.escritura_diferida import (
+    ColaCerrada,
+    ColaLlena,
+    PENDIENTE,
+    encolar_medicion,
+    estado_pendiente,
 )
 
 from services.clima_service import (
-    geocodificar_ciudad,
-    obtener_clima_actual,
+    obtener_clima_actual_cacheado,
+    obtener_clima_actual_lote_cacheado,
     CiudadNoEncontrada,
     ErrorAPIClima,
 )
 
 
+PROVINCIA_DESCONOCIDA = "Desconocida"
+
+
 def registrar_medicion(
     nombre_ciudad: str,
     provincia: str,
     pais: str,
-    temperatura: int,
-    humedad: str,
-    sensacion_termica: str,
-    presion: str,
-    velocidad_viento: str,
+    temperatura: float,
+    humedad: int,
+    sensacion_termica: float,
+    presion: float,
+    velocidad_viento: float,
     descripcion: str,
+    pais_nombre: str = None,
+    latitud: float = None,
+    longitud: float = None,
 ):
     """
     Flujo base:
-    - busca o crea ciudad
-    - determina el rango según la temperatura
-    - inserta la medición
+    - determina el rango según la temperatura (en memoria, sin ir a la BD)
+    - busca o crea la ciudad e inserta la medición
+      (una sola sentencia y una sola transacción en la BD)
     - devuelve un resumen de lo ocurrido
     """
 
-    # 1) Ciudad: buscar o crear
-    ciudad = obtener_ciudad_por_nombre(nombre_ciudad)
-    if ciudad is None:
-        id_ciudad = crear_ciudad(nombre_ciudad, provincia, pais)
-        ciudad = {
-            "id_ciudad": id_ciudad,
-            "nombre": nombre_ciudad,
-            "provincia": provincia,
-            "pais": pais,
-        }
-    else:
-        id_ciudad = ciudad["id_ciudad"]
-
-    # 2) Rango: según temperatura
-    rango = obtener_rango_por_temperatura(temperatura)
+    # 1) Rango: según temperatura
+    with medir("rango"):
+        rango = clasificar_temperatura(temperatura)
     if rango is None:
         raise ValueError(
             f"No se encontró un rango de temperatura válido para {temperatura}°C"
         )
 
-    id_rango = rango["id_rango"]
-
-    # 3) Insertar medición
-    id_medicion = insertar_medicion(
-        id_ciudad=id_ciudad,
-        id_rango=id_rango,
+    # 2-3) Ciudad + medición, atómico
+    registro = registrar_medicion_atomica(
+        nombre_ciudad=nombre_ciudad,
+        provincia=provincia,
+        pais=pais,
+        id_rango=rango["id_rango"],
         temperatura=temperatura,
         humedad=humedad,
         sensacion_termica=sensacion_termica,
         presion=presion,
         velocidad_viento=velocidad_viento,
         descripcion=descripcion,
+        nombre_normalizado=normalizar_nombre(nombre_ciudad),
+        pais_nombre=pais_nombre,
+        latitud=latitud,
+        longitud=longitud,
     )
+    # Los próximos listados de este proceso no responden con la versión anterior
+    registrar_escritura()
+    valores = {
+        "id_rango": rango["id_rango"],
+        "temperatura": temperatura,
+        "humedad": humedad,
+        "sensacion_termica": sensacion_termica,
+        "presion": presion,
+        "velocidad_viento": velocidad_viento,
+        "descripcion": descripcion,
+    }
+    # El autocompletado y la última medición la ven sin releer la BD
+    registrar_ciudad_medida(registro["ciudad"])
+    registrar_medicion_reciente(registro, valores)
 
     # 4) Devolver resumen
     return {
-        "id_medicion": id_medicion,
-        "ciudad": ciudad,
+        "id_medicion": registro["id_medicion"],
+        "fecha": registro["fecha"],
+        "ciudad": registro["ciudad"],
         "rango": rango,
         "temperatura": temperatura,
         "humedad": humedad,
@@ -86,61 +129,81 @@ def registrar_medicion(
     }
 
 
-def registrar_medicion_desde_api(nombre_ciudad: str):
+def valores_medicion(clima):
     """
-    Versión automática:
-    - Recibe SOLO el nombre de la ciudad (como lo escribe el usuario).
-    - Usa la API de Open-Meteo para geocodificar (lat/lon) y obtener clima actual.
-    - Llama a registrar_medicion con todos los datos rellenados.
+    Convierte un ClimaActual en los valores que se guardan en `mediciones`:
+    los mismos números que devolvió la API (humedad en % entero).
+    Si falta algún dato se usa 0 (la sensación térmica cae en la temperatura).
     """
-
-    # 1) Geocodificar ciudad -> lat/lon + país
-    ciudad_geo = geocodificar_ciudad(nombre_ciudad)
-
-    # Provincia: no la tenemos, ponemos algo genérico
-    provincia = "Desconocida"
-    # País: priorizamos código ISO, si no el nombre completo
-    pais = ciudad_geo.codigo_pais or ciudad_geo.pais or "N/A"
-
-    # 2) Obtener clima actual en esas coordenadas
-    clima = obtener_clima_actual(ciudad_geo.latitud, ciudad_geo.longitud)
-
-    # Redondeamos los valores numéricos a algo razonable
-    temperatura = int(round(clima.temperatura))
+    temperatura = clima.temperatura
 
     if clima.humedad_relativa is not None:
-        humedad = str(int(round(clima.humedad_relativa)))
+        humedad = int(round(clima.humedad_relativa))
     else:
-        humedad = "0"
+        humedad = 0
 
     if clima.sensacion_termica is not None:
-        sensacion_termica = str(int(round(clima.sensacion_termica)))
+        sensacion_termica = clima.sensacion_termica
     else:
-        sensacion_termica = str(temperatura)
+        sensacion_termica = temperatura
 
-    if clima.presion is not None:
-        presion = str(int(round(clima.presion)))
-    else:
-        presion = "0"
+    presion = clima.presion if clima.presion is not None else 0.0
+    velocidad_viento = clima.velocidad_viento if clima.velocidad_viento is not None else 0.0
+
+    return {
+        "temperatura": temperatura,
+        "humedad": humedad,
+        "sensacion_termica": sensacion_termica,
+        "presion": presion,
+        "velocidad_viento": velocidad_viento,
+        "descripcion": clima.descripcion,
+    }
 
-    if clima.velocidad_viento is not None:
-        velocidad_viento = str(int(round(clima.velocidad_viento)))
-    else:
-        velocidad_viento = "0"
 
-    descripcion = clima.descripcion
+def pais_de(ciudad_geo):
+    """País que se guarda en `ciudad`: código ISO, si no el nombre completo."""
+    return ciudad_geo.codigo_pais or ciudad_geo.pais or "N/A"
+
+
+def medir_ciudad_desde_api(nombre_ciudad: str):
+    """
+    Geocodifica la ciudad y trae su clima actual (los dos con caché).
+
+    :return: (ciudad_geo, valores de valores_medicion, info de la caché de clima)
+    """
+    # 1) Geocodificar ciudad -> lat/lon + país (caché en memoria / BD / API)
+    with medir("geocoding"):
+        ciudad_geo = geocodificar_ciudad_cacheado(nombre_ciudad)
+
+    # 2) Obtener clima actual en esas coordenadas
+    #    (caché alineada a la actualización de Open-Meteo, cada 15 min)
+    with medir("clima"):
+        clima, info_cache = obtener_clima_actual_cacheado(
+            ciudad_geo.latitud, ciudad_geo.longitud
+        )
+
+    return ciudad_geo, valores_medicion(clima), info_cache
+
+
+def registrar_medicion_desde_api(nombre_ciudad: str):
+    """
+    Versión automática:
+    - Recibe SOLO el nombre de la ciudad (como lo escribe el usuario).
+    - Usa la API de Open-Meteo para geocodificar (lat/lon) y obtener clima actual.
+    - Llama a registrar_medicion con todos los datos rellenados.
+    """
+    ciudad_geo, valores, info_cache = medir_ciudad_desde_api(nombre_ciudad)
 
     # 3) Reusar el flujo base que inserta en la BD
+    #    (provincia: no la tenemos, ponemos algo genérico)
     resultado = registrar_medicion(
         nombre_ciudad=ciudad_geo.nombre,
-        provincia=provincia,
-        pais=pais,
-        temperatura=temperatura,
-        humedad=humedad,
-        sensacion_termica=sensacion_termica,
-        presion=presion,
-        velocidad_viento=velocidad_viento,
-        descripcion=descripcion,
+        provincia=PROVINCIA_DESCONOCIDA,
+        pais=pais_de(ciudad_geo),
+        **valores,
+        pais_nombre=ciudad_geo.pais or None,
+        latitud=ciudad_geo.latitud,
+        longitud=ciudad_geo.longitud,
     )
 
     # Podríamos anexar coords si querés, pero para el TP no es obligatorio
@@ -149,10 +212,209 @@ def registrar_medicion_desde_api(nombre_ciudad: str):
         "longitud": ciudad_geo.longitud,
         "codigo_pais": ciudad_geo.codigo_pais,
     }
+    # Qué tan frescos son los datos de clima (0 = recién consultados)
+    resultado["clima_cache"] = info_cache
 
     return resultado
 
 
+def encolar_medicion_desde_api(nombre_ciudad: str):
+    """
+    Como registrar_medicion_desde_api, pero con escritura diferida: mide y
+    clasifica igual, encola la fila y vuelve sin esperar el INSERT.
+    La `fecha` es la de la medición (se guarda tal cual, no la del INSERT,
+    que puede llegar segundos después con la cola cargada). La respuesta
+    tiene la misma forma salvo `id_medicion`, que se conoce recién al
+    escribir: en su lugar trae `id_provisional` y `estado` (ver
+    estado_medicion_pendiente).
+
+    :raises ColaLlena: si la cola de escritura siguió llena (contrapresión).
+    :raises ColaCerrada: si el proceso se está cerrando.
+    """
+    ciudad_geo, valores, info_cache = medir_ciudad_desde_api(nombre_ciudad)
+    fecha = datetime.now(timezone.utc)
+
+    with medir("rango"):
+        rango = clasificar_temperatura(valores["temperatura"])
+    if rango is None:
+        raise ValueError(
+            f"No se encontró un rango de temperatura válido para {valores['temperatura']}°C"
+        )
+
+    fila = {**fila_para_lote(ciudad_geo, valores, rango), "fecha": fecha}
+    with medir("escritura.encolar"):
+        id_provisional = encolar_medicion(fila)
+
+    return {
+        "id_provisional": id_provisional,
+        "estado": PENDIENTE,
+        "fecha": fecha.isoformat(),
+        "ciudad": {
+            "nombre": fila["nombre_ciudad"],
+            "provincia": fila["provincia"],
+            "pais": fila["pais"],
+        },
+        "rango": rango,
+        **valores,
+        "ciudad_geo": {
+            "latitud": ciudad_geo.latitud,
+            "longitud": ciudad_geo.longitud,
+            "codigo_pais": ciudad_geo.codigo_pais,
+        },
+        "clima_cache": info_cache,
+    }
+
+
+def estado_medicion_pendiente(id_provisional: str):
+    """
+    Estado de una medición encolada:
+    {"id_provisional", "estado": "pendiente" | "escrita" | "perdida",
+     "id_medicion" y "fecha" una vez escrita}, o None si el id no se conoce
+    (de otro proceso, o tan viejo que ya se olvidó).
+    """
+    estado = estado_pendiente(id_provisional)
+    if estado is None:
+        return None
+    return {"id_provisional": id_provisional, **estado}
+
+
+def armar_resultado(consulta, registro, rango, fila, ciudad_geo, info_cache):
+    """
+    Resultado de una medición registrada por lote, con la misma forma que
+    devuelve POST /api/mediciones más la consulta original.
+    """
+    return {
+        "consulta": consulta,
+        "id_medicion": registro["id_medicion"],
+        "fecha": registro["fecha"],
+        "ciudad": registro["ciudad"],
+        "rango": rango,
+        "temperatura": fila["temperatura"],
+        "humedad": fila["humedad"],
+        "sensacion_termica": fila["sensacion_termica"],
+        "presion": fila["presion"],
+        "velocidad_viento": fila["velocidad_viento"],
+        "descripcion": fila["descripcion"],
+        "ciudad_geo": {
+            "latitud": ciudad_geo.latitud,
+            "longitud": ciudad_geo.longitud,
+            "codigo_pais": ciudad_geo.codigo_pais,
+        },
+        "clima_cache": info_cache,
+    }
+
+
+def fila_para_lote(ciudad_geo, valores, rango):
+    """
+    Arma el dict que espera repositories.registrar_mediciones_lote
+    para una ciudad geocodificada, sus valores medidos y su rango.
+    """
+    return {
+        "nombre_ciudad": ciudad_geo.nombre,
+        "provincia": PROVINCIA_DESCONOCIDA,
+        "pais": pais_de(ciudad_geo),
+        "id_rango": rango["id_rango"],
+        **valores,
+        "nombre_normalizado": normalizar_nombre(ciudad_geo.nombre),
+        "pais_nombre": ciudad_geo.pais or None,
+        "latitud": ciudad_geo.latitud,
+        "longitud": ciudad_geo.longitud,
+    }
+
+
+# Máximo de ciudades por pedido de POST /api/mediciones/lote
+LOTE_MAXIMO_CIUDADES = 100
+
+
+def registrar_mediciones_lote_desde_api(nombres_ciudades):
+    """
+    Versión por lotes de registrar_medicion_desde_api:
+    - geocodifica cada ciudad (con caché),
+    - pide el clima de todas en una sola llamada multi-ubicación,
+    - clasifica en memoria,
+    - inserta todas las mediciones en una sola transacción.
+
+    Una ciudad que falla no hace fallar al resto:
+    {
+        "resultados": [ {..., "consulta": "Cordoba"}, ... ],
+        "errores":    [ {"consulta": "Xyz", "error": "...", "detalle": "..."} ]
+    }
+    """
+    resultados = []
+    errores = []
+
+    # 1) Geocoding, ciudad por ciudad (la mayoría sale de la caché)
+    geos = []   # (consulta, ciudad_geo)
+    for nombre in nombres_ciudades:
+        try:
+            geos.append((nombre, geocodificar_ciudad_cacheado(nombre)))
+        except CiudadNoEncontrada as e:
+            errores.append({"consulta": nombre, "error": "Ciudad no encontrada", "detalle": str(e)})
+        except ErrorAPIClima as e:
+            errores.append({"consulta": nombre, "error": "Error al consultar la API de clima", "detalle": str(e)})
+
+    # Varias consultas pueden resolver a la misma ciudad ("Cordoba", "Córdoba"):
+    # se mide una sola vez y se reporta para cada consulta
+    unicas = {}
+    for _, ciudad_geo in geos:
+        unicas.setdefault((ciudad_geo.nombre, pais_de(ciudad_geo)), ciudad_geo)
+    ciudades = list(unicas.values())
+
+    if not ciudades:
+        return {"resultados": resultados, "errores": errores}
+
+    # 2) Clima de todas las ciudades (una llamada por hasta 100 posiciones)
+    try:
+        climas = obtener_clima_actual_lote_cacheado(
+            [(c.latitud, c.longitud) for c in ciudades]
+        )
+    except ErrorAPIClima as e:
+        for consulta, _ in geos:
+            errores.append({"consulta": consulta, "error": "Error al consultar la API de clima", "detalle": str(e)})
+        return {"resultados": resultados, "errores": errores}
+
+    # 3) Rangos en memoria
+    valores = [valores_medicion(clima) for clima, _ in climas]
+    rangos = clasificar_lote([v["temperatura"] for v in valores])
+
+    filas = []
+    por_clave = {}
+    for ciudad_geo, (_, info_cache), v, rango in zip(ciudades, climas, valores, rangos):
+        clave = (ciudad_geo.nombre, pais_de(ciudad_geo))
+        if rango is None:
+            por_clave[clave] = ValueError(
+                f"No se encontró un rango de temperatura válido para {v['temperatura']}°C"
+            )
+            continue
+        fila = fila_para_lote(ciudad_geo, v, rango)
+        filas.append(fila)
+        por_clave[clave] = (fila, rango, ciudad_geo, info_cache)
+
+    # 4) Una sola transacción para todas las mediciones
+    registros = registrar_mediciones_lote(filas)
+    registrar_escritura()
+    for fila, registro in zip(filas, registros):
+        registrar_ciudad_medida(registro["ciudad"])
+        registrar_medicion_reciente(registro, fila)
+    ids = {
+        (f["nombre_ciudad"], f["pais"]): r for f, r in zip(filas, registros)
+    }
+
+    # 5) Resultado por consulta, en el orden pedido
+    for consulta, ciudad_geo in geos:
+        clave = (ciudad_geo.nombre, pais_de(ciudad_geo))
+        dato = por_clave[clave]
+        if isinstance(dato, Exception):
+            errores.append({"consulta": consulta, "error": "No se pudo registrar la medición", "detalle": str(dato)})
+            continue
+        fila, rango, ciudad_geo, info_cache = dato
+        resultados.append(
+            armar_resultado(consulta, ids[clave], rango, fila, ciudad_geo, info_cache)
+        )
+
+    return {"resultados": resultados, "errores": errores}
+
+
 def listar_mediciones():
     """
     Devuelve la lista de mediciones ya registradas.
@@ -162,11 +424,293 @@ def listar_mediciones():
     return obtener_todas_las_mediciones()
 
 
+# -----------------------------
+# Paginación por cursor
+# -----------------------------
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 500
+
+
+class CursorInvalido(ValueError):
+    """Se lanza cuando el cursor de paginación no se puede decodificar."""
+    pass
+
+
+def codificar_cursor(fecha, id_mediciones: int) -> str:
+    """
+    Convierte (fecha, id_mediciones) en un string opaco para el cliente.
+    """
+    crudo = json.dumps([fecha.isoformat(), id_mediciones], separators=(",", ":"))
+    return base64.urlsafe_b64encode(crudo.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str):
+    """
+    Inversa de codificar_cursor: devuelve (fecha_iso, id_mediciones).
+    La fecha queda como string ISO para que PostgreSQL la convierta
+    al tipo de la columna.
+
+    :raises CursorInvalido: si el cursor está mal formado.
+    """
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        crudo = base64.urlsafe_b64decode(cursor + relleno)
+        fecha_iso, id_mediciones = json.loads(crudo)
+        # Validamos el formato antes de mandarlo a la BD
+        if "T" in fecha_iso:
+            datetime.fromisoformat(fecha_iso)
+        else:
+            date.fromisoformat(fecha_iso)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as exc:
+        raise CursorInvalido(f"Cursor de paginación inválido: {cursor!r}") from exc
+
+    if not isinstance(id_mediciones, int) or isinstance(id_mediciones, bool):
+        raise CursorInvalido(f"Cursor de paginación inválido: {cursor!r}")
+
+    return fecha_iso, id_mediciones
+
+
+def filtros_mediciones(
+    id_ciudad: int = None,
+    ciudad: str = None,
+    id_rango: int = None,
+    rango: str = None,
+    desde: date = None,
+    hasta: date = None,
+    temp_min: float = None,
+    temp_max: float = None,
+):
+    """
+    Valida los filtros del listado y los traduce a las claves de
+    mediciones_repository.armar_consulta_pagina. `desde` y `hasta` son
+    días inclusive; `temp_min` y `temp_max`, °C inclusive.
+
+    :raises FiltroInvalido: si algún rango está invertido.
+    """
+    if desde is not None and hasta is not None and desde > hasta:
+        raise FiltroInvalido("'desde' no puede ser posterior a 'hasta'.")
+    if temp_min is not None and temp_max is not None and temp_min > temp_max:
+        raise FiltroInvalido("'temp_min' no puede ser mayor que 'temp_max'.")
+
+    return {
+        "id_ciudad": id_ciudad,
+        "nombre_normalizado": normalizar_nombre(ciudad) if ciudad else None,
+        "id_rango": id_rango,
+        # Los nombres del catálogo están en mayúsculas
+        "nombre_rango": rango.strip().upper() if rango else None,
+        "fecha_desde": desde,
+        "fecha_hasta": hasta + timedelta(days=1) if hasta is not None else None,
+        "temp_min": temp_min,
+        "temp_max": temp_max,
+    }
+
+
+def listar_mediciones_paginadas(limite: int = LIMITE_POR_DEFECTO, cursor: str = None, **filtros):
+    """
+    Devuelve una página de mediciones (de la más reciente a la más antigua):
+    {
+        "mediciones": [...],
+        "next_cursor": "..." o None si es la última página
+    }
+
+    Acepta los filtros de filtros_mediciones (ciudad, rango, fechas,
+    temperatura). El cursor no los incluye: para pedir la página siguiente
+    hay que repetir los mismos filtros.
+    """
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+    despues_de = decodificar_cursor(cursor) if cursor else None
+
+    mediciones, siguiente = obtener_pagina_mediciones(
+        limite, despues_de, filtros_mediciones(**filtros)
+    )
+
+    return {
+        "mediciones": mediciones,
+        "next_cursor": codificar_cursor(*siguiente) if siguiente else None,
+    }
+
+
+# -----------------------------
+# Caché de respuestas del listado (versionada, con ETag)
+# -----------------------------
+
+RESPUESTAS_CACHE_TAMANIO = int(os.getenv("RESPUESTAS_CACHE_TAMANIO", "1000"))
+
+# (version, clave del pedido) -> cuerpo JSON ya serializado (bytes)
+_respuestas = CacheLRU(maxsize=RESPUESTAS_CACHE_TAMANIO)
+_respuestas_lock = threading.Lock()
+_respuestas_contadores = {
+    "no_modificadas": 0,
+    "desde_cache": 0,
+    "consultas_bd": 0,
+}
+
+
+def _contar_respuesta(nombre: str) -> None:
+    with _respuestas_lock:
+        _respuestas_contadores[nombre] += 1
+
+
+def clave_listado(limite: int, cursor, filtros) -> str:
+    """Hash estable de los parámetros de un pedido de GET /api/mediciones."""
+    canonico = json.dumps(
+        [limite, cursor, sorted((k, v) for k, v in filtros.items() if v is not None)],
+        default=str,
+        separators=(",", ":"),
+    )
+    return hashlib.sha1(canonico.encode("utf-8")).hexdigest()[:16]
+
+
+def etag_listado(version: int, clave: str) -> str:
+    """
+    ETag fuerte: misma versión de datos y mismos parámetros producen
+    exactamente el mismo cuerpo (la página se lee en la foto de esa versión).
+    """
+    return f'"{version}-{clave}"'
+
+
+def etag_coincide(if_none_match, etag: str) -> bool:
+    """Compara If-None-Match con el ETag (comparación débil, como pide HTTP)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidatos = (e.strip() for e in if_none_match.split(","))
+    return any(c[2:] == etag if c.startswith("W/") else c == etag for c in candidatos)
+
+
+def listar_mediciones_paginadas_http(
+    limite: int = LIMITE_POR_DEFECTO,
+    cursor: str = None,
+    if_none_match: str = None,
+    **filtros,
+):
+    """
+    listar_mediciones_paginadas para la API, con caché de respuestas:
+
+    - si la versión vigente (escuchada por NOTIFY) y los parámetros dan el
+      ETag que el cliente ya tiene, responde "no modificado" sin ir a la BD,
+    - si la respuesta está en caché para esa versión, la devuelve ya serializada,
+    - si no, lee la página y la versión en la misma foto de la BD y la guarda.
+
+    :return: {"etag", "cuerpo"} con cuerpo = bytes JSON, o None si el
+        cliente ya tiene esta versión (-> 304).
+    """
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+    despues_de = decodificar_cursor(cursor) if cursor else None
+    filtros_bd = filtros_mediciones(**filtros)
+    clave = clave_listado(limite, cursor, filtros_bd)
+
+    # 1) Versión conocida en memoria: 304 o caché, sin tocar la BD
+    version = version_actual()
+    if version is not None:
+        etag = etag_listado(version, clave)
+        if etag_coincide(if_none_match, etag):
+            _contar_respuesta("no_modificadas")
+            return {"etag": etag, "cuerpo": None}
+        cuerpo = _respuestas.get((version, clave))
+        if cuerpo is not FALTA:
+            _contar_respuesta("desde_cache")
+            return {"etag": etag, "cuerpo": cuerpo}
+
+    # 2) BD: página y versión en la misma transacción (la marca, antes de
+    #    leer: confirma las escrituras propias que la lectura ya incluye)
+    marca = marca_version()
+    mediciones, siguiente, version = obtener_pagina_con_version(limite, despues_de, filtros_bd)
+    observar_version(version, marca)
+    _contar_respuesta("consultas_bd")
+
+    cuerpo = json.dumps(
+        {
+            "mediciones": mediciones,
+            "next_cursor": codificar_cursor(*siguiente) if siguiente else None,
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    _respuestas.set((version, clave), cuerpo)
+
+    etag = etag_listado(version, clave)
+    if etag_coincide(if_none_match, etag):
+        return {"etag": etag, "cuerpo": None}
+    return {"etag": etag, "cuerpo": cuerpo}
+
+
+def estadisticas_respuestas():
+    """Métricas de la caché de respuestas del listado."""
+    with _respuestas_lock:
+        contadores = dict(_respuestas_contadores)
+    return {"cache": _respuestas.stats(), **contadores}
+
+
+# -----------------------------
+# Exportación en streaming
+# -----------------------------
+
+FORMATOS_EXPORTACION = ("ndjson", "csv")
+
+# Cantidad de filas que se juntan antes de entregar un bloque de texto
+FILAS_POR_BLOQUE = 500
+
+
+class FormatoNoSoportado(ValueError):
+    """Se lanza cuando se pide exportar en un formato desconocido."""
+    pass
+
+
+def serializar_ndjson(filas):
+    """
+    Convierte filas crudas (tuplas del SELECT de mediciones) en bloques
+    de texto NDJSON: un objeto JSON por línea, con la misma forma que
+    devuelve GET /api/mediciones.
+    """
+    bloque = []
+    for row in filas:
+        bloque.append(json.dumps(fila_a_medicion(row), ensure_ascii=False))
+        if len(bloque) >= FILAS_POR_BLOQUE:
+            bloque.append("")
+            yield "\n".join(bloque)
+            bloque = []
+    if bloque:
+        bloque.append("")
+        yield "\n".join(bloque)
+
+
+def exportar_mediciones(formato: str = "ndjson"):
+    """
+    Generador con la exportación completa de mediciones en `formato`
+    ("ndjson" o "csv"): NDJSON leyendo con un cursor del servidor, CSV con
+    COPY TO STDOUT (ver carga_masiva_service).
+
+    :raises FormatoNoSoportado: si el formato no es uno de FORMATOS_EXPORTACION.
+    """
+    if formato == "ndjson":
+        return serializar_ndjson(iterar_mediciones())
+    if formato == "csv":
+        return exportar_csv_en_bloques()
+    raise FormatoNoSoportado(
+        f"Formato '{formato}' no soportado. Opciones: {', '.join(FORMATOS_EXPORTACION)}."
+    )
+
+
 # Reexportamos las excepciones de clima para que app.py pueda capturarlas
 __all__ = [
     "registrar_medicion",
     "registrar_medicion_desde_api",
+    "registrar_mediciones_lote_desde_api",
+    "encolar_medicion_desde_api",
+    "estado_medicion_pendiente",
+    "ColaLlena",
+    "ColaCerrada",
     "CiudadNoEncontrada",
     "ErrorAPIClima",
     "listar_mediciones",
+    "listar_mediciones_paginadas",
+    "listar_mediciones_paginadas_http",
+    "estadisticas_respuestas",
+    "CursorInvalido",
+    "FiltroInvalido",
+    "exportar_mediciones",
+    "FormatoNoSoportado",
 ]
@@ -0,0 +1,241 @@
+# services/metricas.py
+"""
+Exportación de las métricas de latencia (instrumentacion/latencias.py) y de las
+estadísticas de cada servicio:
+
+- texto_prometheus() arma GET /metrics: los histogramas por etapa, por
+  ruta HTTP y de tamaños de lote más contadores de Open-Meteo, cachés,
+  pool y cola de escritura diferida.
+- estadisticas_metricas() resume las etapas para /api/diagnostico.
+
+La medición en sí (medir, medido, registrar_etapa...) está en
+instrumentacion/latencias.py, fuera de services/, para que database/ y
+repositories/ la usen sin importar servicios.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from instrumentacion.latencias import METRICAS_PEDIDO_LENTO_MS, Histograma, foto_registros
+
+
+PREFIJO = "lab"
+
+
+# -----------------------------
+# Formato de texto de Prometheus
+# -----------------------------
+
+def _etiquetas(**etiquetas) -> str:
+    if not etiquetas:
+        return ""
+    partes = []
+    for nombre, valor in etiquetas.items():
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{nombre}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+
+def _numero(valor) -> str:
+    if isinstance(valor, bool):
+        return "1" if valor else "0"
+    if isinstance(valor, int):
+        return str(valor)
+    return repr(float(valor))
+
+
+class _Texto:
+    """Acumula familias de métricas (HELP + TYPE + muestras)."""
+
+    def __init__(self):
+        self.lineas: List[str] = []
+
+    def familia(self, nombre: str, tipo: str, ayuda: str, muestras) -> None:
+        muestras = list(muestras)
+        if not muestras:
+            return
+        nombre = f"{PREFIJO}_{nombre}"
+        self.lineas.append(f"# HELP {nombre} {ayuda}")
+        self.lineas.append(f"# TYPE {nombre} {tipo}")
+        for sufijo, etiquetas, valor in muestras:
+            self.lineas.append(f"{nombre}{sufijo}{_etiquetas(**etiquetas)} {_numero(valor)}")
+
+    def histogramas(self, nombre: str, ayuda: str, tabla: Dict[Any, Histograma], etiquetas_de) -> None:
+        muestras = []
+        for clave, hist in sorted(tabla.items()):
+            etiquetas = etiquetas_de(clave)
+            acumulados, total, suma = hist.foto()
+            for limite, conteo in zip(hist.buckets, acumulados):
+                muestras.append(("_bucket", {**etiquetas, "le": repr(limite)}, conteo))
+            muestras.append(("_bucket", {**etiquetas, "le": "+Inf"}, total))
+            muestras.append(("_sum", etiquetas, suma))
+            muestras.append(("_count", etiquetas, total))
+        self.familia(nombre, "histogram", ayuda, muestras)
+
+    def __str__(self) -> str:
+        return "\n".join(self.lineas) + "\n"
+
+
+def texto_prometheus(servicios: Dict[str, Any]) -> str:
+    """
+    Texto para GET /metrics.
+
+    :param servicios: estadísticas de los servicios, con las mismas claves
+        que /api/diagnostico: open_meteo, geocoding, clima, respuestas,
+        pool (None si no hay pool de PostgreSQL), almacenamiento y
+        escritura (None si no hay escritura diferida).
+    """
+    texto = _Texto()
+
+    registros = foto_registros()
+    etapas = registros["etapas"]
+    pedidos = registros["pedidos"]
+    respuestas = registros["respuestas"]
+    tamanios = registros["tamanios"]
+    lentos = registros["pedidos_lentos"]
+
+    texto.histogramas(
+        "etapa_segundos", "Duración de cada etapa (servicios, repositorios, conexiones).",
+        etapas, lambda etapa: {"etapa": etapa},
+    )
+    texto.histogramas(
+        "http_pedido_segundos", "Duración de los pedidos HTTP por ruta.",
+        pedidos, lambda clave: {"metodo": clave[0], "ruta": clave[1]},
+    )
+    texto.familia(
+        "http_respuestas_total", "counter", "Respuestas HTTP por ruta y código.",
+        (("", {"metodo": m, "ruta": r, "codigo": c}, n) for (m, r, c), n in sorted(respuestas.items())),
+    )
+    texto.familia(
+        "http_pedidos_lentos_total", "counter",
+        "Pedidos que superaron METRICAS_PEDIDO_LENTO_MS.", [("", {}, lentos)],
+    )
+    texto.histogramas(
+        "lote_filas", "Filas por lote escrito en la BD.",
+        tamanios, lambda lote: {"lote": lote},
+    )
+
+    # Open-Meteo: llamadas, reintentos y errores por endpoint
+    open_meteo = servicios.get("open_meteo") or {}
+    for campo, ayuda in (
+        ("llamadas", "Llamadas a Open-Meteo por endpoint."),
+        ("reintentos", "Reintentos de llamadas a Open-Meteo por endpoint."),
+        ("errores", "Llamadas a Open-Meteo que terminaron en error (red o HTTP >= 400)."),
+    ):
+        texto.familia(
+            f"open_meteo_{campo}_total", "counter", ayuda,
+            (("", {"endpoint": ep}, st[campo]) for ep, st in sorted(open_meteo.items())),
+        )
+
+    # Cachés en memoria (CacheLRU.stats())
+    caches = {
+        "geocoding": (servicios.get("geocoding") or {}).get("cache"),
+        "clima": (servicios.get("clima") or {}).get("cache"),
+        "respuestas": (servicios.get("respuestas") or {}).get("cache"),
+    }
+    caches = {nombre: st for nombre, st in caches.items() if st}
+    for campo, tipo, ayuda in (
+        ("hits", "counter", "Aciertos de la caché."),
+        ("misses", "counter", "Fallos de la caché."),
+        ("desalojadas", "counter", "Entradas descartadas por tamaño."),
+        ("tamanio", "gauge", "Entradas en la caché."),
+    ):
+        sufijo = "_total" if tipo == "counter" else ""
+        texto.familia(
+            f"cache_{campo}{sufijo}", tipo, ayuda,
+            (("", {"cache": nombre}, st[campo]) for nombre, st in sorted(caches.items())),
+        )
+
+    geocoding = servicios.get("geocoding") or {}
+    texto.familia(
+        "geocoding_resoluciones_total", "counter",
+        "Ciudades resueltas por nivel (memoria, BD, negativos, API).",
+        (("", {"nivel": campo}, valor) for campo, valor in sorted(geocoding.items())
+         if isinstance(valor, int)),
+    )
+
+    # Conexiones a la BD: pool de PostgreSQL o conexiones de SQLite
+    pool = servicios.get("pool")
+    almacenamiento = servicios.get("almacenamiento") or {}
+    backend = almacenamiento.get("backend", "postgres")
+    if pool:
+        conexiones = {"en_uso": pool["en_uso"], "libres": pool["libres"]}
+        checkouts = pool["checkouts"]
+        texto.familia(
+            "bd_fallos_checkout_total", "counter",
+            "Pedidos de conexión que fallaron o agotaron la espera.",
+            [("", {"backend": backend}, pool["fallos_checkout"])],
+        )
+        texto.familia(
+            "bd_espera_conexion_segundos_total", "counter",
+            "Tiempo total esperando una conexión libre del pool.",
+            [("", {"backend": backend}, pool["espera_total_ms"] / 1000)],
+        )
+    elif "conexiones" in almacenamiento:
+        conexiones = {
+            "en_uso": almacenamiento["conexiones"] - almacenamiento.get("libres", 0),
+            "libres": almacenamiento.get("libres", 0),
+        }
+        checkouts = almacenamiento.get("checkouts", 0)
+    else:
+        conexiones, checkouts = {}, None
+
+    texto.familia(
+        "bd_conexiones", "gauge", "Conexiones a la BD abiertas, por estado.",
+        (("", {"backend": backend, "estado": estado}, n) for estado, n in sorted(conexiones.items())),
+    )
+    if checkouts is not None:
+        texto.familia(
+            "bd_checkouts_total", "counter", "Conexiones prestadas a consultas.",
+            [("", {"backend": backend}, checkouts)],
+        )
+
+    # Escritura diferida: cola y group commit
+    escritura = servicios.get("escritura")
+    if escritura:
+        texto.familia(
+            "escritura_cola_profundidad", "gauge", "Mediciones esperando en la cola de escritura.",
+            [("", {}, escritura["profundidad"])],
+        )
+        texto.familia(
+            "escritura_cola_capacidad", "gauge", "Tamaño máximo de la cola de escritura.",
+            [("", {}, escritura["capacidad"])],
+        )
+        texto.familia(
+            "escritura_mediciones_total", "counter",
+            "Mediciones de la escritura diferida por resultado.",
+            (("", {"resultado": campo}, escritura[campo])
+             for campo in ("encoladas", "escritas", "rechazadas", "perdidas")),
+        )
+        texto.familia(
+            "escritura_lotes_total", "counter", "Lotes escritos (un commit cada uno).",
+            [("", {}, escritura["lotes"])],
+        )
+        texto.familia(
+            "escritura_lotes_fallidos_total", "counter",
+            "Lotes que fallaron y se reintentaron fila por fila.",
+            [("", {}, escritura["lotes_fallidos"])],
+        )
+
+    return str(texto)
+
+
+def estadisticas_metricas() -> Dict[str, Any]:
+    """Resumen para /api/diagnostico: etapas medidas y pedidos lentos."""
+    registros = foto_registros()
+    etapas = registros["etapas"]
+    lentos = registros["pedidos_lentos"]
+    resumen = {}
+    for etapa, hist in sorted(etapas.items()):
+        _, total, suma = hist.foto()
+        resumen[etapa] = {
+            "veces": total,
+            "promedio_ms": round(suma * 1000 / total, 3) if total else 0.0,
+        }
+    return {
+        "umbral_lento_ms": METRICAS_PEDIDO_LENTO_MS,
+        "pedidos_lentos": lentos,
+        "etapas": resumen,
+    }
+
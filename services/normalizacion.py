@@ -0,0 +1,18 @@
+# services/normalizacion.py
+"""
+Normalización de nombres de ciudad para comparar y buscar.
+
+"  Córdoba ", "CORDOBA" y "cordoba" quedan todos como "cordoba".
+"""
+
+import unicodedata
+
+
+def normalizar_nombre(nombre: str) -> str:
+    """
+    Pasa a minúsculas (casefold), quita tildes/diacríticos y colapsa
+    los espacios repetidos.
+    """
+    descompuesto = unicodedata.normalize("NFKD", nombre or "")
+    sin_tildes = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return " ".join(sin_tildes.casefold().split())
@@ -0,0 +1,187 @@
+# services/open_meteo_client.py
+"""
+Cliente HTTP compartido para las APIs de Open-Meteo.
+
+- Una sola requests.Session por proceso, con un HTTPAdapter de tamaño
+  configurable: reusa conexiones keep-alive (sin DNS + TLS por llamada).
+- Timeouts separados de conexión y de lectura.
+- Reintentos acotados con backoff exponencial y jitter, solo para GET
+  (idempotentes) ante errores de red o respuestas 429/5xx.
+- URLs base configurables por entorno, para apuntar a un servidor local
+  de prueba (ver benchmarks/).
+- Registra por endpoint: llamadas, reintentos, errores y latencias.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentacion.latencias import registrar_etapa
+
+
+# Estados HTTP que vale la pena reintentar
+ESTADOS_REINTENTABLES = frozenset({429, 500, 502, 503, 504})
+
+# Ruta de cada endpoint, relativa a su URL base
+RUTAS = {
+    "geocoding": "/v1/search",
+    "forecast": "/v1/forecast",
+    "archive": "/v1/archive",
+}
+
+
+class ClienteOpenMeteo:
+    def __init__(
+        self,
+        urls_base: Dict[str, str],
+        timeout_conexion: float = 3.05,
+        timeout_lectura: float = 10.0,
+        reintentos: int = 2,
+        backoff_base: float = 0.25,
+        backoff_max: float = 4.0,
+        pool_tamanio: int = 20,
+    ):
+        """
+        :param urls_base: {"geocoding": "https://...", "forecast": "https://...", "archive": "https://..."}
+        :param reintentos: reintentos adicionales al primer intento (0 = ninguno).
+        :param backoff_base: espera base en segundos; el intento n espera
+            un valor al azar entre 0 y min(backoff_max, backoff_base * 2**n).
+        :param pool_tamanio: conexiones keep-alive por host.
+        """
+        self.urls = {
+            nombre: urls_base[nombre].rstrip("/") + ruta
+            for nombre, ruta in RUTAS.items()
+            if nombre in urls_base
+        }
+        self.timeout = (timeout_conexion, timeout_lectura)
+        self.reintentos = reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=len(self.urls) or 1,
+            pool_maxsize=pool_tamanio,
+            max_retries=0,   # los reintentos los maneja get() para poder contarlos
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def desde_entorno(cls) -> "ClienteOpenMeteo":
+        """Crea el cliente con la configuración de las variables OPEN_METEO_*."""
+        return cls(
+            urls_base={
+                "geocoding": os.getenv(
+                    "OPEN_METEO_GEOCODING_BASE", "https://geocoding-api.open-meteo.com"
+                ),
+                "forecast": os.getenv(
+                    "OPEN_METEO_FORECAST_BASE", "https://api.open-meteo.com"
+                ),
+                "archive": os.getenv(
+                    "OPEN_METEO_ARCHIVE_BASE", "https://archive-api.open-meteo.com"
+                ),
+            },
+            timeout_conexion=float(os.getenv("OPEN_METEO_TIMEOUT_CONEXION", "3.05")),
+            timeout_lectura=float(os.getenv("OPEN_METEO_TIMEOUT_LECTURA", "10")),
+            reintentos=int(os.getenv("OPEN_METEO_REINTENTOS", "2")),
+            backoff_base=float(os.getenv("OPEN_METEO_BACKOFF_BASE", "0.25")),
+            pool_tamanio=int(os.getenv("OPEN_METEO_POOL", "20")),
+        )
+
+    def espera_reintento(self, intento: int, retry_after: Optional[str] = None) -> float:
+        """
+        Segundos a esperar antes del reintento `intento` (0, 1, 2...):
+        backoff exponencial con jitter completo, o Retry-After si vino.
+        """
+        if retry_after and retry_after.isdigit():
+            return min(self.backoff_max, float(retry_after))
+        tope = min(self.backoff_max, self.backoff_base * (2 ** intento))
+        return random.uniform(0, tope)
+
+    def registrar_llamada(self, endpoint: str, duracion: float, reintentos: int, error: bool) -> None:
+        """Suma una llamada (con sus reintentos) a las métricas del endpoint."""
+        registrar_etapa(f"open_meteo.{endpoint}", duracion)
+        with self._lock:
+            st = self._stats.setdefault(endpoint, {
+                "llamadas": 0,
+                "reintentos": 0,
+                "errores": 0,
+                "latencia_total_ms": 0.0,
+                "latencia_max_ms": 0.0,
+            })
+            ms = duracion * 1000
+            st["llamadas"] += 1
+            st["reintentos"] += reintentos
+            st["errores"] += 1 if error else 0
+            st["latencia_total_ms"] += ms
+            if ms > st["latencia_max_ms"]:
+                st["latencia_max_ms"] = ms
+
+    # -----------------------------
+    # API pública
+    # -----------------------------
+
+    def url(self, endpoint: str) -> str:
+        return self.urls[endpoint]
+
+    def get(self, endpoint: str, params: Dict[str, Any]) -> requests.Response:
+        """
+        GET a `endpoint` ("geocoding", "forecast" o "archive") con reintentos.
+
+        Devuelve la última respuesta (aunque sea un error HTTP: el que llama
+        decide qué hacer con el status). Si todos los intentos fallan por
+        red, relanza la última requests.RequestException.
+        """
+        url = self.urls[endpoint]
+        inicio = time.perf_counter()
+        reintentos = 0
+
+        for intento in range(self.reintentos + 1):
+            resp = None
+            try:
+                resp = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if intento == self.reintentos:
+                    self.registrar_llamada(endpoint, time.perf_counter() - inicio, reintentos, True)
+                    raise
+            else:
+                if resp.status_code not in ESTADOS_REINTENTABLES or intento == self.reintentos:
+                    error = resp.status_code >= 400
+                    self.registrar_llamada(endpoint, time.perf_counter() - inicio, reintentos, error)
+                    return resp
+
+            reintentos += 1
+            retry_after = resp.headers.get("Retry-After") if resp is not None else None
+            time.sleep(self.espera_reintento(intento, retry_after))
+
+        # No se llega acá: el último intento siempre retorna o relanza
+        raise RuntimeError("Bucle de reintentos terminado sin resultado")
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas por endpoint (incluye latencia promedio)."""
+        with self._lock:
+            resultado = {}
+            for endpoint, st in self._stats.items():
+                copia = dict(st)
+                copia["latencia_total_ms"] = round(st["latencia_total_ms"], 3)
+                copia["latencia_max_ms"] = round(st["latencia_max_ms"], 3)
+                copia["latencia_promedio_ms"] = (
+                    round(st["latencia_total_ms"] / st["llamadas"], 3) if st["llamadas"] else 0.0
+                )
+                resultado[endpoint] = copia
+            return resultado
+
+
+# Cliente compartido por todo el proceso
+cliente = ClienteOpenMeteo.desde_entorno()
@@ -0,0 +1,194 @@
+# services/rangos_service.py
+"""
+Clasificación de temperaturas según el catálogo `rango`, en memoria.
+
+El catálogo (5 filas en catalogo.sql) se carga una sola vez y se guarda
+como un arreglo ordenado de límites inferiores; cada clasificación es
+una búsqueda binaria (bisect), sin ir a la base de datos. Los lotes se
+clasifican de una vez con np.searchsorted sobre los mismos límites.
+
+Se recarga explícitamente con recargar_rangos() o automáticamente
+cuando pasan RANGOS_TTL_SEGUNDOS desde la última carga (0 = nunca).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from repositories.rango_repository import obtener_rangos
+
+
+class CatalogoRangosInvalido(Exception):
+    """Se lanza cuando los rangos cargados tienen huecos o solapamientos."""
+    pass
+
+
+class ClasificadorRangos:
+    """
+    Clasificador inmutable construido a partir de las filas de `rango`.
+
+    Semántica (igual a la consulta SQL que reemplaza):
+        temp_min <= t < temp_max, con NULL = extremo abierto.
+    """
+
+    def __init__(self, rangos: List[Dict[str, Any]]):
+        if not rangos:
+            raise CatalogoRangosInvalido("El catálogo de rangos está vacío.")
+
+        # Primero el que no tiene mínimo (abierto hacia -inf), luego por temp_min
+        ordenados = sorted(
+            rangos,
+            key=lambda r: (r["temp_min"] is not None, r["temp_min"] or 0),
+        )
+        self._validar(ordenados)
+
+        # Límites inferiores desde el segundo rango: bisect_right nos da el índice
+        self._limites = [r["temp_min"] for r in ordenados[1:]]
+        self._minimo = ordenados[0]["temp_min"]
+        self._maximo = ordenados[-1]["temp_max"]
+        # Lo mismo en float64 para clasificar_lote
+        self._limites_np = np.array(self._limites, dtype=np.float64)
+        self._minimo_np = -np.inf if self._minimo is None else float(self._minimo)
+        self._maximo_np = np.inf if self._maximo is None else float(self._maximo)
+        # Los dicts devueltos son compartidos: no modificarlos
+        self._rangos = [
+            {"id_rango": r["id_rango"], "nombre_rango": r["nombre_rango"]}
+            for r in ordenados
+        ]
+        self._por_id = {r["id_rango"]: r for r in self._rangos}
+        # Índice len(_rangos) = None (fuera del catálogo o sin temperatura)
+        self._tabla = np.array(self._rangos + [None], dtype=object)
+
+    @staticmethod
+    def _validar(ordenados: List[Dict[str, Any]]) -> None:
+        ultimo = len(ordenados) - 1
+        for i, r in enumerate(ordenados):
+            nombre = r["nombre_rango"]
+            if r["temp_min"] is None and i != 0:
+                raise CatalogoRangosInvalido(
+                    f"Más de un rango sin temp_min (abierto hacia abajo): '{nombre}'."
+                )
+            if r["temp_max"] is None and i != ultimo:
+                raise CatalogoRangosInvalido(
+                    f"El rango '{nombre}' no tiene temp_max pero no es el último."
+                )
+            if (
+                r["temp_min"] is not None
+                and r["temp_max"] is not None
+                and r["temp_min"] >= r["temp_max"]
+            ):
+                raise CatalogoRangosInvalido(
+                    f"El rango '{nombre}' tiene temp_min >= temp_max."
+                )
+            if i < ultimo:
+                siguiente = ordenados[i + 1]
+                if siguiente["temp_min"] is None:
+                    raise CatalogoRangosInvalido(
+                        f"Más de un rango sin temp_min (abierto hacia abajo): "
+                        f"'{siguiente['nombre_rango']}'."
+                    )
+                if r["temp_max"] < siguiente["temp_min"]:
+                    raise CatalogoRangosInvalido(
+                        f"Hueco entre '{nombre}' ({r['temp_max']}) "
+                        f"y '{siguiente['nombre_rango']}' ({siguiente['temp_min']})."
+                    )
+                if r["temp_max"] > siguiente["temp_min"]:
+                    raise CatalogoRangosInvalido(
+                        f"Solapamiento entre '{nombre}' ({r['temp_max']}) "
+                        f"y '{siguiente['nombre_rango']}' ({siguiente['temp_min']})."
+                    )
+
+    def clasificar(self, temperatura: Optional[float]) -> Optional[Dict[str, Any]]:
+        """
+        Devuelve {"id_rango", "nombre_rango"} para la temperatura,
+        o None si cae fuera de los extremos cerrados del catálogo.
+        """
+        if temperatura is None:
+            return None
+        if self._minimo is not None and temperatura < self._minimo:
+            return None
+        if self._maximo is not None and temperatura >= self._maximo:
+            return None
+        return self._rangos[bisect_right(self._limites, temperatura)]
+
+    def rango(self, id_rango: int) -> Optional[Dict[str, Any]]:
+        """{"id_rango", "nombre_rango"} de un id del catálogo, o None si no está."""
+        return self._por_id.get(id_rango)
+
+    def clasificar_lote(
+        self, temperaturas: Iterable[Optional[float]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Clasifica muchas temperaturas de una vez (mismo orden de entrada),
+        con la misma semántica que clasificar(): None o fuera de los
+        extremos cerrados -> None.
+        """
+        valores = np.array(list(temperaturas), dtype=np.float64)  # None -> nan
+        indices = np.searchsorted(self._limites_np, valores, side="right")
+        # nan da False en las dos comparaciones: queda afuera junto con los extremos
+        dentro = (valores >= self._minimo_np) & (valores < self._maximo_np)
+        indices[~dentro] = len(self._rangos)
+        return self._tabla[indices].tolist()
+
+
+# -----------------------------
+# Instancia compartida con TTL
+# -----------------------------
+
+RANGOS_TTL_SEGUNDOS = float(os.getenv("RANGOS_TTL_SEGUNDOS", "600"))
+
+_clasificador: Optional[ClasificadorRangos] = None
+_cargado_en = 0.0
+_lock = threading.Lock()
+
+
+def recargar_rangos() -> ClasificadorRangos:
+    """
+    Vuelve a leer el catálogo de la BD y reemplaza el clasificador.
+    Si el catálogo nuevo es inválido, lanza CatalogoRangosInvalido
+    y se sigue usando el anterior.
+    """
+    global _clasificador, _cargado_en
+    with _lock:
+        nuevo = ClasificadorRangos(obtener_rangos())
+        _clasificador = nuevo
+        _cargado_en = time.monotonic()
+        return nuevo
+
+
+def obtener_clasificador() -> ClasificadorRangos:
+    """
+    Devuelve el clasificador compartido, cargándolo la primera vez
+    y recargándolo cuando vence el TTL. Si la recarga por TTL falla,
+    se sigue con el catálogo anterior hasta el próximo vencimiento.
+    """
+    global _cargado_en
+    clasificador = _clasificador
+    if clasificador is None:
+        return recargar_rangos()
+
+    if RANGOS_TTL_SEGUNDOS > 0 and time.monotonic() - _cargado_en > RANGOS_TTL_SEGUNDOS:
+        try:
+            return recargar_rangos()
+        except Exception:
+            _cargado_en = time.monotonic()
+
+    return clasificador
+
+
+def clasificar_temperatura(temperatura: Optional[float]) -> Optional[Dict[str, Any]]:
+    """Atajo: clasifica una temperatura con el clasificador compartido."""
+    return obtener_clasificador().clasificar(temperatura)
+
+
+def clasificar_lote(
+    temperaturas: Iterable[Optional[float]],
+) -> List[Optional[Dict[str, Any]]]:
+    """Atajo: clasifica muchas temperaturas sin ninguna consulta a la BD."""
+    return obtener_clasificador().clasificar_lote(temperaturas)
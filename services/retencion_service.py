@@ -0,0 +1,157 @@
+# services/retencion_service.py
+"""
+Mantenimiento de la tabla `mediciones`: particiones y retención.
+
+Cada corrida de mantener_mediciones():
+1) crea las particiones mensuales que falten (el mes actual y los
+   PARTICIONES_MESES_ADELANTE siguientes), para que las inserciones nunca
+   caigan en la partición por defecto,
+2) si RETENCION_DIAS > 0, borra las mediciones crudas más viejas que eso:
+   en PostgreSQL con DROP TABLE de las particiones que quedaron enteras
+   fuera del plazo (sin DELETE ni VACUUM largos). El resumen diario
+   (mediciones_diarias) se conserva siempre; con RETENCION_RESUMEN=hora
+   además se compactan en mediciones_horarias antes de borrarlas.
+
+Se puede correr dentro de app.py (MANTENIMIENTO_HABILITADO=1, cada
+MANTENIMIENTO_INTERVALO segundos) o desde cron con
+`python mantener_mediciones.py`.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from database.almacenamiento.base import RESUMENES_RETENCION
+from repositories.mediciones_repository import aplicar_retencion, mantener_particiones
+from services.ultimas_mediciones import invalidar_ultimas
+from services.version_datos import registrar_escritura
+
+
+logger = logging.getLogger(__name__)
+
+RETENCION_DIAS = int(os.getenv("RETENCION_DIAS", "0"))
+RETENCION_RESUMEN = os.getenv("RETENCION_RESUMEN", "dia").strip().lower()
+PARTICIONES_MESES_ADELANTE = int(os.getenv("PARTICIONES_MESES_ADELANTE", "3"))
+MANTENIMIENTO_INTERVALO = float(os.getenv("MANTENIMIENTO_INTERVALO", "3600"))
+
+
+def mantener_mediciones(
+    dias: Optional[int] = None,
+    resumen: Optional[str] = None,
+    meses_adelante: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Crea las particiones que falten y aplica la retención.
+
+    :param dias: días de mediciones crudas a conservar (0 = todas);
+        por defecto RETENCION_DIAS.
+    :param resumen: "dia" u "hora" (ver RESUMENES_RETENCION); por defecto RETENCION_RESUMEN.
+    :param meses_adelante: meses futuros con partición; por defecto PARTICIONES_MESES_ADELANTE.
+    :return: {"particiones": {...}, "retencion": {...} o None, "segundos"}
+    :raises ValueError: si `resumen` no es válido o algún número es negativo.
+    """
+    dias = RETENCION_DIAS if dias is None else dias
+    resumen = RETENCION_RESUMEN if resumen is None else resumen
+    meses_adelante = PARTICIONES_MESES_ADELANTE if meses_adelante is None else meses_adelante
+
+    if resumen not in RESUMENES_RETENCION:
+        raise ValueError(f"Resumen de retención desconocido: {resumen!r}. Opciones: {', '.join(RESUMENES_RETENCION)}.")
+    if dias < 0 or meses_adelante < 0:
+        raise ValueError("Los días de retención y los meses adelante no pueden ser negativos.")
+
+    inicio = time.perf_counter()
+    resultado = {"particiones": mantener_particiones(meses_adelante), "retencion": None}
+
+    if dias > 0:
+        limite = datetime.now(timezone.utc) - timedelta(days=dias)
+        resultado["retencion"] = {
+            "limite": limite.isoformat(),
+            "resumen": resumen,
+            **aplicar_retencion(limite, resumen),
+        }
+        if resultado["retencion"]["filas_borradas"]:
+            # Las recientes en memoria pueden incluir filas borradas
+            invalidar_ultimas()
+            registrar_escritura()
+
+    resultado["segundos"] = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+
+# -----------------------------
+# Mantenimiento periódico dentro del proceso
+# -----------------------------
+
+_lock = threading.Lock()
+_hilo: Optional[threading.Thread] = None
+_detener = threading.Event()
+_stats: Dict[str, Any] = {
+    "corridas": 0,
+    "corridas_con_error": 0,
+    "particiones_creadas": 0,
+    "particiones_borradas": 0,
+    "filas_borradas": 0,
+    "ultima_corrida": None,
+    "ultimo_error": None,
+}
+
+
+def _correr_una_vez() -> None:
+    try:
+        resultado = mantener_mediciones()
+    except Exception as e:
+        logger.exception("Falló el mantenimiento de mediciones")
+        with _lock:
+            _stats["corridas"] += 1
+            _stats["corridas_con_error"] += 1
+            _stats["ultimo_error"] = {"error": type(e).__name__, "detalle": str(e)}
+        return
+
+    retencion = resultado["retencion"] or {}
+    with _lock:
+        _stats["corridas"] += 1
+        _stats["particiones_creadas"] += len(resultado["particiones"]["creadas"])
+        _stats["particiones_borradas"] += len(retencion.get("particiones_borradas", []))
+        _stats["filas_borradas"] += retencion.get("filas_borradas", 0)
+        _stats["ultima_corrida"] = resultado
+
+
+def _bucle() -> None:
+    while True:
+        _correr_una_vez()
+        if _detener.wait(MANTENIMIENTO_INTERVALO):
+            return
+
+
+def iniciar_mantenimiento() -> None:
+    """Corre mantener_mediciones() ya y después cada MANTENIMIENTO_INTERVALO segundos."""
+    global _hilo
+    with _lock:
+        if _hilo is None or not _hilo.is_alive():
+            _detener.clear()
+            _hilo = threading.Thread(target=_bucle, name="mantenimiento-mediciones", daemon=True)
+            _hilo.start()
+
+
+def detener_mantenimiento(timeout: Optional[float] = None) -> None:
+    _detener.set()
+    if _hilo is not None:
+        _hilo.join(timeout)
+
+
+def estadisticas_mantenimiento() -> Optional[Dict[str, Any]]:
+    """Métricas del mantenimiento periódico, o None si no está corriendo."""
+    with _lock:
+        if _hilo is None:
+            return None
+        datos = dict(_stats)
+        datos["activo"] = _hilo.is_alive()
+    datos["intervalo_segundos"] = MANTENIMIENTO_INTERVALO
+    datos["retencion_dias"] = RETENCION_DIAS
+    datos["resumen"] = RETENCION_RESUMEN
+    return datos
@@ -0,0 +1,312 @@
+# services/scheduler.py
+"""
+Planificador que mide periódicamente una lista fija de ciudades (watchlist).
+
+Cada tick (SCHEDULER_INTERVALO segundos, por defecto 15 min como la API):
+1) recorre SCHEDULER_SLOTS grupos distribuidos a lo largo del intervalo,
+   con jitter, para no pegarle a la API todas juntas; cada ciudad tiene
+   siempre el mismo grupo (según su posición en la watchlist), así se
+   mide una vez por tick con un intervalo parejo,
+2) justo antes de medir un grupo descarta sus ciudades cuya última
+   medición todavía está fresca (la midió otro proceso),
+3) cada grupo se mide con registrar_mediciones_lote_desde_api
+   (una llamada multi-ubicación y una transacción por grupo),
+4) respeta un presupuesto de llamadas a la API por minuto.
+
+Se puede correr dentro de app.py (SCHEDULER_HABILITADO=1) o como proceso
+aparte con `python scheduler.py`.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from repositories.mediciones_repository import obtener_ultimas_fechas_por_ciudad
+from services.clima_service import CLIMA_LOTE_MAXIMO
+from services.mediciones_service import registrar_mediciones_lote_desde_api
+from services.normalizacion import normalizar_nombre
+
+
+logger = logging.getLogger(__name__)
+
+
+def leer_watchlist() -> List[str]:
+    """
+    Ciudades a medir: WATCHLIST (separadas por coma) y/o
+    WATCHLIST_ARCHIVO (una por línea). Sin repetidas.
+    """
+    ciudades = [c.strip() for c in os.getenv("WATCHLIST", "").split(",") if c.strip()]
+    archivo = os.getenv("WATCHLIST_ARCHIVO")
+    if archivo:
+        with open(archivo, "r", encoding="utf-8") as f:
+            ciudades.extend(linea.strip() for linea in f if linea.strip())
+
+    vistas = set()
+    unicas = []
+    for ciudad in ciudades:
+        clave = normalizar_nombre(ciudad)
+        if clave not in vistas:
+            vistas.add(clave)
+            unicas.append(ciudad)
+    return unicas
+
+
+class LimitadorTasa:
+    """
+    Token bucket: como máximo `por_minuto` llamadas por minuto,
+    con ráfagas de hasta `por_minuto` tokens.
+    """
+
+    def __init__(self, por_minuto: float):
+        self.capacidad = max(1.0, por_minuto)
+        self.tasa = self.capacidad / 60.0
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self, cantidad: float, detener: threading.Event) -> bool:
+        """
+        Espera hasta tener `cantidad` tokens. Devuelve False si se pidió
+        detener el planificador mientras esperaba.
+        """
+        cantidad = min(cantidad, self.capacidad)
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._tokens = min(
+                    self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa
+                )
+                self._ultimo = ahora
+                if self._tokens >= cantidad:
+                    self._tokens -= cantidad
+                    return True
+                falta = (cantidad - self._tokens) / self.tasa
+            if detener.wait(falta):
+                return False
+
+
+class PlanificadorWatchlist:
+    def __init__(
+        self,
+        ciudades: List[str],
+        intervalo: float = 900.0,
+        slots: int = 4,
+        jitter: float = 0.2,
+        frescura: Optional[float] = None,
+        llamadas_por_minuto: float = 300.0,
+    ):
+        """
+        :param ciudades: watchlist.
+        :param intervalo: segundos entre ticks.
+        :param slots: en cuántos grupos se reparten las ciudades de un tick.
+        :param jitter: fracción (0..1) del espacio entre grupos que se suma al azar.
+        :param frescura: una ciudad con medición más nueva que esto (segundos)
+            se saltea; por defecto el 90% de lo mínimo que puede pasar entre
+            dos turnos de su grupo (el intervalo menos el jitter máximo).
+        :param llamadas_por_minuto: presupuesto de llamadas a Open-Meteo.
+        """
+        self.ciudades = list(ciudades)
+        self.intervalo = intervalo
+        self.slots = max(1, slots)
+        self.jitter = min(max(jitter, 0.0), 1.0)
+        self.grupos = self._agrupar(self.ciudades, self.slots)
+        if frescura is None:
+            espacio = intervalo / len(self.grupos) if self.grupos else intervalo
+            frescura = (intervalo - self.jitter * espacio) * 0.9
+        self.frescura = frescura
+        self.limitador = LimitadorTasa(llamadas_por_minuto)
+
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        # Última captura exitosa hecha por este proceso (monotonic)
+        self._capturadas: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "ticks": 0,
+            "ticks_con_error": 0,
+            "ultimo_tick_segundos": None,
+            "tick_max_segundos": 0.0,
+            "lag_ultimo_segundos": None,
+            "lag_max_segundos": 0.0,
+            "ciudades_medidas": 0,
+            "ciudades_frescas_omitidas": 0,
+            "fallos_ciudad": 0,
+            "ultimo_error": None,
+        }
+
+    @classmethod
+    def desde_entorno(cls) -> "PlanificadorWatchlist":
+        frescura = os.getenv("SCHEDULER_FRESCURA")
+        return cls(
+            ciudades=leer_watchlist(),
+            intervalo=float(os.getenv("SCHEDULER_INTERVALO", "900")),
+            slots=int(os.getenv("SCHEDULER_SLOTS", "4")),
+            jitter=float(os.getenv("SCHEDULER_JITTER", "0.2")),
+            frescura=float(frescura) if frescura else None,
+            llamadas_por_minuto=float(os.getenv("SCHEDULER_LLAMADAS_POR_MINUTO", "300")),
+        )
+
+    @staticmethod
+    def _agrupar(ciudades: List[str], slots: int) -> List[List[str]]:
+        """Grupo fijo de cada ciudad: su posición en la watchlist módulo slots."""
+        cantidad = min(slots, len(ciudades))
+        return [ciudades[i::cantidad] for i in range(cantidad)]
+
+    # -----------------------------
+    # Un tick
+    # -----------------------------
+
+    def _es_fresca(self, ciudad: str, ultima_bd) -> bool:
+        clave = normalizar_nombre(ciudad)
+        with self._lock:
+            capturada = self._capturadas.get(clave)
+        if capturada is not None and time.monotonic() - capturada < self.frescura:
+            return True
+        # Solo una fecha con hora permite saber cuánto hace (antes de la
+        # migración 004 `fecha` era DATE y no alcanzaba)
+        if isinstance(ultima_bd, datetime):
+            if ultima_bd.tzinfo is None:
+                ultima_bd = ultima_bd.replace(tzinfo=timezone.utc)
+            edad = (datetime.now(timezone.utc) - ultima_bd).total_seconds()
+            return edad < self.frescura
+        return False
+
+    def _pendientes(self, grupo: List[str]) -> List[str]:
+        try:
+            ultimas = obtener_ultimas_fechas_por_ciudad(
+                [normalizar_nombre(c) for c in grupo]
+            )
+        except Exception as e:
+            logger.warning("No se pudo consultar la frescura de la watchlist: %s", e)
+            ultimas = {}
+
+        pendientes = [
+            c for c in grupo
+            if not self._es_fresca(c, ultimas.get(normalizar_nombre(c)))
+        ]
+        with self._lock:
+            self._stats["ciudades_frescas_omitidas"] += len(grupo) - len(pendientes)
+        return pendientes
+
+    def _medir_grupo(self, grupo: List[str]) -> None:
+        grupo = self._pendientes(grupo)
+        if not grupo:
+            return
+        # Peor caso: un geocoding por ciudad + una llamada de clima cada 100
+        llamadas = len(grupo) + math.ceil(len(grupo) / CLIMA_LOTE_MAXIMO)
+        if not self.limitador.adquirir(llamadas, self._detener):
+            return
+
+        resultado = registrar_mediciones_lote_desde_api(grupo)
+
+        ahora = time.monotonic()
+        with self._lock:
+            for r in resultado["resultados"]:
+                self._capturadas[normalizar_nombre(r["consulta"])] = ahora
+            self._stats["ciudades_medidas"] += len(resultado["resultados"])
+            self._stats["fallos_ciudad"] += len(resultado["errores"])
+            if resultado["errores"]:
+                self._stats["ultimo_error"] = resultado["errores"][-1]
+
+    def tick(self, programado: Optional[float] = None) -> None:
+        """
+        Ejecuta un tick completo (bloquea hasta medir todos los grupos).
+        `programado` es el instante (monotonic) en que debía empezar.
+        """
+        inicio = time.monotonic()
+        lag = max(0.0, inicio - programado) if programado is not None else 0.0
+        error = False
+
+        try:
+            espacio = self.intervalo / len(self.grupos) if self.grupos else 0.0
+
+            for i, grupo in enumerate(self.grupos):
+                objetivo = inicio + i * espacio + random.uniform(0, self.jitter * espacio)
+                espera = objetivo - time.monotonic()
+                if espera > 0 and self._detener.wait(espera):
+                    break
+                try:
+                    self._medir_grupo(grupo)
+                except Exception as e:
+                    error = True
+                    logger.exception("Falló la medición de un grupo de la watchlist")
+                    with self._lock:
+                        self._stats["fallos_ciudad"] += len(grupo)
+                        self._stats["ultimo_error"] = {"error": type(e).__name__, "detalle": str(e)}
+        finally:
+            duracion = time.monotonic() - inicio
+            with self._lock:
+                st = self._stats
+                st["ticks"] += 1
+                st["ticks_con_error"] += 1 if error else 0
+                st["ultimo_tick_segundos"] = round(duracion, 3)
+                st["tick_max_segundos"] = round(max(st["tick_max_segundos"], duracion), 3)
+                st["lag_ultimo_segundos"] = round(lag, 3)
+                st["lag_max_segundos"] = round(max(st["lag_max_segundos"], lag), 3)
+
+    # -----------------------------
+    # Ciclo de vida
+    # -----------------------------
+
+    def correr(self) -> None:
+        """Bucle principal: un tick cada `intervalo` segundos hasta detener()."""
+        programado = time.monotonic()
+        while not self._detener.is_set():
+            self.tick(programado)
+            programado += self.intervalo
+            # Si un tick se pasó de largo, no se encolan ticks atrasados
+            if programado < time.monotonic():
+                programado = time.monotonic()
+            if self._detener.wait(max(0.0, programado - time.monotonic())):
+                break
+
+    def iniciar(self) -> "PlanificadorWatchlist":
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self.correr, name="scheduler-watchlist", daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self, timeout: Optional[float] = None) -> None:
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            datos = dict(self._stats)
+        datos["activo"] = self._hilo is not None and self._hilo.is_alive()
+        datos["ciudades"] = len(self.ciudades)
+        datos["intervalo_segundos"] = self.intervalo
+        return datos
+
+
+# Instancia del proceso (solo si se inicia)
+_planificador: Optional[PlanificadorWatchlist] = None
+
+
+def iniciar_planificador() -> Optional[PlanificadorWatchlist]:
+    """
+    Crea e inicia el planificador con la configuración del entorno.
+    Si la watchlist está vacía no hace nada y devuelve None.
+    """
+    global _planificador
+    if _planificador is None:
+        planificador = PlanificadorWatchlist.desde_entorno()
+        if not planificador.ciudades:
+            logger.warning("Scheduler habilitado pero la watchlist está vacía.")
+            return None
+        _planificador = planificador.iniciar()
+    return _planificador
+
+
+def estadisticas_planificador() -> Optional[Dict[str, Any]]:
+    """Métricas del planificador del proceso, o None si no está corriendo."""
+    return _planificador.stats() if _planificador is not None else None
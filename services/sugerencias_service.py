@@ -0,0 +1,336 @@
+# services/sugerencias_service.py
+"""
+Autocompletado de ciudades desde un índice de prefijos en memoria.
+
+El índice es un arreglo ordenado de claves normalizadas (sin tildes, en
+minúsculas, ver normalizacion.py) con el id de ciudad de cada una. Cada
+ciudad aporta su nombre completo y el resto del nombre desde cada palabra
+("mar del plata", "del plata", "plata"). Un prefijo es un rango contiguo
+del arreglo que se encuentra con dos búsquedas binarias.
+
+Las sugerencias se ordenan por cantidad de mediciones. Para que un
+prefijo corto ("s", "san") no obligue a ordenar miles de candidatos, los
+prefijos con más de UMBRAL_ESCANEO claves guardan su top ya calculado,
+que se mantiene al sumar mediciones o ciudades.
+
+Si un prefijo no tiene coincidencias se prueban las variantes a una
+edición de distancia (letra de más, de menos, cambiada o transpuesta).
+
+El índice se arma desde la tabla `ciudad` con el primer uso, se
+actualiza en el proceso con cada medición registrada y se reconstruye
+en segundo plano cada SUGERENCIAS_TTL_SEGUNDOS (para ver las ciudades
+que agregan otros procesos).
+"""
+
+from __future__ import annotations
+
+import heapq
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional
+
+from repositories.ciudad_repository import obtener_ciudades_con_cantidad
+from services.normalizacion import normalizar_nombre
+
+
+logger = logging.getLogger(__name__)
+
+SUGERENCIAS_POR_DEFECTO = 10
+SUGERENCIAS_MAXIMO = 20
+# Rangos más grandes que esto usan el top precalculado
+UMBRAL_ESCANEO = 200
+# Largo mínimo del texto para buscar variantes con un error de tipeo
+LARGO_MINIMO_DIFUSO = 3
+ALFABETO = "abcdefghijklmnopqrstuvwxyz "
+
+# Mayor que cualquier carácter: prefijo + FIN acota el rango del prefijo
+_FIN = "\U0010ffff"
+
+
+def claves_de(nombre: str) -> List[str]:
+    """Nombre normalizado completo y desde cada palabra siguiente."""
+    palabras = normalizar_nombre(nombre).split(" ")
+    if palabras == [""]:
+        return []
+    return [" ".join(palabras[i:]) for i in range(len(palabras))]
+
+
+def variantes_una_edicion(texto: str) -> set:
+    """Textos a una edición de distancia (borrado, transposición, cambio, inserción)."""
+    cortes = [(texto[:i], texto[i:]) for i in range(len(texto) + 1)]
+    borrados = {a + b[1:] for a, b in cortes if b}
+    transpuestos = {a + b[1] + b[0] + b[2:] for a, b in cortes if len(b) > 1}
+    cambiados = {a + c + b[1:] for a, b in cortes if b for c in ALFABETO}
+    insertados = {a + c + b for a, b in cortes for c in ALFABETO}
+    variantes = borrados | transpuestos | cambiados | insertados
+    variantes.discard(texto)
+    return {v.strip() for v in variantes if v.strip()}
+
+
+class IndiceCiudades:
+    """
+    Índice de prefijos thread-safe.
+
+    :param ciudades: dicts con id_ciudad, nombre, pais, pais_nombre, mediciones.
+    :param limite_top: tamaño de los tops precalculados (máximo por consulta).
+    :param umbral: rangos con más claves que esto usan top precalculado.
+    """
+
+    def __init__(
+        self,
+        ciudades: Iterable[Dict[str, Any]] = (),
+        limite_top: int = SUGERENCIAS_MAXIMO,
+        umbral: int = UMBRAL_ESCANEO,
+    ):
+        self.limite_top = limite_top
+        self.umbral = max(umbral, limite_top)
+        self._lock = threading.RLock()
+        self._ciudades: Dict[int, Dict[str, Any]] = {}
+
+        pares = []
+        for ciudad in ciudades:
+            self._ciudades[ciudad["id_ciudad"]] = self._ficha(ciudad)
+            pares.extend((clave, ciudad["id_ciudad"]) for clave in claves_de(ciudad["nombre"]))
+        pares.sort()
+        self._claves = [clave for clave, _ in pares]
+        self._ids = [id_ciudad for _, id_ciudad in pares]
+
+        # prefijo -> ids del top (ordenados), solo para rangos grandes
+        self._top: Dict[str, List[int]] = {}
+        self._precalcular()
+
+    @staticmethod
+    def _ficha(ciudad: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id_ciudad": ciudad["id_ciudad"],
+            "nombre": ciudad["nombre"],
+            "pais": ciudad.get("pais"),
+            "pais_nombre": ciudad.get("pais_nombre"),
+            "mediciones": ciudad.get("mediciones", 0),
+        }
+
+    def __len__(self) -> int:
+        return len(self._ciudades)
+
+    # -----------------------------
+    # Helpers internos (con el lock tomado)
+    # -----------------------------
+
+    def _orden(self, id_ciudad: int):
+        ciudad = self._ciudades[id_ciudad]
+        return (-ciudad["mediciones"], ciudad["nombre"])
+
+    def _rango(self, prefijo: str, lo: int = 0, hi: Optional[int] = None):
+        hi = len(self._claves) if hi is None else hi
+        inicio = bisect_left(self._claves, prefijo, lo, hi)
+        return inicio, bisect_left(self._claves, prefijo + _FIN, inicio, hi)
+
+    def _mejores(self, ids: Iterable[int], cantidad: int) -> List[int]:
+        return heapq.nsmallest(cantidad, set(ids), key=self._orden)
+
+    def _precalcular(self) -> None:
+        """Top de cada prefijo con más de `umbral` claves (de corto a largo)."""
+        pendientes = [("", 0, len(self._claves))]
+        while pendientes:
+            prefijo, lo, hi = pendientes.pop()
+            largo = len(prefijo) + 1
+            i = lo
+            while i < hi:
+                clave = self._claves[i]
+                if len(clave) < largo:
+                    i += 1
+                    continue
+                siguiente = clave[:largo]
+                _, fin = self._rango(siguiente, i, hi)
+                if fin - i > self.umbral:
+                    self._top[siguiente] = self._mejores(self._ids[i:fin], self.limite_top)
+                    pendientes.append((siguiente, i, fin))
+                i = fin
+
+    def _top_de(self, prefijo: str, lo: int, hi: int) -> List[int]:
+        top = self._top.get(prefijo)
+        if top is None:
+            # Rango que creció después de armar el índice
+            top = self._top[prefijo] = self._mejores(self._ids[lo:hi], self.limite_top)
+        return top
+
+    def _reubicar_en_tops(self, id_ciudad: int) -> None:
+        """Actualiza los tops de los prefijos de la ciudad (solo subió su puntaje)."""
+        orden = self._orden(id_ciudad)
+        for clave in claves_de(self._ciudades[id_ciudad]["nombre"]):
+            for largo in range(1, len(clave) + 1):
+                top = self._top.get(clave[:largo])
+                if top is None:
+                    continue
+                if id_ciudad in top:
+                    top.sort(key=self._orden)
+                elif len(top) < self.limite_top or orden < self._orden(top[-1]):
+                    top.append(id_ciudad)
+                    top.sort(key=self._orden)
+                    del top[self.limite_top:]
+
+    def _ids_de(self, prefijo: str, cantidad: int) -> List[int]:
+        lo, hi = self._rango(prefijo)
+        if hi - lo > self.umbral:
+            return self._top_de(prefijo, lo, hi)[:cantidad]
+        return self._mejores(self._ids[lo:hi], cantidad)
+
+    # -----------------------------
+    # API pública
+    # -----------------------------
+
+    def sugerir(self, texto: str, cantidad: int = SUGERENCIAS_POR_DEFECTO) -> List[Dict[str, Any]]:
+        """
+        Hasta `cantidad` ciudades cuyo nombre (o alguna palabra del nombre)
+        empieza con `texto`, de la más medida a la menos medida. Sin
+        coincidencias, busca variantes a un error de tipeo.
+        """
+        prefijo = normalizar_nombre(texto)
+        if not prefijo:
+            return []
+        cantidad = max(1, min(cantidad, self.limite_top))
+
+        with self._lock:
+            ids = self._ids_de(prefijo, cantidad)
+            if not ids and len(prefijo) >= LARGO_MINIMO_DIFUSO:
+                candidatos = set()
+                for variante in variantes_una_edicion(prefijo):
+                    candidatos.update(self._ids_de(variante, cantidad))
+                ids = self._mejores(candidatos, cantidad)
+            return [dict(self._ciudades[i]) for i in ids]
+
+    def agregar(self, ciudad: Dict[str, Any]) -> bool:
+        """
+        Agrega una ciudad nueva. Devuelve False si ya estaba.
+        """
+        id_ciudad = ciudad["id_ciudad"]
+        with self._lock:
+            if id_ciudad in self._ciudades:
+                return False
+            self._ciudades[id_ciudad] = self._ficha(ciudad)
+            for clave in claves_de(ciudad["nombre"]):
+                i = bisect_right(self._claves, clave)
+                self._claves.insert(i, clave)
+                self._ids.insert(i, id_ciudad)
+            self._reubicar_en_tops(id_ciudad)
+            return True
+
+    def sumar_mediciones(self, id_ciudad: int, cantidad: int = 1) -> None:
+        with self._lock:
+            ciudad = self._ciudades.get(id_ciudad)
+            if ciudad is None:
+                return
+            ciudad["mediciones"] += cantidad
+            self._reubicar_en_tops(id_ciudad)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ciudades": len(self._ciudades),
+                "claves": len(self._claves),
+                "prefijos_precalculados": len(self._top),
+            }
+
+
+# -----------------------------
+# Índice compartido del proceso
+# -----------------------------
+
+SUGERENCIAS_TTL_SEGUNDOS = float(os.getenv("SUGERENCIAS_TTL_SEGUNDOS", "300"))
+
+_indice: Optional[IndiceCiudades] = None
+_armado_en = 0.0
+_reconstruyendo = False
+_invalidado = False
+_lock = threading.Lock()
+_armado_lock = threading.Lock()
+
+
+def reconstruir_indice() -> IndiceCiudades:
+    """Lee todas las ciudades de la BD y reemplaza el índice."""
+    global _indice, _armado_en, _invalidado
+    with _lock:
+        _invalidado = False
+    nuevo = IndiceCiudades(obtener_ciudades_con_cantidad())
+    with _lock:
+        _indice = nuevo
+        _armado_en = time.monotonic()
+    return nuevo
+
+
+def _reconstruir_en_fondo() -> None:
+    global _reconstruyendo, _armado_en
+    try:
+        reconstruir_indice()
+    except Exception:
+        logger.exception("No se pudo reconstruir el índice de ciudades")
+        with _lock:
+            _armado_en = time.monotonic()
+    finally:
+        with _lock:
+            _reconstruyendo = False
+
+
+def obtener_indice() -> IndiceCiudades:
+    """
+    Índice compartido: se arma con el primer uso (bloqueante) y, vencido el
+    TTL, se reconstruye en un hilo mientras se sigue usando el anterior.
+    """
+    global _reconstruyendo
+    indice = _indice
+    if indice is None:
+        # Un solo hilo lo arma; los demás esperan ese mismo resultado
+        with _armado_lock:
+            if _indice is None:
+                reconstruir_indice()
+        return _indice
+
+    vencido = SUGERENCIAS_TTL_SEGUNDOS > 0 and time.monotonic() - _armado_en > SUGERENCIAS_TTL_SEGUNDOS
+    if vencido or _invalidado:
+        with _lock:
+            lanzar = not _reconstruyendo
+            _reconstruyendo = True
+        if lanzar:
+            threading.Thread(
+                target=_reconstruir_en_fondo, name="indice-ciudades", daemon=True
+            ).start()
+    return indice
+
+
+def sugerir_ciudades(texto: str, cantidad: int = SUGERENCIAS_POR_DEFECTO) -> List[Dict[str, Any]]:
+    """Sugerencias para el autocompletado (ver IndiceCiudades.sugerir)."""
+    if not normalizar_nombre(texto):
+        return []
+    return obtener_indice().sugerir(texto, cantidad)
+
+
+def registrar_ciudad_medida(ciudad: Dict[str, Any], mediciones: int = 1) -> None:
+    """
+    Informa una medición registrada para `ciudad` (dict con id_ciudad,
+    nombre y pais): la agrega al índice si es nueva y suma su cantidad.
+    Si el índice todavía no se armó no hace nada (lo leerá de la BD).
+    """
+    indice = _indice
+    if indice is None:
+        return
+    if indice.agregar({**ciudad, "mediciones": mediciones}):
+        return
+    indice.sumar_mediciones(ciudad["id_ciudad"], mediciones)
+
+
+def invalidar_indice() -> None:
+    """
+    Marca el índice como vencido (p. ej. después de una importación masiva):
+    el próximo uso lo reconstruye en un hilo, como al vencer el TTL.
+    """
+    global _invalidado
+    with _lock:
+        _invalidado = True
+
+
+def estadisticas_sugerencias() -> Optional[Dict[str, Any]]:
+    """Tamaño del índice, o None si todavía no se armó."""
+    return _indice.stats() if _indice is not None else None
@@ -0,0 +1,389 @@
+# services/ultimas_mediciones.py
+"""
+Última medición y mediciones recientes de cada ciudad, en memoria.
+
+La lectura más común ("¿qué marca ahora la ciudad X?") no necesita ir a
+la BD: por ciudad se guarda un buffer circular con sus últimas
+ULTIMAS_POR_CIUDAD mediciones, en arreglos paralelos (array de números
+de 8 / 4 bytes, sin un objeto Python por valor) dentro de un objeto con
+__slots__.
+
+Memoria acotada por ciudad, sin importar cuántas mediciones tenga:
+unos 68 bytes por lectura guardada más ~1,2 KB fijos (arreglos, nombre
+de la ciudad, entrada del dict). Con el valor por defecto (16) son unos
+2,3 KB por ciudad: ~23 MB cada 10.000 ciudades
+(medido con `python -m benchmarks.bench_ultimas`). Las descripciones
+se comparten entre lecturas (sys.intern).
+
+- Se arma desde la BD al iniciar (o con el primer uso) con las últimas
+  mediciones de cada ciudad (obtener_ultimas_mediciones).
+- Cada medición registrada en este proceso se agrega al momento
+  (registrar_medicion_reciente, junto a registrar_ciudad_medida).
+- Se reconstruye en segundo plano cada ULTIMAS_TTL_SEGUNDOS, o después
+  de una importación masiva o una retención, para ver lo que escriben
+  otros procesos (scheduler.py, ingesta.py).
+
+Las fechas se guardan como segundos desde epoch y se devuelven en UTC.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from repositories.mediciones_repository import obtener_ultimas_mediciones
+from services.rangos_service import obtener_clasificador
+
+
+logger = logging.getLogger(__name__)
+
+ULTIMAS_POR_CIUDAD = int(os.getenv("ULTIMAS_POR_CIUDAD", "16"))
+ULTIMAS_TTL_SEGUNDOS = float(os.getenv("ULTIMAS_TTL_SEGUNDOS", "300"))
+
+
+def _segundos(fecha) -> float:
+    """datetime o string ISO 8601 -> segundos desde epoch."""
+    if isinstance(fecha, str):
+        fecha = datetime.fromisoformat(fecha)
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return fecha.timestamp()
+
+
+class SerieCiudad:
+    """
+    Buffer circular de las últimas `capacidad` mediciones de una ciudad,
+    ordenado por fecha. La posición lógica i (0 = la más vieja) está en
+    el casillero (inicio + i) % capacidad de cada arreglo.
+    """
+
+    __slots__ = (
+        "id_ciudad", "nombre", "provincia", "pais",
+        "capacidad", "inicio", "cantidad",
+        "ids", "fechas", "rangos", "temperaturas", "humedades",
+        "sensaciones", "presiones", "vientos", "descripciones",
+    )
+
+    def __init__(self, ciudad: Dict[str, Any], capacidad: int):
+        self.id_ciudad = ciudad["id_ciudad"]
+        self.nombre = ciudad["nombre"]
+        self.provincia = ciudad["provincia"]
+        self.pais = ciudad["pais"]
+        self.capacidad = capacidad
+        self.inicio = 0
+        self.cantidad = 0
+        self.ids = array("q", bytes(8 * capacidad))
+        self.fechas = array("d", bytes(8 * capacidad))
+        self.rangos = array("i", bytes(4 * capacidad))
+        self.temperaturas = array("d", bytes(8 * capacidad))
+        self.humedades = array("i", bytes(4 * capacidad))
+        self.sensaciones = array("d", bytes(8 * capacidad))
+        self.presiones = array("d", bytes(8 * capacidad))
+        self.vientos = array("d", bytes(8 * capacidad))
+        self.descripciones: List[Optional[str]] = [None] * capacidad
+
+    def _casillero(self, i: int) -> int:
+        return (self.inicio + i) % self.capacidad
+
+    def _mover(self, desde: int, hasta: int) -> None:
+        for arreglo in (
+            self.ids, self.fechas, self.rangos, self.temperaturas, self.humedades,
+            self.sensaciones, self.presiones, self.vientos, self.descripciones,
+        ):
+            arreglo[hasta] = arreglo[desde]
+
+    def agregar(self, id_medicion: int, fecha: float, valores: Dict[str, Any]) -> bool:
+        """
+        Inserta una medición en su lugar por fecha (casi siempre al final).
+        Con el buffer lleno descarta la más vieja. Devuelve False si no se
+        guardó: ya estaba, o es más vieja que todas las del buffer lleno.
+        """
+        n = self.cantidad
+        # Los casilleros sin usar valen 0 (el buffer nunca se achica)
+        if id_medicion in self.ids:
+            return False
+
+        # Posición lógica: desde la más nueva hacia atrás
+        k = n
+        while k > 0 and fecha < self.fechas[self._casillero(k - 1)]:
+            k -= 1
+        if n == self.capacidad:
+            if k == 0:
+                return False
+            self.inicio = (self.inicio + 1) % self.capacidad
+            n -= 1
+            k -= 1
+        for j in range(n, k, -1):
+            self._mover(self._casillero(j - 1), self._casillero(j))
+
+        c = self._casillero(k)
+        self.ids[c] = id_medicion
+        self.fechas[c] = fecha
+        self.rangos[c] = valores["id_rango"]
+        self.temperaturas[c] = valores["temperatura"]
+        self.humedades[c] = int(valores["humedad"])
+        self.sensaciones[c] = valores["sensacion_termica"]
+        self.presiones[c] = valores["presion"]
+        self.vientos[c] = valores["velocidad_viento"]
+        descripcion = valores["descripcion"]
+        self.descripciones[c] = sys.intern(descripcion) if descripcion is not None else None
+        self.cantidad = n + 1
+        return True
+
+    def medicion(self, i: int, rango_de) -> Dict[str, Any]:
+        """Posición lógica i como el dict de fila_a_medicion (GET /api/mediciones)."""
+        c = self._casillero(i)
+        id_rango = self.rangos[c]
+        rango = rango_de(id_rango)
+        return {
+            "id_medicion": self.ids[c],
+            "fecha": datetime.fromtimestamp(self.fechas[c], timezone.utc).isoformat(),
+            "temperatura": self.temperaturas[c],
+            "humedad": self.humedades[c],
+            "sensacion_termica": self.sensaciones[c],
+            "presion": self.presiones[c],
+            "velocidad_viento": self.vientos[c],
+            "descripcion": self.descripciones[c],
+            "ciudad": self.ciudad(),
+            "rango": {
+                "id_rango": id_rango,
+                "nombre_rango": rango["nombre_rango"] if rango is not None else None,
+            },
+        }
+
+    def ciudad(self) -> Dict[str, Any]:
+        return {
+            "id_ciudad": self.id_ciudad,
+            "nombre": self.nombre,
+            "provincia": self.provincia,
+            "pais": self.pais,
+        }
+
+
+class UltimasMediciones:
+    """
+    Series por ciudad, thread-safe.
+
+    :param por_ciudad: tamaño del buffer de cada ciudad.
+    """
+
+    def __init__(self, por_ciudad: int = ULTIMAS_POR_CIUDAD):
+        if por_ciudad < 1:
+            raise ValueError("por_ciudad debe ser >= 1")
+        self.por_ciudad = por_ciudad
+        self._series: Dict[int, SerieCiudad] = {}
+        self._lock = threading.Lock()
+        self._agregadas = 0
+        self._descartadas = 0
+
+    @classmethod
+    def desde_filas(cls, filas, por_ciudad: int = ULTIMAS_POR_CIUDAD) -> "UltimasMediciones":
+        """Arma el almacén desde filas crudas de SELECT_MEDICIONES."""
+        nuevo = cls(por_ciudad)
+        for row in filas:
+            nuevo.agregar(
+                {"id_ciudad": row[8], "nombre": row[9], "provincia": row[10], "pais": row[11]},
+                row[0],
+                row[1],
+                {
+                    "id_rango": row[12],
+                    "temperatura": row[2],
+                    "humedad": row[3],
+                    "sensacion_termica": row[4],
+                    "presion": row[5],
+                    "velocidad_viento": row[6],
+                    "descripcion": row[7],
+                },
+            )
+        return nuevo
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def agregar(self, ciudad: Dict[str, Any], id_medicion: int, fecha, valores: Dict[str, Any]) -> bool:
+        """
+        :param ciudad: dict con id_ciudad, nombre, provincia y pais.
+        :param fecha: datetime o string ISO 8601.
+        :param valores: id_rango y las métricas (como en fila_para_lote).
+        """
+        segundos = _segundos(fecha)
+        with self._lock:
+            serie = self._series.get(ciudad["id_ciudad"])
+            if serie is None:
+                serie = self._series[ciudad["id_ciudad"]] = SerieCiudad(ciudad, self.por_ciudad)
+            guardada = serie.agregar(id_medicion, segundos, valores)
+            if guardada:
+                self._agregadas += 1
+            else:
+                self._descartadas += 1
+        return guardada
+
+    def ultima(self, id_ciudad: int, rango_de) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            serie = self._series.get(id_ciudad)
+            if serie is None or not serie.cantidad:
+                return None
+            return serie.medicion(serie.cantidad - 1, rango_de)
+
+    def recientes(self, id_ciudad: int, cantidad: int, rango_de) -> Optional[Dict[str, Any]]:
+        """{"ciudad", "mediciones": [de la más nueva a la más vieja]} o None."""
+        with self._lock:
+            serie = self._series.get(id_ciudad)
+            if serie is None or not serie.cantidad:
+                return None
+            n = serie.cantidad
+            mediciones = [
+                serie.medicion(i, rango_de)
+                for i in range(n - 1, max(0, n - cantidad) - 1, -1)
+            ]
+            return {"ciudad": serie.ciudad(), "mediciones": mediciones}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            ciudades = len(self._series)
+            lecturas = sum(s.cantidad for s in self._series.values())
+            agregadas = self._agregadas
+            descartadas = self._descartadas
+        return {
+            "ciudades": ciudades,
+            "lecturas": lecturas,
+            "por_ciudad": self.por_ciudad,
+            "agregadas": agregadas,
+            "descartadas": descartadas,
+        }
+
+
+# -----------------------------
+# Almacén compartido
+# -----------------------------
+
+_ultimas: Optional[UltimasMediciones] = None
+_armado_en = 0.0
+_reconstruyendo = False
+_invalidado = False
+# Mediciones registradas mientras se lee la BD: se reaplican al almacén nuevo
+_durante_reconstruccion: Optional[list] = None
+_lock = threading.Lock()
+_armado_lock = threading.Lock()
+
+
+def reconstruir_ultimas() -> UltimasMediciones:
+    """Lee de la BD las últimas mediciones de cada ciudad y reemplaza el almacén."""
+    global _ultimas, _armado_en, _invalidado, _durante_reconstruccion
+    with _lock:
+        _invalidado = False
+        _durante_reconstruccion = []
+    try:
+        nuevo = UltimasMediciones.desde_filas(
+            obtener_ultimas_mediciones(ULTIMAS_POR_CIUDAD), ULTIMAS_POR_CIUDAD
+        )
+    except BaseException:
+        with _lock:
+            _durante_reconstruccion = None
+        raise
+    with _lock:
+        pendientes, _durante_reconstruccion = _durante_reconstruccion, None
+        for args in pendientes:
+            nuevo.agregar(*args)
+        _ultimas = nuevo
+        _armado_en = time.monotonic()
+    return nuevo
+
+
+def _reconstruir_en_fondo() -> None:
+    global _reconstruyendo, _armado_en
+    try:
+        reconstruir_ultimas()
+    except Exception:
+        logger.exception("No se pudieron leer las últimas mediciones")
+        with _lock:
+            _armado_en = time.monotonic()
+    finally:
+        with _lock:
+            _reconstruyendo = False
+
+
+def obtener_ultimas() -> UltimasMediciones:
+    """
+    Almacén compartido: se arma con el primer uso (bloqueante) y, vencido
+    el TTL o invalidado, se reconstruye en un hilo mientras se sigue
+    usando el anterior.
+    """
+    global _reconstruyendo
+    ultimas = _ultimas
+    if ultimas is None:
+        with _armado_lock:
+            if _ultimas is None:
+                reconstruir_ultimas()
+        return _ultimas
+
+    vencido = ULTIMAS_TTL_SEGUNDOS > 0 and time.monotonic() - _armado_en > ULTIMAS_TTL_SEGUNDOS
+    if vencido or _invalidado:
+        with _lock:
+            lanzar = not _reconstruyendo
+            _reconstruyendo = True
+        if lanzar:
+            threading.Thread(
+                target=_reconstruir_en_fondo, name="ultimas-mediciones", daemon=True
+            ).start()
+    return ultimas
+
+
+def _rango_de(id_rango: int) -> Optional[Dict[str, Any]]:
+    return obtener_clasificador().rango(id_rango)
+
+
+def ultima_medicion(id_ciudad: int) -> Optional[Dict[str, Any]]:
+    """La medición más reciente de la ciudad (forma de GET /api/mediciones), o None."""
+    return obtener_ultimas().ultima(id_ciudad, _rango_de)
+
+
+def mediciones_recientes(id_ciudad: int, cantidad: int = ULTIMAS_POR_CIUDAD) -> Optional[Dict[str, Any]]:
+    """
+    Hasta `cantidad` mediciones recientes de la ciudad (como máximo
+    ULTIMAS_POR_CIUDAD), de la más nueva a la más vieja, o None si la
+    ciudad no tiene mediciones.
+    """
+    cantidad = max(1, min(cantidad, ULTIMAS_POR_CIUDAD))
+    return obtener_ultimas().recientes(id_ciudad, cantidad, _rango_de)
+
+
+def registrar_medicion_reciente(registro: Dict[str, Any], valores: Dict[str, Any]) -> None:
+    """
+    Informa una medición recién escrita.
+
+    :param registro: {"id_medicion", "fecha", "ciudad"} como lo devuelven
+        registrar_medicion_atomica / registrar_mediciones_lote.
+    :param valores: id_rango y las métricas (por ejemplo la fila de fila_para_lote).
+
+    Si el almacén todavía no se armó no hace nada (lo leerá de la BD).
+    """
+    args = (registro["ciudad"], registro["id_medicion"], registro["fecha"], valores)
+    with _lock:
+        ultimas = _ultimas
+        if _durante_reconstruccion is not None:
+            _durante_reconstruccion.append(args)
+    if ultimas is not None:
+        ultimas.agregar(*args)
+
+
+def invalidar_ultimas() -> None:
+    """Marca el almacén como vencido: el próximo uso lo reconstruye en un hilo."""
+    global _invalidado
+    with _lock:
+        _invalidado = True
+
+
+def estadisticas_ultimas() -> Optional[Dict[str, Any]]:
+    """Tamaño del almacén, o None si todavía no se armó."""
+    if _ultimas is None:
+        return None
+    datos = _ultimas.stats()
+    datos["ttl_segundos"] = ULTIMAS_TTL_SEGUNDOS
+    return datos
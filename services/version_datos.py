@@ -0,0 +1,284 @@
+# services/version_datos.py
+"""
+Versión vigente de los datos (tabla version_datos, migración 005), conocida
+por cada proceso sin consultar la BD.
+
+Un hilo de fondo mantiene una conexión propia (fuera del pool) con
+LISTEN version_datos. Cada COMMIT que cambia mediciones o rango notifica la
+versión nueva, así que varios procesos de la API (workers de gunicorn,
+el scheduler aparte, etc.) se enteran de los cambios de los demás.
+
+Mientras la escucha no está conectada, version_actual() devuelve None y
+quien la use tiene que ir a la BD: nunca se responde con una versión que
+no se pudo confirmar. Con un backend sin NOTIFY (SQLite) la escucha no se
+inicia y siempre es así.
+
+- Si pasan `espera` segundos sin avisos, la escucha relee la versión por
+  la misma conexión: confirma que sigue viva (una conexión TCP medio
+  abierta no da error en select(), solo silencio) y recupera un aviso
+  perdido. Si esa lectura tarda más que `espera` o falla, deja de dar
+  versión hasta reconectar.
+- Las escrituras de este mismo proceso (registrar_escritura) no esperan
+  el NOTIFY: hasta que una lectura de la BD empezada después de escribir
+  confirme la versión, version_actual() devuelve None y el pedido va a la
+  BD, así el proceso siempre ve lo que acaba de escribir.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import select
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import psycopg2
+
+from database.almacenamiento import obtener_almacenamiento
+from database.connection import get_connection
+
+
+logger = logging.getLogger(__name__)
+
+CANAL = "version_datos"
+VERSION_REINTENTO_SEGUNDOS = float(os.getenv("VERSION_REINTENTO_SEGUNDOS", "2"))
+VERSION_ESPERA_SEGUNDOS = float(os.getenv("VERSION_ESPERA_SEGUNDOS", "5"))
+
+# TCP keepalive de la conexión de LISTEN: corta una conexión muerta aunque
+# el servidor no llegue a cerrarla (la relectura queda esperando la respuesta)
+KEEPALIVES = {
+    "keepalives": 1,
+    "keepalives_idle": 10,
+    "keepalives_interval": 5,
+    "keepalives_count": 3,
+}
+
+
+class EscuchaVersion:
+    """
+    Hilo con LISTEN sobre el canal de versiones.
+
+    :param reintento: segundos de espera antes de reconectar tras un error.
+    :param espera: segundos máximos de cada select() sin avisos antes de
+        releer la versión (y de poder detenerse).
+    """
+
+    def __init__(self, reintento: float = VERSION_REINTENTO_SEGUNDOS, espera: float = VERSION_ESPERA_SEGUNDOS):
+        self.reintento = reintento
+        self.espera = espera
+        self._version: Optional[int] = None
+        self._conectada = False
+        # Escrituras propias registradas y cuántas ya confirmó una lectura
+        self._escrituras = 0
+        self._confirmadas = 0
+        # Inicio de la relectura en curso (None si no hay ninguna)
+        self._releyendo_desde: Optional[float] = None
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._stats = {
+            "notificaciones": 0,
+            "relecturas": 0,
+            "conexiones": 0,
+            "errores": 0,
+            "ultimo_error": None,
+        }
+
+    def version(self) -> Optional[int]:
+        """
+        Versión vigente, o None si no se puede confirmar: escucha
+        desconectada, relectura trabada o escrituras propias que todavía
+        no se vieron en una lectura de la BD.
+        """
+        with self._lock:
+            if not self._conectada or self._confirmadas < self._escrituras:
+                return None
+            if (
+                self._releyendo_desde is not None
+                and time.monotonic() - self._releyendo_desde > self.espera
+            ):
+                return None
+            return self._version
+
+    def marca(self) -> int:
+        """Para observar(): tomarla ANTES de empezar la lectura de la BD."""
+        with self._lock:
+            return self._escrituras
+
+    def observar(self, version: int, marca: Optional[int] = None) -> None:
+        """
+        Registra una versión vista (por NOTIFY o leída de la BD); nunca retrocede.
+
+        :param marca: la de marca() si la versión sale de una lectura de la
+            BD empezada después de tomarla; esa lectura ya incluye las
+            escrituras propias registradas hasta ahí. Los NOTIFY no llevan
+            marca: pueden ser de una versión anterior a la propia.
+        """
+        with self._lock:
+            if self._version is None or version > self._version:
+                self._version = version
+            if marca is not None and marca > self._confirmadas:
+                self._confirmadas = marca
+
+    def registrar_escritura(self) -> None:
+        """Este proceso confirmó una escritura (COMMIT ya hecho)."""
+        with self._lock:
+            self._escrituras += 1
+
+    # -----------------------------
+    # Hilo
+    # -----------------------------
+
+    @staticmethod
+    def _leer_version(cur) -> Optional[int]:
+        cur.execute("SELECT version FROM version_datos WHERE id = 1;")
+        fila = cur.fetchone()
+        return fila[0] if fila is not None else None
+
+    def _conectar(self):
+        conn = get_connection(**KEEPALIVES)
+        conn.autocommit = True
+        marca = self.marca()
+        with conn.cursor() as cur:
+            # Primero LISTEN y después leer: así no se pierde ningún cambio
+            cur.execute(f"LISTEN {CANAL};")
+            version = self._leer_version(cur)
+        if version is not None:
+            self.observar(version, marca)
+        with self._lock:
+            self._conectada = True
+            self._stats["conexiones"] += 1
+        return conn
+
+    def _releer(self, conn) -> None:
+        """
+        Sin avisos durante `espera`: relee la versión por la misma conexión.
+        Si la conexión murió, falla (o queda esperando hasta que el
+        keepalive la corta, y mientras tanto version() devuelve None).
+        """
+        marca = self.marca()
+        with self._lock:
+            self._releyendo_desde = time.monotonic()
+        with conn.cursor() as cur:
+            version = self._leer_version(cur)
+        with self._lock:
+            self._releyendo_desde = None
+            self._stats["relecturas"] += 1
+        if version is not None:
+            self.observar(version, marca)
+
+    def _leer_avisos(self, conn) -> None:
+        while conn.notifies:
+            aviso = conn.notifies.pop(0)
+            try:
+                self.observar(int(aviso.payload))
+            except ValueError:
+                continue
+            with self._lock:
+                self._stats["notificaciones"] += 1
+
+    def _escuchar(self, conn) -> None:
+        while not self._detener.is_set():
+            listos, _, _ = select.select([conn], [], [], self.espera)
+            if listos:
+                conn.poll()
+            else:
+                self._releer(conn)
+            self._leer_avisos(conn)
+
+    def correr(self) -> None:
+        while not self._detener.is_set():
+            conn = None
+            try:
+                conn = self._conectar()
+                self._escuchar(conn)
+            except (psycopg2.Error, OSError) as e:
+                logger.warning("Escucha de versiones desconectada: %s", e)
+                with self._lock:
+                    self._stats["errores"] += 1
+                    self._stats["ultimo_error"] = str(e)
+            finally:
+                with self._lock:
+                    self._conectada = False
+                    self._releyendo_desde = None
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except psycopg2.Error:
+                        pass
+            self._detener.wait(self.reintento)
+
+    def iniciar(self) -> "EscuchaVersion":
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self.correr, name="escucha-version", daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self, timeout: Optional[float] = None) -> None:
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            datos = dict(self._stats)
+            datos["conectada"] = self._conectada
+            datos["version"] = self._version
+        return datos
+
+
+# Instancia del proceso (se inicia con el primer uso)
+_escucha: Optional[EscuchaVersion] = None
+_escucha_lock = threading.Lock()
+
+
+def obtener_escucha() -> Optional[EscuchaVersion]:
+    """Escucha del proceso, o None si el backend no avisa los cambios."""
+    global _escucha
+    if _escucha is None:
+        if not obtener_almacenamiento().notifica_versiones:
+            return None
+        with _escucha_lock:
+            if _escucha is None:
+                _escucha = EscuchaVersion().iniciar()
+    return _escucha
+
+
+def version_actual() -> Optional[int]:
+    """Versión vigente de los datos según la escucha, o None si no está conectada."""
+    escucha = obtener_escucha()
+    return escucha.version() if escucha is not None else None
+
+
+def marca_version() -> int:
+    """Marca para observar_version, tomada antes de leer la BD (0 sin escucha)."""
+    escucha = obtener_escucha()
+    return escucha.marca() if escucha is not None else 0
+
+
+def observar_version(version: int, marca: Optional[int] = None) -> None:
+    """
+    Informa una versión leída de la BD (adelanta a la escucha si viene
+    atrasada). Con la marca de marca_version() tomada antes de la lectura,
+    además confirma las escrituras propias anteriores a ella.
+    """
+    escucha = obtener_escucha()
+    if escucha is not None:
+        escucha.observar(version, marca)
+
+
+def registrar_escritura() -> None:
+    """
+    Llamar después del COMMIT de cada escritura de mediciones de este
+    proceso: hasta que una lectura la confirme, version_actual() es None.
+    """
+    escucha = obtener_escucha()
+    if escucha is not None:
+        escucha.registrar_escritura()
+
+
+def estadisticas_version() -> Optional[Dict[str, Any]]:
+    """Estado de la escucha, o None si todavía no se usó."""
+    return _escucha.stats() if _escucha is not None else None